@@ -12,66 +12,227 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
-import errno
-import socket
-import sys
+import collections
 import time
 
+from eventlet.green import threading
 from neutron._i18n import _
+from neutron.agent.common import ovs_lib
 from neutron.agent.linux.interface import OVSInterfaceDriver
 from oslo_log import log as logging
-from oslo_serialization import jsonutils as json
-import six
 
-import nuage_neutron.agent.linux.exceptions as nuage_exc
+from nuage_neutron.agent.linux import ovsdb_client
 
 LOG = logging.getLogger(__name__)
 
+# the domain of the rows this driver puts in the nuage tables
+VM_DOMAIN = 5
+
 
 class NuageVMDriver(object):
 
+    OVSDB_IP = "localhost"
+    OVSDB_PORT = 6640
+    # seconds between two logs of the ovsdb client stats
+    STATS_LOG_INTERVAL = 600
+
+    _client = None
+    # the requests waiting to be sent, see _transact_combined
+    _pending = collections.deque()
+    _send_lock = threading.Lock()
+    _stats_logged = 0
+    _resynced = False
+
     @classmethod
-    def get_connected_socket(cls):
-        OVSDB_IP = "localhost"
-        OVSDB_PORT = 6640
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            sock.connect((OVSDB_IP, OVSDB_PORT))
-            LOG.debug(("Connected to the ovsdb..."))
-        except socket.error as error:
-            _, _, tb = sys.exc_info()
-            six.reraise(nuage_exc.NuageDriverException,
-                        nuage_exc.NuageDriverException(msg=error),
-                        tb)
-        return sock
+    def get_client(cls):
+        """Return the ovsdb client, connected on first use."""
+        if cls._client is None:
+            cls._client = ovsdb_client.OvsdbClient(cls.OVSDB_IP,
+                                                   cls.OVSDB_PORT)
+        return cls._client
+
+    @staticmethod
+    def _plug_transactions(port_id, device_name, mac_address, bridge):
+        return [
+            [{"op": "insert",
+              "table": "Nuage_Port_Table",
+              "row": {
+                  "name": device_name
+              }}],
+            [{"op": "insert",
+              "table": "Nuage_VM_Table",
+              "row": {
+                  "vm_uuid": port_id
+              }}],
+            [{"op": "update",
+              "table": "Nuage_Port_Table",
+              "where": [["name", "==", device_name]],
+              "row": {
+                  "mac": mac_address,
+                  "bridge": bridge,
+                  "vm_domain": VM_DOMAIN
+              }},
+             {"op": "update",
+              "table": "Nuage_VM_Table",
+              "where": [["vm_uuid", "==", port_id]],
+              "row": {
+                  "state": 1,
+                  "reason": 1,
+                  "domain": VM_DOMAIN,
+                  "vm_name": port_id,
+                  "ports": ["set", [device_name]]
+              }}]
+        ]
+
+    @staticmethod
+    def _unplug_transaction(port_id, device_name):
+        port_delete = {"op": "delete",
+                       "table": "Nuage_Port_Table",
+                       "where": [["name", "==", device_name]]}
+        if port_id is None:
+            return [port_delete]
+        return [{"op": "mutate",
+                 "table": "Nuage_VM_Table",
+                 "where": [["vm_uuid", "==", port_id]],
+                 "mutations": [["ports", "delete", device_name]]},
+                port_delete,
+                {"op": "delete",
+                 "table": "Nuage_VM_Table",
+                 "where": [["vm_uuid", "==", port_id]]}]
+
+    @staticmethod
+    def _atoms(value):
+        """Return the atoms of an ovsdb column value, a set or an atom."""
+        if isinstance(value, list) and value and value[0] == 'set':
+            return value[1]
+        return [] if value is None else [value]
 
     @classmethod
-    def ovsdb_transaction(cls, msg, recv_msg=False, max_retries=5):
-        LOG.debug(_("sending ovsdb-query as: %s"), msg)
-        sock = None
+    def get_plugged_ports(cls):
+        """Read the ports this driver plugged in one round trip.
+
+        :return: dict of device name to (port_id, bridge). The port id is
+            None for a device without row in Nuage_VM_Table.
+        """
+        port_rows, vm_rows = cls._transact_combined([[
+            {"op": "select",
+             "table": "Nuage_Port_Table",
+             "where": [["vm_domain", "==", VM_DOMAIN]],
+             "columns": ["name", "bridge"]},
+            {"op": "select",
+             "table": "Nuage_VM_Table",
+             "where": [["domain", "==", VM_DOMAIN]],
+             "columns": ["vm_uuid", "ports"]}]])[0]
+        port_ids = {}
+        for row in vm_rows.get('rows', []):
+            for device_name in cls._atoms(row.get('ports')):
+                port_ids[device_name] = row['vm_uuid']
+        plugged = {}
+        for row in port_rows.get('rows', []):
+            bridge = cls._atoms(row.get('bridge'))
+            plugged[row['name']] = (port_ids.get(row['name']),
+                                    bridge[0] if bridge else None)
+        return plugged
+
+    @staticmethod
+    def _get_bridge_devices(bridge):
+        return ovs_lib.OVSBridge(bridge).get_port_name_list()
+
+    @classmethod
+    def resync(cls):
+        """Unplug the ports of which the device left its bridge.
+
+        The devices of an agent can be deleted while it is down, e.g. by
+        neutron-ovs-cleanup when the host boots, without unplugging them.
+        Their rows stay in the nuage tables, while the agent only plugs the
+        ports it still has when it starts.
+
+        The plugged ports and the ports of their bridges are read once, and
+        the stale ones are unplugged in one pipelined batch.
+
+        :return: the number of ports unplugged
+        """
+        plugged = cls.get_plugged_ports()
+        attached = {}
+        for bridge in set(bridge for _port_id, bridge in plugged.values()):
+            if bridge:
+                attached[bridge] = set(cls._get_bridge_devices(bridge))
+        stale = [(port_id, device_name)
+                 for device_name, (port_id, bridge) in plugged.items()
+                 if bridge in attached and device_name not in attached[bridge]]
+        cls.unplug_many(stale)
+        LOG.info("NuageVMDriver resync: unplugged %(stale)s of %(plugged)s "
+                 "plugged ports, ovsdb stats: %(stats)s",
+                 {'stale': len(stale), 'plugged': len(plugged),
+                  'stats': cls.get_client().get_stats()})
+        return len(stale)
+
+    @classmethod
+    def _resync_once(cls):
+        """Resync on the first plug after the agent started."""
+        if cls._resynced:
+            return
+        cls._resynced = True
         try:
-            sock = cls.get_connected_socket()
-            sock.sendall(msg.encode())
-            if recv_msg:
-                resp = sock.recv(4096)
-                LOG.debug(_("response from ovsdb-query was: %s"), resp)
-                try:
-                    return json.loads(resp)
-                except ValueError:
-                    return None
+            cls.resync()
         except Exception:
-            ''' Retry 5 times every second '''
-            if (socket.errno in [errno.EBUSY, errno.EAGAIN] and
-                    max_retries > 0):
-                time.sleep(1)
-                LOG.debug(_("retrying some error"))
-                return cls.ovsdb_transaction(
-                    msg, recv_msg, max_retries=(max_retries - 1))
-            else:
-                raise
-        finally:
-            if sock:
-                sock.shutdown(socket.SHUT_RDWR)
+            LOG.exception("NuageVMDriver resync failed")
+
+    @classmethod
+    def _transact_combined(cls, transactions):
+        """Run transactions, pipelined with the ones of concurrent callers.
+
+        While a batch is in flight, the transactions of the other plugs and
+        unplugs queue up. The first caller to get the lock after it sends
+        all queued transactions in one batch, and hands every caller its
+        results.
+        """
+        request = {'transactions': transactions}
+        cls._pending.append(request)
+        with cls._send_lock:
+            if 'results' not in request:
+                batch = []
+                while cls._pending:
+                    batch.append(cls._pending.popleft())
+                cls._send(batch)
+        if isinstance(request['results'], Exception):
+            raise request['results']
+        return request['results']
+
+    @classmethod
+    def _send(cls, batch):
+        client = cls.get_client()
+        try:
+            results = client.transact_many(
+                sum((request['transactions'] for request in batch), []))
+        except Exception as e:
+            for request in batch:
+                request['results'] = e
+            return
+        for request in batch:
+            count = len(request['transactions'])
+            request['results'], results = results[:count], results[count:]
+        LOG.debug("NuageVMDriver: sent the transactions of %s requests in "
+                  "one batch", len(batch))
+        if time.time() - cls._stats_logged > cls.STATS_LOG_INTERVAL:
+            cls._stats_logged = time.time()
+            LOG.info("NuageVMDriver ovsdb stats: %s", client.get_stats())
+
+    @classmethod
+    def _log_errors(cls, action, results):
+        for (port_id, device_name), result in results:
+            errors = ovsdb_client.OvsdbClient.get_errors(result)
+            if errors:
+                LOG.warning("NuageVMDriver %(action)s of port %(id)s:%(name)s"
+                            " failed: %(errors)s",
+                            {'action': action, 'id': port_id,
+                             'name': device_name, 'errors': errors})
+
+    @staticmethod
+    def _updated(result):
+        """Return whether each operation of result updated a single row."""
+        return bool(result) and all(op_result and op_result.get('count') == 1
+                                    for op_result in result)
 
     @classmethod
     def plug(cls, port_id, device_name, mac_address,
@@ -82,123 +243,67 @@ class NuageVMDriver(object):
                    'name': device_name,
                    'bridge': bridge,
                    'namespace': None})
-
-        # Formulate json object
-        query = []
-        # Operation 1
-        query1 = {"id": 1,
-                  "method": "transact",
-                  "params": [
-                      "Open_vSwitch", {
-                          "op": "insert",
-                          "table": "Nuage_Port_Table",
-                          "row": {
-                              "name": device_name
-                          }
-                      }
-                  ]
-                  }
-        # Operation 2
-        query2 = {"id": 2,
-                  "method": "transact",
-                  "params": [
-                      "Open_vSwitch", {
-                          "op": "insert",
-                          "table": "Nuage_VM_Table",
-                          "row": {
-                              "vm_uuid": port_id
-                          }
-                      }
-                  ]
-                  }
-        # Operation 3
-        query3 = {"id": 3,
-                  "method": "transact",
-                  "params": [
-                      "Open_vSwitch", {
-                          "op": "update",
-                          "table": "Nuage_Port_Table",
-                          "where": [["name", "==", device_name]],
-                          "row": {
-                              "mac": mac_address,
-                              "bridge": bridge,
-                              "vm_domain": 5
-                          }
-                      }, {
-                          "op": "update",
-                          "table": "Nuage_VM_Table",
-                          "where": [["vm_uuid", "==", port_id]],
-                          "row": {
-                              "state": 1,
-                              "reason": 1,
-                              "domain": 5,
-                              "vm_name": port_id,
-                              "ports": ["set", [device_name]]
-                          }
-                      }
-                  ]
-                  }
-        # stitch the queries into one single query
-        query.append(json.dumps(query1))
-        query.append(json.dumps(query2))
-        query.append(json.dumps(query3))
-
-        # send the query one by one
-        for q in query:
-            cls.ovsdb_transaction(q)
+        cls._resync_once()
+        cls.plug_many([(port_id, device_name, mac_address, bridge)])
         LOG.debug(_("NuageVMDriver plug: sent the query"))
 
+    @classmethod
+    def plug_many(cls, ports):
+        """Plug ports in a single round trip.
+
+        A port gets two transactions. The first one updates its rows, and
+        does nothing when they don't exist. The second one inserts and
+        updates its rows, and fails when they exist already. So plugging a
+        new port and plugging a port again, as when an agent restarts, both
+        take one round trip. Only a port of which some rows exist gets
+        plugged one step at a time, as the insert failing must not stop the
+        updates.
+
+        :param ports: list of (port_id, device_name, mac_address, bridge)
+        """
+        transactions = []
+        for port in ports:
+            insert_port, insert_vm, update = cls._plug_transactions(*port)
+            transactions += [update, insert_port + insert_vm + update]
+        results = cls._transact_combined(transactions)
+        failed = [port for port, update_result, insert_result
+                  in zip(ports, results[::2], results[1::2])
+                  if ovsdb_client.OvsdbClient.get_errors(insert_result) and
+                  not cls._updated(update_result)]
+        if failed:
+            steps = [cls._plug_transactions(*port) for port in failed]
+            results = cls._transact_combined(sum(steps, []))
+            cls._log_errors('plug', [
+                ((port[0], port[1]), result)
+                for port, result in zip(failed, results[2::3])])
+
     @classmethod
     def unplug(cls, port_id, device_name):
         LOG.debug(_("Nuage unplugging port %(id)s:%(name)s on bridge"),
                   {'id': port_id,
                    'name': device_name})
-
-        # Formulate json object
-        query = {"id": 1,
-                 "method": "transact",
-                 "params": [
-                     "Open_vSwitch", {
-                         "op": "mutate",
-                         "table": "Nuage_VM_Table",
-                         "where": [["vm_uuid", "==", port_id]],
-                         "mutations": [["ports", "delete", device_name]]
-                     }, {
-                         "op": "delete",
-                         "table": "Nuage_Port_Table",
-                         "where": [["name", "==", device_name]]
-                     }, {
-                         "op": "delete",
-                         "table": "Nuage_VM_Table",
-                         "where": [["vm_uuid", "==", port_id]]
-                     }
-                 ]
-                 }
-        # send the obj
-        cls.ovsdb_transaction(json.dumps(query))
+        cls.unplug_many([(port_id, device_name)])
         LOG.debug(_("NuageVMDriver unplug: sent the query"))
 
+    @classmethod
+    def unplug_many(cls, ports):
+        """Unplug ports, each in a single transaction, pipelined.
+
+        :param ports: list of (port_id, device_name)
+        """
+        results = cls._transact_combined(
+            [cls._unplug_transaction(*port) for port in ports])
+        cls._log_errors('unplug', zip(ports, results))
+
     @classmethod
     def get_port_uuid(cls, device_name):
         LOG.debug(_("device name is : %s"), device_name)
-        port_id = None
-        # Formulate json object
-        query = {"id": 1,
-                 "method": "transact",
-                 "params": [
-                     "Open_vSwitch", {
-                         "op": "select",
-                         "table": "Nuage_VM_Table",
-                         "where": [["ports", "==", device_name]]
-                     }
-                 ]
-                 }
-        # send the obj
-        response = cls.ovsdb_transaction(json.dumps(query), True)
-        if response is not None \
-                and response.get('result') is not None:
-            port_id = response['result'][0]['rows'][0]['vm_uuid']
-        return port_id
+        result, = cls._transact_combined([[
+            {"op": "select",
+             "table": "Nuage_VM_Table",
+             "where": [["ports", "==", device_name]]}]])
+        rows = result[0].get('rows') if result and result[0] else None
+        return rows[0]['vm_uuid'] if rows else None
 
 
 class NuageInterfaceDriver(OVSInterfaceDriver):
@@ -0,0 +1,239 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import codecs
+import json
+import re
+import select
+import socket
+import time
+
+from eventlet.green import threading
+from oslo_log import log as logging
+
+import nuage_neutron.agent.linux.exceptions as nuage_exc
+
+LOG = logging.getLogger(__name__)
+
+OVSDB_DATABASE = 'Open_vSwitch'
+RECV_SIZE = 65536
+_WHITESPACE = re.compile(r'\s*')
+
+
+class OvsdbClient(object):
+    """Persistent JSON-RPC connection to an ovsdb server.
+
+    The connection is opened on first use and reopened when the server
+    closed it. Transactions can be pipelined: all requests of a batch are
+    written before the responses are read, which are matched on their id.
+    Responses are framed by decoding json values from the byte stream, so
+    they can have any size.
+    """
+
+    def __init__(self, host='localhost', port=6640, database=OVSDB_DATABASE,
+                 timeout=30, max_retries=5):
+        self.host = host
+        self.port = port
+        self.database = database
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._sock = None
+        self._buffer = ''
+        self._utf8 = None
+        self._decoder = json.JSONDecoder()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {'batches': 0,
+                       'transactions': 0,
+                       'connects': 0,
+                       'failures': 0,
+                       'total_latency': 0.0,
+                       'max_latency': 0.0}
+
+    @staticmethod
+    def get_errors(result):
+        """Return the errors in the result of a transaction.
+
+        The result of an operation which failed has an error member, the
+        results of the operations after it are null.
+        """
+        return [op_result for op_result in result or []
+                if op_result and op_result.get('error')]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_latency'] = (stats['total_latency'] / stats['batches']
+                                if stats['batches'] else 0.0)
+        return stats
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except socket.error:
+                pass
+        self._sock = None
+        self._buffer = ''
+        self._utf8 = None
+
+    def transact(self, operations):
+        """Run one transaction and return its result."""
+        return self.transact_many([operations])[0]
+
+    def transact_many(self, transactions):
+        """Pipeline transactions over the connection.
+
+        :param transactions: list of lists of ovsdb operations
+        :return: the list of results, in the order of transactions
+        :raises NuageDriverException: when the ovsdb server cannot be
+            reached, or rejects a request
+        """
+        if not transactions:
+            return []
+        with self._lock:
+            start = time.time()
+            try:
+                results = self._transact_many(transactions)
+            except Exception:
+                self._stats['failures'] += 1
+                raise
+            latency = time.time() - start
+            self._stats['batches'] += 1
+            self._stats['transactions'] += len(transactions)
+            self._stats['total_latency'] += latency
+            self._stats['max_latency'] = max(self._stats['max_latency'],
+                                             latency)
+        LOG.debug("ovsdb: %(count)s transactions took %(latency).3f s",
+                  {'count': len(transactions), 'latency': latency})
+        return results
+
+    def _transact_many(self, transactions):
+        requests = []
+        for operations in transactions:
+            self._next_id += 1
+            requests.append({'id': self._next_id,
+                             'method': 'transact',
+                             'params': [self.database] + list(operations)})
+        data = ''.join(json.dumps(request) for request in requests).encode()
+        retries = self.max_retries
+        while True:
+            self._ensure_connected()
+            try:
+                self._sock.sendall(data)
+                break
+            except socket.error as e:
+                # nothing got applied as nothing reached the server
+                self.close()
+                if not retries:
+                    self._raise(e)
+                retries -= 1
+                LOG.debug("ovsdb: retrying send after %s", e)
+                time.sleep(1)
+        try:
+            responses = self._receive(set(r['id'] for r in requests))
+        except (socket.error, ValueError) as e:
+            # the transactions may or may not have been applied: no retry
+            self.close()
+            self._raise(e)
+        errors = [responses[r['id']]['error'] for r in requests
+                  if responses[r['id']].get('error')]
+        if errors:
+            self._raise(errors)
+        return [responses[r['id']].get('result') for r in requests]
+
+    def _raise(self, error):
+        raise nuage_exc.NuageDriverException(
+            msg='ovsdb %s:%s: %s' % (self.host, self.port, error))
+
+    def _ensure_connected(self):
+        if self._sock is not None:
+            self._drain()
+        retries = self.max_retries
+        while self._sock is None:
+            try:
+                self._sock = socket.create_connection((self.host, self.port),
+                                                      self.timeout)
+                self._utf8 = codecs.getincrementaldecoder('utf-8')()
+                self._stats['connects'] += 1
+                LOG.debug("Connected to the ovsdb %s:%s",
+                          self.host, self.port)
+            except socket.error as e:
+                if not retries:
+                    self._raise(e)
+                retries -= 1
+                LOG.debug("ovsdb: retrying connect after %s", e)
+                time.sleep(1)
+
+    def _drain(self):
+        """Handle what the server sent while idle, e.g. echo requests.
+
+        When the server closed the connection, it is closed as well, so it
+        gets reopened before sending anything.
+        """
+        try:
+            while select.select([self._sock], [], [], 0)[0]:
+                if not self._read():
+                    self.close()
+                    return
+                for message in self._messages():
+                    LOG.debug("ovsdb: ignoring %s", message)
+        except (socket.error, ValueError) as e:
+            LOG.debug("ovsdb: reconnecting after %s", e)
+            self.close()
+
+    def _read(self):
+        data = self._sock.recv(RECV_SIZE)
+        if data:
+            self._buffer += self._utf8.decode(data)
+        return bool(data)
+
+    def _messages(self):
+        """Return the complete json messages in the receive buffer."""
+        buf = self._buffer
+        # a complete message ends with '}': don't parse a large response
+        # over and over again while it is coming in
+        if not buf[-64:].rstrip().endswith('}'):
+            return []
+        messages = []
+        end = 0
+        while True:
+            start = _WHITESPACE.match(buf, end).end()
+            if start == len(buf):
+                break
+            try:
+                message, end = self._decoder.raw_decode(buf, start)
+            except ValueError:
+                if buf[start] != '{':
+                    raise
+                break  # incomplete message
+            if message.get('method') == 'echo':
+                self._sock.sendall(json.dumps(
+                    {'id': message.get('id'), 'error': None,
+                     'result': message.get('params')}).encode())
+            else:
+                messages.append(message)
+        self._buffer = buf[start:]
+        return messages
+
+    def _receive(self, ids):
+        responses = {}
+        while True:
+            for message in self._messages():
+                if message.get('id') in ids:
+                    responses[message['id']] = message
+            if len(responses) == len(ids):
+                return responses
+            if not self._read():
+                raise socket.error('connection closed by the ovsdb server')
@@ -0,0 +1,37 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from alembic import op
+
+"""add indexes to nuage_switchport_binding
+
+Revision ID: a3f1c2d4e5b6
+Revises: 80a19bb49f41
+Create Date: 2020-06-15 11:42:08.517394
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c2d4e5b6'
+down_revision = '80a19bb49f41'
+
+
+def upgrade():
+    op.create_index('ix_nuage_switchport_binding_neutron_port_id',
+                    'nuage_switchport_binding', ['neutron_port_id'])
+    op.create_index('ix_nuage_switchport_binding_switchport_uuid',
+                    'nuage_switchport_binding',
+                    ['switchport_uuid', 'segmentation_id'])
+    op.create_index('ix_nuage_switchport_mapping_port_uuid',
+                    'nuage_switchport_mapping', ['port_uuid'])
@@ -15,23 +15,40 @@
 
 from oslo_utils import uuidutils
 import six
+import sqlalchemy as sa
+from sqlalchemy import orm
 
 from networking_sfc.db import flowclassifier_db
 from networking_sfc.extensions import flowclassifier as fc_ext
 from neutron_lib.db import api as db_api
 
 
+def _l7_int(l7_parameters, keyword):
+    """Return an int l7 parameter, or None when it is not set.
+
+    l7_parameters can hold plain values, as in a request or a flow classifier
+    dict, or L7Parameter db objects.
+    """
+    value = (l7_parameters or {}).get(keyword)
+    value = getattr(value, 'value', value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class NuageFlowClassifierDbPlugin(flowclassifier_db.FlowClassifierDbPlugin):
 
     @classmethod
     def _vlan_range_conflict(cls, first_vlan_dict, second_vlan_dict):
-        first_vlan_range_min = first_vlan_dict.get('vlan_range_min')
-        first_vlan_range_max = first_vlan_dict.get('vlan_range_max')
-        second_vlan_range_min = second_vlan_dict.get('vlan_range_min')
-        second_vlan_range_max = second_vlan_dict.get('vlan_range_max')
+        first_vlan_range_min = _l7_int(first_vlan_dict, 'vlan_range_min')
+        first_vlan_range_max = _l7_int(first_vlan_dict, 'vlan_range_max')
+        second_vlan_range_min = _l7_int(second_vlan_dict, 'vlan_range_min')
+        second_vlan_range_max = _l7_int(second_vlan_dict, 'vlan_range_max')
 
-        cls._port_range_conflict(first_vlan_range_min, first_vlan_range_max,
-                                 second_vlan_range_min, second_vlan_range_max)
+        return cls._port_range_conflict(
+            first_vlan_range_min, first_vlan_range_max,
+            second_vlan_range_min, second_vlan_range_max)
 
     @classmethod
     def flowclassifier_basic_conflict(cls,
@@ -53,6 +70,52 @@ class NuageFlowClassifierDbPlugin(flowclassifier_db.FlowClassifierDbPlugin):
             filters)
         return query.all()
 
+    @staticmethod
+    def _range_overlap_filters(column_min, column_max, range_min, range_max):
+        # a missing bound is open, as in _port_range_conflict
+        filters = []
+        if range_min is not None:
+            filters.append(sa.or_(column_max.is_(None),
+                                  column_max >= range_min))
+        if range_max is not None:
+            filters.append(sa.or_(column_min.is_(None),
+                                  column_min <= range_max))
+        return filters
+
+    def _find_conflicting_flow_classifier(self, context, fc):
+        """Find a flow classifier visible to context conflicting with fc.
+
+        The db narrows the flow classifiers down on the columns of the
+        conflict check: ethertype, protocol, logical ports and port ranges.
+        Only the flow classifiers left are compared with fc in full, instead
+        of all flow classifiers.
+        """
+        fc_model = flowclassifier_db.FlowClassifier
+        query = flowclassifier_db.model_query.query_with_hooks(
+            context, fc_model)
+        filters = [fc_model.ethertype == fc['ethertype']]
+        for column, value in ((fc_model.protocol, fc['protocol']),
+                              (fc_model.logical_source_port,
+                               fc['logical_source_port']),
+                              (fc_model.logical_destination_port,
+                               fc['logical_destination_port'])):
+            if value is not None:
+                filters.append(sa.or_(column.is_(None), column == value))
+        filters.extend(self._range_overlap_filters(
+            fc_model.source_port_range_min, fc_model.source_port_range_max,
+            fc['source_port_range_min'], fc['source_port_range_max']))
+        filters.extend(self._range_overlap_filters(
+            fc_model.destination_port_range_min,
+            fc_model.destination_port_range_max,
+            fc['destination_port_range_min'],
+            fc['destination_port_range_max']))
+        query = query.filter(*filters).options(
+            orm.selectinload(fc_model.l7_parameters))
+        for flow_classifier_db in query:
+            if self.flowclassifier_conflict(fc, flow_classifier_db):
+                return flow_classifier_db
+        return None
+
     def create_flow_classifier(self, context, flow_classifier):
         fc = flow_classifier['flow_classifier']
         project_id = fc['project_id']
@@ -83,17 +146,9 @@ class NuageFlowClassifierDbPlugin(flowclassifier_db.FlowClassifierDbPlugin):
                 self._get_port(context, logical_source_port)
             if logical_destination_port is not None:
                 self._get_port(context, logical_destination_port)
-            query = flowclassifier_db.model_query.query_with_hooks(
-                context,
-                flowclassifier_db.FlowClassifier)
-            for flow_classifier_db in query.all():
-                if self.flowclassifier_conflict(
-                    fc,
-                    flow_classifier_db
-                ):
-                    raise fc_ext.FlowClassifierInConflict(
-                        id=flow_classifier_db['id']
-                    )
+            conflict = self._find_conflicting_flow_classifier(context, fc)
+            if conflict:
+                raise fc_ext.FlowClassifierInConflict(id=conflict['id'])
             flow_classifier_db = flowclassifier_db.FlowClassifier(
                 id=uuidutils.generate_uuid(),
                 project_id=project_id,
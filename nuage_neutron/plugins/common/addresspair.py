@@ -64,19 +64,20 @@ class NuageAddressPair(BaseNuagePlugin):
         fip['fip_subnet_id'] = fip.port.fixed_ips[0].subnet_id
         return fip
 
-    def _create_vips(self, context, subnet_mapping, port, nuage_vport):
-        port_vip_dict = nuage_vip_dict = dict()
-        enable_spoofing = False
-        vsd_subnet = self._find_vsd_subnet(context, subnet_mapping)
+    def _create_vips(self, context, subnet_mapping, port, nuage_vport,
+                     vsd_subnet=None):
+        vsd_subnet = vsd_subnet or self._find_vsd_subnet(context,
+                                                         subnet_mapping)
         fips_per_vip = nuagedb.get_floatingip_per_vip_in_network(
             context.session, port['network_id'], self.get_device_owners_vip())
         fips_per_vip = {vip: self._make_fip_dict_with_subnet_id(fip)
                         for vip, fip in six.iteritems(fips_per_vip)}
 
+        params_list = []
         if (port.get(constants.VIPS_FOR_PORT_IPS) and
                 self._is_l3(subnet_mapping)):
             for vip_ip in port.get(constants.VIPS_FOR_PORT_IPS):
-                params = {
+                params_list.append({
                     'vip': vip_ip,
                     'mac': port['mac_address'],
                     'subnet_id': subnet_mapping['nuage_subnet_id'],
@@ -87,40 +88,34 @@ class NuageAddressPair(BaseNuagePlugin):
                     'externalID': port['id'],
                     'os_fip': None,
                     'vsd_l3domain_id': None
-                }
-                try:
-                    enable_spoofing |= self.vsdclient.create_vip(params)
-                    port_vip_dict[params['vip']] = params['mac']
-                except Exception as e:
-                    if not self._get_port_from_neutron(context, port):
-                        return
-                    with excutils.save_and_reraise_exception():
-                        LOG.error(
-                            "Error in creating vip for ip %(vip)s and mac "
-                            "%(mac)s: %(err)s", {'vip': vip_ip,
-                                                 'mac': port['mac_address'],
-                                                 'err': str(e)})
-                        self.vsdclient.delete_vips(nuage_vport['ID'],
-                                                   port_vip_dict,
-                                                   port_vip_dict)
+                })
 
+        # resolve the l3 domain and fip subnet of the floating ips only once
+        l3domain_ids = {}
+        fip_subnet_ids = {}
         for allowed_addr_pair in port[addr_pair.ADDRESS_PAIRS]:
             vip = allowed_addr_pair['ip_address']
             mac = allowed_addr_pair['mac_address']
 
             os_fip = fips_per_vip.get(vip)
             if os_fip:
-                vsd_l3domain_id = nuagedb.get_ent_rtr_mapping_by_rtrid(
-                    context.session,
-                    os_fip['router_id'])['nuage_router_id']
-                subnet_mapping = nuagedb.get_subnet_l2dom_by_id(
-                    context.session,
-                    os_fip['fip_subnet_id'])
-                os_fip['vsd_fip_subnet_id'] = subnet_mapping['nuage_subnet_id']
+                if os_fip['router_id'] not in l3domain_ids:
+                    l3domain_ids[os_fip['router_id']] = (
+                        nuagedb.get_ent_rtr_mapping_by_rtrid(
+                            context.session,
+                            os_fip['router_id'])['nuage_router_id'])
+                if os_fip['fip_subnet_id'] not in fip_subnet_ids:
+                    fip_subnet_ids[os_fip['fip_subnet_id']] = (
+                        nuagedb.get_subnet_l2dom_by_id(
+                            context.session,
+                            os_fip['fip_subnet_id'])['nuage_subnet_id'])
+                vsd_l3domain_id = l3domain_ids[os_fip['router_id']]
+                os_fip['vsd_fip_subnet_id'] = fip_subnet_ids[
+                    os_fip['fip_subnet_id']]
             else:
                 vsd_l3domain_id = None
 
-            params = {
+            params_list.append({
                 'vip': vip,
                 'mac': mac,
                 'subnet_id': subnet_mapping['nuage_subnet_id'],
@@ -131,22 +126,20 @@ class NuageAddressPair(BaseNuagePlugin):
                 'externalID': port['id'],
                 'os_fip': os_fip,
                 'vsd_l3domain_id': vsd_l3domain_id
-            }
+            })
 
-            try:
-                enable_spoofing |= self.vsdclient.create_vip(params)
-                nuage_vip_dict[params['vip']] = params['mac']
-            except Exception as e:
-                if not self._get_port_from_neutron(context, port):
-                    return
-                with excutils.save_and_reraise_exception():
-                    LOG.error("Error in creating vip for ip %(vip)s and mac "
-                              "%(mac)s: %(err)s", {'vip': vip,
-                                                   'mac': mac,
-                                                   'err': str(e)})
-                    self.vsdclient.delete_vips(nuage_vport['ID'],
-                                               nuage_vip_dict,
-                                               nuage_vip_dict)
+        try:
+            enable_spoofing = self.vsdclient.create_vips(params_list)
+        except Exception as e:
+            if not self._get_port_from_neutron(context, port):
+                return
+            with excutils.save_and_reraise_exception():
+                LOG.error("Error in creating vips %(vips)s on vport "
+                          "%(vport)s: %(err)s",
+                          {'vips': [(params['vip'], params['mac'])
+                                    for params in params_list],
+                           'vport': nuage_vport['ID'],
+                           'err': str(e)})
         if port[portsecurity.PORTSECURITY]:
             try:
                 self.vsdclient.update_mac_spoofing_on_vport(
@@ -158,24 +151,50 @@ class NuageAddressPair(BaseNuagePlugin):
                     return
                 raise
 
+    @staticmethod
+    def _diff_vips(port, os_vip_dict, nuage_vip_dict):
+        """Compute the vips to add and to delete on a vport
+
+        :param port: the neutron port
+        :param os_vip_dict: the desired vips, as a dict of ip to mac
+        :param nuage_vip_dict: the vips on VSD, as a dict of ip to mac
+        :return: tuple (list of address pairs to add, set of ips to delete)
+        """
+        vips_for_port_ips = port.get(constants.VIPS_FOR_PORT_IPS) or []
+
+        def changed(vip, mac, other_vip_dict):
+            return (mac != other_vip_dict.get(vip) or
+                    (vip in vips_for_port_ips and
+                     mac != port['mac_address']))
+
+        vips_add_list = [{'ip_address': vip, 'mac_address': mac}
+                         for vip, mac in six.iteritems(os_vip_dict)
+                         if (vip not in nuage_vip_dict or
+                             changed(vip, mac, nuage_vip_dict))]
+        vips_delete_set = set(vip for vip, mac in six.iteritems(nuage_vip_dict)
+                              if (vip not in os_vip_dict or
+                                  changed(vip, mac, os_vip_dict)))
+        return vips_add_list, vips_delete_set
+
     def _update_vips(self, context, subnet_mapping, port, nuage_vport,
                      deleted_addr_pairs):
+        vsd_subnet = self._find_vsd_subnet(context, subnet_mapping)
         if deleted_addr_pairs:
             # If some addr pairs were deleted we might have to undo some
             # action on VSD
-            for addrpair in deleted_addr_pairs:
-                params = {
+            self.vsdclient.process_deleted_addr_pairs([
+                {
                     'vip': addrpair['ip_address'],
                     'mac': addrpair['mac_address'],
                     'subnet_id': subnet_mapping['nuage_subnet_id'],
                     'vport_id': nuage_vport['ID'],
                     'port_ips': [ip['ip_address'] for ip in port['fixed_ips']],
                     'port_mac': port['mac_address'],
-                    'subnet_mapping': subnet_mapping
-                }
-                self.vsdclient.process_deleted_addr_pair(params)
+                    'subnet_mapping': subnet_mapping,
+                    'vsd_subnet': vsd_subnet
+                } for addrpair in deleted_addr_pairs])
 
-        # Get all the vips on vport
+        # Get all the vips on vport, only once
         nuage_vips = self.vsdclient.get_vips(nuage_vport['ID'])
 
         nuage_vip_dict = dict()
@@ -183,7 +202,6 @@ class NuageAddressPair(BaseNuagePlugin):
             nuage_vip_dict[nuage_vip['vip']] = nuage_vip['mac']
 
         os_vip_dict = dict()
-        vip_for_ip_dict = dict()
         if addr_pair.ADDRESS_PAIRS in port:
             for allowed_addr_pair in port[addr_pair.ADDRESS_PAIRS]:
                 # OS allows addr pairs with same ip and different mac,
@@ -196,8 +214,6 @@ class NuageAddressPair(BaseNuagePlugin):
                     continue
                 os_vip_dict[allowed_addr_pair['ip_address']] = (
                     allowed_addr_pair['mac_address'])
-                vip_for_ip_dict[allowed_addr_pair['ip_address']] = (
-                    allowed_addr_pair['mac_address'])
         port_ip_vip_add_list = []
         if port.get(constants.VIPS_FOR_PORT_IPS):
             for vip in port.get(constants.VIPS_FOR_PORT_IPS):
@@ -208,43 +224,17 @@ class NuageAddressPair(BaseNuagePlugin):
                 else:
                     os_vip_dict[vip] = port['mac_address']
 
-        vips_add_list = []
-        vips_delete_set = set()
-        for vip, mac in six.iteritems(os_vip_dict):
-            if vip in nuage_vip_dict:
-                # Check if mac is same
-                if (mac != nuage_vip_dict.get(vip) or
-                        (vip in port.get(constants.VIPS_FOR_PORT_IPS) and
-                         mac != port['mac_address'])):
-                    vips_add_dict = {
-                        'ip_address': vip,
-                        'mac_address': mac
-                    }
-                    vips_add_list.append(vips_add_dict)
-            else:
-                vips_add_dict = {
-                    'ip_address': vip,
-                    'mac_address': mac
-                }
-                vips_add_list.append(vips_add_dict)
-
-        for vip, mac in six.iteritems(nuage_vip_dict):
-            if vip in os_vip_dict:
-                # Check if mac is same
-                if (mac != os_vip_dict.get(vip) or
-                        (vip in port.get(constants.VIPS_FOR_PORT_IPS) and
-                         mac != port['mac_address'])):
-                    vips_delete_set.add(vip)
-            else:
-                vips_delete_set.add(vip)
+        vips_add_list, vips_delete_set = self._diff_vips(
+            port, os_vip_dict, nuage_vip_dict)
 
         if vips_delete_set:
             try:
                 self.vsdclient.delete_vips(nuage_vport['ID'],
                                            nuage_vip_dict,
-                                           vips_delete_set)
+                                           vips_delete_set,
+                                           nuage_vips=nuage_vips)
             except Exception as e:
-                with excutils.save_and_reraise_exception:
+                with excutils.save_and_reraise_exception():
                     LOG.error("Error in deleting vips on vport %(port)s: %("
                               "err)s", {'port': nuage_vport['ID'],
                                         'err': e})
@@ -261,17 +251,23 @@ class NuageAddressPair(BaseNuagePlugin):
                 constants.VIPS_FOR_PORT_IPS: port_ip_vip_add_list,
                 portsecurity.PORTSECURITY: port[portsecurity.PORTSECURITY]
             }
-            self._create_vips(context, subnet_mapping, port_dict, nuage_vport)
+            self._create_vips(context, subnet_mapping, port_dict, nuage_vport,
+                              vsd_subnet=vsd_subnet)
 
     def _process_allowed_address_pairs(self, context, port, vport,
-                                       create=False, delete_addr_pairs=None):
-        subnet_id = port['fixed_ips'][0]['subnet_id']
-        subnet_mapping = nuagedb.get_subnet_l2dom_by_id(context.session,
-                                                        subnet_id)
+                                       create=False, delete_addr_pairs=None,
+                                       port_plan=None):
+        if port_plan:
+            subnet_mapping = port_plan.subnet_mapping
+        else:
+            subnet_id = port['fixed_ips'][0]['subnet_id']
+            subnet_mapping = nuagedb.get_subnet_l2dom_by_id(context.session,
+                                                            subnet_id)
         if subnet_mapping:
             if vport:
                 if create:
-                    self._create_vips(context, subnet_mapping, port, vport)
+                    self._create_vips(context, subnet_mapping, port, vport,
+                                      port_plan and port_plan.vsd_subnet)
                 else:
                     self._update_vips(context, subnet_mapping,
                                       port, vport, delete_addr_pairs)
@@ -288,8 +284,10 @@ class NuageAddressPair(BaseNuagePlugin):
             return False
         return True
 
-    def create_allowed_address_pairs(self, context, port, vport):
-        self._process_allowed_address_pairs(context, port, vport, True)
+    def create_allowed_address_pairs(self, context, port, vport,
+                                     port_plan=None):
+        self._process_allowed_address_pairs(context, port, vport, True,
+                                            port_plan=port_plan)
 
     def update_allowed_address_pairs(self, context, port, original_port,
                                      vport):
@@ -368,14 +366,22 @@ class NuageAddressPair(BaseNuagePlugin):
         port = kwargs.get('port')
         vport = kwargs.get('vport')
         context = kwargs.get('context')
+        port_plan = kwargs.get('port_plan')
         configure_vips = (port.get(constants.VIPS_FOR_PORT_IPS) or
                           port.get("allowed_address_pairs"))
-        if not self.is_port_vnic_type_supported(port) or not configure_vips:
+        vnic_type_supported = (port_plan.vnic_type_supported if port_plan
+                               else self.is_port_vnic_type_supported(port))
+        if not vnic_type_supported or not configure_vips:
             # If there are no allowed_address_pair in the request
             # port_security_enabled False and allowed address pairs are
             # mutually exclusive in Neutron
             return
 
+        if port_plan:
+            # the port is planned by its subnet mappings
+            self.create_allowed_address_pairs(context, port, vport,
+                                              port_plan)
+            return
         try:
             nuagedb.get_subnet_l2dom_by_port_id(context.session, port['id'])
             self.create_allowed_address_pairs(context, port, vport)
@@ -384,8 +390,9 @@ class NuageAddressPair(BaseNuagePlugin):
 
     def post_port_update_addresspair(self, resource, event, plugin, context,
                                      port, original_port, vport, rollbacks,
-                                     **kwargs):
-        if self.is_port_vnic_type_supported(port):
+                                     port_plan=None, **kwargs):
+        if (port_plan.vnic_type_supported if port_plan
+                else self.is_port_vnic_type_supported(port)):
             self.update_allowed_address_pairs(context, port,
                                               original_port, vport)
             rollbacks.append((self.update_allowed_address_pairs,
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import re
 import socket
 import struct
@@ -34,25 +35,42 @@ from oslo_log import helpers as log_helpers
 from oslo_log import log
 import six
 
+from nuage_neutron.plugins.common import cache
 from nuage_neutron.plugins.common import callback_manager
 from nuage_neutron.plugins.common.capabilities import Capabilities
 from nuage_neutron.plugins.common import config
 from nuage_neutron.plugins.common import constants
 from nuage_neutron.plugins.common.exceptions import NuageBadRequest
+from nuage_neutron.plugins.common import ip_utils
 from nuage_neutron.plugins.common import nuagedb
 from nuage_neutron.plugins.common.utils import SubnetUtilsBase
 from nuage_neutron.plugins.common.validation import Is
 from nuage_neutron.plugins.common.validation import require
 from nuage_neutron.plugins.common.validation import validate
+from nuage_neutron.plugins.common import warmup
 from nuage_neutron.vsdclient import restproxy
 from nuage_neutron.vsdclient.vsdclient_fac import VsdClientFactory
 
 
 LOG = log.getLogger(__name__)
 
+# What the nuage driver does for a port, decided once at the start of a port
+# create or update, and passed to the subscribers of the port events
+PortPlan = collections.namedtuple('PortPlan', [
+    'subnet_mappings',  # the mappings of the subnets of the fixed ips
+    'subnet_mapping',  # the first one: their vsd properties are the same
+    'vsd_managed',
+    'vnic_type_supported',
+    'actionable',  # whether the port gets a vport
+    'needs_vm',  # whether the vport gets a vm
+    'vsd_subnet'])  # None when not looked up
+
 
 class RootNuagePlugin(SubnetUtilsBase):
 
+    # nuage subnet id -> (the mapped ip versions, the vsd subnet), per process
+    _vsd_subnets = cache.ExpiringCache(constants.VSD_SUBNETS_CACHE_TTL)
+
     def __init__(self):
         super(RootNuagePlugin, self).__init__()
         config.nuage_register_cfg_opts()
@@ -93,7 +111,7 @@ class RootNuagePlugin(SubnetUtilsBase):
             raise cfg.ConfigFileValueError(
                 _('Missing cms_id in configuration.'))
 
-        self.vsdclient = VsdClientFactory.new_vsd_client(
+        self.vsdclient = VsdClientFactory.get_vsd_client(
             cms_id,
             server=cfg.CONF.RESTPROXY.server,
             base_uri=cfg.CONF.RESTPROXY.base_uri,
@@ -104,6 +122,7 @@ class RootNuagePlugin(SubnetUtilsBase):
             organization=cfg.CONF.RESTPROXY.organization,
             servertimeout=cfg.CONF.RESTPROXY.server_timeout,
             max_retries=cfg.CONF.RESTPROXY.server_max_retries)
+        warmup.register()
 
     def _create_nuage_vport(self, port, vsd_subnet, description=None):
         params = {
@@ -194,59 +213,75 @@ class RootNuagePlugin(SubnetUtilsBase):
                              "L2Domain with DHCP server IP"))
                     raise NuageBadRequest(msg=msg)
 
-    def _validate_allocation_pools(self, context, subnet, subnet_info):
-        if not subnet_info:
-            return  # no other linked subnet, all good
-
-        # this is not the only subnet linked to same nuage subnet
-        # need to validate allocation pools being disjunct
+    def _validate_allocation_pools(self, context, subnet, subnet_info,
+                                   nuage_subnet_id=None, subnet_type=None):
+        """Validate the allocation pools of a subnet linked to a vsd subnet
 
+        The pools need to be disjunct from the pools of the other subnets
+        linked to the same vsd subnet, and from the address ranges (dhcp
+        pools) of the vsd subnet itself.
+        """
         LOG.debug('_validate_allocation_pools: subnet {} has allocation pools '
                   '{}'.format(subnet['id'], subnet['allocation_pools']))
 
-        def pools_to_ip_sets(_ip_pools, _ip_sets, _ip_ranges):
+        ip_ranges = [ip_utils.parse_range(pool['start'], pool['end'])
+                     for pool in subnet['allocation_pools']]
+
+        if nuage_subnet_id and ip_ranges:
+            vsd_ranges = self._get_vsd_address_ranges(nuage_subnet_id,
+                                                      subnet_type)
+            for ip_range in ip_ranges:
+                vsd_range = vsd_ranges.get_overlapping(ip_range)
+                if vsd_range:
+                    msg = ("Allocation pool {} overlaps with address range {} "
+                           "of nuage subnet {}".format(ip_range, vsd_range,
+                                                       nuage_subnet_id))
+                    LOG.debug('_validate_allocation_pools: ' + msg)
+                    raise NuageBadRequest(msg=msg)
 
-            def pools_to_ip_range(ip_pools):
-                __ip_ranges = []
-                for ip_pool in ip_pools:
-                    __ip_ranges.append(netaddr.IPRange(ip_pool['start'],
-                                                       ip_pool['end']))
-                return __ip_ranges
+        if not subnet_info:
+            return  # no other linked subnet, all good
 
-            for ip_range in pools_to_ip_range(_ip_pools):
-                _ip_sets.append(netaddr.IPSet(ip_range.cidrs()))
-                _ip_ranges.append(ip_range)
+        # this is not the only subnet linked to same nuage subnet
+        # need to validate allocation pools being disjunct
 
-            return _ip_sets
+        # add other ip pools, skipping the subnet itself (occurs on
+        # subnet-update)
+        other_subnet_ids = [mapping['subnet_id']
+                            for mapping in subnet_info['mappings']
+                            if mapping['subnet_id'] != subnet['id']]
+        if other_subnet_ids:
+            for sub in self.core_plugin.get_subnets(
+                    context, filters={'id': other_subnet_ids}):
+                LOG.debug('_validate_allocation_pools: validating with subnet '
+                          '{} with allocation pools {}'.format(
+                              sub, sub['allocation_pools']))
+                ip_ranges.extend(
+                    ip_utils.parse_range(pool['start'], pool['end'])
+                    for pool in sub['allocation_pools'])
+
+        # Sorting the pools as integer ranges finds an overlap by comparing
+        # neighbours only, without building ip sets for every pair of pools
+        overlap = ip_utils.find_overlap(ip_ranges)
+        if overlap:
+            msg = "Found overlapping allocation pools {} with {}".format(
+                *overlap)
+            LOG.debug('_validate_allocation_pools: ' + msg)
+            raise NuageBadRequest(msg=msg)
 
-        # Create an IPSet for it for easily verifying overlaps
-        # Initiate it with the new subnet itself
-        ip_ranges = []
-        ip_sets = pools_to_ip_sets(subnet['allocation_pools'], [], ip_ranges)
+    def _get_vsd_address_ranges(self, nuage_subnet_id, subnet_type):
+        """Get the address ranges of a vsd subnet as an IPRangeSet
 
-        # add other ip pools
-        for mapping in subnet_info['mappings']:
-            # skip comparing a subnet with itself (occurs on subnet-update)
-            if mapping['subnet_id'] == subnet['id']:
-                continue
-            sub = self.core_plugin.get_subnet(context, mapping['subnet_id'])
-            pools_to_ip_sets(sub['allocation_pools'], ip_sets, ip_ranges)
-
-            LOG.debug('_validate_allocation_pools: validating with subnet {} '
-                      'with allocation pools {}'.format(
-                          sub, sub['allocation_pools']))
-
-        # inspired by IpamBackendMixin.validate_allocation_pools:
-        #                    ~    ~    ~
-        # Use integer cursors as an efficient way for implementing
-        # comparison and avoiding comparing the same pair twice
-        for l_cursor in range(len(ip_sets)):
-            for r_cursor in range(l_cursor + 1, len(ip_sets)):
-                if ip_sets[l_cursor] & ip_sets[r_cursor]:
-                    msg = "Found overlapping allocation pools {} with {}".\
-                        format(ip_ranges[l_cursor], ip_ranges[r_cursor])
-                    LOG.debug('_validate_allocation_pools: ' + msg)
-                    raise NuageBadRequest(msg=msg)
+        These are managed on VSD, out of sight of neutron, so they are
+        fetched again on every validation rather than cached.
+        """
+        return ip_utils.IPRangeSet(
+            ip_utils.parse_range(address_range['minAddress'],
+                                 address_range['maxAddress'])
+            for address_range in self.vsdclient.get_address_ranges(
+                nuage_subnet_id, subnet_type)
+            if (address_range.get('minAddress') and
+                address_range.get('maxAddress')))
 
     @log_helpers.log_method_call
     def _resource_finder(self, context, for_resource, resource_type,
@@ -483,34 +518,66 @@ class RootNuagePlugin(SubnetUtilsBase):
 
     @log_helpers.log_method_call
     def _find_vsd_subnet(self, context, subnet_mapping):
+        """Return the vsd subnet of a subnet mapping
+
+        The vsd subnets are cached for VSD_SUBNETS_CACHE_TTL seconds, along
+        with the ip versions mapped to them, as adding or removing the IPv6
+        subnet of a dualstack network updates its vsd subnet. The plugin
+        forgets the vsd subnets it updates or moves itself, but the cache is
+        per process: the other workers keep using what they cached until it
+        expires, which is why the ttl is short.
+
+        :return: the vsd subnet, None if the subnet got deleted concurrently
+        """
+        nuage_subnet_id = subnet_mapping['nuage_subnet_id']
+        ip_versions = sorted(
+            mapping['ip_version'] for mapping in
+            nuagedb.get_subnet_l2doms_by_nuage_id(context.session,
+                                                  nuage_subnet_id))
+        cached = self._vsd_subnets.get(nuage_subnet_id)
+        if cached and cached[0] == ip_versions:
+            return dict(cached[1])
         try:
             vsd_subnet = self.vsdclient.get_nuage_subnet_by_mapping(
                 subnet_mapping,
                 required=True)
-            return vsd_subnet
-        except restproxy.ResourceNotFoundException:
-            neutron_subnet = self._get_subnet_from_neutron(
-                context, subnet_mapping['subnet_id'])
-            if not neutron_subnet:
-                LOG.info("Subnet %s has been deleted concurrently",
-                         subnet_mapping['subnet_id'])
-                return
-            subnet_mapping = nuagedb.get_subnet_l2dom_by_id(
-                context.session,
-                neutron_subnet['id'])
-            if self._is_os_mgd(subnet_mapping):
-                LOG.debug("Retrying to get the subnet from vsd.")
-                # Here is for the case that router attach/detach has happened
-                # but neutron DB is not updated. Then we use externalID and
-                # cidr to get that subnet in vsd.
-                if self._is_l2(subnet_mapping):
-                    return self.vsdclient.get_domain_subnet_by_ext_id_and_cidr(
-                        neutron_subnet)
-                else:
-                    return self.vsdclient.get_l2domain_by_ext_id_and_cidr(
-                        neutron_subnet)
-            else:
-                raise
+        except restproxy.ResourceNotFoundException as e:
+            # the mapping is stale, the subnet being moved: what is found
+            # instead is not cached
+            self._vsd_subnets.pop(nuage_subnet_id)
+            return self._find_moved_vsd_subnet(context, subnet_mapping, e)
+        self._vsd_subnets.set(vsd_subnet['ID'],
+                              (ip_versions, dict(vsd_subnet)))
+        return vsd_subnet
+
+    def _find_moved_vsd_subnet(self, context, stale_mapping, not_found):
+        neutron_subnet = self._get_subnet_from_neutron(
+            context, stale_mapping['subnet_id'])
+        if not neutron_subnet:
+            LOG.info("Subnet %s has been deleted concurrently",
+                     stale_mapping['subnet_id'])
+            return
+        subnet_mapping = nuagedb.get_subnet_l2dom_by_id(
+            context.session,
+            neutron_subnet['id'])
+        if not self._is_os_mgd(subnet_mapping):
+            raise not_found
+        if (subnet_mapping['nuage_subnet_id'] !=
+                stale_mapping['nuage_subnet_id']):
+            # the subnet got moved meanwhile, and neutron DB is updated
+            return self.vsdclient.get_nuage_subnet_by_mapping(
+                subnet_mapping, required=True)
+        LOG.debug("Retrying to get the subnet from vsd.")
+        # Here is for the case that router attach/detach has happened
+        # but neutron DB is not updated. Then we use externalID and
+        # cidr to get that subnet in vsd. The mappings are left to the l3
+        # plugin doing the attach/detach.
+        if self._is_l2(subnet_mapping):
+            return self.vsdclient.get_domain_subnet_by_ext_id_and_cidr(
+                neutron_subnet)
+        else:
+            return self.vsdclient.get_l2domain_by_ext_id_and_cidr(
+                neutron_subnet)
 
     def _get_default_net_partition_for_current_project(self, context):
         session = context.session
@@ -0,0 +1,91 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Bounded in-process caches.
+
+The caches are per process: a worker does not see what another worker
+cached, so only cache what is immutable or fine to be stale for the ttl.
+"""
+
+import functools
+import time
+
+_MISSING = object()
+
+
+class ExpiringCache(object):
+    """Dict like cache of which the entries expire after ttl seconds.
+
+    The entries don't expire when ttl is None. When the cache is full, the
+    expired entries are dropped, or all of them when that is not enough.
+    """
+
+    def __init__(self, ttl, max_size=4096):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None or (entry[0] is not None and entry[0] < time.time()):
+            return default
+        return entry[1]
+
+    def set(self, key, value):
+        if len(self._data) >= self.max_size:
+            self._purge()
+        expiry = None if self.ttl is None else time.time() + self.ttl
+        self._data[key] = (expiry, value)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else default
+
+    def clear(self):
+        self._data.clear()
+
+    def _purge(self):
+        now = time.time()
+        for key, entry in list(self._data.items()):
+            if entry[0] is not None and entry[0] < now:
+                del self._data[key]
+        if len(self._data) >= self.max_size:
+            self._data.clear()
+
+
+def memoize(max_size=4096, ttl=None):
+    """Cache the results of a single argument function in an ExpiringCache.
+
+    Results of an unhashable argument are not cached. The cache is available
+    as the cache attribute of the decorated function.
+    """
+    def decorator(fn):
+        cache = ExpiringCache(ttl, max_size)
+
+        @functools.wraps(fn)
+        def wrapped(arg):
+            try:
+                result = cache.get(arg, _MISSING)
+            except TypeError:  # unhashable argument
+                return fn(arg)
+            if result is _MISSING:
+                result = fn(arg)
+                cache.set(arg, result)
+            return result
+        wrapped.cache = cache
+        return wrapped
+    return decorator
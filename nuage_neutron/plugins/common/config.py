@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_config import cfg
+from oslo_config import types
 from oslo_log import log
 
 from neutron._i18n import _
@@ -25,6 +26,8 @@ underlay_routing_choices = [constants.NUAGE_UNDERLAY_SNAT,
                             constants.NUAGE_UNDERLAY_ROUTE,
                             constants.NUAGE_UNDERLAY_OFF,
                             constants.NUAGE_UNDERLAY_NOT_AVAILABLE]
+worker_warmup_choices = [constants.WORKER_WARMUP_CONNECTIONS,
+                         constants.WORKER_WARMUP_NETPARTITIONS]
 restproxy_opts = [
     cfg.StrOpt('server', default='vsd.example.com:8443',
                help=_("IP address and port of Nuage's VSD server or cluster")),
@@ -44,6 +47,9 @@ restproxy_opts = [
                help=_("Number of retries invoking VSD server")),
     cfg.IntOpt('server_max_retries_on_domain_delete', default=5,
                help=_("Number of retries deleting domain")),
+    cfg.IntOpt('server_max_concurrent_requests', default=10, min=1,
+               help=_("Maximum number of requests a single bulk operation "
+                      "sends concurrently to VSD")),
     cfg.StrOpt('base_uri', default='/nuage/api/v6',
                help=_("Nuage provided base uri to reach out to VSD")),
     cfg.StrOpt('organization', default='csp',
@@ -99,7 +105,17 @@ plugin_opts = [
     cfg.ListOpt('experimental_features', default=[],
                 help=_("List of experimental features to be enabled.")),
     cfg.ListOpt('enable_debug', default=[],
-                help=_("List of debug features to be enabled."))
+                help=_("List of debug features to be enabled.")),
+    cfg.ListOpt('worker_warmup',
+                item_type=types.String(choices=worker_warmup_choices),
+                default=worker_warmup_choices,
+                help=_("What the API and RPC workers warm up once they "
+                       "started, before serving requests: 'connections' "
+                       "authenticates with VSD and opens as many "
+                       "connections as server_max_concurrent_requests, "
+                       "'netpartitions' queries the net-partitions, which "
+                       "only opens a database connection: the results are "
+                       "not kept for the requests. Empty to disable."))
 ]
 
 
@@ -120,3 +136,7 @@ def is_enabled(name):
 
 def default_allow_non_ip():
     return cfg.CONF.PLUGIN.default_allow_non_ip
+
+
+def max_concurrent_vsd_requests():
+    return cfg.CONF.RESTPROXY.server_max_concurrent_requests
@@ -138,6 +138,16 @@ MAX_VSD_PRIORITY = 999999999
 
 MAX_SG_PER_PORT = 30
 
+# seconds the vsd subnet of a subnet mapping is cached, per process
+VSD_SUBNETS_CACHE_TTL = 10
+# seconds the switchport mappings are cached
+SWITCHPORT_MAPPINGS_CACHE_TTL = 30
+# seconds the vsd gateway port of a switchport is cached
+VSD_GATEWAY_PORTS_CACHE_TTL = 300
+
+WORKER_WARMUP_CONNECTIONS = 'connections'
+WORKER_WARMUP_NETPARTITIONS = 'netpartitions'
+
 NUAGE_UNDERLAY_SNAT = 'snat'
 NUAGE_UNDERLAY_ROUTE = 'route'
 NUAGE_UNDERLAY_OFF = 'off'
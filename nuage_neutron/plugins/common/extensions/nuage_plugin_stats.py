@@ -34,6 +34,11 @@ RESOURCE_ATTRIBUTE_MAP = {
         'auth_resource': {'is_visible': False},
         'default-net-partition': {'is_visible': False},
         'api_count': {'is_visible': True},
+        'auth_renewals': {'is_visible': True},
+        'auth_renewal_failures': {'is_visible': True},
+        'auth_renewal_latency': {'is_visible': True},
+        'startup_timings': {'is_visible': True},
+        'warmup_timings': {'is_visible': True},
         'time_spent_in_nuage': {'is_visible': True},
         'time_spent_in_core': {'is_visible': True},
         'total_time_spent': {'is_visible': True}
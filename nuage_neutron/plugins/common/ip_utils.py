@@ -0,0 +1,222 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Integer based ip address, prefix and range helpers.
+
+Validators comparing many addresses (allocation pools, allowed address
+pairs, VIPs) used to build netaddr objects over and over again. The helpers
+below represent an address as a (version, int) tuple and a prefix or range as
+an IPRange of ints, which are cheap to compare, and cache parse results.
+"""
+
+import bisect
+import collections
+import socket
+import struct
+
+import netaddr
+
+from nuage_neutron.plugins.common import cache
+
+_MAX_BITS = {4: 32, 6: 128}
+_CACHE_SIZE = 4096
+
+
+class IPRange(collections.namedtuple('IPRange',
+                                     ['version', 'first', 'last'])):
+    """An inclusive range of ip addresses of one ip version, as ints."""
+
+    __slots__ = ()
+
+    @property
+    def size(self):
+        return self.last - self.first + 1
+
+    def contains(self, other):
+        """Whether other, an IPRange or a (version, int) ip, is in range."""
+        if len(other) == 2:
+            version, first = other
+            last = first
+        else:
+            version, first, last = other
+        return (version == self.version and
+                self.first <= first and last <= self.last)
+
+    def overlaps(self, other):
+        return (self.version == other.version and
+                self.first <= other.last and other.first <= self.last)
+
+    def __str__(self):
+        return '%s-%s' % (int_to_ip(self.version, self.first),
+                          int_to_ip(self.version, self.last))
+
+
+@cache.memoize(_CACHE_SIZE)
+def parse_ip(ip):
+    """Parse an ip address string into a (version, int) tuple.
+
+    :raises: netaddr.AddrFormatError when ip is not a valid address
+    """
+    try:
+        if ':' in ip:
+            hi, lo = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6,
+                                                           ip))
+            return 6, (hi << 64) | lo
+        return 4, struct.unpack('!I', socket.inet_pton(socket.AF_INET, ip))[0]
+    except (socket.error, ValueError, TypeError):
+        # leave the exotic notations to netaddr
+        address = netaddr.IPAddress(ip)
+        return address.version, int(address)
+
+
+def int_to_ip(version, value):
+    if version == 4:
+        return socket.inet_ntop(socket.AF_INET, struct.pack('!I', value))
+    return socket.inet_ntop(socket.AF_INET6,
+                            struct.pack('!QQ', value >> 64,
+                                        value & 0xFFFFFFFFFFFFFFFF))
+
+
+@cache.memoize(_CACHE_SIZE)
+def parse_cidr(cidr):
+    """Parse a cidr (or a plain ip) into the IPRange it covers.
+
+    Host bits are ignored, as for netaddr.IPNetwork(cidr).cidr.
+
+    :raises: netaddr.AddrFormatError when cidr is not a valid cidr
+    """
+    address, _, prefixlen = cidr.partition('/')
+    version, value = parse_ip(address)
+    max_bits = _MAX_BITS[version]
+    if not prefixlen:
+        prefixlen = max_bits
+    elif prefixlen.isdigit() and int(prefixlen) <= max_bits:
+        prefixlen = int(prefixlen)
+    elif version == 4 and _is_netmask(prefixlen):
+        # address/netmask as VSD returns it
+        prefixlen = 32 - (~parse_ip(prefixlen)[1] & 0xFFFFFFFF).bit_length()
+    else:
+        # netmask notation and friends
+        network = netaddr.IPNetwork(cidr)
+        return IPRange(network.version, network.first, network.last)
+    host_mask = (1 << (max_bits - prefixlen)) - 1
+    first = value & ~host_mask
+    return IPRange(version, first, first | host_mask)
+
+
+def _is_netmask(value):
+    try:
+        version, mask = parse_ip(value)
+    except netaddr.AddrFormatError:
+        return False
+    inverted = ~mask & 0xFFFFFFFF
+    return version == 4 and inverted & (inverted + 1) == 0
+
+
+def parse_range(start, end):
+    """Parse the start and end ip of e.g. an allocation pool."""
+    version, first = parse_ip(start)
+    end_version, last = parse_ip(end)
+    if end_version != version or last < first:
+        raise netaddr.AddrFormatError('Invalid ip range %s-%s' % (start, end))
+    return IPRange(version, first, last)
+
+
+def prefixlen(ip_range):
+    """Return the prefix length of an IPRange that is a prefix."""
+    return _MAX_BITS[ip_range.version] - (ip_range.size - 1).bit_length()
+
+
+def format_cidr(ip_range):
+    return '%s/%s' % (int_to_ip(ip_range.version, ip_range.first),
+                      prefixlen(ip_range))
+
+
+@cache.memoize(_CACHE_SIZE)
+def ip_set(ips):
+    """Return a frozenset of (version, int) for a tuple of ip strings.
+
+    Use it for repeated membership checks against the same addresses,
+    e.g. the fixed ips of a port against all of its address pairs.
+    """
+    return frozenset(parse_ip(ip) for ip in ips)
+
+
+def find_overlap(ranges):
+    """Find two overlapping IPRanges in O(n log n).
+
+    :param ranges: iterable of IPRange, or of (IPRange, payload) tuples
+    :return: the first overlapping pair (in order of first address) or None
+    """
+    items = [(item, item) if isinstance(item, IPRange) else item
+             for item in ranges]
+    items.sort(key=lambda item: item[0])
+    for previous, current in zip(items, items[1:]):
+        if previous[0].overlaps(current[0]):
+            return previous[1], current[1]
+    return None
+
+
+class IPRangeSet(object):
+    """Set of ip addresses kept as sorted, disjoint IPRanges.
+
+    Adding ranges merges them; membership and overlap checks are binary
+    searches, so nothing gets expanded into individual addresses or cidrs.
+    """
+
+    def __init__(self, ranges=()):
+        self._firsts = {4: [], 6: []}
+        self._lasts = {4: [], 6: []}
+        for ip_range in sorted(ranges):
+            self.add(ip_range)
+
+    def add(self, ip_range):
+        firsts = self._firsts[ip_range.version]
+        lasts = self._lasts[ip_range.version]
+        first, last = ip_range.first, ip_range.last
+        # ranges which overlap or are adjacent get merged with the new one
+        lo = bisect.bisect_left(lasts, first - 1)
+        hi = bisect.bisect_right(firsts, last + 1)
+        if lo < hi:
+            first = min(first, firsts[lo])
+            last = max(last, lasts[hi - 1])
+        firsts[lo:hi] = [first]
+        lasts[lo:hi] = [last]
+
+    def __contains__(self, ip):
+        version, value = ip
+        firsts = self._firsts[version]
+        index = bisect.bisect_right(firsts, value) - 1
+        return index >= 0 and value <= self._lasts[version][index]
+
+    def overlaps(self, ip_range):
+        return self.get_overlapping(ip_range) is not None
+
+    def get_overlapping(self, ip_range):
+        """Return the first range of the set overlapping ip_range, or None"""
+        firsts = self._firsts[ip_range.version]
+        lasts = self._lasts[ip_range.version]
+        index = bisect.bisect_left(lasts, ip_range.first)
+        if index < len(firsts) and firsts[index] <= ip_range.last:
+            return IPRange(ip_range.version, firsts[index], lasts[index])
+        return None
+
+    def __iter__(self):
+        for version in (4, 6):
+            for first, last in zip(self._firsts[version],
+                                   self._lasts[version]):
+                yield IPRange(version, first, last)
+
+    def __len__(self):
+        return len(self._firsts[4]) + len(self._firsts[6])
@@ -12,15 +12,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 from neutron_lib.db import model_query as lib_model_query
 from neutron_lib.db import utils as lib_db_utils
 
 from oslo_db.sqlalchemy import utils as sa_utils
 from oslo_utils import uuidutils
 import six
+import sqlalchemy as sa
+from sqlalchemy import orm
 from sqlalchemy.orm import exc as sql_exc
 from sqlalchemy import sql
 
+from nuage_neutron.plugins.common import constants
 from nuage_neutron.plugins.common.extensions import net_topology as _ext
 from nuage_neutron.plugins.common import nuage_models
 
@@ -170,14 +175,16 @@ class NuageGwPortMappingDbMixin(_ext.NuageNetTopologyPluginBase):
     @staticmethod
     def _make_switchport_binding_dict_from_tuple(binding, fields=None):
         gw_bind_db = binding[0]
-        res = {'id': gw_bind_db['id'],
-               'neutron_port_id': gw_bind_db['neutron_port_id'],
-               'switch_id': binding[1],
-               'port_id': binding[2],
-               'port_uuid': gw_bind_db['switchport_uuid'],
-               'nuage_vport_id': gw_bind_db['nuage_vport_id'],
-               'segmentation_id': gw_bind_db['segmentation_id']
-               }
+        res = {'switch_id': binding[1],
+               'port_id': binding[2]}
+        # only read the columns of the fields, the others may not be loaded
+        for field, column in (('id', 'id'),
+                              ('neutron_port_id', 'neutron_port_id'),
+                              ('port_uuid', 'switchport_uuid'),
+                              ('nuage_vport_id', 'nuage_vport_id'),
+                              ('segmentation_id', 'segmentation_id')):
+            if not fields or field in fields:
+                res[field] = gw_bind_db[column]
         return lib_db_utils.resource_fields(res, fields)
 
     @staticmethod
@@ -202,18 +209,20 @@ class NuageGwPortMappingDbMixin(_ext.NuageNetTopologyPluginBase):
                 pci_slot=s['pci_slot'],
                 host_id=s['host_id'])
             context.session.add(gw_map_db)
+        SWITCHPORT_MAPPINGS.invalidate()
         return self._make_switchport_mapping_dict(gw_map_db)
 
     def delete_switchport_mapping(self, context, id):
         gw_map = self._ensure_switchport_mapping_not_in_use(context, id)
         with context.session.begin(subtransactions=True):
             context.session.delete(gw_map)
+        SWITCHPORT_MAPPINGS.invalidate()
 
     def get_switchport_mappings(self, context, filters=None, fields=None,
                                 sorts=None, limit=None, marker=None,
                                 page_reverse=False):
         marker_obj = lib_db_utils.get_marker_obj(self, context,
-                                                 'switchport_mappings',
+                                                 'switchport_mapping',
                                                  limit, marker)
         return lib_model_query.get_collection(
             context,
@@ -234,48 +243,91 @@ class NuageGwPortMappingDbMixin(_ext.NuageNetTopologyPluginBase):
             if s:
                 gw_map_db.update(s)
         context.session.refresh(gw_map_db)
+        SWITCHPORT_MAPPINGS.invalidate()
         return self._make_switchport_mapping_dict(gw_map_db)
 
+    @staticmethod
+    def _switchport_binding_column(key):
+        """Return the binding column of a switchport binding attribute."""
+        binding = nuage_models.NuageSwitchportBinding
+        if key == 'port_uuid':
+            return binding.switchport_uuid
+        if key in binding.__table__.columns:
+            return getattr(binding, key)
+        return None
+
     def get_switchport_bindings(self, context, filters=None, fields=None,
                                 sorts=None, limit=None, marker=None,
                                 page_reverse=False):
-        query = context.session.query(
-            nuage_models.NuageSwitchportBinding,
-            nuage_models.NuageSwitchportMapping.switch_id,
-            nuage_models.NuageSwitchportMapping.port_id)
-        query = query.outerjoin(
-            nuage_models.NuageSwitchportMapping,
-            nuage_models.NuageSwitchportMapping.port_uuid ==
-            nuage_models.NuageSwitchportBinding.switchport_uuid)
-        query = query.distinct()
-
-        if filters:
-            for key, value in six.iteritems(filters):
-                column = getattr(
-                    nuage_models.NuageSwitchportBinding, key, None)
-                if column is None:
-                    column = getattr(
-                        nuage_models.NuageSwitchportMapping, key, None)
+        """Get the switchport bindings, with the switch and port of each.
+
+        Filtering, sorting and keyset pagination are done by the db. The
+        switch and port are only joined in when requested, and only the
+        columns of the requested fields are loaded.
+        """
+        binding = nuage_models.NuageSwitchportBinding
+        mapping = nuage_models.NuageSwitchportMapping
+        query = context.session.query(binding)
+        if fields:
+            columns = {'id': binding.id}
+            for field in fields:
+                column = self._switchport_binding_column(field)
                 if column is not None:
-                    if not value:
-                        query = query.filter(sql.false())
-                    else:
-                        query = query.filter(column.in_(value))
+                    columns[column.key] = column
+            query = query.options(orm.load_only(*columns.values()))
+        with_switchport = (not fields or 'switch_id' in fields or
+                           'port_id' in fields)
+        if with_switchport:
+            # all mappings of a switchport have its switch and port
+            switchports = context.session.query(
+                mapping.port_uuid,
+                sa.func.min(mapping.switch_id).label('switch_id'),
+                sa.func.min(mapping.port_id).label('port_id')).group_by(
+                mapping.port_uuid).subquery()
+            query = query.add_columns(
+                switchports.c.switch_id,
+                switchports.c.port_id).outerjoin(
+                switchports,
+                switchports.c.port_uuid == binding.switchport_uuid)
+
+        for key, value in six.iteritems(filters or {}):
+            column = self._switchport_binding_column(key)
+            if column is None and key in mapping.__table__.columns:
+                # the bindings of the switchports having such a mapping
+                query = query.filter(sql.exists().where(sql.and_(
+                    mapping.port_uuid == binding.switchport_uuid,
+                    getattr(mapping, key).in_(value))) if value
+                    else sql.false())
+            elif column is not None:
+                query = query.filter(column.in_(value) if value
+                                     else sql.false())
 
         if sorts:
             marker_obj = lib_db_utils.get_marker_obj(self, context,
-                                                     'switchport_bindings',
+                                                     'switchport_binding',
                                                      limit, marker)
-            sort_dirs = ['asc' if s[1] else 'desc' for s in sorts]
+            sorts = [('switchport_uuid' if key == 'port_uuid' else key,
+                      direction) for key, direction in sorts]
+            sort_keys = lib_db_utils.get_and_validate_sort_keys(sorts,
+                                                                binding)
+            sort_dirs = lib_db_utils.get_sort_dirs(sorts, page_reverse)
+            # keyset pagination needs a unique sort key
+            if 'id' not in sort_keys:
+                sort_keys.append('id')
+                sort_dirs.append(sort_dirs[0])
             query = sa_utils.paginate_query(
                 query,
-                nuage_models.NuageSwitchportBinding,
+                binding,
                 limit,
                 marker=marker_obj,
-                sort_keys=sorts,
+                sort_keys=sort_keys,
                 sort_dirs=sort_dirs)
-        items = [self._make_switchport_binding_dict_from_tuple(c, fields)
-                 for c in query]
+        if with_switchport:
+            items = [self._make_switchport_binding_dict_from_tuple(c, fields)
+                     for c in query]
+        else:
+            items = [self._make_switchport_binding_dict_from_tuple(
+                (c, None, None), fields) for c in query]
         if limit and page_reverse:
             items.reverse()
         return items
@@ -283,3 +335,60 @@ class NuageGwPortMappingDbMixin(_ext.NuageNetTopologyPluginBase):
     def get_switchport_binding(self, context, id, fields=None):
         gw_binding = self._get_switchport_binding(context, id)
         return self._make_switchport_binding_dict(gw_binding, fields)
+
+
+class SwitchportMappingIndex(object):
+    """In memory view of the switchport mappings, for binding sriov ports.
+
+    The mappings are indexed on host_id and pci_slot. The whole table is
+    loaded at once, and reloaded after ttl seconds, or once a mapping gets
+    created, updated or deleted by this process. A mapping created by
+    another process is found on a miss, which falls back to the db; one
+    updated or deleted by another process can be seen for at most ttl
+    seconds.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._by_host_slot = {}
+        self._expires_at = 0
+
+    def invalidate(self):
+        self._expires_at = 0
+
+    def _load(self, context):
+        if self._expires_at > time.time():
+            return
+        expires_at = time.time() + self.ttl
+        by_host_slot = {}
+        for gw_map_db in context.session.query(
+                nuage_models.NuageSwitchportMapping):
+            self._index(gw_map_db, by_host_slot)
+        self._by_host_slot = by_host_slot
+        self._expires_at = expires_at
+
+    @staticmethod
+    def _index(gw_map_db, by_host_slot):
+        gw_map = NuageGwPortMappingDbMixin._make_switchport_mapping_dict(
+            gw_map_db)
+        by_host_slot[(gw_map['host_id'], gw_map['pci_slot'])] = gw_map
+        return gw_map
+
+    def get_by_host_slot(self, context, host_id, pci_slot):
+        """Return the switchport mapping dict of a host and pci slot.
+
+        :return: the mapping dict, or None when there is no such mapping
+        """
+        self._load(context)
+        gw_map = self._by_host_slot.get((host_id, pci_slot))
+        if gw_map is None:
+            gw_map_db = get_switchport_by_host_slot(
+                context, {'host_id': host_id, 'pci_slot': pci_slot})
+            if gw_map_db is None:
+                return None
+            gw_map = self._index(gw_map_db, self._by_host_slot)
+        return dict(gw_map)
+
+
+SWITCHPORT_MAPPINGS = SwitchportMappingIndex(
+    constants.SWITCHPORT_MAPPINGS_CACHE_TTL)
@@ -74,7 +74,9 @@ class NuageSwitchportMapping(model_base.BASEV2, model_base.HasId):
     pci_slot = sa.Column(sa.String(36), nullable=False)
     host_id = sa.Column(sa.String(255), nullable=False)
     __table_args__ = (sa.PrimaryKeyConstraint('id'),
-                      sa.UniqueConstraint('host_id', 'pci_slot'))
+                      sa.UniqueConstraint('host_id', 'pci_slot'),
+                      sa.Index('ix_nuage_switchport_mapping_port_uuid',
+                               'port_uuid'))
 
 
 class NuageSwitchportBinding(model_base.BASEV2, model_base.HasId):
@@ -89,6 +91,11 @@ class NuageSwitchportBinding(model_base.BASEV2, model_base.HasId):
     sa.ForeignKeyConstraint(['switchport_mapping_id'],
                             ['nuage_switchport_mapping.id'],
                             ondelete="RESTRICT")
+    __table_args__ = (
+        sa.Index('ix_nuage_switchport_binding_neutron_port_id',
+                 'neutron_port_id'),
+        sa.Index('ix_nuage_switchport_binding_switchport_uuid',
+                 'switchport_uuid', 'segmentation_id'))
 
 
 class NuageSfcVlanSubnetMapping(model_base.BASEV2):
@@ -251,6 +251,19 @@ def get_subnet_l2dom_by_port_id(session, port_id):
         return query.first()
 
 
+def get_subnet_l2doms_by_port_ids(session, port_ids):
+    query = (session.query(nuage_models.SubnetL2Domain,
+                           models_v2.IPAllocation.port_id)
+             .select_from(nuage_models.SubnetL2Domain)
+             .join(models_v2.Subnet)
+             .join(models_v2.IPAllocation)
+             .filter(models_v2.IPAllocation.port_id.in_(port_ids)))
+    subnet_mappings = {}
+    for subnet_mapping, port_id in query:
+        subnet_mappings.setdefault(port_id, subnet_mapping)
+    return subnet_mappings
+
+
 # TODO(?) we could implement above method in terms of this method...
 def get_subnet_l2dom_by_port(session, port):
     if port['fixed_ips']:
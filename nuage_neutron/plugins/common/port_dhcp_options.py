@@ -26,6 +26,7 @@ from neutron_lib import constants as os_constants
 from nuage_neutron.plugins.common import base_plugin
 from nuage_neutron.plugins.common import constants
 from nuage_neutron.plugins.common import exceptions as nuage_exc
+from nuage_neutron.plugins.common import utils as nuage_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -51,40 +52,44 @@ class PortDHCPOptionsNuage(base_plugin.BaseNuagePlugin):
         self.nuage_callbacks.subscribe(self.post_port_update_dhcp_opts,
                                        resources.PORT, constants.AFTER_UPDATE)
 
-    def _create_update_extra_dhcp_options(self, dhcp_options, vport,
-                                          port_id, on_opts_update=False):
-        response = []
-        for dhcp_option in dhcp_options:
-            ip_type = dhcp_option['ip_version']
-            try:
-                resp = self.vsdclient.crt_or_updt_vport_dhcp_option(
-                    dhcp_option, vport['ID'], port_id)
-            except Exception as e:
-                e = self._build_dhcp_option_error_message(
-                    dhcp_option['opt_name'], ip_type, e)
-                if on_opts_update:
-                    response.append(e)
-                    response.append("error")
-                    return response
-                for del_resp in response:
-                    if del_resp[1] == 'Created':
-                        self.vsdclient.delete_vport_dhcp_option(
-                            del_resp[3][0]['ID'], ip_type, True)
-                raise e
-            response.append(resp)
-        return response
-
-    def _delete_extra_dhcp_options(self, dhcp_options, vport, port_id):
-        response = []
-        for dhcp_option in dhcp_options:
-            try:
-                resp = self.vsdclient.delete_vport_nuage_dhcp(dhcp_option,
-                                                              vport['ID'])
-                response.append(resp)
-            except Exception as e:
-                e = self._build_dhcp_option_error_message(
-                    dhcp_option['opt_name'], e)
-                raise e
+    def _set_extra_dhcp_options(self, on_exc, vport, port_id, ip_version,
+                                categorised_dhcp_opts):
+        """Apply the categorised extra dhcp options of one ip version.
+
+        The dhcp options of the vport are fetched once, after which the
+        options are created, updated and deleted concurrently. Each option
+        which got applied is registered with on_exc, which restores it as it
+        was, so a failure rolls back all of them.
+        """
+        changes = ([(False, dhcp_option) for dhcp_option in
+                    categorised_dhcp_opts['new'] +
+                    categorised_dhcp_opts['update']] +
+                   [(True, dhcp_option) for dhcp_option in
+                    categorised_dhcp_opts['delete']])
+        if not changes:
+            return
+        vport_dhcp_options = self.vsdclient.get_vport_dhcp_options(
+            vport['ID'], ip_version)
+
+        def apply_change(change):
+            delete, dhcp_option = change
+            if delete:
+                return self.vsdclient.delete_vport_nuage_dhcp(
+                    dhcp_option, vport['ID'], vport_dhcp_options)
+            return self.vsdclient.crt_or_updt_vport_dhcp_option(
+                dhcp_option, vport['ID'], port_id, vport_dhcp_options)
+
+        results = nuage_utils.bulk_call(apply_change, changes)
+        for (_delete, dhcp_option), _result, exception in results:
+            if exception is None:
+                on_exc(self.vsdclient.restore_vport_dhcp_option,
+                       vport['ID'], ip_version, dhcp_option['opt_name'],
+                       vport_dhcp_options)
+        for (_delete, dhcp_option), _result, exception in results:
+            if exception is not None:
+                raise (self._build_dhcp_option_error_message(
+                    dhcp_option['opt_name'], ip_version, exception) or
+                    exception)
 
     def _validate_port_dhcp_opts(self, resource, event, trigger, **kwargs):
         request_port = kwargs.get('request_port')
@@ -194,10 +199,9 @@ class PortDHCPOptionsNuage(base_plugin.BaseNuagePlugin):
         return {'new': add_dhcp_opts, 'update': update_dhcp_opts,
                 'delete': delete_dhcp_opts}
 
-    def _update_extra_dhcp_options(self, categorised_dhcp_opts, ip_version,
-                                   subnet_mapping,
-                                   port_id, current_owner, old_dhcp_opts,
-                                   vport):
+    def _update_extra_dhcp_options(self, on_exc, categorised_dhcp_opts,
+                                   ip_version, subnet_mapping, port_id,
+                                   current_owner, vport):
         if not subnet_mapping:
             # For preventing updating of a port on External Network
             msg = ("Cannot Update a port that does not have corresponding"
@@ -214,41 +218,11 @@ class PortDHCPOptionsNuage(base_plugin.BaseNuagePlugin):
                        " Neutron Port-ID: " + port_id)
                 raise nuage_exc.NuageBadRequest(msg=msg)
         try:
-            created_rollback_opts = self._create_update_extra_dhcp_options(
-                categorised_dhcp_opts['new'], vport, port_id, False)
+            self._set_extra_dhcp_options(on_exc, vport, port_id, ip_version,
+                                         categorised_dhcp_opts)
         except Exception as e:
             LOG.error(_("Port Update failed due to: {}").format(e))
             raise
-        try:
-            # Delete
-            delete_rollback = self._delete_extra_dhcp_options(
-                categorised_dhcp_opts['delete'], vport, port_id)
-            # Update
-            update_rollback = self._create_update_extra_dhcp_options(
-                categorised_dhcp_opts['update'], vport, port_id, True)
-            if "error" in update_rollback:
-                update_rollback.remove("error")
-                e = update_rollback.pop(-1)
-                include_rollback_opt = ([categorised_dhcp_opts['update'][i]
-                                        ['opt_name'] for i in
-                                        range(len(update_rollback))] +
-                                        [categorised_dhcp_opts['delete'][i]
-                                        ['opt_name'] for i in
-                                        range(len(delete_rollback))])
-                for dhcp_opt in old_dhcp_opts:
-                    if dhcp_opt['opt_name'] not in include_rollback_opt:
-                        old_dhcp_opts.remove(dhcp_opt)
-                raise e
-        except Exception as e:
-            # Roll back create
-            for rollback_opt in created_rollback_opts:
-                self.vsdclient.delete_vport_dhcp_option(
-                    rollback_opt[3][0]['ID'], ip_version, True)
-            # Roll back update & delete
-            self._create_update_extra_dhcp_options(old_dhcp_opts, vport,
-                                                   port_id, True)
-            LOG.error(_("Port Update failed due to: {}").format(e))
-            raise e
 
     def _get_nuage_vport(self, port, subnet_mapping, required=True):
         port_params = {'neutron_port_id': port['id']}
@@ -268,8 +242,13 @@ class PortDHCPOptionsNuage(base_plugin.BaseNuagePlugin):
         dhcp_options = copy.deepcopy(port['extra_dhcp_opts'])
         for dhcp_opt in dhcp_options:
             self._translate_dhcp_option(dhcp_opt)
-        self._create_update_extra_dhcp_options(
-            dhcp_options, vport, port['id'])
+        with nuage_utils.rollback() as on_exc:
+            for ip_version in [4, 6]:
+                self._set_extra_dhcp_options(
+                    on_exc, vport, port['id'], ip_version,
+                    {'new': [opt for opt in dhcp_options
+                             if opt['ip_version'] == ip_version],
+                     'update': [], 'delete': []})
 
     def post_port_update_dhcp_opts(self, resource, event, trigger,
                                    port, original_port, vport, subnet_mapping,
@@ -282,16 +261,17 @@ class PortDHCPOptionsNuage(base_plugin.BaseNuagePlugin):
         request_dhcp_options = (copy.deepcopy(port['extra_dhcp_opts'])
                                 if port['extra_dhcp_opts'] else [])
 
-        for ip_version in [4, 6]:
-            self._post_port_update_dhcp_opts(original_port, vport,
-                                             subnet_mapping,
-                                             ip_version,
-                                             request_dhcp_options,
-                                             old_dhcp_options)
+        with nuage_utils.rollback() as on_exc:
+            for ip_version in [4, 6]:
+                self._post_port_update_dhcp_opts(on_exc, original_port, vport,
+                                                 subnet_mapping,
+                                                 ip_version,
+                                                 request_dhcp_options,
+                                                 old_dhcp_options)
 
-    def _post_port_update_dhcp_opts(self, port, vport, subnet_mapping,
+    def _post_port_update_dhcp_opts(self, on_exc, port, vport, subnet_mapping,
                                     ip_version, request_dhcp_options,
-                                    old_dhcp_options,):
+                                    old_dhcp_options):
         old_dhcp_options = [opt for opt in old_dhcp_options
                             if opt['ip_version'] == ip_version]
         request_dhcp_options = [opt for opt in request_dhcp_options
@@ -302,9 +282,10 @@ class PortDHCPOptionsNuage(base_plugin.BaseNuagePlugin):
             self._translate_dhcp_option(dhcp_opt)
         categorised_dhcp_opts = self._categorise_dhcp_options_for_update(
             old_dhcp_options, request_dhcp_options)
-        self._update_extra_dhcp_options(categorised_dhcp_opts,
+        self._update_extra_dhcp_options(on_exc,
+                                        categorised_dhcp_opts,
                                         ip_version,
                                         subnet_mapping,
                                         port['id'],
                                         port['device_owner'],
-                                        old_dhcp_options, vport)
+                                        vport)
@@ -334,6 +334,7 @@ class NuageL3Plugin(base_plugin.BaseNuagePlugin,
             self.vsdclient.move_l2domain_to_l3subnet(
                 subnet_mapping['nuage_subnet_id'],
                 vsd_subnet['ID'])
+            self._vsd_subnets.pop(subnet_mapping['nuage_subnet_id'])
             self.set_mapping_as_l3subnet(session, ipv4_subnet_mapping,
                                          ipv6_subnet_mapping, vsd_subnet)
 
@@ -544,6 +545,7 @@ class NuageL3Plugin(base_plugin.BaseNuagePlugin,
                 subnet,
                 ipv6_subnet_mapping
             )
+            self._vsd_subnets.pop(nuage_subn_id)
 
             self._notify_add_del_router_interface(
                 constants.AFTER_DELETE,
@@ -27,6 +27,9 @@ class NuageNetTopologyPlugin(ext_db.NuageGwPortMappingDbMixin,
 
     supported_extension_aliases = ['net-topology']
 
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         super(NuageNetTopologyPlugin, self).__init__()
 
@@ -14,6 +14,7 @@
 
 import functools
 
+import eventlet
 import netaddr
 from neutron._i18n import _
 from neutron.db import securitygroups_db as sg_db
@@ -55,7 +56,8 @@ class NuageApi(base_plugin.BaseNuagePlugin,
     def __init__(self):
         super(NuageApi, self).__init__()
         # Prepare default and shared netpartitions
-        self._prepare_netpartitions()
+        with nuage_utils.STARTUP_TIMINGS.timed('netpartitions'):
+            self._prepare_netpartitions()
         lib_db_resource_extend.register_funcs('security_groups',
                                               [self._extend_resource_dict])
 
@@ -259,11 +261,15 @@ class NuageApi(base_plugin.BaseNuagePlugin,
 
     @log_helpers.log_method_call
     def _prepare_netpartitions(self):
-        # prepare shared netpartition
+        # prepare shared netpartition, concurrently with the default one
         shared_netpart_name = constants.SHARED_INFRASTRUCTURE
-        self._validate_create_net_partition(n_ctx.get_admin_context(),
-                                            shared_netpart_name)
-        # prepare default netpartition
+        shared_netpart = eventlet.spawn(self._validate_create_net_partition,
+                                        n_ctx.get_admin_context(),
+                                        shared_netpart_name)
+        self._prepare_default_netpartition()
+        shared_netpart.wait()
+
+    def _prepare_default_netpartition(self):
         default_netpart_name = cfg.CONF.RESTPROXY.default_net_partition_name
         l3template = cfg.CONF.RESTPROXY.default_l3domain_template
         l2template = cfg.CONF.RESTPROXY.default_l2domain_template
@@ -429,28 +435,33 @@ class NuageApi(base_plugin.BaseNuagePlugin,
     @lib_db_api.retry_if_session_inactive()
     @log_helpers.log_method_call
     def get_vsd_subnet(self, context, id, fields=None):
+        memo = nuage_utils.LookupMemo()
         subnet = self.vsdclient.get_nuage_subnet_by_id(
             id, required=True)
+        self._prefetch_shared_subnets(memo, [subnet])
+        if subnet['type'] == constants.L3SUBNET:
+            # the parent of a l3 subnet is its zone, which has the domain
+            # as parent
+            zone = memo.get(self.vsdclient.get_nuage_zone_by_id,
+                            subnet['parentID'])
+            netpart_id = memo.get(self.vsdclient.get_router_np_id,
+                                  zone['nuage_parent_id'])
+        else:
+            netpart_id = subnet['parentID']
+
+        net_partition = memo.get(
+            self.vsdclient.get_net_partition_name_by_id, netpart_id)
         vsd_subnet = {'id': subnet['ID'],
                       'name': subnet['name'],
-                      'cidr': self._calc_cidr(subnet),
-                      'ipv6_cidr': self._calc_ipv6_cidr(subnet),
+                      'cidr': self._calc_cidr(subnet, memo),
+                      'ipv6_cidr': self._calc_ipv6_cidr(subnet, memo),
                       'gateway': subnet['gateway'],
                       'ipv6_gateway': subnet['IPv6Gateway'],
                       'ip_version': subnet['IPType'],
                       'enable_dhcpv4': subnet['enableDHCPv4'],
                       'enable_dhcpv6': subnet['enableDHCPv6'],
+                      'net_partition': net_partition
                       }
-        if subnet['type'] == constants.L3SUBNET:
-            domain_id = self.vsdclient.get_router_by_domain_subnet_id(
-                vsd_subnet['id'])
-            netpart_id = self.vsdclient.get_router_np_id(domain_id)
-        else:
-            netpart_id = subnet['parentID']
-
-        net_partition = self.vsdclient.get_net_partition_name_by_id(
-            netpart_id)
-        vsd_subnet['net_partition'] = net_partition
         return self._fields(vsd_subnet, fields)
 
     @nuage_utils.handle_nuage_api_error
@@ -459,13 +470,21 @@ class NuageApi(base_plugin.BaseNuagePlugin,
         if 'vsd_zone_id' not in filters:
             msg = _('vsd_zone_id is a required filter parameter for this API.')
             raise n_exc.BadRequest(resource='vsd-subnets', msg=msg)
+        # the cidr of a subnet linked to a shared subnet is the one of the
+        # shared subnet, so cidr filters are applied on the results, as are
+        # name filters, which are case insensitive
+        vsd_filter, filters = nuage_utils.filters_to_vsd_predicate(
+            filters, {'id': self._id_predicate,
+                      'ip_version': self._ip_type_predicate})
         l3subs = self.vsdclient.get_domain_subnet_by_zone_id(
-            filters['vsd_zone_id'][0])
+            filters['vsd_zone_id'][0], vsd_filter)
+        memo = nuage_utils.LookupMemo()
+        self._prefetch_shared_subnets(memo, l3subs)
         vsd_to_os = {
             'ID': 'id',
             'name': 'name',
-            self._calc_cidr: 'cidr',
-            self._calc_ipv6_cidr: 'ipv6_cidr',
+            functools.partial(self._calc_cidr, memo=memo): 'cidr',
+            functools.partial(self._calc_ipv6_cidr, memo=memo): 'ipv6_cidr',
             'gateway': 'gateway',
             'IPv6Gateway': 'ipv6_gateway',
             'IPType': 'ip_version',
@@ -482,17 +501,37 @@ class NuageApi(base_plugin.BaseNuagePlugin,
 
         l3domains = []
         l2domains = []
+        l3_filters = l2_filters = filters
 
         if 'vsd_organisation_id' in filters:
-            # get domains by enterprise id
-            l3domains.extend(self.vsdclient.get_routers_by_netpart(
-                filters['vsd_organisation_id'][0]))
-            l2domains.extend(self.vsdclient.get_subnet_by_netpart(
-                filters['vsd_organisation_id'][0]))
+            # get domains by enterprise id, l3 and l2 concurrently, only the
+            # ones of the requested type, filtered by VSD where possible
+            memo = nuage_utils.LookupMemo()
+            netpart_id = filters['vsd_organisation_id'][0]
+            types = set(domain_type.upper()
+                        for domain_type in filters.get('type', ['L3', 'L2']))
+            l3_filter, l3_filters = nuage_utils.filters_to_vsd_predicate(
+                filters, {'id': self._id_predicate})
+            l2_filter, l2_filters = nuage_utils.filters_to_vsd_predicate(
+                filters, {'id': self._id_predicate,
+                          'cidr': self._ipv4_cidr_predicate,
+                          'ipv6_cidr': self._ipv6_cidr_predicate,
+                          'ip_type': self._ip_type_predicate})
+            if 'L3' in types:
+                memo.spawn(self.vsdclient.get_routers_by_netpart, netpart_id,
+                           l3_filter)
+            if 'L2' in types:
+                l2domains.extend(memo.get(
+                    self.vsdclient.get_subnet_by_netpart, netpart_id,
+                    l2_filter))
+            if 'L3' in types:
+                l3domains.extend(memo.get(
+                    self.vsdclient.get_routers_by_netpart, netpart_id,
+                    l3_filter))
         elif 'os_router_ids' in filters:
-            # get domain by Openstack router id
-            l3domains.extend(self.vsdclient.get_router_by_external(os_id)
-                             for os_id in filters['os_router_ids'])
+            # get domains by Openstack router ids
+            l3domains.extend(self.vsdclient.get_routers_by_external_ids(
+                filters['os_router_ids']))
         else:
             msg = _('vsd_organisation_id or os_router_ids is a required filter'
                     ' parameter for this API.')
@@ -531,30 +570,73 @@ class NuageApi(base_plugin.BaseNuagePlugin,
             'tunnelType': 'tunnel_type',
             'ECMPCount': 'ecmp_count'
         }
-        return self._trans_vsd_to_os(l3domains + l2domains, vsd_to_os,
-                                     filters, fields)
+        return (self._trans_vsd_to_os(l3domains, vsd_to_os, l3_filters,
+                                      fields) +
+                self._trans_vsd_to_os(l2domains, vsd_to_os, l2_filters,
+                                      fields))
+
+    @staticmethod
+    def _id_predicate(vsd_id):
+        # filters are matched case insensitive, and VSD ids are lower case;
+        # names are matched on the results, as VSD compares them exactly
+        return "ID IS '%s'" % vsd_id.lower()
+
+    @staticmethod
+    def _ip_type_predicate(ip_type):
+        ip_type = ip_type.upper()
+        if ip_type not in ('IPV4', 'IPV6', 'DUALSTACK'):
+            return None
+        return "IPType IS '%s'" % ip_type
+
+    @staticmethod
+    def _ipv4_cidr_predicate(cidr):
+        try:
+            cidr = netaddr.IPNetwork(cidr, version=4)
+        except (netaddr.AddrFormatError, ValueError):
+            return None
+        return "(address IS '%s' and netmask IS '%s')" % (
+            cidr.ip, cidr.netmask)
+
+    @staticmethod
+    def _ipv6_cidr_predicate(cidr):
+        try:
+            cidr = netaddr.IPNetwork(cidr, version=6)
+        except (netaddr.AddrFormatError, ValueError):
+            return None
+        return "IPv6Address IS '%s'" % cidr
+
+    def _prefetch_shared_subnets(self, memo, subnets):
+        for subnet in subnets:
+            shared_id = subnet.get('associatedSharedNetworkResourceID')
+            if shared_id:
+                memo.spawn(self.vsdclient.get_nuage_subnet_by_id, shared_id)
+
+    def _get_shared_subnet(self, shared_id, memo=None):
+        if memo is None:
+            return self.vsdclient.get_nuage_subnet_by_id(shared_id)
+        return memo.get(self.vsdclient.get_nuage_subnet_by_id, shared_id)
 
-    def _calc_cidr(self, subnet):
+    def _calc_cidr(self, subnet, memo=None):
         if (not subnet['address']) and (
                 not subnet['associatedSharedNetworkResourceID']):
             return None
 
         shared_id = subnet['associatedSharedNetworkResourceID']
         if shared_id:
-            subnet = self.vsdclient.get_nuage_subnet_by_id(shared_id)
+            subnet = self._get_shared_subnet(shared_id, memo)
         if subnet.get('address'):
             ip = netaddr.IPNetwork(subnet['address'] + '/' +
                                    subnet['netmask'])
             return str(ip)
 
-    def _calc_ipv6_cidr(self, subnet):
+    def _calc_ipv6_cidr(self, subnet, memo=None):
         if (not subnet['IPv6Address']) and (
                 not subnet['associatedSharedNetworkResourceID']):
             return None
 
         shared_id = subnet['associatedSharedNetworkResourceID']
         if shared_id:
-            subnet = self.vsdclient.get_nuage_subnet_by_id(shared_id)
+            subnet = self._get_shared_subnet(shared_id, memo)
         return subnet.get('IPv6Address')
 
     @nuage_utils.handle_nuage_api_error
@@ -564,9 +646,11 @@ class NuageApi(base_plugin.BaseNuagePlugin,
             msg = _('vsd_domain_id is a required filter parameter for this '
                     'API.')
             raise n_exc.BadRequest(resource='vsd-zones', msg=msg)
+        vsd_filter, filters = nuage_utils.filters_to_vsd_predicate(
+            filters, {'id': self._id_predicate})
         try:
             vsd_zones = self.vsdclient.get_zone_by_domainid(
-                filters['vsd_domain_id'][0])
+                filters['vsd_domain_id'][0], vsd_filter)
         except RESTProxyError as e:
             if e.code == 404:
                 return []
@@ -590,7 +674,9 @@ class NuageApi(base_plugin.BaseNuagePlugin,
     @nuage_utils.handle_nuage_api_error
     @log_helpers.log_method_call
     def get_vsd_organisations(self, context, filters=None, fields=None):
-        netpartitions = self.vsdclient.get_net_partitions()
+        vsd_filter, filters = nuage_utils.filters_to_vsd_predicate(
+            filters, {'id': self._id_predicate})
+        netpartitions = self.vsdclient.get_net_partitions(vsd_filter)
         vsd_to_os = {
             'net_partition_id': 'id',
             'net_partition_name': 'name'
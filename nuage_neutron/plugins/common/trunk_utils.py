@@ -0,0 +1,66 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.services.trunk import exceptions as t_exc
+from neutron_lib.api.definitions import portbindings
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def unset_subports(core_plugin, context, trunk_id, subports, port_data,
+                   remove_from_vsd=None):
+    """Unbind the subports of a trunk and remove them from VSD in bulk.
+
+    The ports are unbound one by one, as ML2 does not allow update_port to
+    run within a transaction. The unbound ports are then removed from VSD
+    in one go, after which the ports which failed are retried one by one.
+
+    :param core_plugin: the core plugin
+    :param context: admin context
+    :param trunk_id: id of the trunk
+    :param subports: the subports to unset
+    :param port_data: the port attributes unbinding a subport
+    :param remove_from_vsd: optional function removing a list of unbound
+        ports from VSD, returning a list of (port, exception) tuples
+    :return: the list of unbound ports
+    """
+    unbound_ports = []
+    for subport in subports:
+        LOG.debug('unset port id : %(id)s', {'id': subport.port_id})
+        try:
+            updated_port = core_plugin.update_port(
+                context, subport.port_id, {'port': dict(port_data)})
+            vif_type = updated_port.get(portbindings.VIF_TYPE)
+            if vif_type != portbindings.VIF_TYPE_UNBOUND:
+                raise t_exc.SubPortBindingError(port_id=subport.port_id,
+                                                trunk_id=trunk_id)
+            unbound_ports.append(updated_port)
+        except Exception as e:
+            LOG.error("Failed to clear binding for subport: %s", e)
+
+    if remove_from_vsd and unbound_ports:
+        failed = [port for port, exception in remove_from_vsd(unbound_ports)
+                  if exception]
+        if failed:
+            LOG.warning("Failed to remove %(failed)s subports of trunk "
+                        "%(trunk)s from VSD, retrying one by one",
+                        {'failed': len(failed), 'trunk': trunk_id})
+        for port in failed:
+            for _, exception in remove_from_vsd([port]):
+                if exception:
+                    LOG.error("Failed to remove subport %(port)s from VSD: "
+                              "%(ex)s", {'port': port['id'],
+                                         'ex': exception})
+    return unbound_ports
@@ -12,19 +12,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import contextlib
 import functools
 import inspect
 import sys
 import time
 
+from eventlet import greenpool
 import netaddr
 import six
 
 from neutron_lib import constants as lib_constants
 from oslo_log import log as logging
 
+from nuage_neutron.plugins.common import config as nuage_config
 from nuage_neutron.plugins.common import exceptions as nuage_exc
+from nuage_neutron.plugins.common import ip_utils
 from nuage_neutron.vsdclient.restproxy import RESTProxyError
 
 
@@ -32,12 +36,12 @@ class SubnetUtilsBase(object):
 
     @staticmethod
     def _is_v4_ip(ip):
-        return (netaddr.IPAddress(ip['ip_address']).version ==
+        return (ip_utils.parse_ip(ip['ip_address'])[0] ==
                 lib_constants.IP_VERSION_4)
 
     @staticmethod
     def _is_v6_ip(ip):
-        return (netaddr.IPAddress(ip['ip_address']).version ==
+        return (ip_utils.parse_ip(ip['ip_address'])[0] ==
                 lib_constants.IP_VERSION_6)
 
     @staticmethod
@@ -80,14 +84,21 @@ class SubnetUtilsBase(object):
     def compare_ip(ip1, ip2):
         return ((ip1 is None and ip2 is None) or
                 (ip1 is not None and ip2 is not None and
-                 netaddr.IPAddress(ip1) == netaddr.IPAddress(ip2)))
+                 ip_utils.parse_ip(str(ip1)) == ip_utils.parse_ip(str(ip2))))
 
     @staticmethod
     def compare_cidr(cidr1, cidr2):
         return ((cidr1 is None and cidr2 is None) or
                 (cidr1 is not None and cidr2 is not None and
-                 SubnetUtilsBase.normalize_cidr(cidr1) ==
-                 SubnetUtilsBase.normalize_cidr(cidr2)))
+                 SubnetUtilsBase._cidr_key(cidr1) ==
+                 SubnetUtilsBase._cidr_key(cidr2)))
+
+    @staticmethod
+    def _cidr_key(value):
+        try:
+            return ip_utils.parse_cidr(str(value))
+        except netaddr.core.AddrFormatError:
+            return value
 
     @staticmethod
     def normalize_cidr(value):
@@ -208,30 +219,59 @@ def handle_nuage_api_errorcode(fn):
     return wrapped
 
 
-def ignore_no_update(fn):
+VSD_NO_UPDATE_ERR_CODE = '2039'  # "There are no attribute changes to
+#                                   modify the entity."
+VSD_NOT_FOUND_ERR_CODE = '404'
+
+
+def _ignore_vsd_errors(fn, vsd_codes):
+    @functools.wraps(fn)
     def wrapped(*args, **kwargs):
         try:
             return fn(*args, **kwargs)
         except RESTProxyError as e:
-            # This should never go to the user. Neutron does not complain
-            # when updating to the same values.
-            if str(e.vsd_code) == '2039':  # "There are no attribute changes
-                #                             to modify the entity."
+            if str(e.vsd_code) in vsd_codes:
                 return Ignored(e)
             raise
     return wrapped
 
 
+def ignore_no_update(fn):
+    # This should never go to the user. Neutron does not complain
+    # when updating to the same values.
+    return _ignore_vsd_errors(fn, (VSD_NO_UPDATE_ERR_CODE,))
+
+
 def ignore_not_found(fn):
-    def wrapped(*args, **kwargs):
-        try:
-            return fn(*args, **kwargs)
-        except RESTProxyError as e:
-            # We probably want to ignore 404 errors when we're deleting anyway.
-            if str(e.vsd_code) == '404':
-                return Ignored(e)
-            raise
-    return wrapped
+    # We probably want to ignore 404 errors when we're deleting anyway.
+    return _ignore_vsd_errors(fn, (VSD_NOT_FOUND_ERR_CODE,))
+
+
+def ignore_vsd_errors(cls):
+    """Class decorator making the vsdclient methods ignore certain errors.
+
+    When updating an entity on the VSD and there is nothing to actually
+    update because the values don't change, VSD will throw an error. This
+    is not needed for neutron so all these exceptions are ignored.
+
+    When VSD responds with a 404, this is sometimes good (for example when
+    trying to update an entity). Yet sometimes this is not required to be
+    an actual exception. When deleting an entity that does no longer exist
+    it is fine for neutron. Also when trying to retrieve something from VSD
+    having None returned is easier to work with than RESTProxy exceptions.
+
+    The methods are wrapped once, when the class is defined, by a single
+    wrapper each.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith('__') or not inspect.isfunction(method):
+            continue
+        if name.startswith('get_') or name.startswith('delete_'):
+            vsd_codes = (VSD_NO_UPDATE_ERR_CODE, VSD_NOT_FOUND_ERR_CODE)
+        else:
+            vsd_codes = (VSD_NO_UPDATE_ERR_CODE,)
+        setattr(cls, name, _ignore_vsd_errors(method, vsd_codes))
+    return cls
 
 
 def filters_to_vsd_filters(filterables, filters, os_to_vsd):
@@ -260,6 +300,42 @@ def filters_to_vsd_filters(filterables, filters, os_to_vsd):
     return vsd_filters
 
 
+def filters_to_vsd_predicate(filters, os_to_vsd):
+    """Translates openstack filters to a X-Nuage-Filter predicate.
+
+    The values of a filter are or'ed, the filters are and'ed, like neutron
+    does.
+
+    :param filters: the neutron filters dict from a list request.
+    :param os_to_vsd: a dict where the key is the neutron name, and the value
+     is the vsd attribute name, or a method returning the predicate for a
+     single filter value, or None when that value cannot be translated.
+    :return: A tuple of the predicate, None when no filter is translated, and
+     a dict of the filters which are not translated, which are to be
+     applied on the vsd objects returned.
+    """
+    predicates = []
+    remaining = {}
+    for os_key, values in six.iteritems(filters or {}):
+        vsd_key = os_to_vsd.get(os_key)
+        value_predicates = []
+        for value in values or []:
+            if not isinstance(value, six.string_types) or "'" in value:
+                value_predicates = None
+                break
+            if hasattr(vsd_key, '__call__'):
+                value_predicates.append(vsd_key(value))
+            elif vsd_key:
+                value_predicates.append("%s IS '%s'" % (vsd_key, value))
+        if not value_predicates or None in value_predicates:
+            remaining[os_key] = values
+        elif len(value_predicates) == 1:
+            predicates.append(value_predicates[0])
+        else:
+            predicates.append('(%s)' % ' or '.join(value_predicates))
+    return ' and '.join(predicates) or None, remaining
+
+
 def add_rollback(rollbacks, method, *args, **kwargs):
     rollbacks.append(functools.partial(method, *args, **kwargs))
 
@@ -277,3 +353,92 @@ def rollback():
             except Exception:
                 log.exception("Rollback failed.")
         raise
+
+
+def bulk_call(fn, items, pool_size=None):
+    """Call fn for every item, concurrently on a bounded green thread pool.
+
+    VSD calls are I/O bound, running them concurrently hides most of the
+    round trip latency of bulk operations.
+
+    :param fn: function taking a single item as argument
+    :param items: iterable of items to process
+    :param pool_size: maximum number of concurrent calls, defaults to
+        [RESTPROXY] server_max_concurrent_requests
+    :return: list of (item, result, exception) tuples, in the order of
+        items. exception is None when fn succeeded for that item.
+    """
+    items = list(items)
+    if pool_size is None:
+        pool_size = nuage_config.max_concurrent_vsd_requests()
+
+    def call(item):
+        try:
+            return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    if pool_size <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+    pool = greenpool.GreenPool(min(pool_size, len(items)))
+    return list(pool.imap(call, items))
+
+
+class PhaseTimings(object):
+    """Durations of the phases of a process, like the startup of plugins."""
+
+    def __init__(self, name):
+        self.name = name
+        self._durations = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            self._durations[phase] = (self._durations.get(phase, 0.0) +
+                                      duration)
+            get_logger().info('%s: %s took %.3f s',
+                              self.name, phase, duration)
+
+    def as_dict(self):
+        return dict(self._durations)
+
+
+STARTUP_TIMINGS = PhaseTimings('Nuage startup')
+WARMUP_TIMINGS = PhaseTimings('Nuage worker warm-up')
+
+
+class LookupMemo(object):
+    """Memo of the lookups done while serving a single request.
+
+    A lookup is started on a green thread when it is first asked for, so
+    independent lookups run concurrently, and a lookup asked for again, e.g.
+    of the same domain or enterprise, is not done twice.
+    """
+
+    def __init__(self, pool_size=None):
+        if pool_size is None:
+            pool_size = nuage_config.max_concurrent_vsd_requests()
+        self._pool = greenpool.GreenPool(max(pool_size, 1))
+        self._lookups = {}
+
+    def spawn(self, fn, *args):
+        """Start the lookup fn(*args), unless it was started already."""
+        key = (fn, args)
+        if key not in self._lookups:
+            self._lookups[key] = self._pool.spawn(fn, *args)
+        return self._lookups[key]
+
+    def get(self, fn, *args):
+        """Return the result of the lookup fn(*args), raising its error."""
+        return self.spawn(fn, *args).wait()
+
+
+def raise_first_bulk_error(results):
+    """Raise the first exception found in the results of bulk_call."""
+    for _, _, exception in results:
+        if exception is not None:
+            raise exception
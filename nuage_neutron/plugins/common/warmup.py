@@ -0,0 +1,72 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Warm-up of the API and RPC workers of neutron-server.
+
+The workers are forked after the plugins initialized, so a worker inherits
+the vsdclients and their auth key, but neither the connections to VSD nor
+those to the database. Each worker warms these up once it started, instead
+of letting the first requests it serves wait for them.
+"""
+
+from neutron_lib.callbacks import events
+from neutron_lib.callbacks import registry
+from neutron_lib.callbacks import resources
+from neutron_lib import context as n_ctx
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from nuage_neutron.plugins.common import config
+from nuage_neutron.plugins.common import constants
+from nuage_neutron.plugins.common import nuagedb
+from nuage_neutron.plugins.common import utils
+from nuage_neutron.vsdclient.vsdclient_fac import VsdClientFactory
+
+LOG = logging.getLogger(__name__)
+
+
+def register():
+    """Warm up each worker of the process once it started."""
+    # subscribing again, for every plugin, is a no-op
+    registry.subscribe(warm_up_worker, resources.PROCESS, events.AFTER_INIT)
+
+
+def warm_up_worker(resource, event, trigger, **kwargs):
+    scope = cfg.CONF.PLUGIN.worker_warmup
+    for phase, warm_up in ((constants.WORKER_WARMUP_CONNECTIONS,
+                            _warm_up_connections),
+                           (constants.WORKER_WARMUP_NETPARTITIONS,
+                            _warm_up_netpartitions)):
+        if phase not in scope:
+            continue
+        try:
+            with utils.WARMUP_TIMINGS.timed(phase):
+                warm_up()
+        except Exception as e:
+            # the requests will do what could not be done here
+            LOG.warning('Warm-up of the %s failed: %s', phase, e)
+
+
+def _warm_up_connections():
+    connections = config.max_concurrent_vsd_requests()
+    for vsdclient in VsdClientFactory.get_vsd_clients():
+        vsdclient.warm_up(connections)
+
+
+def _warm_up_netpartitions():
+    # the query opens a database connection for the requests to reuse, the
+    # net-partitions themselves are not kept
+    context = n_ctx.get_admin_context()
+    net_partitions = nuagedb.get_all_net_partitions(context.session)
+    LOG.debug('Loaded %s net-partitions', len(net_partitions))
@@ -49,18 +49,10 @@ class NuageGatewayDriverBridge(base_plugin.RootNuagePlugin,
         port = port_dict['port']
         gw_ports = port.get('link_info')
         segmentation_id = port_dict['segmentation_id']
-        vsd_port = utils.validate_switchports(self.vsdclient,
-                                              port.get('tenant_id'),
-                                              gw_ports)
-
-        params = {
-            'gatewayport': vsd_port['port_id'],
-            'value': segmentation_id,
-            'redundant': vsd_port['redundant'],
-            'personality': vsd_port['personality']
-        }
-        vlan = self.vsdclient.create_gateway_vlan(params)
-        LOG.debug("created vlan: %(vlan_dict)s", {'vlan_dict': vlan})
+        vsd_port, vlan = utils.create_gateway_vlan(self.vsdclient,
+                                                   port.get('tenant_id'),
+                                                   gw_ports,
+                                                   segmentation_id)
         # create dummy subnet - we need only id
 
         subnet = {'id': port['fixed_ips'][0]['subnet_id']}
@@ -13,7 +13,17 @@
 #    under the License.
 
 from neutron._i18n import _
+from oslo_log import log as logging
+
+from nuage_neutron.plugins.common import cache
+from nuage_neutron.plugins.common import constants
 from nuage_neutron.plugins.common import exceptions
+from nuage_neutron.vsdclient import restproxy
+
+LOG = logging.getLogger(__name__)
+
+# (switch_info, port_id) of a switchport -> its vsd gateway port
+_vsd_ports = cache.ExpiringCache(constants.VSD_GATEWAY_PORTS_CACHE_TTL)
 
 
 def get_nuage_vport(vsdclient, port, required=True):
@@ -28,44 +38,93 @@ def get_nuage_vport(vsdclient, port, required=True):
 
 
 def validate_switchports(vsdclient, tenant_id, switchports):
+    """Return the vsd gateway port the switchports are connected to.
+
+    The vsd gateway ports of the switchports are cached for
+    VSD_GATEWAY_PORTS_CACHE_TTL seconds.
+    """
     vsdports = set()
     vsd_port = None
     if not len(switchports):
         return None
     for switchport in switchports:
-        filters = {'system_id': [switchport.get('switch_info')]}
-        gws = vsdclient.get_gateways(tenant_id, filters)
-        if len(gws) == 0:
-            msg = (_("No gateway found: %s")
-                   % filters['system_id'][0])
-            raise exceptions.NuageBadRequest(msg=msg)
-        port_mnemonic = _convert_ifindex_to_ifname(
-            switchport.get('port_id'))
-        filters = {'gateway': [gws[0]['gw_id']],
-                   'name': [port_mnemonic]}
-        gw_ports = vsdclient.get_gateway_ports(tenant_id,
-                                               filters)
-        if len(gw_ports) == 0:
-            msg = (_("No gateway port found: %s")
-                   % filters['name'][0])
-            raise exceptions.NuageBadRequest(msg=msg)
-        port = gw_ports[0]
-        if port.get('gw_redundant_port_id') is not None:
-            port_id = port.get('gw_redundant_port_id')
-            redundant = True
-        else:
-            port_id = port.get('gw_port_id')
-            redundant = False
-        vsd_port = {
-            'port_id': port_id,
-            'personality': gws[0]['gw_type'],
-            'redundant': redundant
-        }
-        vsdports.add(port_id)
+        key = (switchport.get('switch_info'), switchport.get('port_id'))
+        vsd_port = _vsd_ports.get(key)
+        if vsd_port is None:
+            vsd_port = _get_vsd_port(vsdclient, tenant_id, switchport)
+            _vsd_ports.set(key, vsd_port)
+        vsdports.add(vsd_port['port_id'])
     if len(vsdports) > 1:
         msg = (_("Not all switchports belong to the same redundancy Group"))
         raise exceptions.NuageBadRequest(msg=msg)
-    return vsd_port
+    return dict(vsd_port)
+
+
+def forget_switchports(switchports):
+    """Forget the cached vsd gateway ports of the switchports."""
+    for switchport in switchports:
+        _vsd_ports.pop((switchport.get('switch_info'),
+                        switchport.get('port_id')))
+
+
+def create_gateway_vlan(vsdclient, tenant_id, switchports, segmentation_id):
+    """Create the vlan of a port on the gateway port of its switchports.
+
+    :return: the vsd gateway port, as returned by validate_switchports, and
+        the vlan
+    """
+    vsd_port = validate_switchports(vsdclient, tenant_id, switchports)
+    params = {
+        'gatewayport': vsd_port['port_id'],
+        'value': segmentation_id,
+        'redundant': vsd_port['redundant'],
+        'personality': vsd_port['personality']
+    }
+    try:
+        vlan = vsdclient.create_gateway_vlan(params)
+    except restproxy.ResourceNotFoundException:
+        # the cached gateway port got deleted or replaced on vsd meanwhile
+        LOG.debug("Gateway port %s not found, looking it up again",
+                  vsd_port['port_id'])
+        forget_switchports(switchports)
+        vsd_port = validate_switchports(vsdclient, tenant_id, switchports)
+        params.update(gatewayport=vsd_port['port_id'],
+                      redundant=vsd_port['redundant'],
+                      personality=vsd_port['personality'])
+        vlan = vsdclient.create_gateway_vlan(params)
+    LOG.debug("created vlan: %(vlan_dict)s", {'vlan_dict': vlan})
+    return vsd_port, vlan
+
+
+def _get_vsd_port(vsdclient, tenant_id, switchport):
+    filters = {'system_id': [switchport.get('switch_info')]}
+    gws = vsdclient.get_gateways(tenant_id, filters)
+    if len(gws) == 0:
+        msg = (_("No gateway found: %s")
+               % filters['system_id'][0])
+        raise exceptions.NuageBadRequest(msg=msg)
+    port_mnemonic = _convert_ifindex_to_ifname(
+        switchport.get('port_id'))
+    filters = {'gateway': [gws[0]['gw_id']],
+               'name': [port_mnemonic]}
+    gw_ports = vsdclient.get_gateway_ports(tenant_id,
+                                           filters)
+    if len(gw_ports) == 0:
+        msg = (_("No gateway port found: %s")
+               % filters['name'][0])
+        raise exceptions.NuageBadRequest(msg=msg)
+    port = gw_ports[0]
+    if port.get('gw_redundant_port_id') is not None:
+        port_id = port.get('gw_redundant_port_id')
+        redundant = True
+    else:
+        port_id = port.get('gw_port_id')
+        redundant = False
+    return {
+        'port_id': port_id,
+        'personality': gws[0]['gw_type'],
+        'redundant': redundant
+    }
 
 
 def _convert_ifindex_to_ifname(ifindex):
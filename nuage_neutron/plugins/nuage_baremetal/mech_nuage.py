@@ -12,8 +12,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import inspect
-
 from oslo_config import cfg
 from oslo_log import log as logging
 import stevedore
@@ -31,8 +29,6 @@ from nuage_neutron.plugins.common import exceptions
 from nuage_neutron.plugins.common import nuagedb
 from nuage_neutron.plugins.common import utils
 from nuage_neutron.plugins.common.utils import handle_nuage_api_errorcode
-from nuage_neutron.plugins.common.utils import ignore_no_update
-from nuage_neutron.plugins.common.utils import ignore_not_found
 from nuage_neutron.plugins.nuage_baremetal import portsecurity as psechandler
 from nuage_neutron.plugins.nuage_baremetal import sg_callback
 from nuage_neutron.plugins.nuage_baremetal import trunk_driver
@@ -60,7 +56,6 @@ class NuageBaremetalMechanismDriver(base_plugin.RootNuagePlugin,
         LOG.debug('Initializing driver')
         self.conf = cfg.CONF
         self.init_vsd_client()
-        self._wrap_vsdclient()
         self._core_plugin = None
         self.vif_details = {portbindings.CAP_PORT_FILTER: True}
         self.sec_handler = sg_callback.NuageBmSecurityGroupHandler(
@@ -84,28 +79,6 @@ class NuageBaremetalMechanismDriver(base_plugin.RootNuagePlugin,
                 driver_name=driver_name)
         return extension_manager.driver
 
-    def _wrap_vsdclient(self):
-        """Wraps nuagecient methods with try-except to ignore certain errors.
-
-        When updating an entity on the VSD and there is nothing to actually
-        update because the values don't change, VSD will throw an error. This
-        is not needed for neutron so all these exceptions are ignored.
-
-        When VSD responds with a 404, this is sometimes good (for example when
-        trying to update an entity). Yet sometimes this is not required to be
-        an actual exception. When deleting an entity that does no longer exist
-        it is fine for neutron. Also when trying to retrieve something from VSD
-        having None returned is easier to work with than RESTProxy exceptions.
-        """
-
-        methods = inspect.getmembers(self.vsdclient,
-                                     lambda x: inspect.ismethod(x))
-        for m in methods:
-            wrapped = ignore_no_update(m[1])
-            if m[0].startswith('get_') or m[0].startswith('delete_'):
-                wrapped = ignore_not_found(wrapped)
-            setattr(self.vsdclient, m[0], wrapped)
-
     def _segmentation_id(self, context, port):
         # Calculate segmentation id to be used at port create
         if (port.get('device_owner') == TRUNK_DEVICE_OWNER and
@@ -30,6 +30,7 @@ from neutron_lib.services.trunk import constants as t_consts
 from nuage_neutron.plugins.common import constants as p_consts
 from nuage_neutron.plugins.common import exceptions as nuage_exc
 from nuage_neutron.plugins.common import nuagedb as db
+from nuage_neutron.plugins.common import trunk_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -225,27 +226,12 @@ class NuageTrunkHandler(object):
 
     def _unset_sub_ports(self, trunk_id, subports):
         ctx = n_ctx.get_admin_context()
-        updated_ports = []
-        for port in subports:
-            LOG.debug('unset port id : %(id)s', {'id': port.port_id})
-            try:
-                updated_port = self.core_plugin.update_port(
-                    ctx, port.port_id,
-                    {'port': {portbindings.HOST_ID: None,
-                              portbindings.PROFILE: None,
-                              'device_owner': '',
-                              'device_id': ''}})
-                vif_type = updated_port.get(portbindings.VIF_TYPE)
-                if vif_type != portbindings.VIF_TYPE_UNBOUND:
-                    raise t_exc.SubPortBindingError(port_id=port.port_id,
-                                                    trunk_id=trunk_id)
-                updated_ports.append(updated_port)
-            except t_exc.SubPortBindingError as e:
-                LOG.error("Failed to clear binding for subport: %s", e)
-                self.set_trunk_status(ctx, trunk_id,
-                                      t_consts.TRUNK_DEGRADED_STATUS)
-            except Exception as e:
-                LOG.error("Failed to clear binding for subport: %s", e)
+        updated_ports = trunk_utils.unset_subports(
+            self.core_plugin, ctx, trunk_id, subports,
+            {portbindings.HOST_ID: None,
+             portbindings.PROFILE: None,
+             'device_owner': '',
+             'device_id': ''})
         if len(subports) != len(updated_ports):
             self.set_trunk_status(ctx, trunk_id,
                                   t_consts.TRUNK_DEGRADED_STATUS)
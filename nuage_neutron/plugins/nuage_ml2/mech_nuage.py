@@ -12,7 +12,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import inspect
 import time
 
 import netaddr
@@ -52,8 +51,6 @@ from nuage_neutron.plugins.common import nuagedb
 from nuage_neutron.plugins.common import routing_mechanisms
 from nuage_neutron.plugins.common import utils
 from nuage_neutron.plugins.common.utils import handle_nuage_api_errorcode
-from nuage_neutron.plugins.common.utils import ignore_no_update
-from nuage_neutron.plugins.common.utils import ignore_not_found
 from nuage_neutron.plugins.common.utils import rollback as utils_rollback
 from nuage_neutron.plugins.common.validation import Is
 from nuage_neutron.plugins.common.validation import IsSet
@@ -93,7 +90,6 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
         neutron_extensions.append_api_extensions_path(extensions.__path__)
         self._validate_mech_nuage_configuration()
         self.init_vsd_client()
-        self._wrap_vsdclient()
         NuageSecurityGroup().register()
         NuageAddressPair().register()
         db_base_plugin_v2.AUTO_DELETE_PORT_OWNERS += [
@@ -108,28 +104,6 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                                                service_plugins,
                                                extensions)
 
-    def _wrap_vsdclient(self):
-        """Wraps nuageclient methods with try-except to ignore certain errors.
-
-        When updating an entity on the VSD and there is nothing to actually
-        update because the values don't change, VSD will throw an error. This
-        is not needed for neutron so all these exceptions are ignored.
-
-        When VSD responds with a 404, this is sometimes good (for example when
-        trying to update an entity). Yet sometimes this is not required to be
-        an actual exception. When deleting an entity that does no longer exist
-        it is fine for neutron. Also when trying to retrieve something from VSD
-        having None returned is easier to work with than RESTProxy exceptions.
-        """
-
-        methods = inspect.getmembers(self.vsdclient,
-                                     lambda x: inspect.ismethod(x))
-        for m in methods:
-            wrapped = ignore_no_update(m[1])
-            if m[0].startswith('get_') or m[0].startswith('delete_'):
-                wrapped = ignore_not_found(wrapped)
-            setattr(self.vsdclient, m[0], wrapped)
-
     @utils.context_log
     def create_network_precommit(self, context):
         network = context.current
@@ -415,7 +389,8 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                    .format(nuage_subnet['resourceType']))
             raise NuageBadRequest(msg=msg)
         self._validate_cidr(subnet, nuage_subnet, shared_subnet)
-        self._validate_allocation_pools(context, subnet, subnet_info)
+        self._validate_allocation_pools(context, subnet, subnet_info,
+                                        nuage_subnet_id, nuage_subnet['type'])
         match, os_gw_ip, vsd_gw_ip = self._check_gateway_from_vsd(
             nuage_subnet, shared_subnet, subnet)
         if not match:
@@ -867,6 +842,7 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                                                 params)
             routing_mechanisms.update_nuage_subnet_parameters(db_context,
                                                               updated_subnet)
+        self._vsd_subnets.pop(nuage_subnet_id)
 
     def _validate_update_subnet(self, context, network_external,
                                 subnet_mapping, updated_subnet, original,
@@ -888,8 +864,13 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                     context.session,
                     updated_subnet['nuagenet'],
                     ip_type=updated_subnet['ip_version'])
+                subnet_type = (constants.L2DOMAIN
+                               if self._is_l2(subnet_mapping)
+                               else constants.L3SUBNET)
                 self._validate_allocation_pools(context, updated_subnet,
-                                                subnet_info)
+                                                subnet_info,
+                                                updated_subnet['nuagenet'],
+                                                subnet_type)
             return
 
         if (self._is_l3(subnet_mapping) and 'gateway_ip' in updated_subnet and
@@ -1152,31 +1133,31 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                           context.network)
         self._notify_port_provisioning_complete(context.current['id'])
 
-    def _create_port(self, db_context, port, network):
+    def _create_port(self, db_context, port, network, port_plan=None):
         is_network_external = network._network.get('router:external')
         # Validate port
-        subnet_ids = [ip['subnet_id'] for ip in port['fixed_ips']]
-        subnet_mappings = nuagedb.get_subnet_l2doms_by_subnet_ids(
-            db_context.session, subnet_ids)
-        if not subnet_mappings:
+        port_plan = port_plan or self._plan_port(db_context, port,
+                                                 is_network_external)
+        if not port_plan.subnet_mappings:
             LOG.warn('No VSD subnet found for port.')
             return
-        if not self._should_act_on_port(port, is_network_external):
+        if not port_plan.actionable:
             LOG.warn('Port not applicable for Nuage.')
             return
 
         self._validate_port(db_context, port,
-                            is_network_external, subnet_mappings)
+                            is_network_external, port_plan.subnet_mappings)
         self.nuage_callbacks.notify(resources.PORT, constants.BEFORE_CREATE,
                                     self, context=db_context,
-                                    request_port=port)
+                                    request_port=port, port_plan=port_plan)
 
-        subnet_mapping = subnet_mappings[0]
+        subnet_mapping = port_plan.subnet_mapping
         nuage_vport = nuage_vm = np_name = None
         np_id = subnet_mapping['net_partition_id']
         nuage_subnet = self._find_vsd_subnet(db_context, subnet_mapping)
+        port_plan = port_plan._replace(vsd_subnet=nuage_subnet)
         try:
-            if port.get('binding:host_id') and self._port_should_have_vm(port):
+            if port.get('binding:host_id') and port_plan.needs_vm:
                 self._validate_vmports_same_netpartition(db_context,
                                                          port, np_id)
                 desc = ("device_owner:" + constants.NOVA_PORT_OWNER_PREF +
@@ -1192,7 +1173,7 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                 nuage_vport = self._create_nuage_vport(port, nuage_subnet)
 
             if (not port[portsecurity.PORTSECURITY] and
-                    self._is_os_mgd(subnet_mapping)):
+                    not port_plan.vsd_managed):
                 self._process_port_create_secgrp_for_port_sec(db_context, port)
             self.calculate_vips_for_port_ips(db_context,
                                              port)
@@ -1231,7 +1212,8 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
             self.nuage_callbacks.notify(resources.PORT, constants.AFTER_CREATE,
                                         self, context=db_context, port=port,
                                         vport=nuage_vport, rollbacks=rollbacks,
-                                        subnet_mapping=subnet_mapping)
+                                        subnet_mapping=subnet_mapping,
+                                        port_plan=port_plan)
         except Exception:
             with excutils.save_and_reraise_exception():
                 for rollback in reversed(rollbacks):
@@ -1251,13 +1233,11 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
         is_network_external = context.network._network.get('router:external')
         self._check_fip_on_port_with_multiple_ips(db_context, port)
 
-        currently_actionable = self._should_act_on_port(port,
-                                                        is_network_external)
+        port_plan = self._plan_port(db_context, port, is_network_external)
+        currently_actionable = port_plan.actionable
         previously_actionable = self._should_act_on_port(original,
                                                          is_network_external)
-        subnet_ids = [ip['subnet_id'] for ip in port['fixed_ips']]
-        subnet_mappings = nuagedb.get_subnet_l2doms_by_subnet_ids(
-            db_context.session, subnet_ids)
+        subnet_mappings = port_plan.subnet_mappings
 
         if not currently_actionable and previously_actionable:
             # Port no longer needed
@@ -1270,7 +1250,7 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
 
         elif currently_actionable and not previously_actionable:
             # Port creation needed
-            self._create_port(db_context, port, context.network)
+            self._create_port(db_context, port, context.network, port_plan)
             return
         elif not currently_actionable or not subnet_mappings:
             return
@@ -1278,7 +1258,7 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                             subnet_mappings)
         # We only need the VSD properties of the subnet mapping, this is equal
         # for all subnet_mappings.
-        subnet_mapping = subnet_mappings[0]
+        subnet_mapping = port_plan.subnet_mapping
         self._check_subport_in_use(original, port)
         vm_if_update_required = self._check_vm_if_update(
             db_context, original, port)
@@ -1328,7 +1308,7 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
 
         self._port_device_change(context, db_context, nuage_vport,
                                  original, port,
-                                 subnet_mapping, host_added,
+                                 subnet_mapping, port_plan, host_added,
                                  host_removed)
         rollbacks = []
         try:
@@ -1337,11 +1317,12 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                                         port=port,
                                         original_port=original,
                                         vport=nuage_vport, rollbacks=rollbacks,
-                                        subnet_mapping=subnet_mapping)
+                                        subnet_mapping=subnet_mapping,
+                                        port_plan=port_plan)
             new_sg = port.get('security_groups')
             prt_sec_updt_rqd = (original.get(portsecurity.PORTSECURITY) !=
                                 port.get(portsecurity.PORTSECURITY))
-            if (self._is_os_mgd(subnet_mapping) and
+            if (not port_plan.vsd_managed and
                     prt_sec_updt_rqd and not new_sg):
                 self._process_port_create_secgrp_for_port_sec(db_context,
                                                               port)
@@ -1444,7 +1425,8 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
 
     def _port_device_change(self, context, db_context, nuage_vport, original,
                             port, subnet_mapping,
-                            host_added=False, host_removed=False):
+                            port_plan, host_added=False,
+                            host_removed=False):
         if not host_added and not host_removed:
             return
         np_name = self.vsdclient.get_net_partition_name_by_id(
@@ -1460,7 +1442,7 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                                       is_port_device_owner_removed=True)
         elif host_added:
             self._validate_security_groups(context)
-            if self._port_should_have_vm(port):
+            if port_plan.needs_vm:
                 nuage_subnet = self._find_vsd_subnet(
                     db_context, subnet_mapping)
                 self._create_nuage_vm(db_context, port,
@@ -1909,6 +1891,22 @@ class NuageMechanismDriver(base_plugin.RootNuagePlugin,
                     "to it.").format(port['id'], fips[0]['id'])
             raise NuageBadRequest(msg=msg)
 
+    def _plan_port(self, db_context, port, is_network_external):
+        """Decide what to do for a port, see base_plugin.PortPlan"""
+        subnet_ids = [ip['subnet_id'] for ip in port['fixed_ips']]
+        subnet_mappings = nuagedb.get_subnet_l2doms_by_subnet_ids(
+            db_context.session, subnet_ids)
+        subnet_mapping = subnet_mappings[0] if subnet_mappings else None
+        return base_plugin.PortPlan(
+            subnet_mappings=tuple(subnet_mappings),
+            subnet_mapping=subnet_mapping,
+            vsd_managed=bool(subnet_mapping and
+                             self._is_vsd_mgd(subnet_mapping)),
+            vnic_type_supported=self.is_port_vnic_type_supported(port),
+            actionable=self._should_act_on_port(port, is_network_external),
+            needs_vm=self._port_should_have_vm(port),
+            vsd_subnet=None)
+
     def _should_act_on_port(self, port, is_network_external=False):
         # Should Nuage create vport for this port
 
@@ -185,12 +185,14 @@ class NuageSecurityGroup(base_plugin.BaseNuagePlugin,
         self.vsdclient.delete_nuage_sgrule([local_sg_rule])
 
     def post_port_create(self, resource, event, trigger, context, port, vport,
-                         subnet_mapping, **kwargs):
-        if self._is_vsd_mgd(subnet_mapping):
+                         subnet_mapping, port_plan=None, **kwargs):
+        if (port_plan.vsd_managed if port_plan
+                else self._is_vsd_mgd(subnet_mapping)):
             return
 
         if port[ext_sg.SECURITYGROUPS]:
-            vsd_subnet = self._find_vsd_subnet(context, subnet_mapping)
+            vsd_subnet = ((port_plan and port_plan.vsd_subnet) or
+                          self._find_vsd_subnet(context, subnet_mapping))
             if vsd_subnet:
                 self._process_port_security_group(context,
                                                   port,
@@ -201,15 +203,16 @@ class NuageSecurityGroup(base_plugin.BaseNuagePlugin,
 
     def post_port_update(self, resource, event, trigger, context, port,
                          original_port, vport, rollbacks, subnet_mapping,
-                         **kwargs):
-        if self._is_vsd_mgd(subnet_mapping):
+                         port_plan=None, **kwargs):
+        if (port_plan.vsd_managed if port_plan
+                else self._is_vsd_mgd(subnet_mapping)):
             return
         new_sg = (set(port.get(ext_sg.SECURITYGROUPS)) if
                   port.get(ext_sg.SECURITYGROUPS) else set())
         if (port.get(ext_sg.SECURITYGROUPS) !=
                 original_port.get(ext_sg.SECURITYGROUPS)):
-            vsd_subnet = self.vsdclient.get_nuage_subnet_by_mapping(
-                subnet_mapping)
+            vsd_subnet = ((port_plan and port_plan.vsd_subnet) or
+                          self._find_vsd_subnet(context, subnet_mapping))
             self._process_port_security_group(context,
                                               port,
                                               vport,
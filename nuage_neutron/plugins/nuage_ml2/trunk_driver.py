@@ -14,6 +14,7 @@
 #    under the License.
 
 import collections
+import functools
 
 from neutron.objects import trunk as trunk_objects
 from neutron.services.trunk.drivers import base as trunk_base
@@ -34,6 +35,7 @@ from nuage_neutron.plugins.common import constants as p_consts
 from nuage_neutron.plugins.common import exceptions as nuage_exc
 from nuage_neutron.plugins.common import nuagedb as db
 from nuage_neutron.plugins.common import trunk_db
+from nuage_neutron.plugins.common import trunk_utils
 
 
 LOG = logging.getLogger(__name__)
@@ -225,50 +227,102 @@ class NuageTrunkHandler(object):
                 parent=trunk_port['id'],
                 vnic_type_parent=parent_vnic)
 
-    def _set_sub_ports(self, trunk_id, subports):
+    def _get_subports_data(self, context, subports):
+        """Collect the add_subport data of subports with bulk lookups
+
+        :return: list of (subport, data) tuples and the list of subports for
+            which the data could not be collected.
+        """
         _vsdclient = self.plugin_driver.vsdclient
-        ctx = n_ctx.get_admin_context()
+        port_ids = [port.port_id for port in subports]
+        os_ports = {port['id']: port for port in self.core_plugin.get_ports(
+            context, filters={'id': port_ids})}
+        subnet_ids = list(set(fixed_ip['subnet_id']
+                              for os_port in six.itervalues(os_ports)
+                              for fixed_ip in os_port['fixed_ips']))
+        network_ids = list(set(os_port['network_id']
+                               for os_port in six.itervalues(os_ports)))
+        ip_versions = {subnet['id']: subnet['ip_version']
+                       for subnet in self.core_plugin.get_subnets(
+                           context, filters={'id': subnet_ids},
+                           fields=['id', 'ip_version'])}
+        shared_networks = set(network['id']
+                              for network in self.core_plugin.get_networks(
+                                  context, filters={'id': network_ids},
+                                  fields=['id', 'shared'])
+                              if network['shared'])
+        subnet_mappings = {
+            mapping['subnet_id']: mapping
+            for mapping in db.get_subnet_l2doms_by_subnet_ids(
+                context.session, subnet_ids)} if subnet_ids else {}
+
+        subports_data = []
+        failed = []
+        usergroups = set()
+        np_names = {}
         for port in subports:
-            LOG.debug('setting port id %(id)s  vlan %(vlan)s',
-                      {'id': port.port_id, 'vlan': port.segmentation_id})
-            os_port = self.core_plugin.get_port(ctx, port.port_id)
-            subnet_mapping = db.get_subnet_l2dom_by_port_id(ctx.session,
-                                                            port.port_id)
-            fixed_ips = os_port['fixed_ips']
-            subnets = {4: {}, 6: {}}
+            os_port = os_ports.get(port.port_id)
+            subnet_mapping = next(
+                (subnet_mappings[fixed_ip['subnet_id']]
+                 for fixed_ip in (os_port['fixed_ips'] if os_port else [])
+                 if fixed_ip['subnet_id'] in subnet_mappings), None)
+            if not subnet_mapping:
+                LOG.error("Failed to create subport %s: port or subnet "
+                          "mapping not found", port.port_id)
+                failed.append(port)
+                continue
             ips = {4: None, 6: None}
-            for fixed_ip in fixed_ips:
-                subnet = self.core_plugin.get_subnet(ctx,
-                                                     fixed_ip['subnet_id'])
-                subnets[subnet['ip_version']] = subnet
-                ips[subnet['ip_version']] = fixed_ip['ip_address']
-
-            network_details = self.core_plugin.get_network(
-                ctx,
-                os_port['network_id'])
-            if network_details['shared']:
-                _vsdclient.create_usergroup(
-                    os_port['tenant_id'],
-                    subnet_mapping['net_partition_id'])
-
-            np_name = _vsdclient.get_net_partition_name_by_id(
-                subnet_mapping['net_partition_id'])
-
-            data = {
+            for fixed_ip in os_port['fixed_ips']:
+                ips[ip_versions[fixed_ip['subnet_id']]] = (
+                    fixed_ip['ip_address'])
+            np_id = subnet_mapping['net_partition_id']
+            try:
+                if (os_port['network_id'] in shared_networks and
+                        (os_port['tenant_id'], np_id) not in usergroups):
+                    _vsdclient.create_usergroup(os_port['tenant_id'], np_id)
+                    usergroups.add((os_port['tenant_id'], np_id))
+                if np_id not in np_names:
+                    np_names[np_id] = _vsdclient.get_net_partition_name_by_id(
+                        np_id)
+            except Exception as ex:
+                LOG.error("Failed to create subport %s: %s", port.port_id, ex)
+                failed.append(port)
+                continue
+            subports_data.append((port, {
                 'id': os_port['id'],
                 'mac': os_port['mac_address'],
                 'ipv4': ips[4],
                 'ipv6': ips[6],
-                'net_partition_id': subnet_mapping['net_partition_id'],
-                'net_partition_name': np_name,
+                'net_partition_id': np_id,
+                'net_partition_name': np_names[np_id],
                 'nuage_subnet_id': subnet_mapping.get('nuage_subnet_id')
-            }
+            }))
+        return subports_data, failed
+
+    def _set_sub_ports(self, trunk_id, subports):
+        _vsdclient = self.plugin_driver.vsdclient
+        ctx = n_ctx.get_admin_context()
+        subports_data, failed = self._get_subports_data(ctx, subports)
+        if subports_data:
             try:
-                _vsdclient.add_subport(trunk_id, port, data)
+                results = _vsdclient.add_subports(trunk_id, subports_data)
             except Exception as ex:
-                LOG.error("Failed to create subport: %s", ex)
-                self.set_trunk_status(ctx, trunk_id,
-                                      t_consts.TRUNK_DEGRADED_STATUS)
+                results = [(port, ex) for port, _ in subports_data]
+            for port, ex in results:
+                if ex:
+                    LOG.error("Failed to create subport %s: %s",
+                              port.port_id, ex)
+                    failed.append(port)
+                else:
+                    LOG.debug('set port id %(id)s vlan %(vlan)s',
+                              {'id': port.port_id,
+                               'vlan': port.segmentation_id})
+        LOG.info("Created %(ok)s of %(sub)s subports of trunk %(trunk)s",
+                 {'ok': len(subports) - len(failed), 'sub': len(subports),
+                  'trunk': trunk_id})
+        if failed:
+            self.set_trunk_status(ctx, trunk_id,
+                                  t_consts.TRUNK_DEGRADED_STATUS)
         updated_ports = self._update_subport_bindings(ctx,
                                                       trunk_id,
                                                       subports)
@@ -279,36 +333,36 @@ class NuageTrunkHandler(object):
             self.set_trunk_status(ctx, trunk_id,
                                   t_consts.TRUNK_DEGRADED_STATUS)
 
+    def _remove_subports_from_vsd(self, context, os_ports):
+        subnet_mappings = db.get_subnet_l2doms_by_port_ids(
+            context.session, [os_port['id'] for os_port in os_ports])
+        results = []
+        ports_and_mappings = []
+        for os_port in os_ports:
+            if os_port['id'] in subnet_mappings:
+                ports_and_mappings.append(
+                    (os_port, subnet_mappings[os_port['id']]))
+            else:
+                results.append((os_port, nuage_exc.SubnetMappingNotFound(
+                    resource='port', id=os_port['id'])))
+        if ports_and_mappings:
+            results.extend(self.plugin_driver.vsdclient.remove_subports(
+                ports_and_mappings))
+        return results
+
     def _unset_sub_ports(self, trunk_id, trunk_port, subports):
-        _vsdclient = self.plugin_driver.vsdclient
         ctx = n_ctx.get_admin_context()
         trunk_host = trunk_port.get(portbindings.HOST_ID)
         trunk_target_state = (t_consts.TRUNK_ACTIVE_STATUS if trunk_host else
                               t_consts.TRUNK_DOWN_STATUS)
 
-        updated_ports = []
-        for port in subports:
-            LOG.debug('unset port id : %(id)s', {'id': port.port_id})
-            try:
-                updated_port = self.core_plugin.update_port(
-                    ctx, port.port_id,
-                    {'port': {portbindings.HOST_ID: None,
-                              'device_owner': '',
-                              'device_id': ''}})
-                vif_type = updated_port.get(portbindings.VIF_TYPE)
-                if vif_type != portbindings.VIF_TYPE_UNBOUND:
-                    raise t_exc.SubPortBindingError(port_id=port.port_id,
-                                                    trunk_id=trunk_id)
-                updated_ports.append(updated_port)
-                subnet_mapping = db.get_subnet_l2dom_by_port_id(ctx.session,
-                                                                port.port_id)
-                _vsdclient.remove_subport(updated_port, subnet_mapping)
-            except t_exc.SubPortBindingError as e:
-                LOG.error("Failed to clear binding for subport: %s", e)
-                self.set_trunk_status(ctx, trunk_id,
-                                      t_consts.TRUNK_DEGRADED_STATUS)
-            except Exception as e:
-                LOG.error("Failed to clear binding for subport: %s", e)
+        updated_ports = trunk_utils.unset_subports(
+            self.core_plugin, ctx, trunk_id, subports,
+            {portbindings.HOST_ID: None,
+             'device_owner': '',
+             'device_id': ''},
+            remove_from_vsd=functools.partial(self._remove_subports_from_vsd,
+                                              ctx))
         if len(subports) != len(updated_ports):
             self.set_trunk_status(ctx, trunk_id,
                                   t_consts.TRUNK_DEGRADED_STATUS)
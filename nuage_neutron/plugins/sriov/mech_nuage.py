@@ -12,8 +12,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import inspect
-
 from neutron._i18n import _
 from neutron_lib.api.definitions import portbindings
 from neutron_lib import constants as os_constants
@@ -24,6 +22,7 @@ from oslo_config import cfg
 from oslo_log import log as logging
 
 from nuage_neutron.plugins.common import base_plugin
+from nuage_neutron.plugins.common import cache
 from nuage_neutron.plugins.common import constants as nuage_const
 from nuage_neutron.plugins.common import exceptions
 from nuage_neutron.plugins.common import net_topology_db as ext_db
@@ -31,8 +30,6 @@ from nuage_neutron.plugins.common import nuagedb
 from nuage_neutron.plugins.common import trunk_db
 from nuage_neutron.plugins.common import utils
 from nuage_neutron.plugins.common.utils import handle_nuage_api_errorcode
-from nuage_neutron.plugins.common.utils import ignore_no_update
-from nuage_neutron.plugins.common.utils import ignore_not_found
 from nuage_neutron.plugins.sriov import trunk_driver
 from nuage_neutron.vsdclient.restproxy import ResourceExistsException
 
@@ -55,37 +52,17 @@ class NuageSriovMechanismDriver(base_plugin.RootNuagePlugin,
     for provisioning sriov instances.
     """
 
+    # switch id -> vsd gateway
+    _gateways = cache.ExpiringCache(nuage_const.VSD_GATEWAY_PORTS_CACHE_TTL)
+
     def initialize(self):
         LOG.debug('Initializing driver')
         self.init_vsd_client()
-        self._wrap_vsdclient()
         self.trunk_driver = trunk_driver.NuageTrunkDriver.create(self)
         self.vif_details = {portbindings.CAP_PORT_FILTER: True}
         self.conf = cfg.CONF
         LOG.debug('Initializing complete')
 
-    def _wrap_vsdclient(self):
-        """Wraps nuagecient methods with try-except to ignore certain errors.
-
-        When updating an entity on the VSD and there is nothing to actually
-        update because the values don't change, VSD will throw an error. This
-        is not needed for neutron so all these exceptions are ignored.
-
-        When VSD responds with a 404, this is sometimes good (for example when
-        trying to update an entity). Yet sometimes this is not required to be
-        an actual exception. When deleting an entity that does no longer exist
-        it is fine for neutron. Also when trying to retrieve something from VSD
-        having None returned is easier to work with than RESTProxy exceptions.
-        """
-
-        methods = inspect.getmembers(self.vsdclient,
-                                     lambda x: inspect.ismethod(x))
-        for m in methods:
-            wrapped = ignore_no_update(m[1])
-            if m[0].startswith('get_') or m[0].startswith('delete_'):
-                wrapped = ignore_not_found(wrapped)
-            setattr(self.vsdclient, m[0], wrapped)
-
     @utils.context_log
     def create_network_precommit(self, context):
         db_context = context._plugin_context
@@ -261,9 +238,8 @@ class NuageSriovMechanismDriver(base_plugin.RootNuagePlugin,
             return None
         profile = self._get_binding_profile(port)
         host_id = port['binding:host_id']
-        gw_port_mapping = ext_db.get_switchport_by_host_slot(
-            context._plugin_context,
-            {'host_id': host_id, 'pci_slot': profile.get('pci_slot')})
+        gw_port_mapping = ext_db.SWITCHPORT_MAPPINGS.get_by_host_slot(
+            context._plugin_context, host_id, profile.get('pci_slot'))
         if not gw_port_mapping:
             LOG.warning("_make_port_dict can not get switchport_mapping "
                         "for %(vif)s",
@@ -370,19 +346,14 @@ class NuageSriovMechanismDriver(base_plugin.RootNuagePlugin,
                      {'bp': vport_exist['nuage_vport_id'],
                       'port_id': vport_exist['neutron_port_id']})
             return
+        memo = utils.LookupMemo()
         for gwport in gw_ports:
             vports = ext_db.get_switchport_bindings_by_switchport_vlan(
                 ctx,
                 gwport['port_id'],
                 segmentation_id)
             if len(vports) == 0:
-                filters = {'system_id': [gwport['switch_id']]}
-                gws = self.vsdclient.get_gateways(ctx.tenant_id, filters)
-                if len(gws) == 0:
-                    msg = (_("No gateway found %s")
-                           % filters['system_id'][0])
-                    raise exceptions.NuageBadRequest(msg=msg)
-                gw = gws[0]
+                gw = self._get_gateway(ctx.tenant_id, gwport['switch_id'])
 
                 # gridinv: following code should be removed when
                 # we have proper support of native vlan on cisco/netconf
@@ -390,6 +361,11 @@ class NuageSriovMechanismDriver(base_plugin.RootNuagePlugin,
                         segmentation_id == 0):
                     return
 
+                # the vsd subnet does not depend on the vlan: get it while
+                # the vlan gets created
+                vsd_subnet = memo.spawn(
+                    self.vsdclient.get_nuage_subnet_by_id,
+                    port_dict['subnet_mapping']['nuage_subnet_id'])
                 port_id = gwport['port_id']
                 params = {
                     'gatewayport': port_id,
@@ -422,10 +398,7 @@ class NuageSriovMechanismDriver(base_plugin.RootNuagePlugin,
                     'personality': gw['gw_type'],
                     'type': nuage_const.BRIDGE_VPORT_TYPE
                 }
-                vsd_subnet = self.vsdclient \
-                    .get_nuage_subnet_by_id(
-                        port_dict['subnet_mapping']['nuage_subnet_id'])
-                params['vsd_subnet'] = vsd_subnet
+                params['vsd_subnet'] = vsd_subnet.wait()
 
                 # policy groups are not supported on netconf
                 # managed gateways
@@ -451,6 +424,20 @@ class NuageSriovMechanismDriver(base_plugin.RootNuagePlugin,
             }
             ext_db.add_switchport_binding(ctx, binding)
 
+    def _get_gateway(self, tenant_id, switch_id):
+        """Return the gateway of a switch, cached for a while."""
+        gw = self._gateways.get(switch_id)
+        if gw is None:
+            filters = {'system_id': [switch_id]}
+            gws = self.vsdclient.get_gateways(tenant_id, filters)
+            if len(gws) == 0:
+                msg = (_("No gateway found %s")
+                       % filters['system_id'][0])
+                raise exceptions.NuageBadRequest(msg=msg)
+            gw = gws[0]
+            self._gateways.set(switch_id, gw)
+        return gw
+
     def _create_port(self, port):
         """_create_port. This call makes the REST request to VSD
 
@@ -34,6 +34,7 @@ from nuage_neutron.plugins.common import constants as p_consts
 from nuage_neutron.plugins.common import exceptions as nuage_exc
 from nuage_neutron.plugins.common import nuagedb as db
 from nuage_neutron.plugins.common import trunk_db
+from nuage_neutron.plugins.common import trunk_utils
 
 LOG = logging.getLogger(__name__)
 
@@ -288,27 +289,12 @@ class NuageTrunkHandler(object):
         trunk_host = trunk_port.get(portbindings.HOST_ID)
         trunk_target_state = (t_consts.ACTIVE_STATUS if trunk_host else
                               t_consts.DOWN_STATUS)
-        updated_ports = []
-        for port in subports:
-            LOG.debug('unset port id : %(id)s', {'id': port.port_id})
-            try:
-                updated_port = self.core_plugin.update_port(
-                    ctx, port.port_id,
-                    {'port': {portbindings.HOST_ID: None,
-                              portbindings.PROFILE: None,
-                              'device_owner': '',
-                              'device_id': ''}})
-                vif_type = updated_port.get(portbindings.VIF_TYPE)
-                if vif_type != portbindings.VIF_TYPE_UNBOUND:
-                    raise t_exc.SubPortBindingError(port_id=port.port_id,
-                                                    trunk_id=trunk_id)
-                updated_ports.append(updated_port)
-            except t_exc.SubPortBindingError as e:
-                LOG.error("Failed to clear binding for subport: %s", e)
-                self.set_trunk_status(ctx, trunk_id,
-                                      t_consts.TRUNK_DEGRADED_STATUS)
-            except Exception as e:
-                LOG.error("Failed to clear binding for subport: %s", e)
+        updated_ports = trunk_utils.unset_subports(
+            self.core_plugin, ctx, trunk_id, subports,
+            {portbindings.HOST_ID: None,
+             portbindings.PROFILE: None,
+             'device_owner': '',
+             'device_id': ''})
         if len(subports) != len(updated_ports):
             self.set_trunk_status(ctx, trunk_id,
                                   t_consts.TRUNK_DEGRADED_STATUS)
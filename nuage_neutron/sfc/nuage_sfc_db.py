@@ -13,11 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import binascii
-
 from networking_sfc.db import sfc_db
 from nuage_neutron.flow_classifier import nuage_flowclassifier_db as fc_db
 from nuage_neutron.plugins.common import nuage_models
+from nuage_neutron.sfc import vlan_labels
 import six
 
 
@@ -26,42 +25,50 @@ class NuageSfcDbPlugin(sfc_db.SfcDbPlugin):
     def __init__(self):
         super(NuageSfcDbPlugin, self).__init__()
 
-    @staticmethod
-    def get_subnet_vlan_bit_map_with_lock(context, subnet_id=None):
+    def update_subnet_vlan_bit_map_unset(self, context, vlan_id, subnet_id):
+        self.free_subnet_vlan_labels(context, subnet_id, [vlan_id])
+
+    def allocate_subnet_vlan_labels(self, context, subnet_id, count=1):
+        """Allocate the lowest free vlan labels of a subnet.
+
+        :return: the allocated labels, or an empty list when less than count
+            labels are free
+        """
         with sfc_db.db_api.CONTEXT_WRITER.using(context):
             query = sfc_db.model_query.query_with_hooks(
                 context,
                 nuage_models.NuageSfcVlanSubnetMapping)
-        if subnet_id:
             vlan_mapping = query.filter_by(
                 subnet_id=subnet_id).with_for_update().first()
-        else:
-            vlan_mapping = None
-        return vlan_mapping
-
-    @staticmethod
-    def add_subnet_vlan_bit_map(context, vlan_bit_map, subnet_id):
-        with sfc_db.db_api.CONTEXT_WRITER.using(context):
-            vlan_mapping = nuage_models.NuageSfcVlanSubnetMapping(
-                subnet_id=subnet_id,
-                vlan_bit_map=vlan_bit_map)
-            context.session.add(vlan_mapping)
-            return vlan_mapping
+            if vlan_mapping:
+                bitmap = vlan_labels.VlanLabelBitmap.from_bytes(
+                    vlan_mapping['vlan_bit_map'])
+            else:
+                bitmap = vlan_labels.VlanLabelBitmap()
+            labels = bitmap.allocate(count)
+            if labels:
+                vlan_bit_map = bitmap.to_bytes()
+                if vlan_mapping:
+                    vlan_mapping.update({'vlan_bit_map': vlan_bit_map})
+                else:
+                    context.session.add(
+                        nuage_models.NuageSfcVlanSubnetMapping(
+                            subnet_id=subnet_id,
+                            vlan_bit_map=vlan_bit_map))
+        return labels
 
-    def update_subnet_vlan_bit_map_unset(self, context, vlan_id, subnet_id):
+    def free_subnet_vlan_labels(self, context, subnet_id, labels):
         with sfc_db.db_api.CONTEXT_WRITER.using(context):
-            mask = 1 << (vlan_id - 1)
             query = sfc_db.model_query.query_with_hooks(
                 context,
                 nuage_models.NuageSfcVlanSubnetMapping)
             vlan_mapping = query.filter_by(
                 subnet_id=subnet_id).with_for_update().first()
             if vlan_mapping:
-                int_vlan_map = int(binascii.hexlify(
-                    vlan_mapping['vlan_bit_map']), 16)
-                int_vlan_map |= mask
-                vlan_mapping.update(
-                    {'vlan_bit_map': binascii.unhexlify('%x' % int_vlan_map)})
+                bitmap = vlan_labels.VlanLabelBitmap.from_bytes(
+                    vlan_mapping['vlan_bit_map'])
+                bitmap.free(labels)
+                vlan_mapping.update({'vlan_bit_map': bitmap.to_bytes()})
 
     def delete_subnet_vlan_bit_map(self, context, subnet_id):
         with sfc_db.db_api.CONTEXT_WRITER.using(context):
@@ -13,15 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import binascii
+import bisect
+import collections
 import copy
-import random
 
 from networking_sfc.services.sfc import plugin as sfc_plugin
+from neutron_lib import constants as lib_constants
 from neutron_lib.services.trunk import constants as t_consts
 from nuage_neutron.plugins.common import base_plugin
 from nuage_neutron.plugins.common import constants
 from nuage_neutron.plugins.common import exceptions as nuage_exc
+from nuage_neutron.plugins.common import ip_utils
 from nuage_neutron.plugins.common import nuagedb
 from nuage_neutron.plugins.common import utils as nuage_utils
 from nuage_neutron.sfc import nuage_sfc_db
@@ -31,6 +33,99 @@ from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# the attributes identifying an advanced forwarding entry of a port chain,
+# next to the destination prefix
+SFC_RULE_KEY_ATTRIBUTES = ['description', 'action', 'DSCP', 'locationType',
+                           'locationID', 'redirectVPortTagID', 'etherType',
+                           'protocol', 'sourcePort', 'destinationPort',
+                           'addressOverride', 'IPv6AddressOverride',
+                           'networkType', 'vlanRange', 'redirectRewriteType',
+                           'redirectRewriteValue']
+# attributes for which VSD reports a missing value as a wildcard
+SFC_RULE_WILDCARD_ATTRIBUTES = ['DSCP', 'sourcePort', 'destinationPort',
+                                'vlanRange']
+SFC_RULE_RANGE_ATTRIBUTES = ['sourcePort', 'destinationPort', 'vlanRange']
+SFC_RULE_PREFIX_ATTRIBUTES = ['addressOverride', 'IPv6AddressOverride']
+# the distance between the priorities of consecutive entries of a port
+# chain, which leaves room to add entries in between them on updates
+SFC_RULE_PRIORITY_STEP = 1000
+
+
+def _sfc_canonical_value(attribute, value):
+    """Canonical form of an attribute of a compiled or a VSD entry
+
+    The compiled entries and the entries read back from VSD spell the same
+    match differently: ints against strings, '80-80' against '80', a
+    missing port against '*', protocol names against numbers.
+    """
+    if value is None or value == '':
+        return '*' if attribute in SFC_RULE_WILDCARD_ATTRIBUTES else None
+    value = str(value)
+    if attribute in SFC_RULE_RANGE_ATTRIBUTES:
+        low, _, high = value.partition('-')
+        if low == high:
+            value = low
+    elif attribute == 'protocol':
+        value = str(lib_constants.IP_PROTOCOL_MAP.get(value.lower(), value))
+    elif attribute in SFC_RULE_PREFIX_ATTRIBUTES:
+        value = ip_utils.format_cidr(ip_utils.parse_cidr(value))
+    elif attribute == 'etherType':
+        value = value.lower()
+    return value
+
+
+def _sfc_increasing_subsequence(values):
+    """Return the indexes of a longest strictly increasing subsequence"""
+    # the least tail of the increasing subsequences per length, and its index
+    tails = []
+    tail_indexes = []
+    previous = []
+    for index, value in enumerate(values):
+        length = bisect.bisect_left(tails, value)
+        previous.append(tail_indexes[length - 1] if length else None)
+        if length == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[length] = value
+            tail_indexes[length] = index
+    indexes = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        indexes.append(index)
+        index = previous[index]
+    return indexes[::-1]
+
+
+def _sfc_fill_priorities(priorities):
+    """Fill in the missing priorities in between the given ones.
+
+    :param priorities: strictly increasing priorities, None where missing
+    :return: the strictly increasing priorities, or None when there is no
+        room for the missing ones in between two given ones
+    """
+    priorities = list(priorities)
+    low = 0
+    start = 0
+    while start < len(priorities):
+        end = start
+        while end < len(priorities) and priorities[end] is None:
+            end += 1
+        count = end - start
+        if count:
+            if end == len(priorities):
+                step = SFC_RULE_PRIORITY_STEP
+            elif priorities[end] - low > count:
+                step = (priorities[end] - low) // (count + 1)
+            else:
+                return None
+            for index in range(count):
+                priorities[start + index] = low + step * (index + 1)
+        if end < len(priorities):
+            low = priorities[end]
+        start = end + 1
+    return priorities
+
 
 class NuageSFCPlugin(sfc_plugin.SfcPlugin,
                      base_plugin.BaseNuagePlugin,
@@ -174,27 +269,16 @@ class NuageSFCPlugin(sfc_plugin.SfcPlugin,
         fc_port_pgs, fc_port_rts = self._validate_port_chain_fc_on_vsd(
             fc_filter)
         with nuage_utils.rollback() as on_exc:
-            vlan_subnet_mapping = self.get_subnet_vlan_bit_map_with_lock(
-                context,
-                subnet_id=domain_id)
-            if vlan_subnet_mapping:
-                vlan_label_id = self._set_vlanid(domain_id,
-                                                 vlan_subnet_mapping)
-                on_exc(self.update_subnet_vlan_bit_map_unset,
-                       context,
-                       vlan_label_id,
-                       domain_id)
-            else:
-                vlan_bit_map = (1 << 4094) - 1
-                vlan_label_id = 1
-                mask = 1 << 0
-                vlan_bit_map &= ~mask
-                self.add_subnet_vlan_bit_map(
-                    context,
-                    subnet_id=domain_id,
-                    vlan_bit_map=binascii.unhexlify('%x' % vlan_bit_map))
-                on_exc(self.delete_subnet_vlan_bit_map,
-                       context, domain_id)
+            vlan_labels = self.allocate_subnet_vlan_labels(context, domain_id)
+            if not vlan_labels:
+                msg = ("Cannot create port chain since all"
+                       " 'vlan' values are in use by other"
+                       " port chains for"
+                       " the subnet %s " % domain_id)
+                raise nuage_exc.NuageBadRequest(msg=msg)
+            vlan_label_id = vlan_labels[0]
+            on_exc(self.free_subnet_vlan_labels, context, domain_id,
+                   vlan_labels)
             port_chain_dict['chain_parameters']['correlation_id'] = (
                 vlan_label_id)
             pc = nuage_sfc_db.NuageSfcDbPlugin.create_port_chain(
@@ -217,45 +301,17 @@ class NuageSFCPlugin(sfc_plugin.SfcPlugin,
                 flow_classifiers.reverse()
             else:
                 return pc
-            self._create_nuage_port_chain_rules(on_exc, pc_fwd_policy,
-                                                flow_classifiers,
-                                                port_pair_groups,
-                                                nuage_pgs, rdts, fc_port_pgs,
-                                                fc_port_rts,
-                                                vlan_label=vlan_label_id)
-            if port_chain_dict['chain_parameters'].get('symmetric') is True:
-                ppgs = copy.deepcopy(port_pair_groups)
-                ppgs.reverse()
-                self._create_nuage_port_chain_rules(
-                    on_exc, pc_fwd_policy,
-                    flow_classifiers,
-                    port_pair_groups=ppgs,
-                    nuage_pgs=nuage_pgs,
-                    rdts=rdts,
-                    fc_pgs=fc_port_pgs,
-                    fc_port_rdts=fc_port_rts,
-                    vlan_label=vlan_label_id,
-                    direction='reverse')
+            self._create_nuage_port_chain_rules(
+                on_exc, pc_fwd_policy, pc['id'],
+                flow_classifiers,
+                port_pair_groups,
+                nuage_pgs, rdts, fc_port_pgs,
+                fc_port_rts,
+                vlan_label=vlan_label_id,
+                symmetric=(port_chain_dict['chain_parameters'].get(
+                    'symmetric') is True))
             return pc
 
-    def _set_vlanid(self, domain_id, vlan_subnet_mapping):
-        vlan_bit_map = int(binascii.hexlify(
-            vlan_subnet_mapping['vlan_bit_map']), 16)
-        vlan_label_id = self._get_next_available_vlan_id(
-            vlan_bit_map)
-        if vlan_label_id > 4093:
-            msg = ("Cannot create port chain since all"
-                   " 'vlan' values are in use by other"
-                   " port chains for"
-                   " the subnet %s " % domain_id)
-            raise nuage_exc.NuageBadRequest(msg=msg)
-        mask = 1 << vlan_label_id
-        vlan_bit_map &= ~mask
-        vlan_subnet_mapping.update(
-            {'vlan_bit_map': binascii.unhexlify('%x' % vlan_bit_map)})
-        vlan_label_id += 1
-        return vlan_label_id
-
     def _map_port_chain_fc_filter(self, context, pc_fcs,
                                   port_for_parent_validation):
         flow_classifiers = []
@@ -362,22 +418,6 @@ class NuageSFCPlugin(sfc_plugin.SfcPlugin,
         fc_port_pgs, fc_port_rts = self._validate_port_chain_fc_on_vsd(
             fc_filter)
         with nuage_utils.rollback() as on_exc:
-            existing_adv_fwds = self.vsdclient.get_in_adv_fwd_policy_by_cmsid(
-                nuage_pgs[0]['parentType'], nuage_pgs[0]['parentID'])
-            adv_fwd_tmpl = None
-            for fwd_tmplt in existing_adv_fwds:
-                if ((portchain_id in fwd_tmplt['name']) and
-                        (portchain_id in fwd_tmplt['description'])):
-                    adv_fwd_tmpl = fwd_tmplt
-                    break
-            if adv_fwd_tmpl:
-                name_param = {'name': 'updating_' + adv_fwd_tmpl['name']}
-                self.vsdclient.update_in_adv_fwd_policy_template(
-                    adv_fwd_tmpl['ID'],
-                    name_param)
-                name_param = {'name': adv_fwd_tmpl['name']}
-                on_exc(self.vsdclient.update_in_adv_fwd_policy_template,
-                       adv_fwd_tmpl['ID'], name_param)
             pc = nuage_sfc_db.NuageSfcDbPlugin.update_port_chain(
                 self,
                 context,
@@ -388,44 +428,30 @@ class NuageSFCPlugin(sfc_plugin.SfcPlugin,
                    self,
                    context, original_port_chain['id'],
                    {'port_chain': original_port_chain})
-            fwd_template = {"active": False,
-                            "name": "pc_" + pc['id'],
-                            "description": "pc_" + pc['id'],
-                            "externalID": pc['id'],
-                            "priority": random.randint(
-                                constants.MAX_VSD_PRIORITY // 10,
-                                constants.MAX_VSD_PRIORITY)}
-            pc_fwd_policy = self.vsdclient.create_in_adv_fwd_policy_template(
-                nuage_pgs[0]['parentType'], nuage_pgs[0]['parentID'],
-                fwd_template)
-            on_exc(self.vsdclient.delete_in_adv_fwd_policy_template,
-                   pc_fwd_policy['ID'])
-            self._create_nuage_port_chain_rules(on_exc, pc_fwd_policy,
-                                                flow_classifiers,
-                                                port_pair_groups,
-                                                nuage_pgs, rdts,
-                                                fc_port_pgs,
-                                                fc_port_rts,
-                                                vlan_label=vlan_label_id)
-            if symmetric_val:
-                self._create_nuage_port_chain_rules(
-                    on_exc, pc_fwd_policy,
-                    flow_classifiers,
-                    port_pair_groups,
-                    nuage_pgs, rdts,
-                    fc_port_pgs,
-                    fc_port_rts,
-                    vlan_label=vlan_label_id,
-                    direction='reverse')
-            self.vsdclient.update_in_adv_fwd_policy_template(
-                pc_fwd_policy['ID'],
-                {"active": True})
-            if adv_fwd_tmpl:
-                self.vsdclient.delete_in_adv_fwd_policy_template(
-                    adv_fwd_tmpl['ID'])
-            self.vsdclient.update_in_adv_fwd_policy_template(
-                pc_fwd_policy['ID'],
-                {"priority": original_port_chain['chain_id']})
+            adv_fwd_tmplts = (
+                self.vsdclient.get_in_adv_fwd_policy_by_externalid(
+                    nuage_pgs[0]['parentType'], nuage_pgs[0]['parentID'],
+                    portchain_id))
+            if adv_fwd_tmplts:
+                pc_fwd_policy = adv_fwd_tmplts[0]
+            else:
+                fwd_template = {"active": True,
+                                "priority": pc['chain_id'],
+                                "name": "pc_" + pc['id'],
+                                "description": "pc_" + pc['id'],
+                                "externalID": pc['id']}
+                pc_fwd_policy = (
+                    self.vsdclient.create_in_adv_fwd_policy_template(
+                        nuage_pgs[0]['parentType'],
+                        nuage_pgs[0]['parentID'],
+                        fwd_template))
+                on_exc(self.vsdclient.delete_in_adv_fwd_policy_template,
+                       pc_fwd_policy['ID'])
+            rules = self._compile_port_chain_rules(
+                portchain_id, flow_classifiers, port_pair_groups,
+                nuage_pgs, rdts, fc_port_pgs, fc_port_rts, vlan_label_id,
+                symmetric=bool(symmetric_val))
+            self._update_nuage_port_chain_rules(on_exc, pc_fwd_policy, rules)
             return pc
 
     @nuage_utils.handle_nuage_api_errorcode
@@ -470,10 +496,6 @@ class NuageSFCPlugin(sfc_plugin.SfcPlugin,
                 pc['chain_parameters']['correlation_id'],
                 port_info['fixed_ips'][0]['subnet_id'])
 
-    @staticmethod
-    def _get_next_available_vlan_id(vlan_bit_map):
-        return (vlan_bit_map & -vlan_bit_map).bit_length() - 1
-
     def _validate_ppg(self, context, ppg):
         ingress_ports = []
         egress_ports = []
@@ -590,245 +612,337 @@ class NuageSFCPlugin(sfc_plugin.SfcPlugin,
             raise nuage_exc.NuageBadRequest(msg=msg)
         return list(subnet_ids)[0]
 
-    def _create_nuage_port_chain_rules(self,
-                                       on_exc,
-                                       adv_fwd_tmplt,
-                                       flow_classifiers,
-                                       port_pair_groups,
-                                       nuage_pgs,
-                                       rdts,
-                                       fc_pgs,
-                                       fc_port_rdts,
-                                       vlan_label,
-                                       direction='forward'):
+    def _create_nuage_port_chain_rules(self, on_exc, adv_fwd_tmplt,
+                                       port_chain_id, flow_classifiers,
+                                       port_pair_groups, nuage_pgs, rdts,
+                                       fc_pgs, fc_port_rdts, vlan_label,
+                                       symmetric=False):
+        rules = self._compile_port_chain_rules(port_chain_id,
+                                               flow_classifiers,
+                                               port_pair_groups,
+                                               nuage_pgs, rdts,
+                                               fc_pgs, fc_port_rdts,
+                                               vlan_label,
+                                               symmetric=symmetric)
+        return self._program_port_chain_rules(on_exc, adv_fwd_tmplt, rules)
+
+    def _compile_port_chain_rules(self, port_chain_id, flow_classifiers,
+                                  port_pair_groups, nuage_pgs, rdts, fc_pgs,
+                                  fc_port_rdts, vlan_label, symmetric=False):
+        """Compute the advanced forwarding entries of a port chain.
+
+        No VSD calls are made: the entries are returned as a list of dicts,
+        ordered by precedence, so that they can be programmed in bulk. Per
+        direction, the entries classifying the traffic come first, then the
+        links in between the port pair groups, then the exits of the chain.
+        The exit entries of a direction all match on the vlan label of the
+        chain, so their order decides which one applies.
+        """
         ppg_pg_map = self._sfc_map_vsd_resource(nuage_pgs)
         ppg_rdts_map = self._sfc_map_vsd_resource(rdts)
-        chain_links = list(zip(port_pair_groups[:-1], port_pair_groups[1:]))
-        if not chain_links and port_pair_groups:
-            chain_links = [(port_pair_groups[0], port_pair_groups[0])]
-        if adv_fwd_tmplt['parentType'] == constants.L2DOMAIN:
-            fields = ['parentID', 'DHCPManaged']
-            l2dom_fields = self.vsdclient.get_l2domain_fields_for_pg(
-                adv_fwd_tmplt['parentID'],
-                fields)
-            np_id = l2dom_fields['parentID']
-        else:
-            np_id = self.vsdclient.get_l3domain_np_id(
-                adv_fwd_tmplt['parentID'])
         fc_pg_map = self._sfc_map_vsd_resource(fc_pgs)
         fc_rdts_map = self._sfc_map_vsd_resource(fc_port_rdts)
-        for flow_classifier in flow_classifiers:
-            src_pg = fc_pg_map[flow_classifier['logical_source_port']][0]
-            dst_pg = (
-                fc_pg_map[flow_classifier['logical_destination_port']][0])
-            src_rd = fc_rdts_map[flow_classifier['logical_source_port']][0]
-            dst_rd = (
-                fc_rdts_map[flow_classifier['logical_destination_port']][0])
-            links = []
-            if chain_links:
+        directions = [('forward', port_pair_groups)]
+        if symmetric:
+            directions.append(('reverse', port_pair_groups[::-1]))
+        rules = []
+        for direction, ppgs in directions:
+            chain_links = list(zip(ppgs[:-1], ppgs[1:]))
+            if not chain_links and ppgs:
+                chain_links = [(ppgs[0], ppgs[0])]
+            if not chain_links or not flow_classifiers:
+                continue
+            classifier_rules = []
+            exit_rules = []
+            for flow_classifier in flow_classifiers:
+                src_port = flow_classifier['logical_source_port']
+                dst_port = flow_classifier['logical_destination_port']
                 if direction == 'forward':
-                    links = ([(src_pg['ID'], chain_links[0][0])] +
-                             chain_links +
-                             [(chain_links[-1][1], dst_rd['ID'])])
+                    first_pg = fc_pg_map[src_port][0]['ID']
+                    last_rd = fc_rdts_map[dst_port][0]['ID']
                 else:
-                    links = ([(dst_pg['ID'], chain_links[0][0])] +
-                             chain_links +
-                             [(chain_links[-1][1], src_rd['ID'])])
-            neutron_id = flow_classifier['id']
-            for link in links:
-                if links.index(link) == 0:
-                    policy_group_id = link[0]
-                    ppg_rdts = ppg_rdts_map.get(link[1])
-                    if direction == 'forward':
-                        redirect_target_id = (ppg_rdts[0]['ID']
-                                              if 'ingress' in
-                                                 ppg_rdts[0]['name']
-                                              else ppg_rdts[1]['ID'])
-                    else:
-                        redirect_target_id = (ppg_rdts[0]['ID']
-                                              if 'egress' in
-                                                 ppg_rdts[0]['name']
-                                              else ppg_rdts[1]['ID'])
-                    nuage_match_info = {
-                        'description': direction + '_' + neutron_id,
-                        'action': 'REDIRECT',
-                        'DSCP': '*',
-                        'locationType': "POLICYGROUP",
-                        'locationID': policy_group_id,
-                        'redirectVPortTagID': redirect_target_id,
-                        'externalID': neutron_id
-                    }
-                    if flow_classifier['ethertype'] == 'IPv4':
-                        nuage_match_info['etherType'] = '0x0800'
-                        if (direction == 'forward' and
-                                flow_classifier.get('source_ip_prefix')):
-                            nuage_match_info['addressOverride'] = (
-                                flow_classifier.get('source_ip_prefix'))
-                        elif (direction == 'reverse' and flow_classifier.get(
-                                'destination_ip_prefix')):
-                            nuage_match_info['addressOverride'] = (
-                                flow_classifier.get(
-                                    'destination_ip_prefix'))
-                    else:
-                        nuage_match_info['etherType'] = '0x86DD'
-                        if (direction == 'forward' and
-                                flow_classifier.get('source_ip_prefix')):
-                            nuage_match_info['IPv6AddressOverride'] = (
-                                flow_classifier.get('source_ip_prefix'))
-                        elif (direction == 'reverse' and flow_classifier.get(
-                                'destination_ip_prefix')):
-                            nuage_match_info['IPv6AddressOverride'] = (
-                                flow_classifier.get('destination_ip_prefix'))
-                    if flow_classifier.get('protocol'):
-                        nuage_match_info['protocol'] = flow_classifier.get(
-                            'protocol')
-                        if flow_classifier.get('source_port_range_min'):
-                            if direction == 'forward':
-                                nuage_match_info['sourcePort'] = (
-                                    str(flow_classifier.get(
-                                        'source_port_range_min')) +
-                                    "-" + str(flow_classifier.get(
-                                        'source_port_range_max')))
-                            else:
-                                nuage_match_info['sourcePort'] = (
-                                    str(flow_classifier.get(
-                                        'destination_port_range_min')) +
-                                    "-" + str(flow_classifier.get(
-                                        'destination_port_range_max')))
-                        elif nuage_match_info['protocol'].lower() != 'icmp':
-                            nuage_match_info['sourcePort'] = '*'
-                        if flow_classifier.get('destination_port_range_min'):
-                            if direction == 'forward':
-                                nuage_match_info['destinationPort'] = (
-                                    str(flow_classifier.get(
-                                        'destination_port_range_min')) +
-                                    "-" + str(flow_classifier.get(
-                                        'destination_port_range_max')))
-                            else:
-                                nuage_match_info['destinationPort'] = (
-                                    str(flow_classifier.get(
-                                        'source_port_range_min')) +
-                                    "-" + str(flow_classifier.get(
-                                        'source_port_range_max')))
-                        elif nuage_match_info['protocol'].lower() != 'icmp':
-                            nuage_match_info['destinationPort'] = '*'
-                    else:
-                        nuage_match_info['protocol'] = 'ANY'
-                    if (flow_classifier['l7_parameters'] and
-                            flow_classifier['l7_parameters'].get(
-                                'vlan_range_min')):
-                        nuage_match_info['vlanRange'] = (
-                            flow_classifier['l7_parameters']
-                            ['vlan_range_min']['value'])
-                    else:
-                        nuage_match_info['vlanRange'] = '*'
-                    if direction == 'forward':
-                        nuage_match_info['networkType'] = (
-                            'ENTERPRISE_NETWORK' if flow_classifier.get(
-                                'destination_ip_prefix') else "ANY")
-                    else:
-                        nuage_match_info['networkType'] = (
-                            'ENTERPRISE_NETWORK' if flow_classifier.get(
-                                'source_ip_prefix') else "ANY")
-                    if nuage_match_info['networkType'] == 'ENTERPRISE_NETWORK':
-                        if direction == 'forward':
-                            nuage_match_info['destination_ip_prefix'] = (
-                                flow_classifier.get('destination_ip_prefix'))
-                        else:
-                            nuage_match_info['destination_ip_prefix'] = (
-                                flow_classifier.get('source_ip_prefix'))
-                    nuage_match_info['redirectRewriteType'] = 'VLAN'
-                    nuage_match_info['redirectRewriteValue'] = vlan_label
-                    rule = self.vsdclient.add_nuage_sfc_rule(adv_fwd_tmplt,
-                                                             nuage_match_info,
-                                                             np_id)
-                    on_exc(self.vsdclient.delete_nuage_redirect_target_rule,
-                           rule['ID'])
-                elif links.index(link) == len(links) - 1:
-                    pgs = ppg_pg_map.get(link[0])
-                    if direction == 'forward':
-                        policy_group_id = (
-                            pgs[0]['ID'] if 'egress' in pgs[0]['name']
-                            else pgs[1]['ID'])
-                    else:
-                        policy_group_id = (
-                            pgs[0]['ID'] if 'ingress' in pgs[0]['name']
-                            else pgs[1]['ID'])
-                    nuage_match_info = {
-                        'description': direction + '_' + neutron_id,
-                        'action': 'REDIRECT',
-                        'DSCP': '*',
-                        'locationType': "POLICYGROUP",
-                        'locationID': policy_group_id,
-                        'externalID': neutron_id,
-                        'protocol': 'ANY',
-                        'redirectVPortTagID': link[1]
-                    }
-                    if flow_classifier['ethertype'] == 'IPv4':
-                        nuage_match_info['etherType'] = '0x0800'
-                    else:
-                        nuage_match_info['etherType'] = '0x86DD'
-                    nuage_match_info['networkType'] = "ANY"
-                    nuage_match_info['redirectRewriteType'] = 'VLAN'
-                    nuage_match_info['vlanRange'] = vlan_label
-                    if (flow_classifier['l7_parameters'] and
-                            flow_classifier['l7_parameters'].get(
-                                'vlan_range_min') and
-                            flow_classifier['l7_parameters']
-                            ['vlan_range_min']['value'] ==
-                            flow_classifier['l7_parameters']
-                            ['vlan_range_max']['value']):
-                        new_vlan_value = (flow_classifier['l7_parameters']
-                                          ['vlan_range_min']['value'])
-                    else:
-                        new_vlan_value = 0
-                    nuage_match_info['redirectRewriteValue'] = new_vlan_value
-                    rule = self.vsdclient.add_nuage_sfc_rule(adv_fwd_tmplt,
-                                                             nuage_match_info,
-                                                             np_id)
-                    on_exc(self.vsdclient.delete_nuage_redirect_target_rule,
-                           rule['ID'])
-                elif (link[0] != link[1] and
-                      flow_classifiers.index(flow_classifier) == 0):
-                    pgs = ppg_pg_map.get(link[0])
-                    rdts = ppg_rdts_map.get(link[1])
-                    if direction == 'forward':
-                        policy_group_id = (pgs[0]['ID'] if 'egress' in
-                                                           pgs[0]['name']
-                                           else pgs[1]['ID'])
-                        redirect_target_id = (rdts[0]['ID'] if 'ingress' in
-                                                               rdts[0]['name']
-                                              else rdts[1]['ID'])
-                    else:
-                        policy_group_id = (pgs[0]['ID'] if 'ingress' in
-                                                           pgs[0]['name']
-                                           else pgs[1]['ID'])
-                        redirect_target_id = (rdts[0]['ID'] if 'egress' in
-                                                               rdts[0]['name']
-                                              else rdts[1]['ID'])
-                    nuage_match_info = {
-                        'description': direction + '_' + neutron_id,
-                        'action': 'REDIRECT',
-                        'DSCP': '*',
-                        'locationType': "POLICYGROUP",
-                        'locationID': policy_group_id,
-                        'redirectVPortTagID': redirect_target_id,
-                        'externalID': neutron_id,
-                        'networkType': 'ANY',
-                        'protocol': 'ANY',
-                    }
-                    if flow_classifier['ethertype'] == 'IPv4':
-                        nuage_match_info['etherType'] = '0x0800'
-                    else:
-                        nuage_match_info['etherType'] = '0x86DD'
-                    nuage_match_info['redirectRewriteType'] = 'VLAN'
-                    nuage_match_info['redirectRewriteValue'] = vlan_label
-                    nuage_match_info['vlanRange'] = vlan_label
-                    rule = self.vsdclient.add_nuage_sfc_rule(adv_fwd_tmplt,
-                                                             nuage_match_info,
-                                                             np_id)
-                    on_exc(self.vsdclient.delete_nuage_redirect_target_rule,
-                           rule['ID'])
+                    first_pg = fc_pg_map[dst_port][0]['ID']
+                    last_rd = fc_rdts_map[src_port][0]['ID']
+                classifier_rules.append(self._sfc_classifier_rule(
+                    flow_classifier, direction, first_pg,
+                    ppg_rdts_map[chain_links[0][0]], vlan_label))
+                exit_rules.append(self._sfc_chain_exit_rule(
+                    flow_classifier, direction,
+                    ppg_pg_map[chain_links[-1][1]], last_rd, vlan_label))
+            # the links in between service functions only match on the
+            # vlan label, so they are shared by all the flow classifiers
+            # of the chain, per ether type
+            ether_types = sorted(set(
+                self._sfc_ethertype(flow_classifier)
+                for flow_classifier in flow_classifiers))
+            link_rules = [
+                self._sfc_chain_link_rule(
+                    port_chain_id, ether_type, direction,
+                    ppg_pg_map[link[0]], ppg_rdts_map[link[1]], vlan_label)
+                for ether_type in ether_types
+                for link in chain_links if link[0] != link[1]]
+            rules.extend(classifier_rules + link_rules + exit_rules)
+        return rules
+
+    @staticmethod
+    def _sfc_select_id(nuage_resources, name):
+        # ppg resources are named ingress_<ppg>, egress_<ppg> or
+        # ingress_egress_<ppg>
+        return (nuage_resources[0]['ID'] if name in nuage_resources[0]['name']
+                else nuage_resources[1]['ID'])
+
+    @staticmethod
+    def _sfc_ethertype(flow_classifier):
+        return '0x0800' if flow_classifier['ethertype'] == 'IPv4' else '0x86DD'
+
+    def _sfc_classifier_rule(self, flow_classifier, direction,
+                             policy_group_id, ppg_rdts, vlan_label):
+        """Entry steering the classified traffic into the chain"""
+        neutron_id = flow_classifier['id']
+        if direction == 'forward':
+            redirect_target_id = self._sfc_select_id(ppg_rdts, 'ingress')
+            src_prefix = flow_classifier.get('source_ip_prefix')
+            dst_prefix = flow_classifier.get('destination_ip_prefix')
+            src_port_min = flow_classifier.get('source_port_range_min')
+            src_port_max = flow_classifier.get('source_port_range_max')
+            dst_port_min = flow_classifier.get('destination_port_range_min')
+            dst_port_max = flow_classifier.get('destination_port_range_max')
+        else:
+            redirect_target_id = self._sfc_select_id(ppg_rdts, 'egress')
+            src_prefix = flow_classifier.get('destination_ip_prefix')
+            dst_prefix = flow_classifier.get('source_ip_prefix')
+            src_port_min = flow_classifier.get('destination_port_range_min')
+            src_port_max = flow_classifier.get('destination_port_range_max')
+            dst_port_min = flow_classifier.get('source_port_range_min')
+            dst_port_max = flow_classifier.get('source_port_range_max')
+        nuage_match_info = {
+            'description': direction + '_' + neutron_id,
+            'action': 'REDIRECT',
+            'DSCP': '*',
+            'locationType': "POLICYGROUP",
+            'locationID': policy_group_id,
+            'redirectVPortTagID': redirect_target_id,
+            'externalID': neutron_id,
+            'etherType': self._sfc_ethertype(flow_classifier)
+        }
+        if src_prefix:
+            if flow_classifier['ethertype'] == 'IPv4':
+                nuage_match_info['addressOverride'] = src_prefix
+            else:
+                nuage_match_info['IPv6AddressOverride'] = src_prefix
+        protocol = flow_classifier.get('protocol')
+        if protocol:
+            nuage_match_info['protocol'] = protocol
+            if flow_classifier.get('source_port_range_min'):
+                nuage_match_info['sourcePort'] = (
+                    str(src_port_min) + "-" + str(src_port_max))
+            elif protocol.lower() != 'icmp':
+                nuage_match_info['sourcePort'] = '*'
+            if flow_classifier.get('destination_port_range_min'):
+                nuage_match_info['destinationPort'] = (
+                    str(dst_port_min) + "-" + str(dst_port_max))
+            elif protocol.lower() != 'icmp':
+                nuage_match_info['destinationPort'] = '*'
+        else:
+            nuage_match_info['protocol'] = 'ANY'
+        l7_parameters = flow_classifier['l7_parameters']
+        if l7_parameters and l7_parameters.get('vlan_range_min'):
+            nuage_match_info['vlanRange'] = (
+                l7_parameters['vlan_range_min']['value'])
+        else:
+            nuage_match_info['vlanRange'] = '*'
+        if dst_prefix:
+            nuage_match_info['networkType'] = 'ENTERPRISE_NETWORK'
+            nuage_match_info['destination_ip_prefix'] = dst_prefix
+        else:
+            nuage_match_info['networkType'] = 'ANY'
+        nuage_match_info['redirectRewriteType'] = 'VLAN'
+        nuage_match_info['redirectRewriteValue'] = vlan_label
+        return nuage_match_info
+
+    def _sfc_chain_link_rule(self, port_chain_id, ether_type, direction,
+                             ppg_pgs, ppg_rdts, vlan_label):
+        """Entry steering the chain traffic from one ppg to the next"""
+        if direction == 'forward':
+            policy_group_id = self._sfc_select_id(ppg_pgs, 'egress')
+            redirect_target_id = self._sfc_select_id(ppg_rdts, 'ingress')
+        else:
+            policy_group_id = self._sfc_select_id(ppg_pgs, 'ingress')
+            redirect_target_id = self._sfc_select_id(ppg_rdts, 'egress')
+        return {
+            'description': direction + '_' + port_chain_id,
+            'action': 'REDIRECT',
+            'DSCP': '*',
+            'locationType': "POLICYGROUP",
+            'locationID': policy_group_id,
+            'redirectVPortTagID': redirect_target_id,
+            'externalID': port_chain_id,
+            'networkType': 'ANY',
+            'protocol': 'ANY',
+            'etherType': ether_type,
+            'redirectRewriteType': 'VLAN',
+            'redirectRewriteValue': vlan_label,
+            'vlanRange': vlan_label
+        }
+
+    def _sfc_chain_exit_rule(self, flow_classifier, direction, ppg_pgs,
+                             redirect_target_id, vlan_label):
+        """Entry steering the chain traffic out of the last ppg"""
+        if direction == 'forward':
+            policy_group_id = self._sfc_select_id(ppg_pgs, 'egress')
+        else:
+            policy_group_id = self._sfc_select_id(ppg_pgs, 'ingress')
+        l7_parameters = flow_classifier['l7_parameters']
+        if (l7_parameters and l7_parameters.get('vlan_range_min') and
+                l7_parameters['vlan_range_min']['value'] ==
+                l7_parameters['vlan_range_max']['value']):
+            new_vlan_value = l7_parameters['vlan_range_min']['value']
+        else:
+            new_vlan_value = 0
+        return {
+            'description': direction + '_' + flow_classifier['id'],
+            'action': 'REDIRECT',
+            'DSCP': '*',
+            'locationType': "POLICYGROUP",
+            'locationID': policy_group_id,
+            'externalID': flow_classifier['id'],
+            'protocol': 'ANY',
+            'redirectVPortTagID': redirect_target_id,
+            'etherType': self._sfc_ethertype(flow_classifier),
+            'networkType': "ANY",
+            'redirectRewriteType': 'VLAN',
+            'vlanRange': vlan_label,
+            'redirectRewriteValue': new_vlan_value
+        }
+
+    def _update_nuage_port_chain_rules(self, on_exc, adv_fwd_tmplt, rules):
+        """Reconcile the entries of a template with compiled rules.
+
+        Entries matching a compiled rule are left alone, as long as their
+        priorities follow the compiled order. The missing entries are
+        created with priorities in between the ones of the entries kept,
+        before the stale entries get deleted, so the chain keeps forwarding
+        during the update. When there is no room left in between, all
+        entries are created again, after the existing ones. Deleted entries
+        are restored on rollback.
+        """
+        existing_rules = self.vsdclient.get_nuage_sfc_rules(
+            adv_fwd_tmplt['ID'])
+        macro_cidrs = {}
+        existing_by_key = collections.defaultdict(list)
+        for vsd_rule in existing_rules:
+            if vsd_rule.get('priority') is not None:
+                existing_by_key[self._sfc_vsd_rule_key(
+                    vsd_rule, macro_cidrs)].append(vsd_rule)
+        matches = []
+        for rule in rules:
+            vsd_rules = existing_by_key.get(self._sfc_rule_key(rule))
+            matches.append(vsd_rules.pop(0) if vsd_rules else None)
+        matched = [index for index, vsd_rule in enumerate(matches)
+                   if vsd_rule is not None]
+        in_order = set(matched[index] for index in _sfc_increasing_subsequence(
+            [int(matches[index]['priority']) for index in matched]))
+        priorities = _sfc_fill_priorities(
+            [int(vsd_rule['priority']) if index in in_order else None
+             for index, vsd_rule in enumerate(matches)])
+        if priorities is None:
+            first_priority = max(
+                [int(vsd_rule['priority']) for vsd_rule in existing_rules
+                 if vsd_rule.get('priority') is not None] or [0])
+            priorities = [first_priority + SFC_RULE_PRIORITY_STEP * index
+                          for index in range(1, len(rules) + 1)]
+            in_order = set()
+        new_rules = []
+        new_priorities = []
+        for index, rule in enumerate(rules):
+            if index not in in_order:
+                new_rules.append(rule)
+                new_priorities.append(priorities[index])
+        kept = set(id(matches[index]) for index in in_order)
+        stale_rules = [vsd_rule for vsd_rule in existing_rules
+                       if id(vsd_rule) not in kept]
+        LOG.debug('Updating port chain template %(tmplt)s: %(new)s entries '
+                  'to create, %(stale)s to delete, %(kept)s unchanged',
+                  {'tmplt': adv_fwd_tmplt['ID'], 'new': len(new_rules),
+                   'stale': len(stale_rules), 'kept': len(kept)})
+
+        self._program_port_chain_rules(on_exc, adv_fwd_tmplt, new_rules,
+                                       priorities=new_priorities)
+        results = nuage_utils.bulk_call(
+            lambda vsd_rule: self.vsdclient.delete_nuage_redirect_target_rule(
+                vsd_rule['ID']),
+            stale_rules)
+        for vsd_rule, _, exception in results:
+            if exception is None:
+                on_exc(self.vsdclient.restore_nuage_sfc_rule,
+                       adv_fwd_tmplt['ID'], vsd_rule)
+        nuage_utils.raise_first_bulk_error(results)
+
+    @staticmethod
+    def _sfc_rule_key(rule):
+        key = [_sfc_canonical_value(attribute, rule.get(attribute))
+               for attribute in SFC_RULE_KEY_ATTRIBUTES]
+        if rule.get('destination_ip_prefix'):
+            key.append(ip_utils.parse_cidr(rule['destination_ip_prefix']))
+        else:
+            key.append(None)
+        return tuple(key)
+
+    def _sfc_vsd_rule_key(self, vsd_rule, macro_cidrs):
+        key = [_sfc_canonical_value(attribute, vsd_rule.get(attribute))
+               for attribute in SFC_RULE_KEY_ATTRIBUTES]
+        network_id = vsd_rule.get('networkID')
+        if (vsd_rule.get('networkType') == 'ENTERPRISE_NETWORK' and
+                network_id):
+            if network_id not in macro_cidrs:
+                macro = self.vsdclient.get_nuage_prefix_macro(network_id)
+                macro_cidrs[network_id] = ip_utils.parse_cidr(
+                    macro.get('IPv6Address') or
+                    macro['address'] + '/' + macro['netmask'])
+            key.append(macro_cidrs[network_id])
+        else:
+            key.append(None)
+        return tuple(key)
+
+    def _get_adv_fwd_tmplt_np_id(self, adv_fwd_tmplt):
+        if adv_fwd_tmplt['parentType'] == constants.L2DOMAIN:
+            l2dom_fields = self.vsdclient.get_l2domain_fields_for_pg(
+                adv_fwd_tmplt['parentID'], ['parentID', 'DHCPManaged'])
+            return l2dom_fields['parentID']
+        else:
+            return self.vsdclient.get_l3domain_np_id(
+                adv_fwd_tmplt['parentID'])
+
+    def _program_port_chain_rules(self, on_exc, adv_fwd_tmplt, rules,
+                                  priorities=None):
+        """Create compiled entries in an advanced forwarding template.
+
+        Unless priorities are given, the entries get priorities
+        SFC_RULE_PRIORITY_STEP apart in the order they were compiled, which
+        keeps their precedence deterministic while they are created
+        concurrently. Each created entry is registered with on_exc, so a
+        failure rolls back the whole batch.
+
+        :return: the created VSD entries, in order of the rules
+        """
+        if not rules:
+            return []
+        if priorities is None:
+            priorities = [SFC_RULE_PRIORITY_STEP * index
+                          for index in range(1, len(rules) + 1)]
+        np_id = self._get_adv_fwd_tmplt_np_id(adv_fwd_tmplt)
+        rules = [dict(rule, priority=priority)
+                 for rule, priority in zip(rules, priorities)]
+        results = nuage_utils.bulk_call(
+            lambda rule: self.vsdclient.add_nuage_sfc_rule(
+                adv_fwd_tmplt, dict(rule), np_id),
+            rules)
+        for _, vsd_rule, exception in results:
+            if exception is None:
+                on_exc(self.vsdclient.delete_nuage_redirect_target_rule,
+                       vsd_rule['ID'])
+        nuage_utils.raise_first_bulk_error(results)
+        return [vsd_rule for _, vsd_rule, _ in results]
 
     @staticmethod
     def _sfc_map_vsd_resource(nuage_resources):
@@ -0,0 +1,103 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import struct
+
+from neutron._i18n import _
+
+MAX_VLAN_LABEL = 4094
+
+_WORD_BITS = 64
+_NR_WORDS = 64
+_WORD_MASK = (1 << _WORD_BITS) - 1
+_BLOB_FORMAT = '!%dQ' % _NR_WORDS
+_BLOB_SIZE = struct.calcsize(_BLOB_FORMAT)
+
+
+class VlanLabelBitmap(object):
+    """Bitmap of the free sfc vlan labels of a subnet.
+
+    Label n is free when bit n - 1 is set. The bits are kept in 64 bit
+    words: finding a free label skips the exhausted words, remembering the
+    first word that can have a free label, instead of parsing one big
+    integer of 4094 bits.
+
+    The bytes representation is the one of the vlan_bit_map column of
+    nuage_sfc_vlan_subnet_mapping: the big endian bytes of that integer.
+    """
+
+    __slots__ = ('_words', '_first')
+
+    def __init__(self, words=None):
+        if words is None:
+            last_bits = MAX_VLAN_LABEL - (_NR_WORDS - 1) * _WORD_BITS
+            words = [_WORD_MASK] * (_NR_WORDS - 1) + [(1 << last_bits) - 1]
+        self._words = words
+        self._first = 0
+
+    @classmethod
+    def from_bytes(cls, blob):
+        blob = bytes(blob)
+        if len(blob) > _BLOB_SIZE:
+            raise ValueError(_('vlan bit map of %(size)d bytes exceeds '
+                               '%(max_size)d bytes') %
+                             {'size': len(blob), 'max_size': _BLOB_SIZE})
+        words = struct.unpack(_BLOB_FORMAT, blob.rjust(_BLOB_SIZE, b'\0'))
+        return cls(list(reversed(words)))
+
+    def to_bytes(self):
+        return struct.pack(_BLOB_FORMAT,
+                           *reversed(self._words)).lstrip(b'\0')
+
+    def free_count(self):
+        return sum(bin(word).count('1') for word in self._words)
+
+    def is_free(self, label):
+        bit = self._bit(label)
+        return bool(self._words[bit // _WORD_BITS] >> bit % _WORD_BITS & 1)
+
+    def allocate(self, count=1):
+        """Allocate the count lowest free labels.
+
+        :return: the allocated labels, or an empty list when less than count
+            labels are free, in which case nothing is allocated
+        """
+        if count > self.free_count():
+            return []
+        labels = []
+        words = self._words
+        index = self._first
+        while len(labels) < count:
+            word = words[index]
+            if not word:
+                index += 1
+                continue
+            bit = (word & -word).bit_length() - 1
+            words[index] = word & ~(1 << bit)
+            labels.append(index * _WORD_BITS + bit + 1)
+        self._first = index
+        return labels
+
+    def free(self, labels):
+        for label in labels:
+            bit = self._bit(label)
+            index = bit // _WORD_BITS
+            self._words[index] |= 1 << bit % _WORD_BITS
+            self._first = min(self._first, index)
+
+    @staticmethod
+    def _bit(label):
+        if not 1 <= label <= MAX_VLAN_LABEL:
+            raise ValueError(_('Invalid vlan label %s') % label)
+        return label - 1
@@ -0,0 +1,83 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_cache.py
+
+import mock
+import testtools
+
+from nuage_neutron.plugins.common import cache
+
+
+class TestExpiringCache(testtools.TestCase):
+
+    @mock.patch.object(cache.time, 'time')
+    def test_expiry(self, now):
+        now.return_value = 100
+        expiring = cache.ExpiringCache(10)
+        expiring.set('key', 'value')
+        now.return_value = 110
+        self.assertEqual('value', expiring.get('key'))
+        now.return_value = 111
+        self.assertIsNone(expiring.get('key'))
+
+    @mock.patch.object(cache.time, 'time')
+    def test_no_expiry(self, now):
+        now.return_value = 100
+        forever = cache.ExpiringCache(None)
+        forever.set('key', 'value')
+        now.return_value = 10 ** 9
+        self.assertEqual('value', forever.get('key'))
+
+    @mock.patch.object(cache.time, 'time')
+    def test_full_drops_expired_first(self, now):
+        now.return_value = 100
+        expiring = cache.ExpiringCache(10, max_size=2)
+        expiring.set('old', 1)
+        now.return_value = 105
+        expiring.set('new', 2)
+        now.return_value = 111
+        expiring.set('newer', 3)
+        self.assertEqual(2, len(expiring))
+        self.assertEqual(2, expiring.get('new'))
+        expiring.set('newest', 4)
+        self.assertEqual(1, len(expiring))
+
+
+class TestMemoize(testtools.TestCase):
+
+    def setUp(self):
+        super(TestMemoize, self).setUp()
+        self.calls = []
+
+    def _length(self, arg):
+        self.calls.append(arg)
+        return len(arg)
+
+    def test_memoize(self):
+        memoized = cache.memoize(max_size=2)(self._length)
+        self.assertEqual(2, memoized('ab'))
+        self.assertEqual(2, memoized('ab'))
+        self.assertEqual(['ab'], self.calls)
+        memoized('abc')
+        memoized('abcd')
+        self.assertEqual(1, len(memoized.cache))
+
+    def test_unhashable_not_cached(self):
+        memoized = cache.memoize()(self._length)
+        self.assertEqual(2, memoized(['a', 'b']))
+        self.assertEqual(2, memoized(['a', 'b']))
+        self.assertEqual(2, len(self.calls))
+        self.assertEqual(0, len(memoized.cache))
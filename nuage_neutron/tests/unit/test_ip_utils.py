@@ -0,0 +1,144 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_ip_utils.py
+
+import random
+
+import netaddr
+import testtools
+
+from nuage_neutron.plugins.common import ip_utils
+
+
+class TestIpUtils(testtools.TestCase):
+
+    def test_parse_ip(self):
+        self.assertEqual((4, int(netaddr.IPAddress('10.0.0.1'))),
+                         ip_utils.parse_ip('10.0.0.1'))
+        self.assertEqual(ip_utils.parse_ip('cafe:babe::1'),
+                         ip_utils.parse_ip('cafe:babe:0::1'))
+        self.assertRaises(netaddr.AddrFormatError,
+                          ip_utils.parse_ip, 'not-an-ip')
+
+    def test_parse_cidr_matches_netaddr(self):
+        for cidr in ['10.0.0.5/24', '10.0.0.5', '10.0.0.0/255.255.255.0',
+                     'cafe:babe::1/64', 'cafe:babe::1', '0.0.0.0/0']:
+            network = netaddr.IPNetwork(cidr)
+            self.assertEqual(
+                (network.version, network.first, network.last),
+                tuple(ip_utils.parse_cidr(cidr)), cidr)
+        self.assertEqual('10.0.0.0/24',
+                         ip_utils.format_cidr(
+                             ip_utils.parse_cidr('10.0.0.5/24')))
+
+    def test_range_contains(self):
+        subnet = ip_utils.parse_cidr('10.0.0.0/24')
+        self.assertTrue(subnet.contains(ip_utils.parse_cidr('10.0.0.7/32')))
+        self.assertTrue(subnet.contains(ip_utils.parse_ip('10.0.0.255')))
+        self.assertFalse(subnet.contains(ip_utils.parse_cidr('10.0.0.0/23')))
+        self.assertFalse(subnet.contains(ip_utils.parse_cidr('::a00:7/128')))
+
+    def test_find_overlap(self):
+        pools = [ip_utils.parse_range('10.0.0.50', '10.0.0.60'),
+                 ip_utils.parse_range('10.0.0.2', '10.0.0.10'),
+                 ip_utils.parse_range('10.0.0.11', '10.0.0.20')]
+        self.assertIsNone(ip_utils.find_overlap(pools))
+
+        pools.append(ip_utils.parse_range('10.0.0.15', '10.0.0.55'))
+        overlap = ip_utils.find_overlap(pools)
+        self.assertEqual('10.0.0.11-10.0.0.20', str(overlap[0]))
+        self.assertEqual('10.0.0.15-10.0.0.55', str(overlap[1]))
+
+    def test_ip_range_set(self):
+        ip_set = ip_utils.IPRangeSet([
+            ip_utils.parse_range('10.0.0.2', '10.0.0.10'),
+            ip_utils.parse_range('10.0.0.11', '10.0.0.20'),
+            ip_utils.parse_range('10.0.0.40', '10.0.0.50'),
+            ip_utils.parse_range('cafe::1', 'cafe::ff')])
+        self.assertEqual(3, len(ip_set))  # adjacent ranges got merged
+        self.assertIn(ip_utils.parse_ip('10.0.0.15'), ip_set)
+        self.assertNotIn(ip_utils.parse_ip('10.0.0.30'), ip_set)
+        self.assertIn(ip_utils.parse_ip('cafe::f'), ip_set)
+        self.assertTrue(ip_set.overlaps(
+            ip_utils.parse_range('10.0.0.25', '10.0.0.40')))
+        self.assertFalse(ip_set.overlaps(
+            ip_utils.parse_range('10.0.0.21', '10.0.0.39')))
+        self.assertEqual('10.0.0.2-10.0.0.20', str(ip_set.get_overlapping(
+            ip_utils.parse_range('10.0.0.20', '10.0.0.30'))))
+
+
+class TestIpUtilsMatchNetaddr(testtools.TestCase):
+    """The validations done with ip_utils give the netaddr results."""
+
+    PORT_IPS = ('10.0.0.2', '10.0.0.3', 'cafe:babe::2')
+    SUBNETS = ('10.0.0.0/255.255.0.0', '10.0.0.0/24', 'cafe:babe::/64')
+    VIPS = ('10.0.0.2', '10.0.0.4', '10.0.0.2/32', '10.0.0.0/30',
+            '10.0.1.7', '10.1.0.1', '10.0.0.0/16', '10.0.0.0/8',
+            'cafe:babe::2', 'cafe:babe::2/128', 'cafe:babe::/120',
+            'cafe:babe:1::1', '::a00:2')
+
+    def test_vip_checks(self):
+        port_ips = [netaddr.IPNetwork(ip) for ip in self.PORT_IPS]
+        port_ip_set = ip_utils.ip_set(self.PORT_IPS)
+        for vip in self.VIPS:
+            network = netaddr.IPNetwork(vip)
+            parsed = ip_utils.parse_cidr(vip)
+            self.assertEqual(network.size != 1, parsed.size != 1, vip)
+            if network.size == 1:
+                self.assertEqual(
+                    network in port_ips,
+                    (parsed.version, parsed.first) in port_ip_set, vip)
+            for subnet in self.SUBNETS:
+                self.assertEqual(
+                    network in netaddr.IPNetwork(subnet),
+                    ip_utils.parse_cidr(subnet).contains(parsed),
+                    '%s in %s' % (vip, subnet))
+
+    @staticmethod
+    def _netaddr_overlap(pools):
+        ip_sets = [netaddr.IPSet(netaddr.IPRange(start, end).cidrs())
+                   for start, end in pools]
+        return any(ip_sets[left] & ip_sets[right]
+                   for left in range(len(ip_sets))
+                   for right in range(left + 1, len(ip_sets)))
+
+    def _overlap(self, pools):
+        return ip_utils.find_overlap(ip_utils.parse_range(start, end)
+                                     for start, end in pools)
+
+    def test_pool_overlap(self):
+        for pools in (
+                [('10.0.0.2', '10.0.0.10'), ('10.0.0.11', '10.0.0.20')],
+                [('10.0.0.2', '10.0.0.10'), ('10.0.0.10', '10.0.0.20')],
+                [('10.0.0.2', '10.0.0.100'), ('10.0.0.50', '10.0.0.60')],
+                [('10.0.0.2', '10.0.0.2'), ('10.0.0.2', '10.0.0.2')],
+                [('cafe:babe::1:1', 'cafe:babe::1:ffff'),
+                 ('cafe:babe::2:1', 'cafe:babe::2:ffff')],
+                [('cafe:babe::1:1', 'cafe:babe::2:1'),
+                 ('cafe:babe::2:1', 'cafe:babe::2:ffff')]):
+            self.assertEqual(self._netaddr_overlap(pools),
+                             self._overlap(pools) is not None, pools)
+
+    def test_random_pool_overlap(self):
+        rand = random.Random(27)
+        for attempt in range(50):
+            pools = []
+            for index in range(rand.randint(2, 8)):
+                start = rand.randint(1, 200)
+                end = start + rand.randint(0, 30)
+                pools.append(('10.0.0.%d' % start, '10.0.0.%d' % end))
+            self.assertEqual(self._netaddr_overlap(pools),
+                             self._overlap(pools) is not None, pools)
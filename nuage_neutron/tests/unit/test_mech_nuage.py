@@ -15,6 +15,9 @@
 # run me using :
 # python -m testtools.run nuage_neutron/tests/unit/test_mech_nuage.py
 
+import time
+
+import eventlet
 import mock
 import oslo_config
 import testtools
@@ -476,6 +479,64 @@ class TestNuageMechanismDriver(testtools.TestCase):
             self.assertEqual(True, 'Unauthorized' in str(e),
                              "Got an exception other than Unauthorized")
 
+    def test_rest_call_renews_auth_key_once(self):
+        rest_proxy = self.get_me_a_rest_proxy()
+        calls = []
+
+        def rest_call(action, resource, data, extra_headers=None,
+                      ignore_marked_for_deletion=False, auth_renewal=False):
+            calls.append(resource)
+            token = rest_proxy.auth_token.token
+            version = token.version if token else None
+            if resource == '/me':
+                return (200, 'OK', '', [{'APIKey': 'key%s' % len(calls),
+                                         'APIKeyExpiry': 3600000}],
+                        {'date': 'Thu, 01 Jan 1970 00:00:00 GMT'}, version)
+            if resource == '/systemconfigs':
+                return (200, 'OK', '', [{'APIKeyRenewalInterval': 600}],
+                        {}, version)
+            if version == 1:
+                return 401, 'Unauthorized', '', None, {}, version
+            return 200, 'OK', '', [{'ID': resource}], {}, version
+
+        with mock.patch.object(rest_proxy, '_rest_call',
+                               side_effect=rest_call):
+            token = rest_proxy.generate_nuage_auth()
+            self.assertEqual(1, token.version)
+            self.assertEqual(['/me', '/systemconfigs'], calls)
+
+            self.assertEqual([{'ID': '/enterprises'}],
+                             rest_proxy.get('/enterprises'))
+            self.assertEqual(2, rest_proxy.auth_token.token.version)
+            # a request which failed on the renewed key does not renew it
+            self.assertEqual(rest_proxy.auth_token.token,
+                             rest_proxy.generate_nuage_auth(stale_version=1))
+
+        self.assertEqual(['/me', '/systemconfigs', '/enterprises', '/me',
+                          '/enterprises'], calls)
+        stats = rest_proxy.auth_token.get_stats()
+        self.assertEqual(2, stats['renewals'])
+        self.assertEqual(0, stats['renewal_failures'])
+        # the key is renewed in the first half of the renewal window
+        renew_in = token.renew_at - time.time()
+        self.assertTrue(3000 - 5 < renew_in < 3300, renew_in)
+
+    def test_warm_up_opens_connections(self):
+        rest_proxy = self.get_me_a_rest_proxy()
+        response = mock.Mock(status_code=200, reason='OK', headers={},
+                             text='[{"APIKey": "key"}]')
+
+        def request(method, url, **kwargs):
+            eventlet.sleep(0.01)  # the requests are in flight concurrently
+            return response
+
+        with mock.patch('requests.Session.request', side_effect=request):
+            self.assertEqual(5, rest_proxy.warm_up(5))
+            self.assertIsNotNone(rest_proxy.auth_token.token)
+            # the requests which follow reuse the sessions
+            rest_proxy.get('/enterprises')
+            self.assertEqual(5, rest_proxy.warm_up())
+
     @mock.patch.object(RootNuagePlugin, 'init_vsd_client')
     @mock.patch.object(NuageMechanismDriver, 'get_subnets',
                        return_value=[{'id': 'subnet1', 'ip_version': 4},
@@ -575,6 +636,61 @@ class TestNuageMechanismDriver(testtools.TestCase):
                          NuageMechanismDriver.sort_ips(
                              ['cafe:babe:12::1', 'cafe:babe:1::1']))
 
+    # allocation pool checks
+
+    def get_me_a_pool_validator(self, vsd_ranges):
+        self.set_config_fixture()
+        nmd = NuageMechanismDriver()
+        nmd.vsdclient = mock.Mock()
+        nmd.vsdclient.get_address_ranges.return_value = [
+            {'minAddress': start, 'maxAddress': end}
+            for start, end in vsd_ranges]
+        return nmd
+
+    @staticmethod
+    def get_me_a_subnet(*pools):
+        return {'id': 'subnet', 'allocation_pools': [
+            {'start': start, 'end': end} for start, end in pools]}
+
+    def test_allocation_pools_overlap_vsd_address_range(self):
+        nmd = self.get_me_a_pool_validator([('10.0.0.100', '10.0.0.150')])
+        subnet = self.get_me_a_subnet(('10.0.0.2', '10.0.0.50'),
+                                      ('10.0.0.140', '10.0.0.200'))
+        self.assertRaisesRegex(
+            NuageBadRequest,
+            'Allocation pool 10.0.0.140-10.0.0.200 overlaps with address '
+            'range 10.0.0.100-10.0.0.150 of nuage subnet nuage-subnet',
+            nmd._validate_allocation_pools, None, subnet, None,
+            'nuage-subnet', 'l2domain')
+        nmd.vsdclient.get_address_ranges.assert_called_once_with(
+            'nuage-subnet', 'l2domain')
+
+    def test_allocation_pools_disjunct_from_vsd_address_range(self):
+        nmd = self.get_me_a_pool_validator([('10.0.0.100', '10.0.0.150'),
+                                            ('cafe::1', 'cafe::ff')])
+        subnet = self.get_me_a_subnet(('10.0.0.2', '10.0.0.99'),
+                                      ('10.0.0.151', '10.0.0.200'))
+        nmd._validate_allocation_pools(None, subnet, None,
+                                       'nuage-subnet', 'l2domain')
+
+    def test_allocation_pools_vsd_address_ranges_not_cached(self):
+        nmd = self.get_me_a_pool_validator([])
+        subnet = self.get_me_a_subnet(('10.0.0.2', '10.0.0.99'))
+        nmd._validate_allocation_pools(None, subnet, None,
+                                       'nuage-subnet', 'l2domain')
+        # an address range got added on VSD in the meantime
+        nmd.vsdclient.get_address_ranges.return_value = [
+            {'minAddress': '10.0.0.50', 'maxAddress': '10.0.0.60'}]
+        self.assertRaises(
+            NuageBadRequest, nmd._validate_allocation_pools, None, subnet,
+            None, 'nuage-subnet', 'l2domain')
+
+    def test_allocation_pools_without_pools_skip_vsd(self):
+        nmd = self.get_me_a_pool_validator([('10.0.0.100', '10.0.0.150')])
+        nmd._validate_allocation_pools(None, self.get_me_a_subnet(), None,
+                                       'nuage-subnet', 'l2domain')
+        nmd.vsdclient.get_address_ranges.assert_not_called()
+
 
 class Context(object):
     def __init__(self, network, subnet):
@@ -0,0 +1,221 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_net_topology_db.py
+
+import mock
+from neutron_lib import exceptions as n_exc
+import sqlalchemy as sa
+from sqlalchemy import orm
+import testtools
+
+from nuage_neutron.plugins.common import net_topology_db
+from nuage_neutron.plugins.common import nuage_models
+
+
+class SwitchportDbTestCase(testtools.TestCase):
+    """Runs against the switchport tables in an in memory sqlite db."""
+
+    def setUp(self):
+        super(SwitchportDbTestCase, self).setUp()
+        engine = sa.create_engine('sqlite://')
+        nuage_models.NuageSwitchportMapping.metadata.create_all(
+            engine,
+            tables=[nuage_models.NuageSwitchportMapping.__table__,
+                    nuage_models.NuageSwitchportBinding.__table__])
+        self.session = orm.Session(bind=engine)
+        self.addCleanup(self.session.close)
+        self.context = mock.Mock(session=self.session, is_admin=True)
+
+    def _add_mapping(self, mapping_id, host_id='host1', pci_slot='0000:01',
+                     switch_id='switch1', port_id='port1', port_uuid=None):
+        self.session.add(nuage_models.NuageSwitchportMapping(
+            id=mapping_id, switch_info='gw1', switch_id=switch_id,
+            redundant=False, port_id=port_id,
+            port_uuid=port_uuid or 'uuid-' + port_id, pci_slot=pci_slot,
+            host_id=host_id))
+        self.session.flush()
+
+
+class TestGetSwitchportBindings(SwitchportDbTestCase):
+
+    def setUp(self):
+        super(TestGetSwitchportBindings, self).setUp()
+        self.plugin = net_topology_db.NuageGwPortMappingDbMixin()
+        # two mappings of switch1 port1, one of switch2 port2
+        self._add_mapping('map1', pci_slot='0000:01')
+        self._add_mapping('map2', host_id='host2', pci_slot='0000:01')
+        self._add_mapping('map3', pci_slot='0000:02', switch_id='switch2',
+                          port_id='port2')
+        for binding_id, port_id, segmentation_id in (
+                ('binding1', 'port1', 10),
+                ('binding2', 'port1', 20),
+                ('binding3', 'port2', 10)):
+            self.session.add(nuage_models.NuageSwitchportBinding(
+                id=binding_id, neutron_port_id='neutron-' + binding_id,
+                nuage_vport_id='vport-' + binding_id,
+                switchport_uuid='uuid-' + port_id,
+                segmentation_id=segmentation_id,
+                switchport_mapping_id='map1' if port_id == 'port1'
+                else 'map3'))
+        self.session.flush()
+
+    def _ids(self, **kwargs):
+        return [binding['id'] for binding in
+                self.plugin.get_switchport_bindings(self.context, **kwargs)]
+
+    def test_switchport_joined_once(self):
+        bindings = self.plugin.get_switchport_bindings(
+            self.context, sorts=[('id', True)])
+        self.assertEqual(
+            [('binding1', 'switch1', 'port1', 'uuid-port1', 10),
+             ('binding2', 'switch1', 'port1', 'uuid-port1', 20),
+             ('binding3', 'switch2', 'port2', 'uuid-port2', 10)],
+            [(binding['id'], binding['switch_id'], binding['port_id'],
+              binding['port_uuid'], binding['segmentation_id'])
+             for binding in bindings])
+
+    def test_binding_filters(self):
+        self.assertEqual(['binding1', 'binding3'], sorted(self._ids(
+            filters={'segmentation_id': [10]})))
+        self.assertEqual(['binding3'], self._ids(
+            filters={'port_uuid': ['uuid-port2']}))
+        self.assertEqual([], self._ids(filters={'segmentation_id': []}))
+
+    def test_mapping_filters_exists(self):
+        # port1 has two mappings, its bindings must not be duplicated
+        self.assertEqual(['binding1', 'binding2'], sorted(self._ids(
+            filters={'switch_id': ['switch1']})))
+        self.assertEqual(['binding1', 'binding2'], sorted(self._ids(
+            filters={'host_id': ['host2']})))
+        self.assertEqual(['binding3'], self._ids(
+            filters={'switch_id': ['switch2'], 'segmentation_id': [10]}))
+        self.assertEqual([], self._ids(filters={'host_id': []}))
+
+    def test_fields(self):
+        bindings = self.plugin.get_switchport_bindings(
+            self.context, fields=['neutron_port_id'],
+            filters={'segmentation_id': [20]})
+        self.assertEqual([{'neutron_port_id': 'neutron-binding2'}],
+                         bindings)
+        bindings = self.plugin.get_switchport_bindings(
+            self.context, fields=['id', 'switch_id'],
+            filters={'segmentation_id': [20]})
+        self.assertEqual([{'id': 'binding2', 'switch_id': 'switch1'}],
+                         bindings)
+
+    def test_fields_load_only_their_columns(self):
+        statements = []
+        sa.event.listen(self.session.get_bind(), 'before_cursor_execute',
+                        lambda conn, cursor, statement, *args:
+                        statements.append(statement))
+        self.plugin.get_switchport_bindings(self.context,
+                                            fields=['neutron_port_id'])
+        select, = statements
+        self.assertIn('neutron_port_id', select)
+        for column in ('nuage_vport_id', 'segmentation_id',
+                       'switchport_mapping_id', 'nuage_switchport_mapping'):
+            self.assertNotIn(column, select)
+
+    def test_keyset_paging(self):
+        sorts = [('segmentation_id', True)]
+        self.assertEqual(['binding1', 'binding3'],
+                         self._ids(sorts=sorts, limit=2))
+        self.assertEqual(['binding2'],
+                         self._ids(sorts=sorts, limit=2, marker='binding3'))
+        self.assertEqual(['binding1', 'binding3'],
+                         self._ids(sorts=sorts, limit=2, marker='binding2',
+                                   page_reverse=True))
+
+    def test_sort_on_port_uuid(self):
+        self.assertEqual(['binding3', 'binding2', 'binding1'], self._ids(
+            sorts=[('port_uuid', False), ('id', False)]))
+
+    def test_invalid_sort_key(self):
+        self.assertRaises(n_exc.BadRequest, self._ids,
+                          sorts=[('switch_id', True)])
+
+
+class TestSwitchportMappingIndex(SwitchportDbTestCase):
+
+    def setUp(self):
+        super(TestSwitchportMappingIndex, self).setUp()
+        self.index = net_topology_db.SwitchportMappingIndex(ttl=30)
+
+    def _delete_mapping(self, mapping_id):
+        self.session.query(nuage_models.NuageSwitchportMapping).filter_by(
+            id=mapping_id).delete()
+        self.session.flush()
+
+    def _get(self, host_id='host1', pci_slot='0000:01'):
+        gw_map = self.index.get_by_host_slot(self.context, host_id,
+                                             pci_slot)
+        return gw_map and gw_map['id']
+
+    def test_loaded_once(self):
+        self._add_mapping('map1')
+        self.assertEqual('map1', self._get())
+        self._delete_mapping('map1')
+        # served from the view until it expires or gets invalidated
+        self.assertEqual('map1', self._get())
+
+    def test_invalidate(self):
+        self._add_mapping('map1')
+        self.assertEqual('map1', self._get())
+        self._delete_mapping('map1')
+        self.index.invalidate()
+        self.assertIsNone(self._get())
+
+    @mock.patch.object(net_topology_db.time, 'time')
+    def test_expiry(self, now):
+        now.return_value = 100
+        self._add_mapping('map1')
+        self.assertEqual('map1', self._get())
+        self._delete_mapping('map1')
+        now.return_value = 131
+        self.assertIsNone(self._get())
+
+    def test_miss_falls_back_to_db(self):
+        self.assertIsNone(self._get())
+        # e.g. created by another worker
+        self._add_mapping('map1')
+        self.assertEqual('map1', self._get())
+        # and kept in the view
+        self._delete_mapping('map1')
+        self.assertEqual('map1', self._get())
+
+    def test_returns_copies(self):
+        self._add_mapping('map1')
+        self.index.get_by_host_slot(self.context, 'host1',
+                                    '0000:01')['id'] = 'changed'
+        self.assertEqual('map1', self._get())
+
+    def test_changes_invalidate(self):
+        plugin = net_topology_db.NuageGwPortMappingDbMixin()
+        mapping = mock.MagicMock()
+        with mock.patch.object(net_topology_db.SWITCHPORT_MAPPINGS,
+                               'invalidate') as invalidate, \
+                mock.patch.object(plugin, '_validate_host_pci'), \
+                mock.patch.object(plugin,
+                                  '_ensure_switchport_mapping_not_in_use',
+                                  return_value=mapping), \
+                mock.patch.object(plugin, '_make_switchport_mapping_dict'):
+            context = mock.MagicMock()
+            plugin.create_switchport_mapping(context, {
+                'switchport_mapping': mock.MagicMock()})
+            plugin.update_switchport_mapping(context, 'map1', {
+                'switchport_mapping': {'host_id': 'host2'}})
+            plugin.delete_switchport_mapping(context, 'map1')
+        self.assertEqual(3, invalidate.call_count)
@@ -0,0 +1,108 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_addresspair.py
+
+import mock
+import testtools
+
+from nuage_neutron.plugins.common import addresspair
+from nuage_neutron.plugins.common import base_plugin
+from nuage_neutron.plugins.common.exceptions import SubnetMappingNotFound
+
+SUBNET_MAPPING = {'subnet_id': 'subnet1', 'nuage_subnet_id': 'l2dom1',
+                  'nuage_managed_subnet': False}
+VSD_SUBNET = {'ID': 'l2dom1'}
+
+
+def _port_plan(vnic_type_supported=True):
+    return base_plugin.PortPlan(
+        subnet_mappings=(SUBNET_MAPPING,), subnet_mapping=SUBNET_MAPPING,
+        vsd_managed=False, vnic_type_supported=vnic_type_supported,
+        actionable=True, needs_vm=True, vsd_subnet=VSD_SUBNET)
+
+
+class TestNuageAddressPairPortEvents(testtools.TestCase):
+
+    def setUp(self):
+        super(TestNuageAddressPairPortEvents, self).setUp()
+        with mock.patch.object(base_plugin.RootNuagePlugin,
+                               'init_vsd_client'):
+            self.driver = addresspair.NuageAddressPair()
+        self.context = mock.Mock()
+        self.port = {'id': 'port1', 'fixed_ips': [{'subnet_id': 'subnet1'}],
+                     'allowed_address_pairs': [{'ip_address': '10.0.0.9'}]}
+        self.vport = {'ID': 'vport1'}
+        for method in ('_create_vips', 'is_port_vnic_type_supported',
+                       'update_allowed_address_pairs'):
+            patcher = mock.patch.object(self.driver, method,
+                                        return_value=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.db_lookups = []
+        for function in ('get_subnet_l2dom_by_id',
+                         'get_subnet_l2dom_by_port_id'):
+            patcher = mock.patch.object(addresspair.nuagedb, function,
+                                        return_value=SUBNET_MAPPING)
+            self.db_lookups.append(patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def _create(self, port_plan=None):
+        self.driver.post_port_create_addresspair(
+            None, None, None, context=self.context, port=self.port,
+            vport=self.vport, port_plan=port_plan)
+
+    def test_create_with_plan(self):
+        self._create(_port_plan())
+        self.driver._create_vips.assert_called_once_with(
+            self.context, SUBNET_MAPPING, self.port, self.vport, VSD_SUBNET)
+        self.driver.is_port_vnic_type_supported.assert_not_called()
+        for lookup in self.db_lookups:
+            lookup.assert_not_called()
+
+    def test_create_without_plan(self):
+        self._create()
+        self.driver._create_vips.assert_called_once_with(
+            self.context, SUBNET_MAPPING, self.port, self.vport, None)
+        self.driver.is_port_vnic_type_supported.assert_called_once_with(
+            self.port)
+
+    def test_create_without_plan_nor_mapping(self):
+        self.db_lookups[1].side_effect = SubnetMappingNotFound(
+            resource='port', id='port1')
+        self._create()
+        self.driver._create_vips.assert_not_called()
+
+    def test_create_unsupported_vnic_type(self):
+        self._create(_port_plan(vnic_type_supported=False))
+        self.driver._create_vips.assert_not_called()
+
+    def test_update(self):
+        original_port = dict(self.port, allowed_address_pairs=[])
+        for port_plan in (_port_plan(), None):
+            self.driver.post_port_update_addresspair(
+                None, None, None, self.context, self.port, original_port,
+                self.vport, [], port_plan=port_plan)
+        self.assertEqual(2,
+                         self.driver.update_allowed_address_pairs.call_count)
+        # only checked without a plan
+        self.assertEqual(
+            1, self.driver.is_port_vnic_type_supported.call_count)
+
+        self.driver.update_allowed_address_pairs.reset_mock()
+        self.driver.post_port_update_addresspair(
+            None, None, None, self.context, self.port, original_port,
+            self.vport, [], port_plan=_port_plan(vnic_type_supported=False))
+        self.driver.update_allowed_address_pairs.assert_not_called()
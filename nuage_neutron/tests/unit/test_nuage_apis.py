@@ -32,3 +32,42 @@ class TestNuageApis(testtools.TestCase):
     @mock.patch.object(NuageApi, '_prepare_netpartitions')
     def test_nuage_apis_init(self, *_):
         NuageApi()
+
+    @mock.patch.object(RootNuagePlugin, 'init_vsd_client')
+    @mock.patch.object(NuageApi, '_prepare_netpartitions')
+    def test_get_vsd_domains_filters(self, *_):
+        api = NuageApi()
+        api.vsdclient = mock.Mock()
+        api.vsdclient.get_subnet_by_netpart.return_value = [
+            {'ID': 'l2-id', 'name': 'l2', 'ipv4_cidr': '10.0.0.0/24',
+             'dhcp_managed': True}]
+        domains = api.get_vsd_domains(
+            None, filters={'vsd_organisation_id': ['np-id'],
+                           'type': ['l2'],
+                           'cidr': ['10.0.0.0/24'],
+                           'dhcp_managed': ['True']})
+
+        self.assertEqual([('l2-id', 'L2')],
+                         [(domain['id'], domain['type'])
+                          for domain in domains])
+        api.vsdclient.get_routers_by_netpart.assert_not_called()
+        api.vsdclient.get_subnet_by_netpart.assert_called_once_with(
+            'np-id',
+            "(address IS '10.0.0.0' and netmask IS '255.255.255.0')")
+
+    @mock.patch.object(RootNuagePlugin, 'init_vsd_client')
+    @mock.patch.object(NuageApi, '_prepare_netpartitions')
+    def test_get_vsd_organisations_filters_case_insensitive(self, *_):
+        api = NuageApi()
+        api.vsdclient = mock.Mock()
+        api.vsdclient.get_net_partitions.return_value = [
+            {'net_partition_id': 'np-id', 'net_partition_name': 'Finance'},
+            {'net_partition_id': 'np-id', 'net_partition_name': 'HR'}]
+        organisations = api.get_vsd_organisations(
+            None, filters={'id': ['NP-ID'], 'name': ['finance']})
+
+        # the name is matched on the results, case insensitive
+        self.assertEqual(['Finance'], [organisation['name']
+                                       for organisation in organisations])
+        api.vsdclient.get_net_partitions.assert_called_once_with(
+            "ID IS 'np-id'")
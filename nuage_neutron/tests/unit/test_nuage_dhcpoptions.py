@@ -0,0 +1,128 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_dhcpoptions.py
+
+import mock
+import testtools
+
+from nuage_neutron.vsdclient.common import constants
+from nuage_neutron.vsdclient.common import helper
+from nuage_neutron.vsdclient.resources import dhcpoptions
+
+SUBNET = {'id': 'subnet', 'nuage_l2bridge': None, 'ip_version': 4,
+          'dns_nameservers': ['8.8.8.8', '1.1.1.1'],
+          'host_routes': [{'destination': '10.0.0.0/8',
+                           'nexthop': '192.168.0.1'}],
+          'gateway_ip': '10.0.0.1'}
+DNS = {'type': '06', 'value': '0808080801010101', 'length': '08'}
+ROUTES = {'value': '080ac0a80001', 'length': '06'}
+GATEWAY = {'type': '03', 'value': '0a000001', 'length': '04'}
+
+
+class TestDhcpOptionEncoding(testtools.TestCase):
+
+    def test_encode_dns(self):
+        self.assertEqual((DNS['value'], DNS['length']),
+                         dhcpoptions._encode_dns(('8.8.8.8', '1.1.1.1')))
+
+    def test_encode_static_routes(self):
+        self.assertEqual(
+            (ROUTES['value'], ROUTES['length']),
+            dhcpoptions._encode_static_routes(
+                (('10.0.0.0/8', '192.168.0.1'),)))
+        # a /24 takes three bytes of the destination, two routes 5 each
+        self.assertEqual(
+            ('180a0102c0a8000120ac100001c0a80002', '11'),
+            dhcpoptions._encode_static_routes(
+                (('10.1.2.0/24', '192.168.0.1'),
+                 ('172.16.0.1/32', '192.168.0.2'))))
+
+    def test_encode_gateway_ip(self):
+        self.assertEqual((GATEWAY['value'], GATEWAY['length']),
+                         dhcpoptions._encode_gateway_ip('10.0.0.1'))
+
+    def test_encoding_cached(self):
+        dhcpoptions._encode_dns.cache.clear()
+        encoding = dhcpoptions._encode_dns(('8.8.8.8',))
+        self.assertIs(encoding, dhcpoptions._encode_dns(('8.8.8.8',)))
+        self.assertEqual(1, len(dhcpoptions._encode_dns.cache))
+
+
+class TestReconcileNuageDhcp(testtools.TestCase):
+
+    def setUp(self):
+        super(TestReconcileNuageDhcp, self).setUp()
+        patcher = mock.patch.object(helper,
+                                    'get_external_id_based_on_subnet_id',
+                                    return_value='subnet@cms')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.restproxy = mock.Mock()
+        self.dhcp_options = dhcpoptions.NuageDhcpOptions(self.restproxy)
+
+    def _reconcile(self, existing, subnet=None,
+                   network_type=constants.NETWORK_TYPE_L2, **kwargs):
+        self.restproxy.get.return_value = existing
+        self.dhcp_options._reconcile_nuage_dhcp(subnet or SUBNET, 'l2dom',
+                                                network_type, **kwargs)
+
+    def test_creates_missing_options(self):
+        self._reconcile([])
+        self.restproxy.get.assert_called_once_with(
+            '/l2domains/l2dom/dhcpoptions')
+        posted = {data['type']: data
+                  for (resource, data), _kwargs
+                  in self.restproxy.post.call_args_list}
+        self.assertEqual({'03', '06', '79', 'f9'}, set(posted))
+        self.assertEqual(dict(DNS, externalID='subnet@cms'), posted['06'])
+        self.assertEqual(dict(ROUTES, type='f9', externalID='subnet@cms'),
+                         posted['f9'])
+        self.restproxy.put.assert_not_called()
+
+    def test_l3_has_no_gateway_option(self):
+        self._reconcile([], network_type=constants.NETWORK_TYPE_L3)
+        self.restproxy.get.assert_called_once_with(
+            '/subnets/l2dom/dhcpoptions')
+        self.assertEqual(
+            {'06', '79', 'f9'},
+            {data['type'] for (resource, data), _kwargs
+             in self.restproxy.post.call_args_list})
+
+    def test_same_options_left_alone(self):
+        self._reconcile([dict(DNS, ID='dns'), dict(GATEWAY, ID='gw'),
+                         dict(ROUTES, type='79', ID='rt1'),
+                         dict(ROUTES, type='f9', ID='rt2')])
+        self.restproxy.post.assert_not_called()
+        self.restproxy.put.assert_not_called()
+        self.restproxy.delete.assert_not_called()
+
+    def test_changed_option_updated(self):
+        self._reconcile([dict(DNS, ID='dns', value='08080808', length='04'),
+                         dict(GATEWAY, ID='gw'),
+                         dict(ROUTES, type='79', ID='rt1'),
+                         dict(ROUTES, type='f9', ID='rt2')])
+        self.restproxy.put.assert_called_once_with(
+            '/dhcpoptions/dns?responseChoice=1', DNS)
+        self.restproxy.post.assert_not_called()
+
+    def test_delete_types(self):
+        subnet = dict(SUBNET, dns_nameservers=[], host_routes=[])
+        self._reconcile([dict(DNS, ID='dns'), dict(GATEWAY, ID='gw')],
+                        subnet=subnet, delete_types=('06', '79'))
+        self.restproxy.delete.assert_called_once_with(
+            '/dhcpoptions/dns?responseChoice=1')
+        self.restproxy.post.assert_not_called()
+        self.restproxy.put.assert_not_called()
@@ -0,0 +1,158 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run \
+#     nuage_neutron/tests/unit/test_nuage_flowclassifier_db.py
+
+import mock
+from networking_sfc.db import flowclassifier_db
+from neutron.db import models_v2  # noqa: F401 for the ports foreign keys
+import sqlalchemy as sa
+from sqlalchemy import orm
+import testtools
+
+from nuage_neutron.flow_classifier import nuage_flowclassifier_db
+
+
+def _flow_classifier(vlan_range=None, **attributes):
+    fc = {'ethertype': 'IPv4', 'protocol': 'tcp',
+          'source_ip_prefix': None, 'destination_ip_prefix': None,
+          'source_port_range_min': None, 'source_port_range_max': None,
+          'destination_port_range_min': None,
+          'destination_port_range_max': None,
+          'logical_source_port': 'port1', 'logical_destination_port': None,
+          'l7_parameters': {}}
+    if vlan_range:
+        fc['l7_parameters'] = {'vlan_range_min': vlan_range[0],
+                               'vlan_range_max': vlan_range[1]}
+    fc.update(attributes)
+    return fc
+
+
+class TestNuageFlowClassifierDb(testtools.TestCase):
+
+    def assertConflict(self, expected, first, second):
+        plugin = nuage_flowclassifier_db.NuageFlowClassifierDbPlugin
+        self.assertEqual(expected,
+                         plugin.flowclassifier_conflict(first, second))
+        self.assertEqual(expected,
+                         plugin.flowclassifier_conflict(second, first))
+
+    def test_vlan_range_conflict(self):
+        self.assertConflict(True, _flow_classifier((10, 20)),
+                            _flow_classifier((20, 30)))
+        self.assertConflict(False, _flow_classifier((10, 20)),
+                            _flow_classifier((21, 30)))
+        # a classifier without vlan range matches any vlan
+        self.assertConflict(True, _flow_classifier((10, 20)),
+                            _flow_classifier())
+
+    def test_vlan_range_conflict_needs_basic_conflict(self):
+        self.assertConflict(False, _flow_classifier((10, 20)),
+                            _flow_classifier((10, 20), protocol='udp'))
+        self.assertConflict(False, _flow_classifier((10, 20)),
+                            _flow_classifier((10, 20), ethertype='IPv6'))
+
+    def test_vlan_range_conflict_with_db_parameters(self):
+        # the l7 parameters of a request against the ones in the db
+        db_fc = _flow_classifier(l7_parameters={
+            'vlan_range_min': flowclassifier_db.L7Parameter(
+                keyword='vlan_range_min', value='10'),
+            'vlan_range_max': flowclassifier_db.L7Parameter(
+                keyword='vlan_range_max', value='20')})
+        self.assertConflict(True, _flow_classifier((15, 15)), db_fc)
+        self.assertConflict(False, _flow_classifier((5, 9)), db_fc)
+
+
+class TestNuageFlowClassifierConflictQuery(testtools.TestCase):
+
+    def setUp(self):
+        super(TestNuageFlowClassifierConflictQuery, self).setUp()
+        engine = sa.create_engine('sqlite://')
+        flowclassifier_db.FlowClassifier.metadata.create_all(
+            engine, tables=[flowclassifier_db.FlowClassifier.__table__,
+                            flowclassifier_db.L7Parameter.__table__])
+        self.session = orm.Session(bind=engine)
+        self.addCleanup(self.session.close)
+        self.context = mock.Mock(is_admin=True, session=self.session)
+        self.plugin = nuage_flowclassifier_db.NuageFlowClassifierDbPlugin()
+
+    def _add(self, fc_id, vlan_range=None, **attributes):
+        fc = _flow_classifier(vlan_range, **attributes)
+        l7_parameters = {
+            key: flowclassifier_db.L7Parameter(keyword=key, value=str(val))
+            for key, val in fc.pop('l7_parameters').items()}
+        self.session.add(flowclassifier_db.FlowClassifier(
+            id=fc_id, project_id='project', l7_parameters=l7_parameters,
+            **fc))
+        self.session.flush()
+
+    def _find(self, vlan_range=None, **attributes):
+        conflict = self.plugin._find_conflicting_flow_classifier(
+            self.context, _flow_classifier(vlan_range, **attributes))
+        return conflict and conflict['id']
+
+    def _candidates(self, **attributes):
+        # the flow classifiers compared in full with the new one
+        with mock.patch.object(self.plugin, 'flowclassifier_conflict',
+                               return_value=False) as conflict:
+            self.assertIsNone(self._find(**attributes))
+        return sorted(args[1]['id'] for args, _kwargs
+                      in conflict.call_args_list)
+
+    def test_no_flow_classifiers(self):
+        self.assertIsNone(self._find())
+
+    def test_conflict_found(self):
+        self._add('fc1')
+        with mock.patch.object(self.plugin, 'flowclassifier_conflict',
+                               return_value=True):
+            self.assertEqual('fc1', self._find())
+
+    def test_column_mismatch(self):
+        self._add('fc1', protocol='udp')
+        self._add('fc2', ethertype='IPv6')
+        self._add('fc3', logical_source_port='port2')
+        self._add('fc4', source_port_range_min=100,
+                  source_port_range_max=200)
+        self.assertEqual([], self._candidates(source_port_range_min=300,
+                                              source_port_range_max=400))
+
+    def test_wildcards(self):
+        self._add('fc1', protocol=None, logical_source_port=None)
+        self._add('fc2', destination_port_range_min=80)
+        self.assertEqual(['fc1', 'fc2'], self._candidates(
+            destination_port_range_min=80, destination_port_range_max=80))
+
+    def test_port_range_overlap(self):
+        self._add('fc1', destination_port_range_min=100,
+                  destination_port_range_max=200)
+        self._add('fc2', destination_port_range_min=300,
+                  destination_port_range_max=400)
+        self.assertEqual(['fc1'], self._candidates(
+            destination_port_range_min=200, destination_port_range_max=299))
+        self.assertEqual([], self._candidates(
+            destination_port_range_min=201, destination_port_range_max=299))
+        self.assertEqual(['fc1', 'fc2'], self._candidates())
+
+    def test_vlan_range_checked_on_candidates(self):
+        self._add('fc1', (10, 20))
+        self.assertIsNone(self._find((21, 30)))
+        self.assertEqual('fc1', self._find((20, 30)))
+
+    def test_ip_prefix_checked_on_candidates(self):
+        self._add('fc1', source_ip_prefix='10.0.0.0/24')
+        self.assertIsNone(self._find(source_ip_prefix='10.0.1.0/24'))
+        self.assertEqual('fc1', self._find(source_ip_prefix='10.0.0.0/16'))
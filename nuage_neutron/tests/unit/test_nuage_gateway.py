@@ -0,0 +1,207 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_gateway.py
+
+import mock
+import testtools
+
+from nuage_neutron.plugins.common import utils
+from nuage_neutron.vsdclient.common import constants
+from nuage_neutron.vsdclient.common import gw_helper
+from nuage_neutron.vsdclient.common import helper
+from nuage_neutron.vsdclient.resources import gateway
+from nuage_neutron.vsdclient import restproxy
+
+# vlan id: (enterprise permission, tenant permission)
+PERMISSIONS = {
+    'vlan1': ('np1', 'group-np1'),
+    # permitted to another tenant
+    'vlan2': ('np1', 'group-other'),
+    # assigned to the enterprise only
+    'vlan3': ('np2', None),
+    'vlan4': (None, None),
+    'vlan5': ('np2', 'group-np2'),
+}
+
+
+class FakeRestProxy(object):
+
+    def get(self, resource, required=False):
+        _, vlans, vlan_id, kind = resource.split('/')
+        netpart_id, group_id = PERMISSIONS[vlan_id]
+        permitted = (netpart_id if kind == 'enterprisepermissions'
+                     else group_id)
+        return [{'permittedEntityID': permitted}] if permitted else []
+
+
+class TestTenantVlans(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTenantVlans, self).setUp()
+        patcher = mock.patch.object(utils.nuage_config,
+                                    'max_concurrent_vsd_requests',
+                                    return_value=4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            helper, 'create_usergroup',
+            side_effect=lambda restproxy, tenant_id, netpart_id: (
+                'user', 'group-' + netpart_id))
+        self.create_usergroup = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gateway = gateway.NuageGateway(FakeRestProxy(), mock.Mock())
+
+    def _old_tenant_vlan_ids(self, vlan_ids, tenant_id):
+        # the permission checks as they were made one vlan at a time
+        permitted = set()
+        for vlan_id in vlan_ids:
+            ent_perm = gw_helper.get_ent_permission_on_vlan(
+                self.gateway.restproxy, vlan_id)
+            if ent_perm and self.gateway._check_tenant_perm(
+                    vlan_id, tenant_id, ent_perm['permittedEntityID']):
+                permitted.add(vlan_id)
+        return permitted
+
+    def _groups_resolved(self):
+        return {args[2] for args, _kwargs
+                in self.create_usergroup.call_args_list}
+
+    def test_same_as_one_by_one(self):
+        vlan_ids = sorted(PERMISSIONS)
+        old = self._old_tenant_vlan_ids(vlan_ids, 'tenant')
+        old_groups = self._groups_resolved()
+        self.create_usergroup.reset_mock()
+
+        self.assertEqual(old, self.gateway._get_tenant_vlan_ids(vlan_ids,
+                                                                'tenant'))
+        self.assertEqual({'vlan1', 'vlan5'}, old)
+        # the group is still resolved, or created, for an enterprise of
+        # which the vlans have no tenant permission; once per enterprise
+        self.assertEqual({'np1', 'np2'}, old_groups)
+        self.assertEqual(
+            [mock.call(self.gateway.restproxy, 'tenant', 'np1'),
+             mock.call(self.gateway.restproxy, 'tenant', 'np2')],
+            sorted(self.create_usergroup.call_args_list,
+                   key=lambda call: call[0][2]))
+
+    def test_enterprise_permission_only(self):
+        self.assertEqual(set(), self.gateway._get_tenant_vlan_ids(
+            ['vlan3'], 'tenant'))
+        self.create_usergroup.assert_called_once_with(
+            self.gateway.restproxy, 'tenant', 'np2')
+
+    def test_no_enterprise_permission(self):
+        self.assertEqual(set(), self.gateway._get_tenant_vlan_ids(
+            ['vlan4'], 'tenant'))
+        self.create_usergroup.assert_not_called()
+
+    def test_gateway_port_vlans(self):
+        vlans = [{'ID': vlan_id} for vlan_id in sorted(PERMISSIONS)]
+        with mock.patch.object(self.gateway, '_get_gateway_port_vlans',
+                               return_value=vlans):
+            listed = self.gateway.get_gateway_port_vlans(
+                'tenant', 'np1', {'gatewayport': ['port1']})
+        self.assertEqual(
+            [{'ID': 'vlan1', 'assignedTo': 'tenant'},
+             {'ID': 'vlan5', 'assignedTo': 'tenant'}], listed)
+
+    def test_gateway_vports(self):
+        vports = [{'ID': 'vport-' + vlan_id, 'VLANID': vlan_id,
+                   'type': constants.HOST_VPORT_TYPE, 'name': vlan_id}
+                  for vlan_id in sorted(PERMISSIONS)]
+        with mock.patch.object(gateway.nuagedb,
+                               'get_subnet_info_by_nuage_id',
+                               return_value={
+                                   'subnet_type': constants.L2DOMAIN}), \
+                mock.patch.object(gw_helper, 'get_vports_for_l2domain',
+                                  return_value=vports), \
+                mock.patch.object(gw_helper, 'get_interface_by_vport',
+                                  return_value=None), \
+                mock.patch.object(gw_helper, 'get_gateway_port_vlan',
+                                  side_effect=lambda restproxy, vlan_id: {
+                                      'ID': vlan_id, 'gatewayID': 'gw',
+                                      'parentID': 'port', 'value': 10}):
+            listed = self.gateway.get_gateway_vports(
+                mock.Mock(), 'tenant', 'np1',
+                {'subnet': ['subnet1'], 'nuage_subnet_id': ['l2dom']})
+        self.assertEqual(['vport-vlan1', 'vport-vlan5'],
+                         [vport['vport_id'] for vport in listed])
+        self.assertEqual(
+            sorted(self._old_tenant_vlan_ids(sorted(PERMISSIONS),
+                                             'tenant')),
+            [vport['nuage_vlan_id'] for vport in listed])
+
+
+class TestCreateVportInterface(testtools.TestCase):
+
+    PARAMS = {'gw_type': 'VSG', 'nuage_vlan_id': 'vlan1',
+              'externalid': 'port1', 'nuage_managed_subnet': False}
+
+    def setUp(self):
+        super(TestCreateVportInterface, self).setUp()
+        patcher = mock.patch.object(utils.nuage_config,
+                                    'max_concurrent_vsd_requests',
+                                    return_value=4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # records the order of the calls of both
+        self.calls = mock.Mock()
+        self.restproxy = self.calls.restproxy
+        self.restproxy.post.side_effect = lambda resource, data, **kwargs: [
+            {'ID': 'interface1' if 'vports/' in resource else 'vport1'}]
+        self.pg_obj = self.calls.pg_obj
+        self.pg_obj.create_nuage_sec_grp_for_no_port_sec.return_value = 'pg1'
+
+    def _create(self, policy_group=True, **params):
+        return gw_helper._create_vport_interface(
+            'l2dom1', self.pg_obj, self.restproxy, constants.L2DOMAIN,
+            constants.BRIDGE_VPORT_TYPE, policy_group,
+            dict(self.PARAMS, **params))
+
+    def _call_names(self):
+        return [name for name, _args, _kwargs in self.calls.mock_calls]
+
+    def test_policy_group_assigned_after_vport_creation(self):
+        created = self._create()
+        self.assertEqual({'vport': {'ID': 'vport1'},
+                          'interface': {'ID': 'interface1'}}, created)
+        create_pg = self.pg_obj.create_nuage_sec_grp_for_no_port_sec
+        create_pg.assert_called_once_with(
+            {'l2dom_id': 'l2dom1', 'rtr_id': None,
+             'type': constants.HOST_VPORT_TYPE,
+             'sg_type': constants.HARDWARE})
+        self.pg_obj.update_vport_policygroups.assert_called_once_with(
+            'vport1', ['pg1'])
+        names = self._call_names()
+        self.assertEqual('pg_obj.update_vport_policygroups', names[-1])
+        self.assertEqual(['restproxy.post', 'restproxy.post'],
+                         [name for name in names
+                          if name.startswith('restproxy')])
+
+    def test_no_policy_group(self):
+        self._create(policy_group=False)
+        self._create(nuage_managed_subnet=True)
+        self.assertEqual([], [name for name in self._call_names()
+                              if name.startswith('pg_obj')])
+
+    def test_policy_group_lookup_failure_raised(self):
+        error = restproxy.RESTProxyError('fail', error_code=500)
+        self.pg_obj.create_nuage_sec_grp_for_no_port_sec.side_effect = error
+        raised = self.assertRaises(restproxy.RESTProxyError, self._create)
+        self.assertIs(error, raised)
+        # raised on waiting for it, once the vport got created
+        self.assertEqual(2, self.restproxy.post.call_count)
+        self.pg_obj.update_vport_policygroups.assert_not_called()
@@ -0,0 +1,210 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_interface.py
+
+import eventlet
+import mock
+import testtools
+
+from nuage_neutron.agent.linux import exceptions as nuage_exc
+from nuage_neutron.agent.linux import nuage_interface
+
+NuageVMDriver = nuage_interface.NuageVMDriver
+
+PORT = ('port1', 'tap1', 'fa:16:3e:00:00:01', 'alubr0')
+OTHER_PORT = ('port2', 'tap2', 'fa:16:3e:00:00:02', 'alubr0')
+OK = [{}, {}]
+INSERT_FAILED = [{'error': 'constraint violation'}, {}]
+UPDATED = [{'count': 1}, {'count': 1}]
+NOT_UPDATED = [{'count': 0}, {'count': 0}]
+
+
+def _plug(port):
+    # the update and the insert transaction plug_many sends for port
+    insert_port, insert_vm, update = NuageVMDriver._plug_transactions(*port)
+    return [update, insert_port + insert_vm + update]
+
+
+class NuageVMDriverTestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(NuageVMDriverTestCase, self).setUp()
+        self.client = mock.Mock()
+        self.client.get_stats.return_value = {}
+        patcher = mock.patch.object(NuageVMDriver, 'get_client',
+                                    return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for attribute, value in (('_stats_logged', 0), ('_resynced', True)):
+            patcher = mock.patch.object(NuageVMDriver, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _sent(self):
+        return [args[0] for args, _kwargs
+                in self.client.transact_many.call_args_list]
+
+
+class TestNuageVMDriver(NuageVMDriverTestCase):
+
+    def test_plug_new_port_single_round_trip(self):
+        self.client.transact_many.return_value = [NOT_UPDATED, OK]
+        NuageVMDriver.plug(*PORT)
+        self.assertEqual([_plug(PORT)], self._sent())
+
+    def test_replug_single_round_trip(self):
+        # the rows exist already: the update applies, the insert fails
+        self.client.transact_many.return_value = [UPDATED, INSERT_FAILED]
+        NuageVMDriver.plug(*PORT)
+        self.assertEqual([_plug(PORT)], self._sent())
+
+    def test_plug_partial_rows_in_steps(self):
+        # only the port row exists: the vm row gets inserted on its own
+        self.client.transact_many.side_effect = [
+            [[{'count': 1}, {'count': 0}], INSERT_FAILED],
+            [INSERT_FAILED, OK, UPDATED]]
+        NuageVMDriver.plug(*PORT)
+        _plug_sent, steps = self._sent()
+        self.assertEqual(NuageVMDriver._plug_transactions(*PORT), steps)
+
+    def test_plug_many_retries_failed_ports_only(self):
+        self.client.transact_many.side_effect = [
+            [NOT_UPDATED, OK, NOT_UPDATED, INSERT_FAILED],
+            [INSERT_FAILED, INSERT_FAILED, OK]]
+        NuageVMDriver.plug_many([PORT, OTHER_PORT])
+        plug_sent, steps = self._sent()
+        self.assertEqual(_plug(PORT) + _plug(OTHER_PORT), plug_sent)
+        self.assertEqual(NuageVMDriver._plug_transactions(*OTHER_PORT),
+                         steps)
+
+    def test_unplug(self):
+        self.client.transact_many.return_value = [OK]
+        NuageVMDriver.unplug('port1', 'tap1')
+        self.assertEqual([[NuageVMDriver._unplug_transaction('port1',
+                                                             'tap1')]],
+                         self._sent())
+
+    def test_get_port_uuid(self):
+        self.client.transact_many.return_value = [
+            [{'rows': [{'vm_uuid': 'port1'}]}]]
+        self.assertEqual('port1', NuageVMDriver.get_port_uuid('tap1'))
+        self.client.transact_many.return_value = [[{'rows': []}]]
+        self.assertIsNone(NuageVMDriver.get_port_uuid('tap1'))
+
+    def test_concurrent_requests_combined(self):
+        # a request queued by another caller while a batch was in flight
+        queued = {'transactions': [['unplug tap2']]}
+        NuageVMDriver._pending.append(queued)
+        self.client.transact_many.return_value = [
+            'unplugged', NOT_UPDATED, OK]
+        NuageVMDriver.plug(*PORT)
+        self.assertEqual([[['unplug tap2']] + _plug(PORT)], self._sent())
+        self.assertEqual(['unplugged'], queued['results'])
+        self.assertEqual(0, len(NuageVMDriver._pending))
+
+    def test_plugs_during_a_batch_sent_together(self):
+        pool = eventlet.GreenPool()
+
+        def transact_many(transactions):
+            if not self.client.transact_many.call_args_list[1:]:
+                # while the first unplug waits for ovsdb, two ports get
+                # plugged
+                pool.spawn(NuageVMDriver.plug, *PORT)
+                pool.spawn(NuageVMDriver.plug, *OTHER_PORT)
+                eventlet.sleep(0)
+                return [OK]
+            return [NOT_UPDATED, OK] * 2
+
+        self.client.transact_many.side_effect = transact_many
+        NuageVMDriver.unplug('port1', 'tap1')
+        pool.waitall()
+        self.assertEqual(_plug(PORT) + _plug(OTHER_PORT), self._sent()[1])
+        self.assertEqual(2, len(self._sent()))
+
+    def test_combined_failure_raised_to_every_caller(self):
+        queued = {'transactions': [['unplug tap2']]}
+        NuageVMDriver._pending.append(queued)
+        error = nuage_exc.NuageDriverException(msg='ovsdb down')
+        self.client.transact_many.side_effect = error
+        self.assertRaises(nuage_exc.NuageDriverException,
+                          NuageVMDriver.plug, *PORT)
+        self.assertIs(error, queued['results'])
+
+    @mock.patch.object(nuage_interface.time, 'time')
+    def test_stats_logged_periodically(self, now):
+        self.client.transact_many.return_value = [OK]
+        now.return_value = 10 ** 6
+        NuageVMDriver.unplug('port1', 'tap1')
+        NuageVMDriver.unplug('port1', 'tap1')
+        self.assertEqual(1, self.client.get_stats.call_count)
+        now.return_value += NuageVMDriver.STATS_LOG_INTERVAL + 1
+        NuageVMDriver.unplug('port1', 'tap1')
+        self.assertEqual(2, self.client.get_stats.call_count)
+
+
+class TestNuageVMDriverResync(NuageVMDriverTestCase):
+
+    PLUGGED = [
+        {'rows': [{'name': 'tap1', 'bridge': 'alubr0'},
+                  {'name': 'tap2', 'bridge': 'alubr0'},
+                  {'name': 'tap3', 'bridge': ['set', []]},
+                  {'name': 'tap4', 'bridge': 'alubr0'}]},
+        {'rows': [{'vm_uuid': 'port1', 'ports': 'tap1'},
+                  {'vm_uuid': 'port2', 'ports': ['set', ['tap2']]},
+                  {'vm_uuid': 'port3', 'ports': ['set', ['tap3']]}]}]
+
+    def setUp(self):
+        super(TestNuageVMDriverResync, self).setUp()
+        patcher = mock.patch.object(NuageVMDriver, '_get_bridge_devices',
+                                    return_value=['tap1', 'patch-int'])
+        self.bridge_devices = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_plugged_ports(self):
+        self.client.transact_many.return_value = [self.PLUGGED]
+        self.assertEqual({'tap1': ('port1', 'alubr0'),
+                          'tap2': ('port2', 'alubr0'),
+                          'tap3': ('port3', None),
+                          'tap4': (None, 'alubr0')},
+                         NuageVMDriver.get_plugged_ports())
+
+    def test_resync_unplugs_devices_off_their_bridge(self):
+        self.client.transact_many.side_effect = [[self.PLUGGED], [OK, OK]]
+        self.assertEqual(2, NuageVMDriver.resync())
+        self.bridge_devices.assert_called_once_with('alubr0')
+        _select, unplugs = self._sent()
+        # in one batch; tap3 has no bridge, so it is left alone
+        self.assertEqual(
+            [NuageVMDriver._unplug_transaction(None, 'tap4'),
+             NuageVMDriver._unplug_transaction('port2', 'tap2')],
+            sorted(unplugs, key=len))
+
+    def test_first_plug_resyncs(self):
+        NuageVMDriver._resynced = False
+        self.client.transact_many.side_effect = [
+            [self.PLUGGED], [OK, OK], [NOT_UPDATED, OK], [NOT_UPDATED, OK]]
+        NuageVMDriver.plug(*PORT)
+        NuageVMDriver.plug(*OTHER_PORT)
+        self.assertEqual([_plug(PORT), _plug(OTHER_PORT)], self._sent()[2:])
+
+    def test_plug_after_failed_resync(self):
+        NuageVMDriver._resynced = False
+        self.client.transact_many.side_effect = [
+            nuage_exc.NuageDriverException(msg='ovsdb down'),
+            [NOT_UPDATED, OK]]
+        NuageVMDriver.plug(*PORT)
+        self.assertEqual(_plug(PORT), self._sent()[1])
+        self.assertTrue(NuageVMDriver._resynced)
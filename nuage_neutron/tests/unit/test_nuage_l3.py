@@ -19,7 +19,9 @@ import mock
 import testtools
 
 from nuage_neutron.plugins.common.base_plugin import RootNuagePlugin
+from nuage_neutron.plugins.common import nuagedb
 from nuage_neutron.plugins.common.service_plugins.l3 import NuageL3Plugin
+from nuage_neutron.vsdclient import restproxy
 
 
 class TestNuageL3Plugin(testtools.TestCase):
@@ -31,3 +33,38 @@ class TestNuageL3Plugin(testtools.TestCase):
     @mock.patch.object(RootNuagePlugin, 'init_vsd_client')
     def test_l3_init(self, *_):
         NuageL3Plugin()
+
+    @mock.patch.object(RootNuagePlugin, 'init_vsd_client')
+    def test_find_vsd_subnet_stale_mapping(self, *_):
+        plugin = NuageL3Plugin()
+        self.addCleanup(plugin._vsd_subnets.clear)
+        plugin.vsdclient = mock.Mock()
+        context = mock.MagicMock()
+        mapping = {'subnet_id': 'subnet1', 'nuage_subnet_id': 'l2domain1',
+                   'nuage_l2dom_tmplt_id': 'template1', 'ip_version': 4,
+                   'nuage_managed_subnet': False}
+        plugin.vsdclient.get_nuage_subnet_by_mapping.side_effect = (
+            restproxy.ResourceNotFoundException())
+        plugin.vsdclient.get_domain_subnet_by_ext_id_and_cidr.return_value = {
+            'ID': 'l3subnet1', 'type': 'SUBNET'}
+
+        with mock.patch.object(nuagedb, 'get_subnet_l2doms_by_nuage_id',
+                               side_effect=lambda session, nuage_id: [
+                                   mapping] if mapping['nuage_subnet_id'] ==
+                               nuage_id else []), \
+                mock.patch.object(nuagedb, 'get_subnet_l2dom_by_id',
+                                  return_value=mapping), \
+                mock.patch.object(plugin, '_get_subnet_from_neutron',
+                                  return_value={'id': 'subnet1'}):
+            # the subnet was attached to a router, the mapping is stale
+            vsd_subnet = plugin._find_vsd_subnet(context, dict(mapping))
+            self.assertEqual('l3subnet1', vsd_subnet['ID'])
+            # the mapping is left to the l3 plugin
+            self.assertEqual('l2domain1', mapping['nuage_subnet_id'])
+            self.assertEqual('template1', mapping['nuage_l2dom_tmplt_id'])
+
+            # what is found for a stale mapping is not cached
+            self.assertEqual(vsd_subnet,
+                             plugin._find_vsd_subnet(context, mapping))
+            self.assertEqual(
+                2, plugin.vsdclient.get_nuage_subnet_by_mapping.call_count)
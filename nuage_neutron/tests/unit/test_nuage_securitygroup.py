@@ -15,7 +15,9 @@
 import mock
 import testtools
 
+from nuage_neutron.plugins.common import base_plugin
 from nuage_neutron.plugins.common.base_plugin import RootNuagePlugin
+from nuage_neutron.plugins.common import cache
 from nuage_neutron.plugins.nuage_ml2 import securitygroup
 from nuage_neutron.vsdclient import restproxy
 
@@ -39,3 +41,117 @@ class TestNuageSecurityGroup(testtools.TestCase):
         driver._create_policygroup(mock.MagicMock(), mock.MagicMock(),
                                    mock.MagicMock())
         vsd_mock.create_security_group_rules.assert_not_called()
+
+
+SUBNET_MAPPING = {'subnet_id': 'subnet1', 'nuage_subnet_id': 'l2dom1',
+                  'nuage_managed_subnet': False, 'ip_version': 4}
+VSD_SUBNET = {'ID': 'l2dom1', 'type': 'L2DOMAIN'}
+
+
+def _port_plan(vsd_managed=False, vsd_subnet=VSD_SUBNET):
+    return base_plugin.PortPlan(
+        subnet_mappings=(SUBNET_MAPPING,), subnet_mapping=SUBNET_MAPPING,
+        vsd_managed=vsd_managed, vnic_type_supported=True, actionable=True,
+        needs_vm=True, vsd_subnet=vsd_subnet)
+
+
+class TestNuageSecurityGroupPortEvents(testtools.TestCase):
+
+    def setUp(self):
+        super(TestNuageSecurityGroupPortEvents, self).setUp()
+        with mock.patch.object(RootNuagePlugin, 'init_vsd_client'):
+            self.driver = securitygroup.NuageSecurityGroup()
+        self.driver.vsdclient = mock.Mock()
+        self.driver.vsdclient.get_nuage_subnet_by_mapping.return_value = (
+            VSD_SUBNET)
+        self.driver._vsd_subnets = cache.ExpiringCache(None)
+        self.context = mock.Mock()
+        self.port = {'id': 'port1', 'security_groups': ['sg1'],
+                     'fixed_ips': [{'subnet_id': 'subnet1'}]}
+        self.vport = {'ID': 'vport1'}
+        for method in ('_process_port_security_group',
+                       '_get_subnet_from_neutron'):
+            patcher = mock.patch.object(self.driver, method)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            base_plugin.nuagedb, 'get_subnet_l2doms_by_nuage_id',
+            return_value=[SUBNET_MAPPING])
+        self.get_mappings = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create(self, port_plan=None):
+        self.driver.post_port_create(None, None, None, self.context,
+                                     self.port, self.vport, SUBNET_MAPPING,
+                                     port_plan=port_plan)
+
+    def _update(self, port_plan=None):
+        self.driver.post_port_update(None, None, None, self.context,
+                                     self.port,
+                                     dict(self.port, security_groups=[]),
+                                     self.vport, [], SUBNET_MAPPING,
+                                     port_plan=port_plan)
+
+    def _processed_vsd_subnet(self):
+        args, _kwargs = self.driver._process_port_security_group.call_args
+        return args[4]
+
+    def test_create_with_plan(self):
+        self._create(_port_plan())
+        self.assertEqual(VSD_SUBNET, self._processed_vsd_subnet())
+        self.driver.vsdclient.get_nuage_subnet_by_mapping.assert_not_called()
+        self.get_mappings.assert_not_called()
+
+    def test_create_without_plan(self):
+        self._create()
+        self.assertEqual(VSD_SUBNET, self._processed_vsd_subnet())
+        get_vsd_subnet = self.driver.vsdclient.get_nuage_subnet_by_mapping
+        get_vsd_subnet.assert_called_once_with(SUBNET_MAPPING, required=True)
+
+    def test_create_vsd_managed(self):
+        self._create(_port_plan(vsd_managed=True))
+        self._update(_port_plan(vsd_managed=True))
+        self.driver._process_port_security_group.assert_not_called()
+
+    def test_create_with_plan_without_vsd_subnet(self):
+        # the plan of a port without vport has no vsd subnet
+        self._create(_port_plan(vsd_subnet=None))
+        self.assertEqual(VSD_SUBNET, self._processed_vsd_subnet())
+        self.assertEqual(
+            1, self.driver.vsdclient.get_nuage_subnet_by_mapping.call_count)
+
+    def test_update_with_plan(self):
+        self._update(_port_plan())
+        self.assertEqual(VSD_SUBNET, self._processed_vsd_subnet())
+        self.driver.vsdclient.get_nuage_subnet_by_mapping.assert_not_called()
+        self.get_mappings.assert_not_called()
+
+    def test_update_without_plan(self):
+        self._update()
+        self.assertEqual(VSD_SUBNET, self._processed_vsd_subnet())
+
+    def test_update_moved_subnet(self):
+        # the vsd subnet of a stale mapping is looked up where it moved to,
+        # instead of the security groups being processed without one
+        moved_mapping = dict(SUBNET_MAPPING, nuage_subnet_id='subnet2')
+        moved_subnet = {'ID': 'subnet2', 'type': 'SUBNET'}
+
+        def get_nuage_subnet_by_mapping(subnet_mapping, required=False):
+            if subnet_mapping['nuage_subnet_id'] == 'l2dom1':
+                raise restproxy.ResourceNotFoundException('not found')
+            return moved_subnet
+
+        self.driver.vsdclient.get_nuage_subnet_by_mapping.side_effect = (
+            get_nuage_subnet_by_mapping)
+        self.driver._get_subnet_from_neutron.return_value = {'id': 'subnet1'}
+        with mock.patch.object(base_plugin.nuagedb, 'get_subnet_l2dom_by_id',
+                               return_value=moved_mapping):
+            self._update()
+        self.assertEqual(moved_subnet, self._processed_vsd_subnet())
+
+    def test_update_deleted_subnet(self):
+        self.driver.vsdclient.get_nuage_subnet_by_mapping.side_effect = (
+            restproxy.ResourceNotFoundException('not found'))
+        self.driver._get_subnet_from_neutron.return_value = None
+        self._update()
+        self.assertIsNone(self._processed_vsd_subnet())
@@ -0,0 +1,432 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_sfc.py
+
+import mock
+import testtools
+
+from nuage_neutron.sfc import nuage_sfc_plugin
+from nuage_neutron.sfc.nuage_sfc_plugin import NuageSFCPlugin
+from nuage_neutron.vsdclient import restproxy
+
+VLAN_LABEL = 7
+
+PPGS = ['ppga', 'ppgb', 'ppgc']
+
+# the ingress and egress policy groups and redirect targets of the ppgs,
+# in the order VSD may return them
+NUAGE_PGS = [pg for ppg in PPGS for pg in (
+    {'ID': 'pg-in-' + ppg, 'name': 'ingress_' + ppg},
+    {'ID': 'pg-eg-' + ppg, 'name': 'egress_' + ppg})]
+RDTS = [rdt for ppg in PPGS for rdt in (
+    {'ID': 'rt-eg-' + ppg, 'name': 'egress_' + ppg},
+    {'ID': 'rt-in-' + ppg, 'name': 'ingress_' + ppg})]
+
+# the policy groups and redirect targets of the logical ports
+FC_PGS = [{'ID': 'pg-src', 'name': 'fc_src'},
+          {'ID': 'pg-dst', 'name': 'fc_dst'}]
+FC_RDTS = [{'ID': 'rt-src', 'name': 'fc_src'},
+           {'ID': 'rt-dst', 'name': 'fc_dst'}]
+
+TCP_CLASSIFIER = {
+    'id': 'fc1', 'ethertype': 'IPv4',
+    'logical_source_port': 'src', 'logical_destination_port': 'dst',
+    'source_ip_prefix': '10.0.0.0/24', 'destination_ip_prefix': '10.1.0.0/24',
+    'protocol': 'tcp',
+    'source_port_range_min': 1000, 'source_port_range_max': 2000,
+    'destination_port_range_min': 80, 'destination_port_range_max': 80,
+    'l7_parameters': {'vlan_range_min': {'value': 100},
+                      'vlan_range_max': {'value': 100}}}
+ICMP_CLASSIFIER = {
+    'id': 'fc2', 'ethertype': 'IPv6',
+    'logical_source_port': 'src', 'logical_destination_port': 'dst',
+    'source_ip_prefix': None, 'destination_ip_prefix': 'cafe::/64',
+    'protocol': 'icmp',
+    'source_port_range_min': None, 'source_port_range_max': None,
+    'destination_port_range_min': None, 'destination_port_range_max': None,
+    'l7_parameters': {}}
+
+
+TCP_CLASSIFIER_443 = dict(TCP_CLASSIFIER, id='fc3',
+                          destination_port_range_min=443,
+                          destination_port_range_max=443)
+
+PORT_CHAIN_ID = 'pc1'
+STEP = nuage_sfc_plugin.SFC_RULE_PRIORITY_STEP
+
+
+def _chain_rule(direction, owner_id, ether_type, location_id,
+                redirect_target_id, rewrite_value=VLAN_LABEL):
+    """A chain link or chain exit entry, which only match on the label"""
+    return {'DSCP': '*', 'action': 'REDIRECT',
+            'description': direction + '_' + owner_id,
+            'etherType': ether_type, 'externalID': owner_id,
+            'locationID': location_id, 'locationType': 'POLICYGROUP',
+            'networkType': 'ANY', 'protocol': 'ANY',
+            'redirectRewriteType': 'VLAN',
+            'redirectRewriteValue': rewrite_value,
+            'redirectVPortTagID': redirect_target_id,
+            'vlanRange': VLAN_LABEL}
+
+
+def _link_rules(direction, ether_type):
+    if direction == 'forward':
+        return [_chain_rule('forward', PORT_CHAIN_ID, ether_type,
+                            'pg-eg-ppga', 'rt-in-ppgb'),
+                _chain_rule('forward', PORT_CHAIN_ID, ether_type,
+                            'pg-eg-ppgb', 'rt-in-ppgc')]
+    return [_chain_rule('reverse', PORT_CHAIN_ID, ether_type, 'pg-in-ppgc',
+                        'rt-eg-ppgb'),
+            _chain_rule('reverse', PORT_CHAIN_ID, ether_type, 'pg-in-ppgb',
+                        'rt-eg-ppga')]
+
+
+# the entries of a symmetric chain of three ppgs with the tcp and the icmp
+# classifier: per direction the classifying entries, the links, per ether
+# type, and the exits
+SYMMETRIC_CHAIN_RULES = (
+    [{'DSCP': '*', 'action': 'REDIRECT', 'addressOverride': '10.0.0.0/24',
+      'description': 'forward_fc1', 'destinationPort': '80-80',
+      'destination_ip_prefix': '10.1.0.0/24', 'etherType': '0x0800',
+      'externalID': 'fc1', 'locationID': 'pg-src',
+      'locationType': 'POLICYGROUP', 'networkType': 'ENTERPRISE_NETWORK',
+      'protocol': 'tcp', 'redirectRewriteType': 'VLAN',
+      'redirectRewriteValue': VLAN_LABEL, 'redirectVPortTagID': 'rt-in-ppga',
+      'sourcePort': '1000-2000', 'vlanRange': 100},
+     {'DSCP': '*', 'action': 'REDIRECT', 'description': 'forward_fc2',
+      'destination_ip_prefix': 'cafe::/64', 'etherType': '0x86DD',
+      'externalID': 'fc2', 'locationID': 'pg-src',
+      'locationType': 'POLICYGROUP', 'networkType': 'ENTERPRISE_NETWORK',
+      'protocol': 'icmp', 'redirectRewriteType': 'VLAN',
+      'redirectRewriteValue': VLAN_LABEL, 'redirectVPortTagID': 'rt-in-ppga',
+      'vlanRange': '*'}] +
+    _link_rules('forward', '0x0800') +
+    _link_rules('forward', '0x86DD') +
+    [_chain_rule('forward', 'fc1', '0x0800', 'pg-eg-ppgc', 'rt-dst', 100),
+     _chain_rule('forward', 'fc2', '0x86DD', 'pg-eg-ppgc', 'rt-dst', 0),
+     {'DSCP': '*', 'action': 'REDIRECT', 'addressOverride': '10.1.0.0/24',
+      'description': 'reverse_fc1', 'destinationPort': '1000-2000',
+      'destination_ip_prefix': '10.0.0.0/24', 'etherType': '0x0800',
+      'externalID': 'fc1', 'locationID': 'pg-dst',
+      'locationType': 'POLICYGROUP', 'networkType': 'ENTERPRISE_NETWORK',
+      'protocol': 'tcp', 'redirectRewriteType': 'VLAN',
+      'redirectRewriteValue': VLAN_LABEL, 'redirectVPortTagID': 'rt-eg-ppgc',
+      'sourcePort': '80-80', 'vlanRange': 100},
+     {'DSCP': '*', 'IPv6AddressOverride': 'cafe::/64', 'action': 'REDIRECT',
+      'description': 'reverse_fc2', 'etherType': '0x86DD',
+      'externalID': 'fc2', 'locationID': 'pg-dst',
+      'locationType': 'POLICYGROUP', 'networkType': 'ANY',
+      'protocol': 'icmp', 'redirectRewriteType': 'VLAN',
+      'redirectRewriteValue': VLAN_LABEL, 'redirectVPortTagID': 'rt-eg-ppgc',
+      'vlanRange': '*'}] +
+    _link_rules('reverse', '0x0800') +
+    _link_rules('reverse', '0x86DD') +
+    [_chain_rule('reverse', 'fc1', '0x0800', 'pg-in-ppga', 'rt-src', 100),
+     _chain_rule('reverse', 'fc2', '0x86DD', 'pg-in-ppga', 'rt-src', 0)])
+
+
+def _as_read_from_vsd(rule, priority):
+    """A compiled entry, spelled the way VSD returns it once created"""
+    vsd_rule = {'ID': 'vsd-%s' % priority, 'priority': priority,
+                'networkID': None, 'addressOverride': None,
+                'IPv6AddressOverride': None, 'DSCP': '*',
+                'sourcePort': '*', 'destinationPort': '*'}
+    for attribute, value in rule.items():
+        if attribute == 'destination_ip_prefix':
+            vsd_rule['networkID'] = 'macro-' + value
+        elif attribute == 'protocol' and value != 'ANY':
+            vsd_rule['protocol'] = str({'tcp': 6, 'icmp': 1}[value])
+        elif attribute in ('sourcePort', 'destinationPort'):
+            low, high = value.split('-')
+            vsd_rule[attribute] = low if low == high else value
+        elif attribute == 'IPv6AddressOverride':
+            vsd_rule[attribute] = value.replace('::', ':0:0::')
+        else:
+            vsd_rule[attribute] = str(value)
+    return vsd_rule
+
+
+def _prefix_macro(network_id):
+    cidr = network_id[len('macro-'):]
+    if ':' in cidr:
+        return {'IPv6Address': cidr, 'address': None, 'netmask': None}
+    return {'IPv6Address': None, 'address': cidr.split('/')[0],
+            'netmask': '255.255.255.0'}
+
+
+class TestNuageSFCPlugin(testtools.TestCase):
+
+    def setUp(self):
+        super(TestNuageSFCPlugin, self).setUp()
+        with mock.patch.object(NuageSFCPlugin, '__init__',
+                               return_value=None):
+            self.plugin = NuageSFCPlugin()
+        self.plugin.vsdclient = mock.Mock()
+
+    def _compile(self, ppgs=PPGS, symmetric=True,
+                 flow_classifiers=(TCP_CLASSIFIER, ICMP_CLASSIFIER)):
+        return self.plugin._compile_port_chain_rules(
+            PORT_CHAIN_ID, list(flow_classifiers), ppgs, NUAGE_PGS, RDTS,
+            FC_PGS, FC_RDTS, VLAN_LABEL, symmetric=symmetric)
+
+    # port chain compilation
+
+    def test_compile_symmetric_port_chain(self):
+        self.assertEqual(SYMMETRIC_CHAIN_RULES, self._compile(PPGS, True))
+        self.plugin.vsdclient.assert_not_called()
+
+    def test_compile_port_chain_forward_only(self):
+        self.assertEqual(SYMMETRIC_CHAIN_RULES[:8],
+                         self._compile(PPGS, False))
+
+    def test_compile_single_ppg_port_chain(self):
+        self.assertEqual([
+            SYMMETRIC_CHAIN_RULES[0],
+            SYMMETRIC_CHAIN_RULES[1],
+            _chain_rule('forward', 'fc1', '0x0800', 'pg-eg-ppga', 'rt-dst',
+                        100),
+            _chain_rule('forward', 'fc2', '0x86DD', 'pg-eg-ppga', 'rt-dst',
+                        0),
+            dict(SYMMETRIC_CHAIN_RULES[8], redirectVPortTagID='rt-eg-ppga'),
+            dict(SYMMETRIC_CHAIN_RULES[9], redirectVPortTagID='rt-eg-ppga'),
+            _chain_rule('reverse', 'fc1', '0x0800', 'pg-in-ppga', 'rt-src',
+                        100),
+            _chain_rule('reverse', 'fc2', '0x86DD', 'pg-in-ppga', 'rt-src',
+                        0)],
+            self._compile(['ppga'], True))
+
+    def test_compile_links_independent_of_flow_classifiers(self):
+        links = [rule for rule in self._compile(
+            flow_classifiers=[TCP_CLASSIFIER])
+            if rule['externalID'] == PORT_CHAIN_ID]
+        self.assertEqual(
+            _link_rules('forward', '0x0800') +
+            _link_rules('reverse', '0x0800'), links)
+        self.assertEqual(links, [
+            rule for rule in self._compile(
+                flow_classifiers=[TCP_CLASSIFIER_443, TCP_CLASSIFIER])
+            if rule['externalID'] == PORT_CHAIN_ID])
+
+    def test_compile_port_chain_without_ppgs(self):
+        self.assertEqual([], self._compile([], True))
+
+    def test_compile_port_chain_without_flow_classifiers(self):
+        self.assertEqual([], self._compile(flow_classifiers=[]))
+
+    # port chain programming
+
+    def test_program_port_chain_rules(self):
+        vsdclient = self.plugin.vsdclient
+        vsdclient.get_l3domain_np_id.return_value = 'np'
+        vsdclient.add_nuage_sfc_rule.side_effect = (
+            lambda tmplt, rule, np_id: {'ID': 'vsd-' + rule['description'],
+                                        'priority': rule['priority']})
+        on_exc = mock.Mock()
+        tmplt = {'ID': 'tmplt', 'parentType': 'domain', 'parentID': 'dom'}
+        rules = SYMMETRIC_CHAIN_RULES[:3]
+
+        created = self.plugin._program_port_chain_rules(
+            on_exc, tmplt, rules)
+
+        self.assertEqual([STEP, 2 * STEP, 3 * STEP],
+                         [vsd_rule['priority'] for vsd_rule in created])
+        vsdclient.get_l3domain_np_id.assert_called_once_with('dom')
+        self.assertEqual(
+            [mock.call(tmplt, dict(rule, priority=STEP * (index + 1)), 'np')
+             for index, rule in enumerate(rules)],
+            vsdclient.add_nuage_sfc_rule.call_args_list)
+        self.assertEqual(3, on_exc.call_count)
+        # the compiled rules are left untouched
+        self.assertNotIn('priority', rules[0])
+
+    def test_program_port_chain_rules_priorities(self):
+        vsdclient = self.plugin.vsdclient
+        vsdclient.add_nuage_sfc_rule.side_effect = (
+            lambda tmplt, rule, np_id: {'ID': 'vsd-' + rule['description'],
+                                        'priority': rule['priority']})
+        created = self.plugin._program_port_chain_rules(
+            mock.Mock(), {'ID': 'tmplt', 'parentType': 'domain',
+                          'parentID': 'dom'},
+            SYMMETRIC_CHAIN_RULES[:2], priorities=[10, 20])
+        self.assertEqual([10, 20],
+                         [vsd_rule['priority'] for vsd_rule in created])
+
+    def test_program_port_chain_rules_failure(self):
+        vsdclient = self.plugin.vsdclient
+        vsdclient.get_l2domain_fields_for_pg.return_value = {
+            'parentID': 'np', 'DHCPManaged': True}
+        error = restproxy.RESTProxyError('fail')
+
+        def add_rule(tmplt, rule, np_id):
+            if rule['priority'] == 2 * STEP:
+                raise error
+            return {'ID': 'vsd-%s' % rule['priority']}
+
+        vsdclient.add_nuage_sfc_rule.side_effect = add_rule
+        on_exc = mock.Mock()
+        tmplt = {'ID': 'tmplt', 'parentType': 'l2domain',
+                 'parentID': 'l2dom'}
+
+        self.assertRaises(restproxy.RESTProxyError,
+                          self.plugin._program_port_chain_rules,
+                          on_exc, tmplt, SYMMETRIC_CHAIN_RULES[:3])
+        # the created entries are rolled back with the rest of the chain
+        self.assertEqual(
+            [mock.call(vsdclient.delete_nuage_redirect_target_rule,
+                       'vsd-%s' % STEP),
+             mock.call(vsdclient.delete_nuage_redirect_target_rule,
+                       'vsd-%s' % (3 * STEP))],
+            on_exc.call_args_list)
+
+    def test_program_no_port_chain_rules(self):
+        self.assertEqual([], self.plugin._program_port_chain_rules(
+            mock.Mock(), {'ID': 'tmplt'}, []))
+        self.plugin.vsdclient.assert_not_called()
+
+    # port chain updates
+
+    @staticmethod
+    def _created(rules, step=STEP):
+        """The VSD entries of rules, created with the given step"""
+        return [_as_read_from_vsd(rule, step * (index + 1))
+                for index, rule in enumerate(rules)]
+
+    def _update(self, vsd_rules, rules):
+        vsdclient = self.plugin.vsdclient
+        vsdclient.get_nuage_sfc_rules.return_value = vsd_rules
+        vsdclient.get_nuage_prefix_macro.side_effect = _prefix_macro
+        vsdclient.get_l3domain_np_id.return_value = 'np'
+        vsdclient.add_nuage_sfc_rule.side_effect = (
+            lambda tmplt, rule, np_id: _as_read_from_vsd(
+                rule, rule['priority']))
+        on_exc = mock.Mock()
+        self.plugin._update_nuage_port_chain_rules(
+            on_exc, {'ID': 'tmplt', 'parentType': 'domain',
+                     'parentID': 'dom'}, rules)
+        return on_exc
+
+    def _added(self):
+        return [rule for (_tmplt, rule, _np_id), _kwargs
+                in self.plugin.vsdclient.add_nuage_sfc_rule.call_args_list]
+
+    def _deleted(self):
+        return sorted(
+            args[0] for args, _kwargs in
+            self.plugin.vsdclient.delete_nuage_redirect_target_rule.
+            call_args_list)
+
+    def assertPrioritiesFollow(self, rules, vsd_rules):
+        """Assert the entries after an update follow the compiled order"""
+        deleted = set(self._deleted())
+        entries = [vsd_rule for vsd_rule in vsd_rules
+                   if vsd_rule['ID'] not in deleted]
+        entries += [_as_read_from_vsd(rule, rule['priority'])
+                    for rule in self._added()]
+        entries.sort(key=lambda vsd_rule: int(vsd_rule['priority']))
+        self.assertEqual(
+            [self.plugin._sfc_rule_key(rule) for rule in rules],
+            [self.plugin._sfc_vsd_rule_key(vsd_rule, {})
+             for vsd_rule in entries])
+
+    def test_update_port_chain_unchanged(self):
+        on_exc = self._update(self._created(SYMMETRIC_CHAIN_RULES),
+                              SYMMETRIC_CHAIN_RULES)
+        vsdclient = self.plugin.vsdclient
+        vsdclient.add_nuage_sfc_rule.assert_not_called()
+        vsdclient.delete_nuage_redirect_target_rule.assert_not_called()
+        on_exc.assert_not_called()
+
+    def test_update_port_chain_appended_flow_classifier(self):
+        # neutron lists the flow classifiers of the chain as [fc1, fc3]
+        # instead of [fc1]; they are compiled in reverse order
+        vsd_rules = self._created(self._compile(
+            flow_classifiers=[TCP_CLASSIFIER]))
+        rules = self._compile(
+            flow_classifiers=[TCP_CLASSIFIER_443, TCP_CLASSIFIER])
+        self._update(vsd_rules, rules)
+
+        # only the entries of the new classifier are created
+        self.assertEqual(
+            [rule for rule in rules if rule['externalID'] == 'fc3'],
+            [{key: value for key, value in rule.items()
+              if key != 'priority'} for rule in self._added()])
+        self.assertEqual([], self._deleted())
+        self.assertPrioritiesFollow(rules, vsd_rules)
+
+    def test_update_port_chain_prepended_flow_classifier(self):
+        vsd_rules = self._created(self._compile(
+            flow_classifiers=[TCP_CLASSIFIER]))
+        rules = self._compile(
+            flow_classifiers=[TCP_CLASSIFIER, TCP_CLASSIFIER_443])
+        self._update(vsd_rules, rules)
+        self.assertEqual(['fc3'] * 4, [rule['externalID']
+                                       for rule in self._added()])
+        self.assertEqual([], self._deleted())
+        self.assertPrioritiesFollow(rules, vsd_rules)
+
+    def test_update_port_chain_reordered_flow_classifiers(self):
+        vsd_rules = self._created(self._compile(
+            flow_classifiers=[TCP_CLASSIFIER, TCP_CLASSIFIER_443]))
+        rules = self._compile(
+            flow_classifiers=[TCP_CLASSIFIER_443, TCP_CLASSIFIER])
+        self._update(vsd_rules, rules)
+        # the entries of one classifier are moved, the links stay
+        self.assertEqual(4, len(self._added()))
+        self.assertEqual(4, len(self._deleted()))
+        self.assertPrioritiesFollow(rules, vsd_rules)
+
+    def test_update_port_chain_without_room_in_between(self):
+        # entries created one priority apart get all created again
+        vsd_rules = self._created(self._compile(
+            flow_classifiers=[TCP_CLASSIFIER]), step=1)
+        rules = self._compile(
+            flow_classifiers=[TCP_CLASSIFIER_443, TCP_CLASSIFIER])
+        self._update(vsd_rules, rules)
+        self.assertEqual(
+            [len(vsd_rules) + STEP * (index + 1)
+             for index in range(len(rules))],
+            [rule['priority'] for rule in self._added()])
+        self.assertEqual(sorted(vsd_rule['ID'] for vsd_rule in vsd_rules),
+                         self._deleted())
+        self.assertPrioritiesFollow(rules, vsd_rules)
+
+    def test_update_port_chain_removed_flow_classifier(self):
+        vsd_rules = self._created(SYMMETRIC_CHAIN_RULES)
+        new_rules = self._compile(flow_classifiers=[TCP_CLASSIFIER])
+        on_exc = self._update(vsd_rules, new_rules)
+
+        self.plugin.vsdclient.add_nuage_sfc_rule.assert_not_called()
+        # the entries of the icmp classifier and its ipv6 links
+        removed = [vsd_rule for vsd_rule in vsd_rules
+                   if vsd_rule['etherType'] == '0x86DD']
+        self.assertEqual(8, len(removed))
+        self.assertEqual(sorted(vsd_rule['ID'] for vsd_rule in removed),
+                         self._deleted())
+        # the deleted entries are restored on rollback
+        self.assertEqual(
+            [mock.call(self.plugin.vsdclient.restore_nuage_sfc_rule,
+                       'tmplt', vsd_rule) for vsd_rule in removed],
+            on_exc.call_args_list)
+
+    def test_sfc_rule_keys_are_canonical(self):
+        self.plugin.vsdclient.get_nuage_prefix_macro.side_effect = (
+            _prefix_macro)
+        for index, rule in enumerate(SYMMETRIC_CHAIN_RULES):
+            vsd_rule = _as_read_from_vsd(rule, index + 1)
+            vsd_rule['etherType'] = vsd_rule['etherType'].lower()
+            self.assertEqual(
+                self.plugin._sfc_rule_key(rule),
+                self.plugin._sfc_vsd_rule_key(vsd_rule, {}))
@@ -0,0 +1,65 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_sriov.py
+
+import mock
+import testtools
+
+from nuage_neutron.plugins.common import cache
+from nuage_neutron.plugins.common import exceptions
+from nuage_neutron.plugins.sriov import mech_nuage
+
+
+class TestSriovGateways(testtools.TestCase):
+
+    def setUp(self):
+        super(TestSriovGateways, self).setUp()
+        self.driver = mech_nuage.NuageSriovMechanismDriver()
+        self.driver.vsdclient = mock.Mock()
+        self.driver.vsdclient.get_gateways.side_effect = (
+            lambda tenant_id, filters: [{'ID': 'gw-' + filters[
+                'system_id'][0]}])
+        self.driver._gateways = cache.ExpiringCache(10)
+
+    def test_cache_hit(self):
+        self.assertEqual({'ID': 'gw-switch1'},
+                         self.driver._get_gateway('tenant', 'switch1'))
+        self.assertEqual({'ID': 'gw-switch1'},
+                         self.driver._get_gateway('tenant', 'switch1'))
+        self.driver.vsdclient.get_gateways.assert_called_once_with(
+            'tenant', {'system_id': ['switch1']})
+
+    def test_cache_miss(self):
+        self.driver._get_gateway('tenant', 'switch1')
+        self.assertEqual({'ID': 'gw-switch2'},
+                         self.driver._get_gateway('tenant', 'switch2'))
+        self.assertEqual(2, self.driver.vsdclient.get_gateways.call_count)
+
+    @mock.patch.object(cache.time, 'time')
+    def test_expiry(self, now):
+        now.return_value = 100
+        self.driver._get_gateway('tenant', 'switch1')
+        now.return_value = 111
+        self.driver._get_gateway('tenant', 'switch1')
+        self.assertEqual(2, self.driver.vsdclient.get_gateways.call_count)
+
+    def test_not_found_not_cached(self):
+        self.driver.vsdclient.get_gateways.side_effect = None
+        self.driver.vsdclient.get_gateways.return_value = []
+        for attempt in range(2):
+            self.assertRaises(exceptions.NuageBadRequest,
+                              self.driver._get_gateway, 'tenant', 'switch1')
+        self.assertEqual(2, self.driver.vsdclient.get_gateways.call_count)
@@ -0,0 +1,423 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_trunk.py
+
+import mock
+from neutron_lib.services.trunk import constants as t_consts
+import testtools
+
+from nuage_neutron.plugins.common import trunk_utils
+from nuage_neutron.plugins.common import utils
+from nuage_neutron.plugins.nuage_ml2 import trunk_driver
+from nuage_neutron.vsdclient.impl import vsdclientimpl
+from nuage_neutron.vsdclient import restproxy
+
+
+def _subport(port_id, segmentation_id=10):
+    return mock.Mock(port_id=port_id, segmentation_id=segmentation_id,
+                     trunk_id='trunk')
+
+
+def _os_port(port_id, network_id='net1', subnet_ids=('subnet1',)):
+    return {'id': port_id, 'network_id': network_id, 'tenant_id': 'tenant',
+            'mac_address': 'fa:16:3e:00:00:0' + port_id[-1],
+            'fixed_ips': [{'subnet_id': subnet_id,
+                           'ip_address': '10.0.%s.%s' % (index,
+                                                         port_id[-1])}
+                          for index, subnet_id in enumerate(subnet_ids)]}
+
+
+class TrunkTestCase(testtools.TestCase):
+
+    def setUp(self):
+        super(TrunkTestCase, self).setUp()
+        # run the bulk calls on a green thread pool
+        patcher = mock.patch.object(utils.nuage_config,
+                                    'max_concurrent_vsd_requests',
+                                    return_value=4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestTrunkSubportsData(TrunkTestCase):
+
+    def setUp(self):
+        super(TestTrunkSubportsData, self).setUp()
+        self.handler = trunk_driver.NuageTrunkHandler(mock.Mock())
+        self.handler._core_plugin = mock.Mock()
+        self.vsdclient = self.handler.plugin_driver.vsdclient
+        self.vsdclient.get_net_partition_name_by_id.side_effect = (
+            lambda np_id: 'name-' + np_id)
+        core_plugin = self.handler.core_plugin
+        core_plugin.get_ports.return_value = [
+            _os_port('port1', subnet_ids=('subnet1', 'subnet6')),
+            _os_port('port2', network_id='net2', subnet_ids=('subnet2',)),
+            _os_port('port3', network_id='net2', subnet_ids=('subnet2',)),
+            _os_port('port4', subnet_ids=('subnet1',))]
+        core_plugin.get_subnets.return_value = [
+            {'id': 'subnet1', 'ip_version': 4},
+            {'id': 'subnet6', 'ip_version': 6},
+            {'id': 'subnet2', 'ip_version': 4}]
+        core_plugin.get_networks.return_value = [
+            {'id': 'net1', 'shared': False},
+            {'id': 'net2', 'shared': True}]
+        patcher = mock.patch.object(
+            trunk_driver.db, 'get_subnet_l2doms_by_subnet_ids',
+            return_value=[
+                {'subnet_id': 'subnet1', 'net_partition_id': 'np1',
+                 'nuage_subnet_id': 'l2dom1'},
+                {'subnet_id': 'subnet6', 'net_partition_id': 'np1',
+                 'nuage_subnet_id': 'l2dom1'},
+                {'subnet_id': 'subnet2', 'net_partition_id': 'np2',
+                 'nuage_subnet_id': 'l2dom2'}])
+        self.get_mappings = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bulk_lookups(self):
+        subports = [_subport('port1'), _subport('port2'), _subport('port3')]
+        subports_data, failed = self.handler._get_subports_data(
+            mock.Mock(), subports)
+
+        self.assertEqual([], failed)
+        self.assertEqual(subports, [port for port, _ in subports_data])
+        self.assertEqual(
+            {'id': 'port1', 'mac': 'fa:16:3e:00:00:01',
+             'ipv4': '10.0.0.1', 'ipv6': '10.0.1.1',
+             'net_partition_id': 'np1', 'net_partition_name': 'name-np1',
+             'nuage_subnet_id': 'l2dom1'},
+            subports_data[0][1])
+        self.assertEqual(['np1', 'np2', 'np2'],
+                         [data['net_partition_id']
+                          for _, data in subports_data])
+        core_plugin = self.handler.core_plugin
+        self.assertEqual(1, core_plugin.get_ports.call_count)
+        self.assertEqual(1, core_plugin.get_subnets.call_count)
+        self.assertEqual(1, core_plugin.get_networks.call_count)
+        self.assertEqual(1, self.get_mappings.call_count)
+        # once per net-partition, and per tenant for the shared network
+        self.assertEqual(
+            [mock.call('np1'), mock.call('np2')],
+            self.vsdclient.get_net_partition_name_by_id.call_args_list)
+        self.vsdclient.create_usergroup.assert_called_once_with('tenant',
+                                                                'np2')
+
+    def test_failed_subports(self):
+        self.vsdclient.create_usergroup.side_effect = (
+            restproxy.RESTProxyError('fail'))
+        subports = [_subport('port1'), _subport('port2'),
+                    _subport('missing'), _subport('port4')]
+        subports_data, failed = self.handler._get_subports_data(
+            mock.Mock(), subports)
+        # the usergroup of the shared network or the port can't be found
+        self.assertEqual(['port2', 'missing'],
+                         [port.port_id for port in failed])
+        self.assertEqual(['port1', 'port4'],
+                         [port.port_id for port, _ in subports_data])
+
+
+class TestTrunkSetSubports(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTrunkSetSubports, self).setUp()
+        self.handler = trunk_driver.NuageTrunkHandler(mock.Mock())
+        self.vsdclient = self.handler.plugin_driver.vsdclient
+        self.subports = [_subport('port1'), _subport('port2'),
+                         _subport('port3')]
+        for method, kwargs in (
+                ('set_trunk_status', {}),
+                ('_get_subports_data', {'return_value': (
+                    [(port, {}) for port in self.subports[:2]],
+                    [self.subports[2]])}),
+                ('_update_subport_bindings', {'return_value': {
+                    'trunk': self.subports}})):
+            patcher = mock.patch.object(self.handler, method, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(trunk_driver.n_ctx, 'get_admin_context')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _statuses(self):
+        return [args[2] for args, _kwargs
+                in self.handler.set_trunk_status.call_args_list]
+
+    def test_all_subports_added(self):
+        self.handler._get_subports_data.return_value = (
+            [(port, {}) for port in self.subports], [])
+        self.vsdclient.add_subports.return_value = [
+            (port, None) for port in self.subports]
+        self.handler._set_sub_ports('trunk', self.subports)
+        self.assertEqual([], self._statuses())
+
+    def test_some_subports_failed(self):
+        self.vsdclient.add_subports.return_value = [
+            (self.subports[0], None),
+            (self.subports[1], restproxy.RESTProxyError('fail'))]
+        self.handler._set_sub_ports('trunk', self.subports)
+        self.vsdclient.add_subports.assert_called_once_with(
+            'trunk', [(port, {}) for port in self.subports[:2]])
+        self.assertEqual([t_consts.TRUNK_DEGRADED_STATUS], self._statuses())
+        # the subports are bound all the same
+        self.handler._update_subport_bindings.assert_called_once_with(
+            mock.ANY, 'trunk', self.subports)
+
+    def test_add_subports_failed(self):
+        self.vsdclient.add_subports.side_effect = (
+            restproxy.RESTProxyError('fail'))
+        self.handler._set_sub_ports('trunk', self.subports)
+        self.assertEqual([t_consts.TRUNK_DEGRADED_STATUS], self._statuses())
+
+
+class TestVsdClientAddSubports(TrunkTestCase):
+
+    def setUp(self):
+        super(TestVsdClientAddSubports, self).setUp()
+        with mock.patch.object(vsdclientimpl.VsdClientImpl, '__init__',
+                               return_value=None):
+            self.vsdclient = vsdclientimpl.VsdClientImpl()
+        self.vsdclient.trunk = mock.Mock()
+        self.vsdclient.trunk.get_trunk.side_effect = (
+            lambda os_trunk_id, np_id, required: {'ID': 'vsd-trunk-' + np_id})
+        patcher = mock.patch.object(
+            self.vsdclient, 'get_nuage_vport_by_neutron_id',
+            side_effect=lambda params, required: {
+                'ID': 'vport-' + params['neutron_port_id']})
+        self.get_vport = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _data(self, port_id, np_id):
+        return _subport(port_id), {'net_partition_id': np_id,
+                                   'nuage_subnet_id': 'l2dom-' + np_id}
+
+    def test_trunk_looked_up_once_per_net_partition(self):
+        subports_data = [self._data('port1', 'np1'),
+                         self._data('port2', 'np2'),
+                         self._data('port3', 'np1')]
+        results = self.vsdclient.add_subports('trunk', subports_data)
+
+        self.assertEqual([(port, None) for port, _ in subports_data],
+                         results)
+        self.assertEqual(
+            [mock.call('trunk', 'np1', required=True),
+             mock.call('trunk', 'np2', required=True)],
+            self.vsdclient.trunk.get_trunk.call_args_list)
+        self.assertEqual(
+            sorted([('vsd-trunk-np1', 'vport-port1'),
+                    ('vsd-trunk-np2', 'vport-port2'),
+                    ('vsd-trunk-np1', 'vport-port3')]),
+            sorted((args[0], args[2]) for args, _kwargs in
+                   self.vsdclient.trunk.add_subport_to_trunk.call_args_list))
+
+    def test_subport_exceptions(self):
+        error = restproxy.ResourceNotFoundException('no vport')
+
+        def get_vport(params, required):
+            if params['neutron_port_id'] == 'port2':
+                raise error
+            return {'ID': 'vport-' + params['neutron_port_id']}
+
+        self.get_vport.side_effect = get_vport
+        subports_data = [self._data('port1', 'np1'),
+                         self._data('port2', 'np1'),
+                         self._data('port3', 'np1')]
+        results = self.vsdclient.add_subports('trunk', subports_data)
+
+        self.assertEqual([None, error, None],
+                         [exception for _, exception in results])
+        self.assertEqual(2, self.vsdclient.trunk.add_subport_to_trunk.
+                         call_count)
+
+    def test_missing_trunk_fails_all(self):
+        self.vsdclient.trunk.get_trunk.side_effect = (
+            restproxy.ResourceNotFoundException('no trunk'))
+        self.assertRaises(restproxy.ResourceNotFoundException,
+                          self.vsdclient.add_subports, 'trunk',
+                          [self._data('port1', 'np1')])
+
+
+class TestUnsetSubports(testtools.TestCase):
+
+    PORT_DATA = {'binding:host_id': None, 'device_owner': '',
+                 'device_id': ''}
+
+    def setUp(self):
+        super(TestUnsetSubports, self).setUp()
+        self.core_plugin = mock.Mock()
+        self.vif_types = {}
+        self.core_plugin.update_port.side_effect = self._update_port
+        self.remove_from_vsd = mock.Mock(
+            side_effect=lambda ports: [(port, None) for port in ports])
+
+    def _update_port(self, context, port_id, data):
+        vif_type = self.vif_types.get(port_id, 'unbound')
+        if isinstance(vif_type, Exception):
+            raise vif_type
+        return {'id': port_id, 'binding:vif_type': vif_type}
+
+    def _unset(self, port_ids):
+        return trunk_utils.unset_subports(
+            self.core_plugin, mock.Mock(), 'trunk',
+            [_subport(port_id) for port_id in port_ids], self.PORT_DATA,
+            remove_from_vsd=self.remove_from_vsd)
+
+    def test_unset(self):
+        unbound = self._unset(['port1', 'port2'])
+        self.assertEqual(['port1', 'port2'],
+                         [port['id'] for port in unbound])
+        self.remove_from_vsd.assert_called_once_with(unbound)
+        self.assertEqual(
+            [mock.call(mock.ANY, port_id, {'port': self.PORT_DATA})
+             for port_id in ('port1', 'port2')],
+            self.core_plugin.update_port.call_args_list)
+
+    def test_only_unbound_ports_removed_from_vsd(self):
+        # a port still bound and a port of which the update failed
+        self.vif_types = {'port2': 'ovs', 'port3': ValueError('fail')}
+        unbound = self._unset(['port1', 'port2', 'port3', 'port4'])
+        self.assertEqual(['port1', 'port4'],
+                         [port['id'] for port in unbound])
+        self.remove_from_vsd.assert_called_once_with(unbound)
+
+    def test_failed_vsd_removals_retried_one_by_one(self):
+        error = restproxy.RESTProxyError('fail')
+        self.remove_from_vsd.side_effect = [
+            [({'id': 'port1'}, None), ({'id': 'port2'}, error),
+             ({'id': 'port3'}, error)],
+            [({'id': 'port2'}, None)],
+            [({'id': 'port3'}, error)]]
+        unbound = self._unset(['port1', 'port2', 'port3'])
+        # unbound all the same
+        self.assertEqual(3, len(unbound))
+        self.assertEqual(
+            [mock.call(unbound), mock.call([{'id': 'port2'}]),
+             mock.call([{'id': 'port3'}])],
+            self.remove_from_vsd.call_args_list)
+
+    def test_nothing_unbound(self):
+        self.vif_types = {'port1': 'ovs'}
+        self.assertEqual([], self._unset(['port1']))
+        self.remove_from_vsd.assert_not_called()
+
+
+class TestTrunkUnsetSubports(TrunkTestCase):
+
+    def setUp(self):
+        super(TestTrunkUnsetSubports, self).setUp()
+        self.handler = trunk_driver.NuageTrunkHandler(mock.Mock())
+        self.handler._core_plugin = mock.Mock()
+        self.vsdclient = self.handler.plugin_driver.vsdclient
+        self.vif_types = {}
+        self.handler.core_plugin.update_port.side_effect = (
+            lambda context, port_id, data: self._update_port(port_id))
+        self.vsdclient.remove_subports.side_effect = (
+            lambda ports_and_mappings: [(os_port, None) for os_port, _
+                                        in ports_and_mappings])
+        patcher = mock.patch.object(self.handler, 'set_trunk_status')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(trunk_driver.n_ctx, 'get_admin_context')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            trunk_driver.db, 'get_subnet_l2doms_by_port_ids',
+            side_effect=lambda session, port_ids: {
+                port_id: {'nuage_subnet_id': 'l2dom'}
+                for port_id in port_ids if port_id != 'unmapped'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _update_port(self, port_id):
+        vif_type = self.vif_types.get(port_id, 'unbound')
+        if isinstance(vif_type, Exception):
+            raise vif_type
+        return {'id': port_id, 'binding:vif_type': vif_type}
+
+    def _unset(self, port_ids, host='host1'):
+        self.handler._unset_sub_ports(
+            'trunk', {'binding:host_id': host},
+            [_subport(port_id) for port_id in port_ids])
+        return [args[2] for args, _kwargs
+                in self.handler.set_trunk_status.call_args_list]
+
+    def _removed_from_vsd(self):
+        return [os_port['id'] for args, _kwargs
+                in self.vsdclient.remove_subports.call_args_list
+                for os_port, _mapping in args[0]]
+
+    def test_unset(self):
+        self.assertEqual([t_consts.TRUNK_ACTIVE_STATUS],
+                         self._unset(['port1', 'port2']))
+        self.assertEqual(['port1', 'port2'], self._removed_from_vsd())
+
+    def test_unset_unbound_trunk(self):
+        self.assertEqual([t_consts.TRUNK_DOWN_STATUS],
+                         self._unset(['port1'], host=None))
+
+    def test_binding_error_degrades_trunk(self):
+        self.vif_types = {'port2': 'ovs'}
+        self.assertEqual([t_consts.TRUNK_DEGRADED_STATUS],
+                         self._unset(['port1', 'port2', 'port3']))
+        self.assertEqual(['port1', 'port3'], self._removed_from_vsd())
+
+    def test_update_failure_degrades_trunk(self):
+        self.vif_types = {'port1': ValueError('fail')}
+        self.assertEqual([t_consts.TRUNK_DEGRADED_STATUS],
+                         self._unset(['port1', 'port2']))
+        self.assertEqual(['port2'], self._removed_from_vsd())
+
+    def test_vsd_failures_do_not_degrade_trunk(self):
+        # as before, a subport unbound in neutron is removed from the
+        # trunk, whether or not VSD could be updated
+        self.vsdclient.remove_subports.side_effect = (
+            lambda ports_and_mappings: [
+                (os_port, restproxy.RESTProxyError('fail'))
+                for os_port, _ in ports_and_mappings])
+        self.assertEqual([t_consts.TRUNK_ACTIVE_STATUS],
+                         self._unset(['port1', 'unmapped']))
+        # the mapped port, then retried on its own
+        self.assertEqual(['port1', 'port1'], self._removed_from_vsd())
+
+    def test_remove_subports_from_vsd(self):
+        results = self.handler._remove_subports_from_vsd(
+            mock.Mock(), [{'id': 'port1'}, {'id': 'unmapped'}])
+        self.assertEqual([{'id': 'unmapped'}, {'id': 'port1'}],
+                         [os_port for os_port, _ in results])
+        self.assertIsInstance(results[0][1],
+                              trunk_driver.nuage_exc.SubnetMappingNotFound)
+        self.assertIsNone(results[1][1])
+        self.vsdclient.remove_subports.assert_called_once_with(
+            [({'id': 'port1'}, {'nuage_subnet_id': 'l2dom'})])
+
+
+class TestVsdClientRemoveSubports(TrunkTestCase):
+
+    def test_remove_subports(self):
+        with mock.patch.object(vsdclientimpl.VsdClientImpl, '__init__',
+                               return_value=None):
+            vsdclient = vsdclientimpl.VsdClientImpl()
+        error = restproxy.RESTProxyError('fail')
+
+        def remove_subport(os_port, subnet_mapping):
+            if os_port['id'] == 'port2':
+                raise error
+
+        items = [({'id': port_id}, {}) for port_id in
+                 ('port1', 'port2', 'port3')]
+        with mock.patch.object(vsdclient, 'remove_subport',
+                               side_effect=remove_subport):
+            results = vsdclient.remove_subports(items)
+        self.assertEqual([({'id': 'port1'}, None), ({'id': 'port2'}, error),
+                          ({'id': 'port3'}, None)], results)
@@ -0,0 +1,97 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_nuage_vm.py
+
+import mock
+import testtools
+
+from nuage_neutron.vsdclient.common import constants
+from nuage_neutron.vsdclient.resources.vm import NuageVM
+from nuage_neutron.vsdclient import restproxy
+
+
+class TestNuageVM(testtools.TestCase):
+
+    def test_compare_ip_uses_host_address(self):
+        self.assertTrue(NuageVM._compare_ip(
+            {'vip': '10.0.0.5/24', 'port_ips': ['10.0.0.5']}))
+        self.assertTrue(NuageVM._compare_ip(
+            {'vip': '10.0.0.5', 'port_ips': ['10.0.0.4', '10.0.0.5']}))
+        self.assertTrue(NuageVM._compare_ip(
+            {'vip': 'cafe::5/64', 'port_ips': ['cafe::5']}))
+        # the network address of the vip prefix is not the vip
+        self.assertFalse(NuageVM._compare_ip(
+            {'vip': '10.0.0.5/24', 'port_ips': ['10.0.0.0']}))
+        self.assertFalse(NuageVM._compare_ip(
+            {'vip': '10.0.0.6/32', 'port_ips': ['10.0.0.5']}))
+
+    @staticmethod
+    def _vip_params(vip):
+        return {'vip': vip, 'mac': 'fa:16:3e:00:00:01',
+                'vport_id': 'vport', 'externalID': 'port',
+                'subnet_id': 'subnet', 'vsd_l3domain_id': 'domain',
+                'os_fip': mock.MagicMock(id='os-fip',
+                                         floating_ip_address='1.1.1.1')}
+
+    def test_create_vip_in_use_deletes_created_fip(self):
+        vsdclient = mock.Mock()
+        vsdclient.get_nuage_fip_by_id.return_value = None
+        vsdclient.create_nuage_floatingip.return_value = 'vsd-fip'
+        vm = NuageVM(mock.Mock(), vsdclient)
+        params = self._vip_params('10.0.0.10')
+        in_use = restproxy.RESTProxyError(
+            vsd_code=constants.VSD_IP_IN_USE_ERR_CODE)
+        with mock.patch.object(vm, 'create_vip_on_vport',
+                               side_effect=in_use):
+            self.assertTrue(vm._create_vip(
+                params, {'subn_type': constants.SUBNET}))
+        vsdclient.delete_nuage_floatingip.assert_called_once_with('vsd-fip')
+
+    def test_create_vip_keeps_existing_fip(self):
+        vsdclient = mock.Mock()
+        vsdclient.get_nuage_fip_by_id.return_value = {
+            'nuage_fip_id': 'vsd-fip'}
+        vm = NuageVM(mock.Mock(), vsdclient)
+        params = self._vip_params('10.0.0.10')
+        in_use = restproxy.RESTProxyError(
+            vsd_code=constants.VSD_IP_IN_USE_ERR_CODE)
+        with mock.patch.object(vm, 'create_vip_on_vport',
+                               side_effect=in_use):
+            self.assertTrue(vm._create_vip(
+                params, {'subn_type': constants.SUBNET}))
+        vsdclient.delete_nuage_floatingip.assert_not_called()
+
+    def test_process_vips_rollback_deletes_created_fips(self):
+        vsdclient = mock.Mock()
+        rest = mock.Mock()
+        vm = NuageVM(rest, vsdclient)
+        created = self._vip_params('10.0.0.10')
+        failed = self._vip_params('10.0.0.11')
+        error = restproxy.RESTProxyError(
+            error_code=constants.REST_SERV_INTERNAL_ERROR)
+
+        def process_vip(params):
+            if params is failed:
+                raise error
+            params['created_vsd_fip_id'] = 'vsd-fip'
+            params['nuage_vip'] = {'ID': 'vip', 'virtualIP': params['vip']}
+            return False
+
+        with mock.patch.object(vm, 'process_vip', side_effect=process_vip):
+            self.assertRaises(restproxy.RESTProxyError,
+                              vm.process_vips, [created, failed])
+        self.assertEqual(1, rest.delete.call_count)
+        vsdclient.delete_nuage_floatingip.assert_called_once_with('vsd-fip')
@@ -0,0 +1,111 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_ovsdb_client.py
+
+import json
+import socket
+import threading
+
+import mock
+import testtools
+
+from nuage_neutron.agent.linux import exceptions as nuage_exc
+from nuage_neutron.agent.linux import ovsdb_client
+
+
+class FakeOvsdbServer(threading.Thread):
+    """Answers transact requests, in small chunks, after an echo request"""
+
+    def __init__(self, sock, handler):
+        super(FakeOvsdbServer, self).__init__()
+        self.daemon = True
+        self.sock = sock
+        self.handler = handler
+        self.requests = []
+
+    def run(self):
+        self.sock.sendall(json.dumps(
+            {'id': 'echo', 'method': 'echo', 'params': []}).encode())
+        decoder = json.JSONDecoder()
+        buf = ''
+        while True:
+            data = self.sock.recv(16)
+            if not data:
+                return
+            buf += data.decode()
+            while buf.strip():
+                buf = buf.lstrip()
+                try:
+                    message, end = decoder.raw_decode(buf)
+                except ValueError:
+                    break
+                buf = buf[end:]
+                if message.get('method') != 'transact':
+                    continue
+                self.requests.append(message)
+                response = json.dumps(self.handler(message)).encode()
+                for i in range(0, len(response), 1000):
+                    self.sock.sendall(response[i:i + 1000])
+
+
+class TestOvsdbClient(testtools.TestCase):
+
+    def _get_client(self, handler):
+        client_sock, server_sock = socket.socketpair()
+        self.addCleanup(server_sock.close)
+        server = FakeOvsdbServer(server_sock, handler)
+        server.start()
+        patcher = mock.patch.object(socket, 'create_connection',
+                                    return_value=client_sock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        client = ovsdb_client.OvsdbClient()
+        self.addCleanup(client.close)
+        return client, server
+
+    def test_pipelined_large_responses(self):
+        def handler(request):
+            rows = [{'name': request['params'][1]['table'] * 1000}] * 50
+            return {'id': request['id'], 'error': None,
+                    'result': [{'rows': rows}]}
+
+        client, server = self._get_client(handler)
+        tables = ['table%d' % i for i in range(20)]
+        results = client.transact_many(
+            [[{'op': 'select', 'table': table, 'where': []}]
+             for table in tables])
+        self.assertEqual([table * 1000 for table in tables],
+                         [result[0]['rows'][0]['name'] for result in results])
+        self.assertEqual(20, len(server.requests))
+        stats = client.get_stats()
+        self.assertEqual(1, stats['batches'])
+        self.assertEqual(20, stats['transactions'])
+        self.assertEqual(1, stats['connects'])
+
+    def test_errors(self):
+        def handler(request):
+            if request['params'][1]['op'] == 'insert':
+                return {'id': request['id'], 'error': None,
+                        'result': [{'error': 'constraint violation'}, None]}
+            return {'id': request['id'], 'error': 'unknown database',
+                    'result': None}
+
+        client, _ = self._get_client(handler)
+        result = client.transact([{'op': 'insert'}, {'op': 'update'}])
+        self.assertEqual([{'error': 'constraint violation'}],
+                         client.get_errors(result))
+        self.assertRaises(nuage_exc.NuageDriverException,
+                          client.transact, [{'op': 'select'}])
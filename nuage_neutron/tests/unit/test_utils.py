@@ -0,0 +1,93 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_utils.py
+
+import testtools
+
+from nuage_neutron.plugins.common import utils
+from nuage_neutron.vsdclient.restproxy import RESTProxyError
+
+
+def _raise(error):
+    if error:
+        raise error
+    return 'result'
+
+
+@utils.ignore_vsd_errors
+class FakeVsdClient(object):
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def get_thing(self):
+        return _raise(self.error)
+
+    def delete_thing(self):
+        return _raise(self.error)
+
+    def update_thing(self):
+        return _raise(self.error)
+
+    @staticmethod
+    def get_static(error):
+        return _raise(error)
+
+
+class TestIgnoreVsdErrors(testtools.TestCase):
+
+    NOT_FOUND = RESTProxyError('not found', error_code=404, vsd_code='404')
+    NO_UPDATE = RESTProxyError('no changes', error_code=409, vsd_code=2039)
+    OTHER = RESTProxyError('conflict', error_code=409, vsd_code='2510')
+
+    def _call(self, method, error):
+        return getattr(FakeVsdClient(error), method)()
+
+    def test_results_returned(self):
+        for method in ('get_thing', 'delete_thing', 'update_thing'):
+            self.assertEqual('result', self._call(method, None))
+
+    def test_get_and_delete_ignore_not_found_and_no_update(self):
+        for method in ('get_thing', 'delete_thing'):
+            for error in (self.NOT_FOUND, self.NO_UPDATE):
+                result = self._call(method, error)
+                self.assertIsInstance(result, utils.Ignored)
+                self.assertFalse(result)
+                self.assertIs(error, result.exception)
+
+    def test_others_ignore_no_update_only(self):
+        result = self._call('update_thing', self.NO_UPDATE)
+        self.assertIsInstance(result, utils.Ignored)
+        self.assertIs(self.NO_UPDATE, result.exception)
+        self.assertRaises(RESTProxyError, self._call, 'update_thing',
+                          self.NOT_FOUND)
+
+    def test_other_errors_propagate(self):
+        for method in ('get_thing', 'delete_thing', 'update_thing'):
+            self.assertRaises(RESTProxyError, self._call, method,
+                              self.OTHER)
+            self.assertRaises(ValueError, self._call, method, ValueError())
+        # no vsd code at all
+        self.assertRaises(RESTProxyError, self._call, 'get_thing',
+                          RESTProxyError('unreachable'))
+
+    def test_wrapped_once(self):
+        self.assertEqual('get_thing', FakeVsdClient.get_thing.__name__)
+        self.assertIs(FakeVsdClient.get_thing, FakeVsdClient.get_thing)
+        # only the class' own functions, not dunders nor staticmethods
+        self.assertNotIn('__wrapped__', vars(FakeVsdClient.__init__))
+        self.assertRaises(RESTProxyError, FakeVsdClient.get_static,
+                          self.NOT_FOUND)
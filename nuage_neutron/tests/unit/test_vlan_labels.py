@@ -0,0 +1,49 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# run me using :
+# python -m testtools.run nuage_neutron/tests/unit/test_vlan_labels.py
+
+import binascii
+
+import testtools
+
+from nuage_neutron.sfc import vlan_labels
+
+
+class TestVlanLabelBitmap(testtools.TestCase):
+
+    def test_bytes_compatible_with_hexlified_int(self):
+        # the format written by previous releases
+        vlan_bit_map = ((1 << 4094) - 1) & ~(1 << 0) & ~(1 << 70)
+        blob = binascii.unhexlify('%x' % vlan_bit_map)
+
+        bitmap = vlan_labels.VlanLabelBitmap.from_bytes(blob)
+        self.assertFalse(bitmap.is_free(1))
+        self.assertFalse(bitmap.is_free(71))
+        self.assertTrue(bitmap.is_free(2))
+        self.assertEqual(4092, bitmap.free_count())
+        self.assertEqual(blob, bitmap.to_bytes())
+
+    def test_allocate_and_free(self):
+        bitmap = vlan_labels.VlanLabelBitmap()
+        self.assertEqual([1, 2, 3], bitmap.allocate(3))
+        bitmap.free([2])
+        self.assertEqual([2, 4], bitmap.allocate(2))
+
+        self.assertEqual(4090, len(bitmap.allocate(4090)))
+        self.assertEqual([], bitmap.allocate())
+        bitmap.free([4094, 100])
+        self.assertEqual([100, 4094], bitmap.allocate(2))
+        self.assertRaises(ValueError, bitmap.free, [4095])
@@ -19,6 +19,7 @@ try:
 except ImportError:
     from neutron.i18n import _
 
+from nuage_neutron.plugins.common import utils
 from nuage_neutron.vsdclient.common.cms_id_helper import get_vsd_external_id
 from nuage_neutron.vsdclient.common import constants
 from nuage_neutron.vsdclient.common import helper
@@ -28,9 +29,15 @@ from nuage_neutron.vsdclient import restproxy
 LOG = logging.getLogger(__name__)
 
 
-def _add_policy_group_for_no_port_sec(gw_type, subn_id, rtr_id, pg_obj,
-                                      nuage_vport_id):
-    policy_group_list = []
+def _get_policy_group_for_no_port_sec(gw_type, subnet_id, subn_type,
+                                      pg_obj, restproxy_serv):
+    if subn_type == constants.SUBNET:
+        subn_id = None
+        rtr_id = helper._get_nuage_domain_id_from_subnet(restproxy_serv,
+                                                         subnet_id)
+    else:
+        subn_id = subnet_id
+        rtr_id = None
     params = {
         'l2dom_id': subn_id,
         'rtr_id': rtr_id,
@@ -38,9 +45,7 @@ def _add_policy_group_for_no_port_sec(gw_type, subn_id, rtr_id, pg_obj,
         'sg_type': (constants.SOFTWARE if gw_type in constants.SW_GW_TYPES
                     else constants.HARDWARE)
     }
-    pg_id = pg_obj.create_nuage_sec_grp_for_no_port_sec(params)
-    policy_group_list.append(pg_id)
-    pg_obj.update_vport_policygroups(nuage_vport_id, policy_group_list)
+    return pg_obj.create_nuage_sec_grp_for_no_port_sec(params)
 
 
 def _create_vport_interface(subnet_id, pg_obj, restproxy_serv,
@@ -48,6 +53,15 @@ def _create_vport_interface(subnet_id, pg_obj, restproxy_serv,
     gw_type = params.get('gw_type')
     nuage_vlan_id = params.get('nuage_vlan_id')
 
+    policy_group = policy_group and not params.get('nuage_managed_subnet')
+    if policy_group:
+        # the policy group does not depend on the vport: get it, or create
+        # it, while the vport and its interface get created
+        memo = utils.LookupMemo()
+        policy_group_id = memo.spawn(_get_policy_group_for_no_port_sec,
+                                     gw_type, subnet_id, subn_type, pg_obj,
+                                     restproxy_serv)
+
     req_params = dict()
     extra_params = {
         'vlan': nuage_vlan_id,
@@ -108,15 +122,9 @@ def _create_vport_interface(subnet_id, pg_obj, restproxy_serv,
         on_res_exists=restproxy_serv.retrieve_by_external_id,
         ignore_err_codes=[restproxy.REST_IFACE_EXISTS_ERR_CODE])[0]
 
-    if policy_group and not params.get('nuage_managed_subnet'):
-        if subn_type == constants.SUBNET:
-            nuage_rtr_id = helper._get_nuage_domain_id_from_subnet(
-                restproxy_serv, subnet_id)
-            _add_policy_group_for_no_port_sec(gw_type, None, nuage_rtr_id,
-                                              pg_obj, nuage_vport_id)
-        else:
-            _add_policy_group_for_no_port_sec(gw_type, subnet_id, None,
-                                              pg_obj, nuage_vport_id)
+    if policy_group:
+        pg_obj.update_vport_policygroups(nuage_vport_id,
+                                         [policy_group_id.wait()])
     return {
         'vport': vport,
         'interface': vport_intf
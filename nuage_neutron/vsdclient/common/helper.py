@@ -39,36 +39,6 @@ VSD_RESP_OBJ = constants.VSD_RESP_OBJ
 
 LOG = logging.getLogger(__name__)
 
-# This is global definition of the local cache that we gonna keep
-cache = {}
-
-
-class MemoizeClass(type):
-    """This is singleton class with memoize logic
-
-    Memoization effectively refers to remembering
-    ("memoization" -> "memorandum" -> to be remembered) results of
-    method calls based on the method inputs and then returning the
-    remembered result rather than computing the result again.
-    You can think of it as a cache for method results.
-
-    It returns the values from the cache if the called with
-    same arguments.
-    """
-    global cache
-
-    def __call__(cls, *args, **kwargs):
-        """Cache lookup
-
-        Here I am making this key unique so that even it treats
-        the cache of different class called with same arguments as
-        different entry and adds it to the cache
-        """
-        key = str(cls) + str(args) + str(kwargs)
-        if key not in cache:
-            cache[key] = super(MemoizeClass, cls).__call__(*args, **kwargs)
-        return cache[key]
-
 
 def get_l3domid_for_netpartition(restproxy_serv, np_id, name):
     req_params = {
@@ -468,6 +438,14 @@ def get_nuage_subnet(restproxy_serv, subnet_mapping):
     return subnets[0] if subnets else None
 
 
+def get_address_ranges(restproxy_serv, nuage_subnet_id, subnet_type):
+    parent = (nuagelib.NuageL2Domain.resource
+              if subnet_type == constants.L2DOMAIN
+              else nuagelib.NuageSubnet.resource)
+    return restproxy_serv.get(nuagelib.AddressRange.get_url(
+        parent=parent, parent_id=nuage_subnet_id))
+
+
 def get_domain_subnet_by_ext_id_and_cidr(restproxy_serv, neutron_subnet):
     params = {
         'externalID': get_subnet_external_id(neutron_subnet),
@@ -898,6 +876,14 @@ def _chunked_extra_header_match_any_filter(field, values,
                        field, '","'.join(chunk))}
 
 
+def predicate_header(predicate):
+    """Creates the X-Nuage-Filter header for a predicate, if any"""
+    if not predicate:
+        return None
+    return {'X-Nuage-FilterType': 'predicate',
+            'X-Nuage-Filter': predicate}
+
+
 def get_by_field_values(restproxy_serv, resource, field_name, field_values,
                         **kwargs):
     """Get objects which have field_name IN(field_values)
@@ -2403,6 +2403,14 @@ class VsdChildResource(VsdResource):
                            parent_id=parent_id) + '?responseChoice=1'
 
 
+class AddressRange(VsdChildResource):
+    resource = 'addressranges'
+
+
+class Domain(VsdChildResource):
+    resource = 'domains'
+
+
 class Job(VsdChildResource):
     resource = 'jobs'
 
@@ -13,13 +13,10 @@
 #    under the License.
 
 import logging
-from time import sleep
-
-from eventlet.green import threading
-import six
 
 from nuage_neutron.plugins.common import config as nuage_config
 from nuage_neutron.plugins.common import constants as plugin_constants
+from nuage_neutron.plugins.common import utils
 from nuage_neutron.plugins.common.utils import SubnetUtilsBase
 from nuage_neutron.vsdclient.common import cms_id_helper
 from nuage_neutron.vsdclient.common import constants
@@ -40,7 +37,7 @@ from nuage_neutron.vsdclient.vsdclient import VsdClient
 LOG = logging.getLogger(__name__)
 
 
-@six.add_metaclass(helper.MemoizeClass)
+@utils.ignore_vsd_errors
 class VsdClientImpl(VsdClient, SubnetUtilsBase):
     __renew_auth_key = True
 
@@ -52,12 +49,17 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
         super(VsdClientImpl, self).__init__()
         self.restproxy = restproxy.RESTProxyServer(**kwargs)
 
-        response = self.restproxy.generate_nuage_auth()
+        # the client is not lazy: it authenticates and verifies the cms id
+        # when it is created, so a misconfigured VSD fails the startup. The
+        # clients are shared by VsdClientFactory, so this happens once for
+        # all plugins of a process.
+        with utils.STARTUP_TIMINGS.timed('vsd_authentication'):
+            self.restproxy.generate_nuage_auth()
         if self.__renew_auth_key:
-            threading.Thread(target=self._auth_key_renewal,
-                             args=[response]).start()
+            self.restproxy.auth_token.enable_proactive_renewal()
 
-        self.verify_cms(cms_id)
+        with utils.STARTUP_TIMINGS.timed('verify_cms'):
+            self.verify_cms(cms_id)
         cms_id_helper.CMS_ID = cms_id
 
         self.net_part = netpartition.NuageNetPartition(self.restproxy)
@@ -74,19 +76,13 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
                                             self.policygroups)
         self.trunk = trunk.NuageTrunk(self.restproxy)
 
-    def _auth_key_renewal(self, api_key_info):
-        """Sleep until the renewal window, renew the key, and sleep again.
-
-        :param api_key_info: Information about the auth key.
-        """
-        while True:
-            sleep(self.restproxy.compute_sleep_time(api_key_info))
-            api_key_info = self.restproxy.generate_nuage_auth()
-
     def verify_cms(self, cms_id):
         cms = nuagelib.NuageCms(create_params={'cms_id': cms_id})
         self.restproxy.get(cms.get_resource(), required=True)
 
+    def warm_up(self, connections=0):
+        return self.restproxy.warm_up(connections)
+
     def get_usergroup(self, tenant, net_partition_id):
         return helper.get_usergroup(self.restproxy, tenant, net_partition_id)
 
@@ -124,8 +120,8 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def link_default_netpartition(self, params):
         return self.net_part.link_default_netpartition(params)
 
-    def get_net_partitions(self):
-        return self.net_part.get_net_partitions()
+    def get_net_partitions(self, vsd_filter=None):
+        return self.net_part.get_net_partitions(vsd_filter)
 
     def get_netpartition_by_name(self, name):
         return self.net_part.get_netpartition_by_name(name)
@@ -145,8 +141,8 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def set_fip_quota_at_ent_profile(self, fip_quota):
         self.net_part.set_fip_quota_at_ent_profile(fip_quota)
 
-    def get_subnet_by_netpart(self, netpart_id):
-        return self.l2domain.get_subnet_by_netpart(netpart_id)
+    def get_subnet_by_netpart(self, netpart_id, vsd_filter=None):
+        return self.l2domain.get_subnet_by_netpart(netpart_id, vsd_filter)
 
     def create_subnet(self, ipv4_subnet, ipv6_subnet, params):
         mapping = params.get('mapping')
@@ -225,6 +221,9 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def get_router_by_external(self, id):
         return self.domain.get_router_by_external(id)
 
+    def get_routers_by_external_ids(self, ids):
+        return self.domain.get_routers_by_external_ids(ids)
+
     def move_l2domain_to_l3subnet(self, l2domain_id, l3subnetwork_id):
         self.l2domain.move_to_l3(l2domain_id, l3subnetwork_id)
 
@@ -301,8 +300,8 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def check_unused_policygroups(self, securitygroup_ids, sg_type='SOFTWARE'):
         self.policygroups.check_unused_policygroups(securitygroup_ids, sg_type)
 
-    def get_zone_by_domainid(self, domain_id):
-        return self.domain.get_zone_by_domainid(domain_id)
+    def get_zone_by_domainid(self, domain_id, vsd_filter=None):
+        return self.domain.get_zone_by_domainid(domain_id, vsd_filter)
 
     def get_zone_by_routerid(self, neutron_router_id, shared=False):
         return self.domain.get_zone_by_routerid(neutron_router_id, shared)
@@ -314,16 +313,16 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def get_nuage_port_by_id(self, params):
         return helper.get_nuage_port_by_id(self.restproxy, params)
 
-    def get_routers_by_netpart(self, netpart_id):
-        return self.domain.get_routers_by_netpart(netpart_id)
+    def get_routers_by_netpart(self, netpart_id, vsd_filter=None):
+        return self.domain.get_routers_by_netpart(netpart_id, vsd_filter)
 
     def get_fip_underlay_enabled_domain_by_netpart(self, netpart_id):
         return self.domain.get_fip_underlay_enabled_domain_by_netpart(
             netpart_id)
 
-    def get_domain_subnet_by_zone_id(self, zone_id):
+    def get_domain_subnet_by_zone_id(self, zone_id, vsd_filter=None):
         return self.domain.domainsubnet.get_domain_subnet_by_zone_id(
-            zone_id)
+            zone_id, vsd_filter)
 
     def get_domain_subnet_by_id(self, subnet_id):
         subnet = self.domain.domainsubnet.get_domain_subnet_by_id(subnet_id)
@@ -375,6 +374,10 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
         return self.domain.domainsubnet.create_shared_subnet(
             vsd_zone_id, subnet, params)
 
+    def get_address_ranges(self, nuage_subnet_id, subnet_type):
+        return helper.get_address_ranges(self.restproxy, nuage_subnet_id,
+                                         subnet_type)
+
     def get_nuage_subnet_by_mapping(self, subnet_mapping, required=False):
         nuage_id = subnet_mapping['nuage_subnet_id']
         try:
@@ -613,6 +616,13 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
         return self.redirecttargets.add_nuage_sfc_rule(tmplt, rule_params,
                                                        np_id)
 
+    def get_nuage_sfc_rules(self, fwd_policy_id):
+        return self.redirecttargets.get_nuage_sfc_rules(fwd_policy_id)
+
+    def restore_nuage_sfc_rule(self, fwd_policy_id, vsd_rule):
+        return self.redirecttargets.restore_nuage_sfc_rule(fwd_policy_id,
+                                                           vsd_rule)
+
     def get_nuage_redirect_target_rules(self, params):
         return self.redirecttargets.get_nuage_redirect_target_rules(params)
 
@@ -704,13 +714,23 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def nuage_vports_on_subnet(self, subnet_id):
         return self.vm.nuage_vports_on_subnet(subnet_id)
 
+    def get_vport_dhcp_options(self, vport_id, ip_version):
+        return self.dhcp_options.get_vport_dhcp_options(vport_id, ip_version)
+
     def crt_or_updt_vport_dhcp_option(self, extra_dhcp_opt, resource_id,
-                                      external_id):
+                                      external_id, vport_dhcp_options=None):
         return self.dhcp_options.create_update_extra_dhcp_option_on_vport(
-            extra_dhcp_opt, resource_id, external_id)
+            extra_dhcp_opt, resource_id, external_id, vport_dhcp_options)
 
-    def delete_vport_nuage_dhcp(self, dhcp_opt, vport_id):
-        return self.dhcp_options.delete_vport_nuage_dhcp(dhcp_opt, vport_id)
+    def delete_vport_nuage_dhcp(self, dhcp_opt, vport_id,
+                                vport_dhcp_options=None):
+        return self.dhcp_options.delete_vport_nuage_dhcp(dhcp_opt, vport_id,
+                                                         vport_dhcp_options)
+
+    def restore_vport_dhcp_option(self, vport_id, ip_version, option_number,
+                                  vport_dhcp_options):
+        return self.dhcp_options.restore_vport_dhcp_option(
+            vport_id, ip_version, option_number, vport_dhcp_options)
 
     def delete_vport_dhcp_option(self, dhcp_id, ip_version, on_rollback):
         return self.dhcp_options.delete_nuage_extra_dhcp_option(dhcp_id,
@@ -850,11 +870,14 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def create_vip(self, params):
         return self.vm.process_vip(params)
 
+    def create_vips(self, params_list):
+        return self.vm.process_vips(params_list)
+
     def get_vips(self, vport_id):
         return self.vm.get_vips_on_vport(vport_id)
 
-    def delete_vips(self, vport_id, vip_dict, vips):
-        self.vm.delete_vips(vport_id, vip_dict, vips)
+    def delete_vips(self, vport_id, vip_dict, vips, nuage_vips=None):
+        self.vm.delete_vips(vport_id, vip_dict, vips, nuage_vips=nuage_vips)
 
     def update_fip_to_vips(self, neutron_subnet_id, vip, vsd_fip_id):
         self.vm.update_fip_to_vips(neutron_subnet_id, vip, vsd_fip_id)
@@ -865,6 +888,9 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
     def process_deleted_addr_pair(self, params):
         self.vm.process_deleted_addr_pair(params)
 
+    def process_deleted_addr_pairs(self, params_list):
+        self.vm.process_deleted_addr_pairs(params_list)
+
     def change_perm_of_subns(self, nuage_npid, nuage_subnetid, shared,
                              tenant_id, remove_everybody=False):
         helper.change_perm_of_subns(self.restproxy, nuage_npid,
@@ -946,9 +972,14 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
             **filters)
 
     def get_nuage_plugin_stats(self):
-        stats = {}
+        stats = {'startup_timings': utils.STARTUP_TIMINGS.as_dict(),
+                 'warmup_timings': utils.WARMUP_TIMINGS.as_dict()}
         if nuage_config.is_enabled(plugin_constants.DEBUG_API_STATS):
             stats['api_count'] = self.restproxy.api_count
+            auth_stats = self.restproxy.auth_token.get_stats()
+            stats['auth_renewals'] = auth_stats['renewals']
+            stats['auth_renewal_failures'] = auth_stats['renewal_failures']
+            stats['auth_renewal_latency'] = auth_stats['renewal_latency']
         return stats
 
     # Trunk
@@ -976,6 +1007,37 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
         self.trunk.add_subport(os_trunk_id, os_subport,
                                vport['ID'], data)
 
+    def add_subports(self, os_trunk_id, subports_data):
+        """Add subports to a trunk, concurrently.
+
+        :param os_trunk_id: id of the openstack trunk
+        :param subports_data: list of (os_subport, data) tuples, data as for
+            add_subport
+        :return: list of (os_subport, exception) tuples, in order.
+            exception is None when the subport got added.
+        """
+        vsd_trunk_ids = {}
+        for _, data in subports_data:
+            np_id = data['net_partition_id']
+            if np_id not in vsd_trunk_ids:
+                vsd_trunk_ids[np_id] = self.trunk.get_trunk(
+                    os_trunk_id, np_id, required=True)['ID']
+
+        def add_subport(subport_data):
+            os_subport, data = subport_data
+            params = {
+                'neutron_port_id': os_subport.port_id,
+                'l2dom_id': data.get('nuage_subnet_id'),
+                'l3dom_id': data.get('nuage_subnet_id')
+            }
+            vport = self.get_nuage_vport_by_neutron_id(params, required=True)
+            self.trunk.add_subport_to_trunk(
+                vsd_trunk_ids[data['net_partition_id']], os_subport,
+                vport['ID'], data)
+
+        return [(subport_data[0], exception) for subport_data, _, exception
+                in utils.bulk_call(add_subport, subports_data)]
+
     def remove_subport(self, os_port, subnet_mapping):
         params = {
             'neutron_port_id': os_port['id'],
@@ -985,5 +1047,16 @@ class VsdClientImpl(VsdClient, SubnetUtilsBase):
         vport = self.get_nuage_vport_by_neutron_id(params, required=True)
         self.trunk.remove_subport(os_port, vport)
 
+    def remove_subports(self, ports_and_mappings):
+        """Remove subports from their trunk, concurrently.
+
+        :param ports_and_mappings: list of (os_port, subnet_mapping) tuples
+        :return: list of (os_port, exception) tuples, in order.
+            exception is None when the subport got removed.
+        """
+        return [(item[0], exception) for item, _, exception
+                in utils.bulk_call(lambda item: self.remove_subport(*item),
+                                   ports_and_mappings)]
+
     def update_subport(self, os_port, vport, data):
         self.trunk.update_subport(os_port, vport, data)
@@ -16,6 +16,7 @@ import logging
 
 import netaddr
 
+from nuage_neutron.plugins.common import cache
 from nuage_neutron.vsdclient.common import cms_id_helper
 from nuage_neutron.vsdclient.common import constants
 from nuage_neutron.vsdclient.common import helper
@@ -23,6 +24,7 @@ from nuage_neutron.vsdclient.common import nuagelib
 from nuage_neutron.vsdclient import restproxy
 
 DHCP_OPTIONS = constants.DHCP_OPTIONS
+ENCODING_CACHE_SIZE = 1024
 LOG = logging.getLogger(__name__)
 
 
@@ -57,29 +59,76 @@ class NuageDhcpOptions(object):
         """
         LOG.debug('create_nuage_dhcp() for resource %s '
                   'network type %s', parent_id, network_type)
+        self._reconcile_nuage_dhcp(subnet, parent_id, network_type)
 
-        opts_todo = []
+    def get_subnet_dhcp_payloads(self, subnet, network_type):
+        """Function:  get_subnet_dhcp_payloads
+
+        Encodes the nuage DHCP options of a subnet, keyed on their type
+
+        subnet         : neutron subnet
+        network_type   : l2 only domain or domain/subnet
+        """
+        payloads = {}
         ip_version = subnet['ip_version']
         dhcp_options = DHCP_OPTIONS[ip_version]
         # ipv4 and ipv6
         if subnet.get('dns_nameservers'):
-            opts_todo.append(dhcp_options['dns_nameservers'])
+            payloads[dhcp_options['dns_nameservers']] = self._get_dns_tmpl(
+                ip_version, subnet['dns_nameservers'])
         # ipv4 only
         if ip_version == 4:
             if subnet.get('host_routes'):
-                opts_todo.append(
-                    dhcp_options['classless-static-route'])
-                opts_todo.append(
-                    dhcp_options['microsoft-classless-static-route'])
+                for route_type in ('classless-static-route',
+                                   'microsoft-classless-static-route'):
+                    payloads[dhcp_options[route_type]] = (
+                        self._get_static_rte_tmpl(
+                            ip_version, subnet['host_routes'], route_type))
             if (subnet.get('gateway_ip') and
                     network_type == constants.NETWORK_TYPE_L2):
-                opts_todo.append(
-                    dhcp_options['gateway_ip'])
-        for opt in opts_todo:
-            self._create_nuage_dhcp_options(subnet,
-                                            parent_id,
-                                            network_type,
-                                            opt)
+                payloads[dhcp_options['gateway_ip']] = (
+                    self._get_gateway_ip_tmpl(ip_version,
+                                              subnet['gateway_ip']))
+        external_id = helper.get_external_id_based_on_subnet_id(subnet)
+        for data in payloads.values():
+            data['externalID'] = external_id
+        return payloads
+
+    def _reconcile_nuage_dhcp(self, subnet, parent_id, network_type,
+                              delete_types=()):
+        """Function:  _reconcile_nuage_dhcp
+
+        Sets the nuage DHCP options of a subnet on a l2 only domain or
+        domain/subnet, listing the options which are set already only once.
+        Options which are set already with the same value are left alone.
+
+        subnet         : neutron subnet
+        parent_id      : Nuage l2 only domain or dom/subnet ID
+        network_type   : l2 only domain or domain/subnet
+        delete_types   : types of the DHCP options to delete
+        """
+        ip_version = subnet['ip_version']
+        nuage_dhcp_options = nuagelib.NuageDhcpOptions(ip_version)
+        if network_type == constants.NETWORK_TYPE_L2:
+            resource = nuage_dhcp_options.resource_by_l2domainid(parent_id)
+        else:
+            resource = nuage_dhcp_options.resource_by_subnetid(parent_id)
+        existing = {option['type']: option
+                    for option in self.restproxy.get(resource)}
+        for dhcp_type in delete_types:
+            if dhcp_type in existing:
+                self.restproxy.delete(nuage_dhcp_options.dhcp_resource(
+                    existing.pop(dhcp_type)['ID']))
+        payloads = self.get_subnet_dhcp_payloads(subnet, network_type)
+        for dhcp_type, data in payloads.items():
+            option = existing.get(dhcp_type)
+            if option is None:
+                self._set_nuage_dhcp_options(parent_id, ip_version, data,
+                                             None, network_type)
+            elif (option.get('value') != data['value'] or
+                  option.get('length') != data['length']):
+                self._set_nuage_dhcp_options(parent_id, ip_version, data,
+                                             option['ID'], network_type)
 
     def clear_nuage_dhcp_for_ip_version(self, ip_version, parent_id,
                                         network_type):
@@ -139,37 +188,54 @@ class NuageDhcpOptions(object):
                     not subnet['gateway_ip'] and
                     network_type == constants.NETWORK_TYPE_L2):
                 opts_todo.append(dhcp_options['gateway_ip'])
-        for opt in opts_todo:
-            self._delete_nuage_dhcp_option(
-                parent_id, network_type, ip_version, opt)
-        self.create_nuage_dhcp(subnet, parent_id, network_type)
+        self._reconcile_nuage_dhcp(subnet, parent_id, network_type,
+                                   delete_types=opts_todo)
 
-    def delete_vport_nuage_dhcp(self, dhcp_opt, vport_id):
+    def get_vport_dhcp_options(self, vport_id, ip_version):
+        nuage_dhcp_options = nuagelib.NuageDhcpOptions(ip_version)
+        return self.restproxy.get(
+            nuage_dhcp_options.resource_by_vportid(vport_id))
+
+    def _get_vport_dhcp_option_id(self, vport_id, ip_version, option_number,
+                                  vport_dhcp_options=None):
+        dhcp_type = helper.convert_hex_for_vsd(hex(option_number))
+        if vport_dhcp_options is None:
+            return self._check_dhcp_option_exists(
+                vport_id, constants.VPORT, ip_version, dhcp_type)
+        return self._is_option_already_present(vport_dhcp_options, dhcp_type)
+
+    def delete_vport_nuage_dhcp(self, dhcp_opt, vport_id,
+                                vport_dhcp_options=None):
         """Function:  delete_nuage_extra_dhcp_option
 
         Delete the nuage DHCP options for the Vports
 
-        dhcp_opt       : DHCP opt to delete from VSD.
-        vport_id       : Vport on which to delete the DHCP option.
+        dhcp_opt           : DHCP opt to delete from VSD.
+        vport_id           : Vport on which to delete the DHCP option.
+        vport_dhcp_options : DHCP options of the Vport, when fetched already.
         """
         LOG.debug('delete nuage dhcp option for resource {}'.format(vport_id))
         ip_version = dhcp_opt['ip_version']
         nuage_dhcp_options = nuagelib.NuageDhcpOptions(ip_version)
-        dhcp_id = self._check_dhcp_option_exists(
-            vport_id, constants.VPORT, ip_version,
-            helper.convert_hex_for_vsd(hex(dhcp_opt['opt_name'])))
+        dhcp_id = self._get_vport_dhcp_option_id(
+            vport_id, ip_version, dhcp_opt['opt_name'], vport_dhcp_options)
+        if not dhcp_id and vport_dhcp_options is not None:
+            return None
         resp = self.restproxy.delete(nuage_dhcp_options.dhcp_resource(dhcp_id))
         return resp
 
     def create_update_extra_dhcp_option_on_vport(self, extra_dhcp_opt,
-                                                 parent_id, external_id):
+                                                 parent_id, external_id,
+                                                 vport_dhcp_options=None):
         """Function:  create_update_extra_dhcp_option_on_vport
 
         Creates/Updates nuage DHCP options on Vport
 
-        extra_dhcp_opt : extra DHCP options details to be configured.
-        parent_id      : Vport on which to create the DHCP options.
-        external_id    : neutron portID on which we create the DHCP options.
+        extra_dhcp_opt     : extra DHCP options details to be configured.
+        parent_id          : Vport on which to create the DHCP options.
+        external_id        : neutron portID on which we create the DHCP
+                             options.
+        vport_dhcp_options : DHCP options of the Vport, when fetched already.
         """
         LOG.debug('Create/Update nuage dhcp option for '
                   'resource {}'.format(parent_id))
@@ -180,9 +246,8 @@ class NuageDhcpOptions(object):
         external_id = cms_id_helper.get_vsd_external_id(external_id)
         length = 0
         opt_value = ""
-        dhcp_id = self._check_dhcp_option_exists(
-            parent_id, constants.VPORT, ip_version,
-            helper.convert_hex_for_vsd(hex(option_number)))
+        dhcp_id = self._get_vport_dhcp_option_id(
+            parent_id, ip_version, option_number, vport_dhcp_options)
         if option_number in constants.PRCS_DHCP_OPT_AS_RAW_HEX[ip_version]:
             try:
                 for value in option_value:
@@ -204,6 +269,33 @@ class NuageDhcpOptions(object):
         return self._set_nuage_dhcp_options(parent_id, ip_version, data,
                                             dhcp_id, constants.VPORT)
 
+    def restore_vport_dhcp_option(self, vport_id, ip_version, option_number,
+                                  vport_dhcp_options):
+        """Function:  restore_vport_dhcp_option
+
+        Restores a DHCP option on a Vport as it was before it got created,
+        updated or deleted.
+
+        vport_id           : Vport of the DHCP option.
+        ip_version         : IP version of the option.
+        option_number      : number of the DHCP option.
+        vport_dhcp_options : DHCP options of the Vport as they were.
+        """
+        dhcp_id = self._get_vport_dhcp_option_id(vport_id, ip_version,
+                                                 option_number)
+        old_id = self._get_vport_dhcp_option_id(
+            vport_id, ip_version, option_number, vport_dhcp_options)
+        if not old_id:
+            if dhcp_id:
+                self.delete_nuage_extra_dhcp_option(dhcp_id, ip_version, True)
+            return
+        old_option = next(option for option in vport_dhcp_options
+                          if option['ID'] == old_id)
+        data = {key: old_option[key]
+                for key in ('type', 'length', 'value', 'externalID')}
+        self._set_nuage_dhcp_options(vport_id, ip_version, data, dhcp_id,
+                                     constants.VPORT)
+
     def delete_nuage_extra_dhcp_option(self, dhcp_id, ip_version, on_rollback):
         nuage_dhcp_options = nuagelib.NuageDhcpOptions(ip_version)
         try:
@@ -214,51 +306,6 @@ class NuageDhcpOptions(object):
                              e.message)
             raise
 
-    def _create_nuage_dhcp_options(self, subnet, resource_id,
-                                   resource_type, dhcp_option):
-        """Function:  create_nuage_dhcp_options
-
-        Creates the nuage DHCP options on a l2 only domain and domain/subnet
-
-        subnet        : openstack subnet
-        resource_id   : Nuage l2 only domain or dom/subnetID
-        resource_type : l2 domain or domain/subnet
-        dhcp_option   : Type of the DHCP option
-        """
-        LOG.debug('_create_nuage_dhcp_options() for resource %s', resource_id)
-        ip_version = subnet['ip_version']
-        dhcp_options = DHCP_OPTIONS[ip_version]
-        dhcp_id = self._check_dhcp_option_exists(resource_id, resource_type,
-                                                 ip_version, dhcp_option)
-
-        if dhcp_option == dhcp_options['dns_nameservers']\
-                and subnet['dns_nameservers']:
-            data = self._get_dns_tmpl(ip_version, subnet['dns_nameservers'])
-        elif ip_version == 4:
-            if (dhcp_option == dhcp_options[
-                    'microsoft-classless-static-route'] and
-                    subnet['host_routes']):
-                data = self._get_static_rte_tmpl(
-                    ip_version,
-                    subnet['host_routes'], 'microsoft-classless-static-route')
-            elif (dhcp_option == dhcp_options['classless-static-route'] and
-                  subnet['host_routes']):
-                data = self._get_static_rte_tmpl(
-                    ip_version,
-                    subnet['host_routes'], 'classless-static-route')
-            elif (dhcp_option == dhcp_options['gateway_ip'] and
-                  subnet['gateway_ip']):
-                data = self._get_gateway_ip_tmpl(
-                    ip_version, subnet['gateway_ip'])
-            else:
-                raise Exception("Unknown DHCPv4 option")
-        else:
-            raise Exception("Unknown DHCP option")
-
-        data['externalID'] = helper.get_external_id_based_on_subnet_id(subnet)
-        self._set_nuage_dhcp_options(resource_id, ip_version, data,
-                                     dhcp_id, resource_type)
-
     def _set_nuage_dhcp_options(self, resource_id, ip_version,
                                 data, dhcp_id=False, resource_type=None):
         """Function:  set_nuage_dhcp_options
@@ -301,27 +348,6 @@ class NuageDhcpOptions(object):
             return self.restproxy.delete(
                 nuage_dhcp_options.dhcp_resource(dhcp_id))
 
-    def _delete_nuage_dhcp_option(self, subnet_id, isl2dom, ip_version,
-                                  dhcp_type):
-        """Function:  _delete_nuage_dhcp_option
-
-        Deletes the nuage DHCP options on a l2 only doamain and domain/subnet
-
-        subnet_id     : Nuage l2 only domian or dom/subnet ID
-        isl2dom       : l2 only domain or domain/subnet
-        ip_version    : IP version of the option
-        dhcp_type     : Type of the DHCP option
-        """
-        LOG.debug('_delete_nuage_dhcp_option() called for subnet %s '
-                  'dhcp_type %s', subnet_id, dhcp_type)
-        # Check if the dhcp options exists of type dhcp_type on this l2/l3
-        # subnet
-        dhcp_id = self._check_dhcp_option_exists(subnet_id, isl2dom,
-                                                 ip_version, dhcp_type)
-        if dhcp_id:
-            nuage_dhcp_options = nuagelib.NuageDhcpOptions(ip_version)
-            self.restproxy.delete(nuage_dhcp_options.dhcp_resource(dhcp_id))
-
     def _check_dhcp_option_exists(self, resource_id, resource_type,
                                   ip_version, dhcp_type):
         """Function:  _check_dhcp_option_exists
@@ -356,42 +382,65 @@ class NuageDhcpOptions(object):
         return None
 
     def _get_dns_tmpl(self, ip_version, dns_list):
-        _dns_length = format(4 * len(dns_list), '02x')
-        _dns = ""
-        for dns_item in dns_list:
-            _dns = _dns + self.get_ip_hex_value(netaddr.IPNetwork(dns_item).ip)
+        _dns, _dns_length = _encode_dns(tuple(dns_list))
         return NuageDhcpOptions._get_dhcp_template(
             ip_version, _dns, _dns_length, 'dns_nameservers')
 
     # TODO(team): Will move this util function to common utils
     @staticmethod
     def get_ip_hex_value(ip):
-        return str(hex(ip)[2:]).zfill(8)
+        return _ip_hex_value(ip)
 
     def _get_static_rte_tmpl(self, ip_version,
                              static_routes, static_route_type):
-        # minimum is 5, multiplied by the number of routes
-        _length_d = len(static_routes) * 5
-        _data = ""
-        for static_route in static_routes:
-            _ip = netaddr.IPNetwork(static_route['destination'])
-            # length of the subnet
-            _netmask_length = \
-                sum([1 for a in str(_ip.netmask).split('.') if int(a) > 0])
-            _length_d = _length_d + _netmask_length
-            cidr_prefix = format(_ip.prefixlen, '02x')
-            # need to do that to get the correction padding for length
-            cidr_ip = self.get_ip_hex_value(_ip.ip)[:_netmask_length * 2]
-            _ip = netaddr.IPAddress(static_route['nexthop'])
-            nexthop_ip = self.get_ip_hex_value(_ip)
-            _data += "%s%s%s" % (cidr_prefix, cidr_ip, nexthop_ip)
-        _length = format(_length_d, '02x')
+        _data, _length = _encode_static_routes(
+            tuple((static_route['destination'], static_route['nexthop'])
+                  for static_route in static_routes))
         return NuageDhcpOptions._get_dhcp_template(
             ip_version, _data, _length, static_route_type)
 
     def _get_gateway_ip_tmpl(self, ip_version, gateway_ip):
-        _length = format(4, '02x')
-        _ip = netaddr.IPAddress(gateway_ip)
-        _data = self.get_ip_hex_value(_ip)
+        _data, _length = _encode_gateway_ip(gateway_ip)
         return NuageDhcpOptions._get_dhcp_template(
             ip_version, _data, _length, 'gateway_ip')
+
+
+def _ip_hex_value(ip):
+    return str(hex(ip)[2:]).zfill(8)
+
+
+@cache.memoize(ENCODING_CACHE_SIZE)
+def _encode_dns(dns_servers):
+    _dns_length = format(4 * len(dns_servers), '02x')
+    _dns = ""
+    for dns_item in dns_servers:
+        _dns = _dns + _ip_hex_value(netaddr.IPNetwork(dns_item).ip)
+    return _dns, _dns_length
+
+
+@cache.memoize(ENCODING_CACHE_SIZE)
+def _encode_static_routes(static_routes):
+    # minimum is 5, multiplied by the number of routes
+    _length_d = len(static_routes) * 5
+    _data = ""
+    for destination, nexthop in static_routes:
+        _ip = netaddr.IPNetwork(destination)
+        # length of the subnet
+        _netmask_length = \
+            sum([1 for a in str(_ip.netmask).split('.') if int(a) > 0])
+        _length_d = _length_d + _netmask_length
+        cidr_prefix = format(_ip.prefixlen, '02x')
+        # need to do that to get the correction padding for length
+        cidr_ip = _ip_hex_value(_ip.ip)[:_netmask_length * 2]
+        _ip = netaddr.IPAddress(nexthop)
+        nexthop_ip = _ip_hex_value(_ip)
+        _data += "%s%s%s" % (cidr_prefix, cidr_ip, nexthop_ip)
+    _length = format(_length_d, '02x')
+    return _data, _length
+
+
+@cache.memoize(ENCODING_CACHE_SIZE)
+def _encode_gateway_ip(gateway_ip):
+    _length = format(4, '02x')
+    _ip = netaddr.IPAddress(gateway_ip)
+    return _ip_hex_value(_ip), _length
@@ -94,6 +94,19 @@ class NuageDomain(object):
             required=True)
         return l3_doms[0] if l3_doms else None
 
+    def get_routers_by_external_ids(self, ext_ids):
+        """Get the l3 domains of routers, in the order of ext_ids
+
+        Routers without l3 domain are left out.
+        """
+        vsd_ext_ids = [get_vsd_external_id(ext_id) for ext_id in ext_ids]
+        l3_doms = {l3_dom['externalID']: l3_dom
+                   for l3_dom in helper.get_by_field_values(
+                       self.restproxy, nuagelib.Domain, 'externalID',
+                       vsd_ext_ids)}
+        return [l3_doms[ext_id] for ext_id in vsd_ext_ids
+                if ext_id in l3_doms]
+
     def get_router_by_id(self, nuage_l3domain_id, required=False):
         params = {
             'domain_id': nuage_l3domain_id
@@ -113,9 +126,11 @@ class NuageDomain(object):
                 get_vsd_external_id(neutron_router_id)))
         return fwd_temps[0]['ID'] if fwd_temps else None
 
-    def get_routers_by_netpart(self, netpart_id):
+    def get_routers_by_netpart(self, netpart_id, vsd_filter=None):
         nuagel3dom = nuagelib.NuageL3Domain({'net_partition_id': netpart_id})
         return self.restproxy.get(nuagel3dom.get_all_resources_in_ent(),
+                                  extra_headers=helper.predicate_header(
+                                      vsd_filter),
                                   required=True)
 
     def get_fip_underlay_enabled_domain_by_netpart(self, netpart_id):
@@ -423,9 +438,11 @@ class NuageDomain(object):
                 neutron_tenant_id),
             ignore_err_codes=[constants.CONFLICT_ERR_CODE])
 
-    def get_zone_by_domainid(self, domain_id):
+    def get_zone_by_domainid(self, domain_id, vsd_filter=None):
         nuage_l3_domain = nuagelib.NuageL3Domain({'domain_id': domain_id})
         zones = self.restproxy.get(nuage_l3_domain.get_all_zones(),
+                                   extra_headers=helper.predicate_header(
+                                       vsd_filter),
                                    required=True)
         res = []
         for zone in zones:
@@ -570,9 +587,11 @@ class NuageDomainSubnet(object):
         return helper.get_domain_subnet_by_ext_id_and_cidr(self.restproxy,
                                                            neutron_subnet)
 
-    def get_domain_subnet_by_zone_id(self, zone_id):
+    def get_domain_subnet_by_zone_id(self, zone_id, vsd_filter=None):
         subnet = nuagelib.NuageSubnet({'zone': zone_id})
-        return self.restproxy.get(subnet.get_all_resources_in_zone())
+        return self.restproxy.get(
+            subnet.get_all_resources_in_zone(),
+            extra_headers=helper.predicate_header(vsd_filter))
 
     def update_domain_subnet_to_dualstack(self, ipv4_subnet, ipv6_subnet,
                                           params):
@@ -22,6 +22,7 @@ except ImportError:
 
 from nuage_neutron.plugins.common import exceptions as nuage_exc
 from nuage_neutron.plugins.common import nuagedb
+from nuage_neutron.plugins.common import utils
 
 from nuage_neutron.vsdclient.common.cms_id_helper import get_vsd_external_id
 from nuage_neutron.vsdclient.common.cms_id_helper import strip_cms_id
@@ -250,27 +251,24 @@ class NuageGateway(object):
             vlan_list = self._get_vlans_for_tenant(tenant_id, netpart_id)
 
         if tenant_id:
+            permitted = self._get_tenant_vlan_ids(
+                [vlan['ID'] for vlan in vlan_list], tenant_id)
             updated_vlan_list = []
             for vlan in vlan_list:
-                # Get permissions for each vlan
-                ent_perm = gw_helper.get_ent_permission_on_vlan(self.restproxy,
-                                                                vlan['ID'])
-                if ent_perm:
-                    vlan_perm = self._check_tenant_perm(
-                        vlan['ID'],
-                        tenant_id,
-                        ent_perm['permittedEntityID'])
-                    if vlan_perm:
-                        vlan['assignedTo'] = tenant_id
-                        updated_vlan_list.append(vlan)
+                if vlan['ID'] in permitted:
+                    vlan['assignedTo'] = tenant_id
+                    updated_vlan_list.append(vlan)
 
             return updated_vlan_list
         else:
             # Now get the assigned tenant_id for each vlan and update vlan in
             # place
-            for vlan in vlan_list:
-                vlan_perm = gw_helper.get_tenant_perm(self.restproxy,
-                                                      vlan['ID'])
+            results = utils.bulk_call(
+                lambda vlan: gw_helper.get_tenant_perm(self.restproxy,
+                                                       vlan['ID']),
+                vlan_list)
+            utils.raise_first_bulk_error(results)
+            for vlan, vlan_perm, error in results:
                 if vlan_perm:
                     vlan['assignedTo'] = vlan_perm['permittedEntityName']
 
@@ -279,27 +277,64 @@ class NuageGateway(object):
     def _get_vlans_for_tenant(self, tenant_id, netpart_id):
         # Get all the gateways in the enterprise
         gws = self.get_gateways(tenant_id, filters=None)
-        # Get all the gatewayports
-        gw_port_vlans = []
-        for gw in gws:
-            req_params = {
+
+        # Get all the gatewayports, then all their vlans, of all gateways
+        # at once
+        def get_ports(gw):
+            return self._get_gateway_ports(req_params={
                 'gw_id': gw['ID'],
                 'personality': gw['personality'],
                 'redundant': gw['redundant']
-            }
+            })
 
-            gw_ports = self._get_gateway_ports(req_params=req_params)
-            for gw_port in gw_ports:
-                # Get all the vlans
-                req_params = {
-                    'port_id': gw_port['ID'],
-                    'personality': gw['personality'],
-                    'redundant': gw['redundant']
-                }
-                gw_port_vlans.extend(
-                    self._get_gateway_port_vlans(tenant_id, req_params))
-
-        return gw_port_vlans if gw_port_vlans else []
+        def get_vlans(port_of_gw):
+            gw_port, gw = port_of_gw
+            return self._get_gateway_port_vlans(tenant_id, {
+                'port_id': gw_port['ID'],
+                'personality': gw['personality'],
+                'redundant': gw['redundant']
+            })
+
+        results = utils.bulk_call(get_ports, gws)
+        utils.raise_first_bulk_error(results)
+        gw_ports = [(gw_port, gw) for gw, ports, error in results
+                    for gw_port in ports]
+        results = utils.bulk_call(get_vlans, gw_ports)
+        utils.raise_first_bulk_error(results)
+        return [vlan for port, vlans, error in results
+                for vlan in vlans]
+
+    def _get_tenant_vlan_ids(self, vlan_ids, tenant_id):
+        """Return the ids of the vlans the tenant has permission for.
+
+        The permissions of the vlans are fetched concurrently, and the
+        group of the tenant is resolved once per enterprise the vlans are
+        assigned to, instead of once per vlan.
+        """
+        def get_permissions(vlan_id):
+            ent_perm = gw_helper.get_ent_permission_on_vlan(self.restproxy,
+                                                            vlan_id)
+            if not ent_perm:
+                return None, None
+            return (ent_perm['permittedEntityID'],
+                    gw_helper.get_tenant_perm(self.restproxy, vlan_id,
+                                              required=True))
+
+        results = utils.bulk_call(get_permissions, vlan_ids)
+        utils.raise_first_bulk_error(results)
+        groups = {}
+        permitted = set()
+        for vlan_id, (netpart_id, vlan_perm), error in results:
+            if not netpart_id:
+                continue
+            if netpart_id not in groups:
+                # Check if the grp exists in VSD, if not create it
+                groups[netpart_id] = helper.create_usergroup(
+                    self.restproxy, tenant_id, netpart_id)[1]
+            if (vlan_perm and
+                    vlan_perm['permittedEntityID'] == groups[netpart_id]):
+                permitted.add(vlan_id)
+        return permitted
 
     def _get_ent_permissions(self, vlan_id):
         req_params = {
@@ -988,58 +1023,48 @@ class NuageGateway(object):
                 vport_list = gw_helper.get_vports_for_l2domain(
                     self.restproxy, nuage_subnet_id)
 
+        def get_vport_info(vport):
+            # Get the host/bridge interface and the gw interface
+            nuage_interface = gw_helper.get_interface_by_vport(
+                self.restproxy,
+                vport['ID'], vport['type'])
+            nuage_vlan = gw_helper.get_gateway_port_vlan(self.restproxy,
+                                                         vport['VLANID'])
+            return nuage_interface, nuage_vlan
+
+        # Skip the vports which do not have any vlan. This should never
+        # happen as if vport is created a vlan is always associated with it
+        vport_list = [vport for vport in vport_list
+                      if vport['type'] in [constants.HOST_VPORT_TYPE,
+                                           constants.BRIDGE_VPORT_TYPE] and
+                      vport['VLANID']]
+        results = utils.bulk_call(get_vport_info, vport_list)
+        utils.raise_first_bulk_error(results)
+
         resp_list = []
-        for vport in vport_list:
-            vport_type = vport['type']
+        for vport, (nuage_interface, nuage_vlan), error in results:
             resp = dict()
-            if vport_type in [constants.HOST_VPORT_TYPE,
-                              constants.BRIDGE_VPORT_TYPE]:
-                resp['vport_id'] = vport['ID']
-                resp['vport_type'] = vport_type
-                resp['vport_name'] = vport['name']
-                # Get the host/bridge interface
-                nuage_interface = gw_helper.get_interface_by_vport(
-                    self.restproxy,
-                    vport['ID'], vport_type)
-
-                resp['port_id'] = None
-                if nuage_interface:
-                    resp['interface'] = nuage_interface['ID']
-                    resp['port_id'] = strip_cms_id(
-                        nuage_interface['externalID'])
-
-                resp['subnet_id'] = subnet_id
-
-                if not vport['VLANID']:
-                    # Skip this vport as it does not have any vlan.
-                    # This should never happen as if vport is created a vlan
-                    # is always associated with it
-                    continue
-
-                # Get the gw interface
-                nuage_vlan = gw_helper.get_gateway_port_vlan(self.restproxy,
-                                                             vport['VLANID'])
-
-                resp['nuage_vlan_id'] = nuage_vlan['ID']
-                resp['gateway'] = nuage_vlan['gatewayID']
-                resp['gatewayport'] = nuage_vlan['parentID']
-                resp['value'] = nuage_vlan['value']
-
-                resp_list.append(resp)
+            resp['vport_id'] = vport['ID']
+            resp['vport_type'] = vport['type']
+            resp['vport_name'] = vport['name']
+            resp['port_id'] = None
+            if nuage_interface:
+                resp['interface'] = nuage_interface['ID']
+                resp['port_id'] = strip_cms_id(
+                    nuage_interface['externalID'])
+
+            resp['subnet_id'] = subnet_id
+            resp['nuage_vlan_id'] = nuage_vlan['ID']
+            resp['gateway'] = nuage_vlan['gatewayID']
+            resp['gatewayport'] = nuage_vlan['parentID']
+            resp['value'] = nuage_vlan['value']
+
+            resp_list.append(resp)
 
         if tenant_id:
-            updated_vport_list = []
-            for vport in resp_list:
-                ent_perm = gw_helper.get_ent_permission_on_vlan(
-                    self.restproxy,
-                    vport['nuage_vlan_id'])
-                if ent_perm:
-                    vlan_perm = self._check_tenant_perm(
-                        vport['nuage_vlan_id'],
-                        tenant_id,
-                        ent_perm['permittedEntityID'])
-                    if vlan_perm:
-                        updated_vport_list.append(vport)
-            return updated_vport_list
+            permitted = self._get_tenant_vlan_ids(
+                [vport['nuage_vlan_id'] for vport in resp_list], tenant_id)
+            return [vport for vport in resp_list
+                    if vport['nuage_vlan_id'] in permitted]
 
         return resp_list
@@ -35,9 +35,11 @@ class NuageL2Domain(object):
         self.restproxy = restproxy
         self.policygroups = policygroups
 
-    def get_subnet_by_netpart(self, netpart_id):
+    def get_subnet_by_netpart(self, netpart_id, vsd_filter=None):
         nuagel2dom = nuagelib.NuageL2Domain({'net_partition_id': netpart_id})
         l2_doms = self.restproxy.get(nuagel2dom.get_all_resources_in_ent(),
+                                     extra_headers=helper.predicate_header(
+                                         vsd_filter),
                                      required=True)
         res = []
         for l2dom in l2_doms:
@@ -129,9 +129,11 @@ class NuageNetPartition(object):
                                           nuagel2domtemplate.post_data())[0]
         return l2_dom_temp['ID']
 
-    def get_net_partitions(self):
+    def get_net_partitions(self, vsd_filter=None):
         netpartition = nuagelib.NuageNetPartition()
         enterprises = self.restproxy.get(netpartition.get_resource(),
+                                         extra_headers=helper.predicate_header(
+                                             vsd_filter),
                                          required=True)
         res = []
         for enterprise in enterprises:
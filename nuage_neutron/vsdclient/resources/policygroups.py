@@ -33,6 +33,14 @@ PROTO_NAME_TO_NUM = lib_constants.IP_PROTOCOL_MAP
 VSD_RESP_OBJ = constants.VSD_RESP_OBJ
 NUAGE_SUPPORTED_ETHERTYPES = constants.NUAGE_SUPPORTED_ETHERTYPES
 NOT_SUPPORTED_ACL_ATTR_MSG = constants.NOT_SUPPORTED_ACL_ATTR_MSG
+SFC_RULE_ATTRIBUTES = ['DSCP', 'IPv6AddressOverride', 'action',
+                       'addressOverride', 'description', 'destinationPort',
+                       'etherType', 'externalID', 'flowLoggingEnabled',
+                       'locationID', 'locationType', 'networkID',
+                       'networkType', 'priority', 'protocol',
+                       'redirectRewriteType', 'redirectRewriteValue',
+                       'redirectVPortTagID', 'sourcePort',
+                       'statsLoggingEnabled', 'vlanRange']
 NUAGE_ACL_PROTOCOL_ANY_MAPPING = constants.NUAGE_ACL_PROTOCOL_ANY_MAPPING
 RES_POLICYGROUPS = constants.RES_POLICYGROUPS
 NOTHING_TO_UPDATE_ERR_CODE = constants.VSD_NO_ATTR_CHANGES_TO_MODIFY_ERR_CODE
@@ -1549,6 +1557,19 @@ class NuageRedirectTargets(object):
             rule_params)
         return rule[0]
 
+    def get_nuage_sfc_rules(self, fwd_policy_id):
+        nuage_fwdrule = nuagelib.NuageAdvFwdRule()
+        return self.restproxy.get(
+            nuage_fwdrule.in_post_resource(fwd_policy_id))
+
+    def restore_nuage_sfc_rule(self, fwd_policy_id, vsd_rule):
+        nuage_fwdrule = nuagelib.NuageAdvFwdRule()
+        rule_params = {key: vsd_rule[key] for key in SFC_RULE_ATTRIBUTES
+                       if vsd_rule.get(key) is not None}
+        return self.restproxy.post(
+            nuage_fwdrule.in_post_resource(fwd_policy_id),
+            rule_params)[0]
+
     def _map_nuage_redirect_target_rule(self, params):
         np_id = params['np_id']
         rtarget_rule = params.get('rtarget_rule')
@@ -130,15 +130,21 @@ class NuageTrunk(NuageTrunkBase):
         if vsd_trunk:
             self.delete(Trunk, vsd_trunk['ID'])
 
+    def get_trunk(self, os_trunk_id, net_partition_id, required=False):
+        return self._get_by_openstack_id(Trunk, os_trunk_id,
+                                         parent='enterprises',
+                                         parent_id=net_partition_id,
+                                         required=required)
+
     # TrunkPort
     def add_subport(self, os_trunk_id, subport, vport_id, params):
-        vsd_trunk = self._get_by_openstack_id(
-            Trunk, os_trunk_id,
-            parent='enterprises',
-            parent_id=params['net_partition_id'])
+        vsd_trunk = self.get_trunk(os_trunk_id, params['net_partition_id'])
+        self.add_subport_to_trunk(vsd_trunk.get('ID'), subport, vport_id,
+                                  params)
 
+    def add_subport_to_trunk(self, vsd_trunk_id, subport, vport_id, params):
         data = self.map_subport_to_vsd_vport(subport)
-        data['associatedTrunkID'] = vsd_trunk.get('ID')
+        data['associatedTrunkID'] = vsd_trunk_id
         self.put(TrunkPort, vport_id, data)
         self.add_subport_interface(vport_id, params)
 
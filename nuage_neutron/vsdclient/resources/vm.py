@@ -14,8 +14,7 @@
 
 import logging
 
-from netaddr import IPNetwork
-
+from nuage_neutron.plugins.common import ip_utils
 from nuage_neutron.plugins.common import utils
 from nuage_neutron.vsdclient.common.cms_id_helper import get_vsd_external_id
 from nuage_neutron.vsdclient.common import constants
@@ -468,10 +467,13 @@ class NuageVM(object):
         if args['subn_type'] == constants.SUBNET:
             # Create VIP only for l3 subnet
             try:
-                vip = self.create_vip_on_vport(params)
                 if params['os_fip']:
-                    self._add_os_fip_to_vip(params, vip)
+                    # associate the floating ip within the VIP creation
+                    params['vsd_fip_id'] = self._get_vsd_fip_for_vip(params)
+                params['nuage_vip'] = self.create_vip_on_vport(params)
             except restproxy.RESTProxyError as e:
+                # the floating ip is of no use without the vip
+                self._delete_created_fip(params)
                 if e.vsd_code == constants.VSD_IP_IN_USE_ERR_CODE:
                     # Vip address already in use by other vminterface.
                     # Workaround by allowing source address spoofing.
@@ -485,23 +487,33 @@ class NuageVM(object):
         else:
             return True
 
-    def _add_os_fip_to_vip(self, params, vip):
+    def _get_vsd_fip_for_vip(self, params):
         os_fip = params['os_fip']
         vsd_fip = self.vsdclient.get_nuage_fip_by_id(
             {'fip_id': os_fip['id']})
-        if not vsd_fip:
-            params = {
-                'nuage_rtr_id': params['vsd_l3domain_id'],
-                'nuage_fippool_id': os_fip['vsd_fip_subnet_id'],
-                'neutron_fip_ip': os_fip.floating_ip_address,
-                'neutron_fip_id': os_fip.id
-            }
-            vsd_fip_id = self.vsdclient.create_nuage_floatingip(
-                params)
-        else:
-            vsd_fip_id = vsd_fip['nuage_fip_id']
-        if vsd_fip_id:
-            self._update_fip_to_vip(vip, vsd_fip_id)
+        if vsd_fip:
+            return vsd_fip['nuage_fip_id']
+        fip_params = {
+            'nuage_rtr_id': params['vsd_l3domain_id'],
+            'nuage_fippool_id': os_fip['vsd_fip_subnet_id'],
+            'neutron_fip_ip': os_fip.floating_ip_address,
+            'neutron_fip_id': os_fip.id
+        }
+        # remember the floating ip created here, so that it can be deleted
+        # again when the vip is not created
+        fip_id = self.vsdclient.create_nuage_floatingip(fip_params)
+        params['created_vsd_fip_id'] = fip_id
+        return fip_id
+
+    def _delete_created_fip(self, params):
+        fip_id = params.pop('created_vsd_fip_id', None)
+        if not fip_id:
+            return
+        try:
+            self.vsdclient.delete_nuage_floatingip(fip_id)
+        except restproxy.RESTProxyError as e:
+            LOG.error("Rollback of floating ip %(fip)s failed: %(err)s",
+                      {'fip': fip_id, 'err': e})
 
     @staticmethod
     def get_net_size(netmask):
@@ -512,21 +524,21 @@ class NuageVM(object):
 
     @staticmethod
     def _check_cidr(params):
-        ip = IPNetwork(params['vip'])
-        if ip.size != 1:
-            LOG.info("No VIP will be created for %s", str(ip.cidr))
+        vip = ip_utils.parse_cidr(params['vip'])
+        if vip.size != 1:
+            LOG.info("No VIP will be created for %s",
+                     ip_utils.format_cidr(vip))
             return False
 
         return True
 
     @staticmethod
     def _compare_ip(params):
-        vip_addr = params['vip']
-        if '/' in vip_addr:
-            vip_ip = vip_addr.split('/')
-            vip_addr = vip_ip[0]
-        if IPNetwork(vip_addr) in [IPNetwork(ip) for ip in
-                                   params['port_ips']]:
+        # the host address of the vip, not the network of its prefix
+        vip = ip_utils.parse_ip(params['vip'].split('/')[0])
+        # the ips of a port are shared by all its address pairs, so their
+        # parsed set is cached across the vips of the port
+        if vip in ip_utils.ip_set(tuple(params['port_ips'])):
             LOG.info("No VIP will be created for %s as it is same as the"
                      "ip of the port", params['vip'])
             return True
@@ -559,17 +571,17 @@ class NuageVM(object):
         if not nuage_subnet.get('DHCPManaged', True):
             return True
 
-        vip = IPNetwork(params['vip'])
+        vip = ip_utils.parse_cidr(params['vip'])
         if vip.version == 6:
             if not nuage_subnet['IPv6Address']:
                 return False
-            subnet = IPNetwork(nuage_subnet['IPv6Address'])
+            subnet = ip_utils.parse_cidr(nuage_subnet['IPv6Address'])
         else:
             if not nuage_subnet['address']:
                 return False
-            subnet = IPNetwork('{}/{}'.format(nuage_subnet['address'],
-                                              nuage_subnet['netmask']))
-        return vip in subnet
+            subnet = ip_utils.parse_cidr('{}/{}'.format(
+                nuage_subnet['address'], nuage_subnet['netmask']))
+        return subnet.contains(vip)
 
     def process_vip(self, params):
         key, action = self._find_vip_action(params)
@@ -614,17 +626,58 @@ class NuageVM(object):
 
         key = (full_cidr, diff_mac, same_ip, same_subn)
         action = self._get_vip_action(key)
-        if action == ACTION_VIP and IPNetwork(params['vip']).version == 6:
+        if (action == ACTION_VIP and
+                ip_utils.parse_cidr(params['vip']).version == 6):
             params['IPType'] = constants.IPV6
         LOG.debug("Key is %s and action is %s", key, action)
         return key, action
 
+    def process_vips(self, params_list):
+        """Process the address pairs of a single vport in one pass.
+
+        The VIP of every address pair, together with its floating ip
+        association, is created concurrently. When any of them fails, the
+        VIPs and the floating ips created by this call are deleted again and
+        the first error is raised.
+
+        :return: True when mac spoofing needs to be enabled on the vport
+        """
+        results = utils.bulk_call(self.process_vip, params_list)
+        if any(exception for _, _, exception in results):
+            created = [params['nuage_vip'] for params in params_list
+                       if params.get('nuage_vip')]
+            for vip, _, exception in utils.bulk_call(self._delete_vip,
+                                                     created):
+                if exception:
+                    LOG.error("Rollback of vip %(vip)s failed: %(err)s",
+                              {'vip': vip['virtualIP'], 'err': exception})
+            # the floating ips are only deleted once no vip refers to them
+            utils.bulk_call(self._delete_created_fip,
+                            [params for params in params_list
+                             if params.get('created_vsd_fip_id')])
+            utils.raise_first_bulk_error(results)
+        return any(enable_spoofing for _, enable_spoofing, _ in results)
+
     def process_deleted_addr_pair(self, params):
-        params['vsd_subnet'] = helper.get_nuage_subnet(
-            self.restproxy, params['subnet_mapping'])
-        _, action = self._find_vip_action(params)
-        if action == ACTION_MACSPOOFING or action == ACTION_VIP:
-            self.update_mac_spoofing_on_vport(params, constants.DISABLED)
+        self.process_deleted_addr_pairs([params])
+
+    def process_deleted_addr_pairs(self, params_list):
+        """Undo the mac spoofing of deleted address pairs of a single vport.
+
+        The vsd subnet is fetched only once, unless it is passed in the
+        params, and mac spoofing is disabled at most once.
+        """
+        if not params_list:
+            return
+        vsd_subnet = (params_list[0].get('vsd_subnet') or
+                      helper.get_nuage_subnet(
+                          self.restproxy, params_list[0]['subnet_mapping']))
+        for params in params_list:
+            params['vsd_subnet'] = vsd_subnet
+            _, action = self._find_vip_action(params)
+            if action == ACTION_MACSPOOFING or action == ACTION_VIP:
+                self.update_mac_spoofing_on_vport(params, constants.DISABLED)
+                return
 
     def update_mac_spoofing_on_vport(self, params, status):
         req_params = {'vport_id': params['vport_id']}
@@ -652,6 +705,8 @@ class NuageVM(object):
             extra_params['IPType'] = constants.IPV6
         else:
             extra_params['IPType'] = constants.IPV4
+        if params.get('vsd_fip_id'):
+            extra_params['fip'] = params['vsd_fip_id']
 
         nuage_vip = nuagelib.NuageVIP(create_params=req_params,
                                       extra_params=extra_params)
@@ -683,26 +738,29 @@ class NuageVM(object):
                 resp.append(ret)
         return resp
 
-    def delete_vips(self, vport_id, vip_dict, vips):
-        nuage_vips = self.get_vips_on_vport(vport_id)
-
-        nuage_vip_dict = dict()
-        for vip in vips:
-            nuage_vip_dict[vip] = vip_dict[vip]
-
-        for nuage_vip in nuage_vips:
-            if nuage_vip['vip'] in nuage_vip_dict:
-                req_params = {
-                    'vip_id': nuage_vip['vip_id']
-                }
-                nuage_vip = nuagelib.NuageVIP(create_params=req_params)
-                try:
-                    self.restproxy.delete(nuage_vip.delete_resource())
-                except restproxy.ResourceNotFoundException:
-                    LOG.error("Error in deleting vip with ip %(vip)s and mac "
-                              "%(mac)s", {'vip': nuage_vip['vip'],
-                                          'mac': nuage_vip['mac']})
-                    raise
+    def delete_vips(self, vport_id, vip_dict, vips, nuage_vips=None):
+        """Delete the given vips from the vport.
+
+        :param nuage_vips: the vips on the vport as returned by
+            get_vips_on_vport, fetched from VSD when not given
+        """
+        if nuage_vips is None:
+            nuage_vips = self.get_vips_on_vport(vport_id)
+        vips_to_delete = [nuage_vip for nuage_vip in nuage_vips
+                          if nuage_vip['vip'] in vips]
+        results = utils.bulk_call(
+            lambda nuage_vip: self._delete_vip({'ID': nuage_vip['vip_id']}),
+            vips_to_delete)
+        for nuage_vip, _, exception in results:
+            if exception:
+                LOG.error("Error in deleting vip with ip %(vip)s and mac "
+                          "%(mac)s", {'vip': nuage_vip['vip'],
+                                      'mac': nuage_vip['mac']})
+        utils.raise_first_bulk_error(results)
+
+    def _delete_vip(self, vip):
+        nuage_vip = nuagelib.NuageVIP(create_params={'vip_id': vip['ID']})
+        self.restproxy.delete(nuage_vip.delete_resource())
 
     def get_vips(self, parent, parent_id, **filters):
         nuage_vip = nuagelib.NuageVIP()
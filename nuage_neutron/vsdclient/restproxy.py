@@ -14,12 +14,16 @@
 
 import base64
 import calendar
+import collections
 import logging
 import math
+import os
+import random
 import re
 import time
 
 from eventlet.green import threading
+from eventlet import greenpool
 from neutron._i18n import _
 from oslo_serialization import jsonutils as json
 import requests
@@ -72,10 +76,11 @@ LIST_SUBNETS = re.compile(r'.*/subnets(\?.*)?$')
 GET_L2DOMAIN = re.compile(r'/l2domains/([0-9a-fA-F\-]+?)(\?.*)?$')
 GET_SUBNET = re.compile(r'/subnets/([0-9a-fA-F\-]+?)(\?.*)?$')
 
-NUAGE_AUTH = None
-NUAGE_AUTH_RENEWING = True
-NUAGE_AUTH_SEMAPHORE = threading.Semaphore()
-THREAD_LOCAL_DATA = threading.local()
+# seconds before retrying a failed proactive renewal of the auth key
+AUTH_RENEWAL_RETRY_INTERVAL = 10
+
+# sessions kept open for reuse by a RESTProxyServer, at most
+MAX_IDLE_SESSIONS = 32
 
 
 class RESTProxyBaseException(Exception):
@@ -138,6 +143,260 @@ class ResourceConflictException(RESTProxyError):
             REST_CONFLICT)
 
 
+AuthToken = collections.namedtuple('AuthToken',
+                                   ['version', 'authorization', 'renew_at'])
+
+
+class _Renewal(object):
+    """A renewal of the auth key in progress, which others can wait for."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.token = None
+        self.error = None
+
+    def finish(self, token=None, error=None):
+        self.token = token
+        self.error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.token
+
+
+class SessionPool(object):
+    """The :class:`requests.Session` objects of a RESTProxyServer.
+
+    Due to SSL connection issues arising when one session is shared between
+    multiple threads (problem is in urllib3), a session is used by a single
+    request at a time. Requests borrow a session from the pool, so the
+    connections of a session are reused by the requests which follow.
+
+    A forked process starts with an empty pool: it must not use the
+    connections of its parent. These are dropped without closing them,
+    which would shut down the TLS connections the parent is still using.
+    """
+
+    def __init__(self, max_idle=MAX_IDLE_SESSIONS):
+        self.max_idle = max_idle
+        self._idle = []
+        self._pid = os.getpid()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+        try:
+            return self._idle.pop()
+        except IndexError:
+            return requests.Session()
+
+    def release(self, session):
+        if len(self._idle) < self.max_idle:
+            self._idle.append(session)
+        else:
+            session.close()
+
+
+class AuthTokenManager(object):
+    """Owns the auth key of a RESTProxyServer.
+
+    Requests read the current token without locking: a renewed token is
+    swapped in as a whole, with a higher version. Requests which got a 401
+    tell which version they used, so a key is renewed only once however
+    many requests fail on it, and requests which used an older version
+    simply retry with the current one.
+
+    When proactive renewal is enabled, the key is renewed in the renewal
+    window VSD allows before it expires, i.e. APIKeyRenewalInterval seconds
+    before the expiry, while requests keep using the current key. That
+    interval is fetched once and cached. The renewal time is spread over
+    the first half of the window, so the workers of a server do not all
+    renew at the same moment.
+    """
+
+    def __init__(self, restproxy):
+        self._restproxy = restproxy
+        self._token = None
+        self._renewal = None
+        self._renewal_interval = None
+        self._lock = threading.Lock()
+        self._proactive = False
+        self._timer = None
+        self._stats = {'renewals': 0,
+                       'proactive_renewals': 0,
+                       'renewal_failures': 0,
+                       'total_renewal_latency': 0.0,
+                       'max_renewal_latency': 0.0}
+
+    @property
+    def token(self):
+        return self._token
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['renewal_latency'] = (
+            stats['total_renewal_latency'] / stats['renewals']
+            if stats['renewals'] else 0.0)
+        stats['version'] = self._token.version if self._token else 0
+        return stats
+
+    def after_fork(self):
+        """Reset the state the process did not inherit from its parent.
+
+        Timer threads do not survive a fork, neither does a renewal which
+        was in progress in the parent. The key itself stays valid.
+        """
+        self._lock = threading.Lock()
+        self._renewal = None
+        self._timer = None
+        if self._proactive and self._token is not None:
+            self._schedule(self._token)
+
+    def enable_proactive_renewal(self):
+        self._proactive = True
+        if self._token is not None:
+            self._schedule(self._token)
+
+    def renew(self, stale_version=None):
+        """Renew the auth key, or wait for the renewal in progress.
+
+        :param stale_version: the version of the token which was rejected,
+            0 for no token. When the token was renewed since, the current
+            one is returned.
+        :return: the current token
+        """
+        with self._lock:
+            token = self._token
+            if (stale_version is not None and token is not None and
+                    token.version != stale_version):
+                return token
+            renewal = self._renewal
+            owner = renewal is None
+            if owner:
+                renewal = self._renewal = _Renewal()
+        if not owner:
+            return renewal.wait()
+        try:
+            token = self._renew()
+        except Exception as e:
+            with self._lock:
+                self._renewal = None
+            renewal.finish(error=e)
+            raise
+        with self._lock:
+            self._renewal = None
+        renewal.finish(token=token)
+        return token
+
+    def _renew(self):
+        start = time.time()
+        try:
+            token = self._authenticate()
+        except Exception:
+            self._stats['renewal_failures'] += 1
+            raise
+        latency = time.time() - start
+        self._stats['renewals'] += 1
+        self._stats['total_renewal_latency'] += latency
+        self._stats['max_renewal_latency'] = max(
+            self._stats['max_renewal_latency'], latency)
+        self._token = token
+        LOG.debug("[RESTProxy] New auth-token received, version %s, "
+                  "took %.3f s", token.version, latency)
+        if self._proactive:
+            self._schedule(token)
+        return token
+
+    def _authenticate(self):
+        restproxy = self._restproxy
+        encoded_auth = base64.b64encode(
+            restproxy.serverauth.encode()).decode()
+        # use a temporary auth key instead of the expired auth key
+        extra_headers = {'Authorization': 'Basic ' + encoded_auth}
+        resp = restproxy._rest_call('GET', restproxy.auth_resource, '',
+                                    extra_headers=extra_headers,
+                                    auth_renewal=True)
+        if not resp or resp[0] == 0:
+            restproxy.raise_rest_error("Could not establish a connection "
+                                       "with the VSD. Please check VSD URI "
+                                       "path in plugin config and verify "
+                                       "IP connectivity.")
+        elif resp[0] not in REST_SUCCESS_CODES \
+                or not resp[3][0].get('APIKey'):
+            restproxy.raise_rest_error("Could not authenticate with the "
+                                       "VSD. Please check the credentials "
+                                       "in the plugin config")
+        uname = restproxy.serverauth.split(':')[0]
+        new_uname_pass = uname + ':' + resp[3][0]['APIKey']
+        authorization = 'Basic ' + base64.b64encode(
+            new_uname_pass.encode()).decode()
+        if self._renewal_interval is None:
+            self._renewal_interval = self._get_renewal_interval(authorization)
+        version = self._token.version + 1 if self._token else 1
+        return AuthToken(version, authorization,
+                         self._compute_renew_at(resp))
+
+    def _get_renewal_interval(self, authorization):
+        resp = self._restproxy._rest_call(
+            'GET', '/systemconfigs', '',
+            extra_headers={'Authorization': authorization},
+            auth_renewal=True)
+        if resp[0] in REST_SUCCESS_CODES and resp[3]:
+            return resp[3][0].get('APIKeyRenewalInterval')
+        LOG.warning("[RESTProxy] Could not get the APIKeyRenewalInterval "
+                    "from VSD")
+        return None
+
+    def _compute_renew_at(self, api_key_info):
+        """Return the local time to renew the key, None when unknown."""
+        response_headers = api_key_info[4]
+        expiry = api_key_info[3][0].get('APIKeyExpiry')
+        if not response_headers or 'date' not in response_headers \
+                or not expiry or self._renewal_interval is None:
+            return None
+        # Assuming it's always going be in GMT
+        current_time_on_vsd = int(calendar.timegm(time.strptime(
+            response_headers['date'].rstrip(' GMT'),
+            "%a, %d %b %Y %H:%M:%S")))
+        # Convert from milli seconds to seconds
+        window_start = (expiry / 1000 - current_time_on_vsd -
+                        self._renewal_interval)
+        return time.time() + window_start + random.uniform(
+            0, self._renewal_interval / 2.0)
+
+    def _schedule(self, token, delay=None):
+        if delay is None:
+            if token.renew_at is None:
+                return
+            delay = max(token.renew_at - time.time(), 1)
+        timer = threading.Timer(delay, self._renew_proactively,
+                                args=[token])
+        timer.daemon = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = timer
+        timer.start()
+
+    def _renew_proactively(self, token):
+        if self._token is not token:
+            return  # renewed meanwhile, which scheduled the next renewal
+        try:
+            self.renew(stale_version=token.version)
+            self._stats['proactive_renewals'] += 1
+        except Exception as e:
+            LOG.warning("[RESTProxy] Renewal of the auth key failed, "
+                        "retrying in %s s: %s",
+                        AUTH_RENEWAL_RETRY_INTERVAL, e)
+            self._schedule(token, AUTH_RENEWAL_RETRY_INTERVAL)
+
+
 class RESTProxyServer(object):
 
     def __init__(self, server, base_uri, serverssl, verify_cert, serverauth,
@@ -159,6 +418,9 @@ class RESTProxyServer(object):
         self.api_stats_enabled = nuage_config.is_enabled(
             plugin_constants.DEBUG_API_STATS)
         self.api_count = 0
+        self.auth_token = AuthTokenManager(self)
+        self._sessions = SessionPool()
+        self._pid = os.getpid()
 
     @staticmethod
     def raise_rest_error(msg, exc=None, log_as_error=True, log_message=None):
@@ -213,25 +475,8 @@ class RESTProxyServer(object):
                    "the administrator.")
             RESTProxyServer.raise_rest_error(msg)
 
-    @staticmethod
-    def _get_session():
-        """Get the :class:`requests.Session` object for the current thread.
-
-        Due to SSL connection issues arising when one session is shared between
-        multiple threads (problem is in urllib3), we assign a new session to
-        each thread. This is done using thread-local data. For more information
-        see https://docs.python.org/2/library/threading.html#threading.local.
-
-        :return: :class:`requests.Session`
-        """
-        global THREAD_LOCAL_DATA
-        if not hasattr(THREAD_LOCAL_DATA, 'session'):
-            THREAD_LOCAL_DATA.session = requests.Session()
-        return THREAD_LOCAL_DATA.session
-
     def _rest_call(self, action, resource, data, extra_headers=None,
                    ignore_marked_for_deletion=False, auth_renewal=False):
-        global NUAGE_AUTH
         if not auth_renewal and self.api_stats_enabled:
             self.api_count += 1
         uri = self.base_uri + resource
@@ -241,8 +486,9 @@ class RESTProxyServer(object):
             'Content-type': 'application/json',
             'X-Nuage-Organization': self.organization,
         }
-        if NUAGE_AUTH:
-            headers['Authorization'] = NUAGE_AUTH
+        token = self.auth_token.token
+        if token:
+            headers['Authorization'] = token.authorization
         if extra_headers:
             headers.update(extra_headers)
 
@@ -292,7 +538,8 @@ class RESTProxyServer(object):
                                     self.is_marked(resp_data[0]):
                                 return self._subnet_not_found(match.group(1))
                 ret = (response.status_code, response.reason, response.text,
-                       resp_data, response.headers, headers['Authorization'])
+                       resp_data, response.headers,
+                       token.version if token else 0)
             except requests.exceptions.RequestException as e:
                 LOG.error(_('ServerProxy: request failed: {}').format(e))
             else:
@@ -302,7 +549,8 @@ class RESTProxyServer(object):
             LOG.debug("Attempt %s of %s", attempt + 1, self.max_retries)
         LOG.debug('After %d retries VSD did not respond properly.',
                   self.max_retries)
-        return ret or 0, None, None, None, None, headers['Authorization']
+        return ret or (0, None, None, None, None,
+                       token.version if token else 0)
 
     def _create_request(self, method, url, data, headers):
         """Create a HTTP(S) connection to the server and return the response.
@@ -319,105 +567,64 @@ class RESTProxyServer(object):
             'timeout': self.timeout,
             'verify': self.verify_cert,
         }
-        return self._get_session().request(method, url, **kwargs)
+        session = self._sessions.acquire()
+        try:
+            return session.request(method, url, **kwargs)
+        finally:
+            self._sessions.release(session)
 
-    def compute_sleep_time(self, api_key_info):
-        # Assuming it's always going be in GMT
-        response_headers = api_key_info[4] if api_key_info else None
-        api_key_data = api_key_info[3][0] if api_key_info else None
-        if response_headers and api_key_data:
-            current_time_on_vsd = int(calendar.timegm(time.strptime(
-                response_headers['date'].rstrip(' GMT'),
-                "%a, %d %b %Y %H:%M:%S")))
-            # Convert from milli seconds to seconds
-            api_expiry_time = api_key_data['APIKeyExpiry'] / 1000
-            response = self.get('/systemconfigs', required=True)
-            if response[0]:
-                renewal_before = response[0]['APIKeyRenewalInterval']
-                time_to_sleep = (
-                    api_expiry_time - current_time_on_vsd - renewal_before)
-                time_to_sleep = time_to_sleep if time_to_sleep > 0 else 1
-                return time_to_sleep
-
-        # Sleep for 1 second and compute value for time to sleep.
-        return 1
-
-    def generate_nuage_auth(self):
+    def generate_nuage_auth(self, stale_version=None):
         """Generate the Nuage authentication key.
 
-        The first thread to execute this method acquires `NUAGE_AUTH_SEMAPHORE`
-        and is thus able to generate the key. All subsequent threads which
-        execute this method while the first thread is busy generating the key,
-        will wait in the elif-block until the semaphore has been released by
-        the first thread. If the first thread has finished generating the key,
-        these threads will acquire the semaphore, release it and thus exit
-        the method. However, if the first thread fails to generate the key,
-        all other threads will again execute this method.
+        See AuthTokenManager.renew.
         """
-        global NUAGE_AUTH, NUAGE_AUTH_RENEWING, NUAGE_AUTH_SEMAPHORE
-        if NUAGE_AUTH_SEMAPHORE.acquire(blocking=False):
-            NUAGE_AUTH_RENEWING = True
-            try:
-                encoded_auth = base64.b64encode(
-                    self.serverauth.encode()).decode()
-                # use a temporary auth key instead of the expired auth key
-                extra_headers = {'Authorization': 'Basic ' + encoded_auth}
-                resp = self._rest_call('GET', self.auth_resource, '',
-                                       extra_headers=extra_headers,
-                                       auth_renewal=True)
-
-                if not resp or resp[0] == 0:
-                    self.raise_rest_error("Could not establish a connection "
-                                          "with the VSD. Please check VSD URI "
-                                          "path in plugin config and verify "
-                                          "IP connectivity.")
-                elif resp[0] not in REST_SUCCESS_CODES \
-                        or not resp[3][0].get('APIKey'):
-                    self.raise_rest_error("Could not authenticate with the "
-                                          "VSD. Please check the credentials "
-                                          "in the plugin config")
-                else:
-                    uname = self.serverauth.split(':')[0]
-                    new_uname_pass = uname + ':' + resp[3][0]['APIKey']
-                    encoded_auth = base64.b64encode(
-                        new_uname_pass.encode()).decode()
-                    NUAGE_AUTH = 'Basic ' + encoded_auth
-                    NUAGE_AUTH_RENEWING = False
-                    LOG.debug("[RESTProxy] New auth-token received %s",
-                              NUAGE_AUTH)
-                    return resp
-            finally:
-                NUAGE_AUTH_SEMAPHORE.release()
-        # some other thread is renewing the auth key
-        elif NUAGE_AUTH_RENEWING:
-            # make this thread wait until the other thread completes renewal
-            NUAGE_AUTH_SEMAPHORE.acquire(blocking=True)
-            NUAGE_AUTH_SEMAPHORE.release()
-            if NUAGE_AUTH_RENEWING:  # but not successful
-                self.generate_nuage_auth()
+        return self.auth_token.renew(stale_version)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # this client was created before the process forked
+            self._pid = os.getpid()
+            self.auth_token.after_fork()
+
+    def warm_up(self, connections=0):
+        """Authenticate and open connections ahead of the requests.
+
+        :param connections: the number of connections to open to VSD,
+            concurrently, for the requests to reuse
+        :return: the number of idle connections
+        """
+        self._check_fork()
+        if self.auth_token.token is None:
+            self.generate_nuage_auth(stale_version=0)
+        pool = greenpool.GreenPool(max(connections, 1))
+        for response in pool.imap(
+                lambda i: self.rest_call('GET', self.auth_resource, ''),
+                range(connections)):
+            if response[0] not in REST_SUCCESS_CODES:
+                LOG.debug("[RESTProxy] warm-up request failed: %s",
+                          response[:3])
+        return len(self._sessions)
 
     def rest_call(self, action, resource, data, extra_headers=None,
                   ignore_marked_for_deletion=False):
-        global NUAGE_AUTH
+        self._check_fork()
+        if self.auth_token.token is None:
+            # authenticate on first use
+            self.generate_nuage_auth(stale_version=0)
         response = self._rest_call(
             action, resource, data, extra_headers=extra_headers,
             ignore_marked_for_deletion=ignore_marked_for_deletion)
 
         # If at all authentication expires with VSD, re-authenticate.
         if response[0] == REST_UNAUTHORIZED and response[1] == 'Unauthorized':
-            # only renew the auth key if it hasn't been renewed yet
-            if response[5] == NUAGE_AUTH:
-                self.generate_nuage_auth()
-                # When VSD license expires and if user will spin a VM
-                # in this state then a proper error should be raised
-                # eventually instead of going in to infinite loop.
-                response = self._rest_call(
-                    action, resource, data, extra_headers=extra_headers,
-                    ignore_marked_for_deletion=ignore_marked_for_deletion)
-            else:
-                response = self.rest_call(
-                    action, resource, data, extra_headers=extra_headers,
-                    ignore_marked_for_deletion=ignore_marked_for_deletion)
+            # this renews the auth key only if it hasn't been renewed yet
+            self.generate_nuage_auth(stale_version=response[5])
+            # When VSD license expires and if user will spin a VM
+            # in this state then a proper error should be raised
+            # eventually instead of going in to infinite loop.
+            response = self._rest_call(
+                action, resource, data, extra_headers=extra_headers,
+                ignore_marked_for_deletion=ignore_marked_for_deletion)
         return response
 
     def get(self, resource, data='', extra_headers=None, required=False):
@@ -24,6 +24,9 @@ class VsdClient(object):
     def verify_cms(self, id):
         pass
 
+    def warm_up(self, connections=0):
+        pass
+
     @abstractmethod
     def get_usergroup(self, tenant, net_partition_id):
         pass
@@ -55,7 +58,7 @@ class VsdClient(object):
     def link_default_netpartition(self, params):
         pass
 
-    def get_net_partitions(self):
+    def get_net_partitions(self, vsd_filter=None):
         pass
 
     def get_netpartition_by_name(self, name):
@@ -76,7 +79,7 @@ class VsdClient(object):
     def set_fip_quota_at_ent_profile(self, fip_quota):
         pass
 
-    def get_subnet_by_netpart(self, netpart_id):
+    def get_subnet_by_netpart(self, netpart_id, vsd_filter=None):
         pass
 
     def create_subnet(self, ipv4_subnet, ipv6_subnet, params):
@@ -123,6 +126,9 @@ class VsdClient(object):
     def get_router_by_external(self, id):
         pass
 
+    def get_routers_by_external_ids(self, ids):
+        pass
+
     def move_l2domain_to_l3subnet(self, l2domain_id, l3subnetwork_id):
         pass
 
@@ -176,7 +182,7 @@ class VsdClient(object):
     def check_unused_policygroups(self, securitygroup_ids, sg_type='SOFTWARE'):
         pass
 
-    def get_zone_by_domainid(self, domain_id):
+    def get_zone_by_domainid(self, domain_id, vsd_filter=None):
         pass
 
     def get_zone_by_routerid(self, neutron_router_id, shared=False):
@@ -189,13 +195,13 @@ class VsdClient(object):
     def get_nuage_port_by_id(self, params):
         pass
 
-    def get_routers_by_netpart(self, netpart_id):
+    def get_routers_by_netpart(self, netpart_id, vsd_filter=None):
         pass
 
     def get_fip_underlay_enabled_domain_by_netpart(self, netpart_id):
         pass
 
-    def get_domain_subnet_by_zone_id(self, zone_id):
+    def get_domain_subnet_by_zone_id(self, zone_id, vsd_filter=None):
         pass
 
     def get_domain_subnet_by_id(self, subnet_id):
@@ -233,6 +239,9 @@ class VsdClient(object):
                                required=False):
         pass
 
+    def get_address_ranges(self, nuage_subnet_id, subnet_type):
+        pass
+
     def get_nuage_subnet_by_mapping(self, subnet_mapping, required=False):
         pass
 
@@ -380,6 +389,12 @@ class VsdClient(object):
     def add_nuage_sfc_rule(self, tmplt, rule_params, np_id):
         pass
 
+    def get_nuage_sfc_rules(self, fwd_policy_id):
+        pass
+
+    def restore_nuage_sfc_rule(self, fwd_policy_id, vsd_rule):
+        pass
+
     def get_nuage_redirect_target_rules(self, params):
         pass
 
@@ -467,11 +482,19 @@ class VsdClient(object):
     def nuage_vports_on_subnet(self, subnet_id):
         pass
 
+    def get_vport_dhcp_options(self, vport_id, ip_version):
+        pass
+
     def crt_or_updt_vport_dhcp_option(self, extra_dhcp_opt, resource_id,
-                                      external_id):
+                                      external_id, vport_dhcp_options=None):
+        pass
+
+    def delete_vport_nuage_dhcp(self, dhcp_opt, vport_id,
+                                vport_dhcp_options=None):
         pass
 
-    def delete_vport_nuage_dhcp(self, dhcp_opt, vport_id):
+    def restore_vport_dhcp_option(self, vport_id, ip_version, option_number,
+                                  vport_dhcp_options):
         pass
 
     def delete_vport_dhcp_option(self, dhcp_id, ip_version, on_rollback):
@@ -545,13 +568,16 @@ class VsdClient(object):
     def create_vip(self, params):
         pass
 
+    def create_vips(self, params_list):
+        pass
+
     def get_vips(self, vport_id):
         pass
 
     def create_vip_on_vport(self, params):
         pass
 
-    def delete_vips(self, vport_id, vip_dict, vips):
+    def delete_vips(self, vport_id, vip_dict, vips, nuage_vips=None):
         pass
 
     def update_fip_to_vips(self, neutron_subnet_id, vip, vsd_fip_id):
@@ -560,6 +586,9 @@ class VsdClient(object):
     def process_deleted_addr_pair(self, params):
         pass
 
+    def process_deleted_addr_pairs(self, params_list):
+        pass
+
     def change_perm_of_subns(self, nuage_npid, nuage_subnetid, shared,
                              tenant_id, remove_everybody=False):
         pass
@@ -622,8 +651,14 @@ class VsdClient(object):
     def add_subport(self, os_trunk_id, os_subport, data):
         pass
 
+    def add_subports(self, os_trunk_id, subports_data):
+        pass
+
     def remove_subport(self, os_port, subnet_mapping):
         pass
 
+    def remove_subports(self, ports_and_mappings):
+        pass
+
     def update_subport(self, os_port, vport, params):
         pass
@@ -12,11 +12,50 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from eventlet.green import threading
+
+from nuage_neutron.plugins.common import utils
 from nuage_neutron.vsdclient.impl.vsdclientimpl import VsdClientImpl
 
 
 class VsdClientFactory(object):
+    """Creates vsdclients, and registers the ones shared by the process.
+
+    A shared client is registered by VSD server, organization and cms id.
+    Registered clients remain valid in forked processes: their REST proxy
+    opens new connections when it finds itself in another process.
+    """
+
+    _clients = {}
+    _lock = threading.Lock()
 
     @staticmethod
     def new_vsd_client(cms_id, **kwargs):
         return VsdClientImpl(cms_id, **kwargs)
+
+    @classmethod
+    def get_vsd_client(cls, cms_id, **kwargs):
+        """Return the shared client, creating it when asked for first.
+
+        Callers asking concurrently for a client which is not created yet
+        wait for the first one to have created it.
+        """
+        key = (kwargs.get('server'), kwargs.get('organization'), cms_id)
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None:
+                with utils.STARTUP_TIMINGS.timed('vsdclient'):
+                    client = cls.new_vsd_client(cms_id, **kwargs)
+                cls._clients[key] = client
+        return client
+
+    @classmethod
+    def get_vsd_clients(cls):
+        """Return the shared clients."""
+        with cls._lock:
+            return list(cls._clients.values())
+
+    @classmethod
+    def clear(cls):  # useful in unit testing
+        with cls._lock:
+            cls._clients.clear()